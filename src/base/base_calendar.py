@@ -1,10 +1,16 @@
 import flet as ft
 from abc import abstractmethod
-from datetime import datetime, date, timedelta
-from base.base_page import BasePage
+from datetime import datetime, date
+from base.base_page import BasePage, loading_placeholder
+from base.search_controller import SearchController
+from base.keyed_list import patch_list_tile
+from base.infinite_list import InfiniteList
 import calendar
 from peewee import fn
 
+# Смен в одной порции списка за день
+SHIFTS_WINDOW = 12
+
 # Словарь русских названий месяцев
 RUSSIAN_MONTHS = {
     1: "Январь", 2: "Февраль", 3: "Март", 4: "Апрель",
@@ -15,6 +21,13 @@ RUSSIAN_MONTHS = {
 class BaseCalendar(BasePage):
     """Базовый класс для календарей"""
     
+    # Ключ календаря в общем кэше месяцев (None - месяцы не кэшируются)
+    CALENDAR_KIND = None
+    # Таблицы смен в списке за день (см. database/day_shifts.py)
+    SHIFT_SOURCES = ('duty',)
+    # Одна строка на сотрудника в списке за день
+    MERGE_SHIFTS_BY_EMPLOYEE = False
+    
     def __init__(self, page: ft.Page):
         super().__init__(page)
         self.current_year = date.today().year
@@ -24,6 +37,9 @@ class BaseCalendar(BasePage):
         self.calendar_container = None
         self.dialog = None
         self.current_shift_date = None
+        self._lookups = {}
+        # Фильтр списка смен по сотруднику и объекту применяется после паузы в вводе
+        self._shifts_filter = SearchController(lambda text, results: self.reset_page_and_update())
         self._init_components()
     
     def _init_components(self):
@@ -38,15 +54,14 @@ class BaseCalendar(BasePage):
     def _create_dialogs(self):
         """Создает диалоги"""
         self.shifts_list_view = ft.ListView(expand=True, spacing=5, height=500)
+        self.shifts_page_text = ft.Text("", color=ft.Colors.GREY)
+        self.shift_rows = self._create_shift_rows()
         
         # Контролы поиска и фильтрации
         self.show_shifts_cb = ft.Checkbox(label="Обычные смены", value=True, on_change=lambda e: self.update_shifts_list())
         self.show_vzn_cb = ft.Checkbox(label="ВЗН", value=True, on_change=lambda e: self.update_shifts_list())
-        self.employee_search_field = ft.TextField(label="Поиск по сотруднику", width=200, on_change=lambda e: self.reset_page_and_update())
-        self.object_search_field = ft.TextField(label="Поиск по объекту", width=200, on_change=lambda e: self.reset_page_and_update())
-        self.shifts_page = 0
-        self.shifts_page_size = 12
-        self.shifts_page_text = ft.Text("Страница 1")
+        self.employee_search_field = ft.TextField(label="Поиск по сотруднику", width=200, on_change=self._on_shifts_filter_change)
+        self.object_search_field = ft.TextField(label="Поиск по объекту", width=200, on_change=self._on_shifts_filter_change)
         
         self.shifts_dialog = ft.AlertDialog(
             modal=True,
@@ -62,11 +77,7 @@ class BaseCalendar(BasePage):
                 ], alignment=ft.MainAxisAlignment.START),
                 ft.Divider(),
                 self.shifts_list_view,
-                ft.Row([
-                    ft.IconButton(ft.Icons.ARROW_BACK, on_click=lambda e: self.prev_shifts_page()),
-                    self.shifts_page_text,
-                    ft.IconButton(ft.Icons.ARROW_FORWARD, on_click=lambda e: self.next_shifts_page())
-                ], alignment=ft.MainAxisAlignment.CENTER)
+                ft.Row([self.shifts_page_text], alignment=ft.MainAxisAlignment.CENTER)
             ], height=650, width=900),
             actions=[
                 *([ft.TextButton(self._get_add_shift_button_text(), on_click=lambda e: self.open_add_shift_dialog())] if self._get_add_shift_button_text() else []),
@@ -153,14 +164,83 @@ class BaseCalendar(BasePage):
         ])
     
     def update_calendar(self):
-        """Обновляет календарь"""
-        if hasattr(self, '_shifts_cache'):
-            delattr(self, '_shifts_cache')
+        """
+        Обновляет календарь
+        
+        Данные месяца берутся из общего кэша календарей (database/month_cache.py),
+        а если месяца там нет - загружаются вне потока интерфейса. При смене месяца
+        сетка заменяется заглушкой, при обновлении того же месяца старая
+        сетка остается на экране до прихода новых данных. После показа
+        соседние месяцы загружаются в кэш заранее.
+        """
+        from database.month_cache import month_cache
+        year, month = self.current_year, self.current_month
+        kind = self.CALENDAR_KIND
+        self.current_month_display.value = f"{RUSSIAN_MONTHS[month]} {year}"
+        
+        def show_month(month_data):
+            if (self.current_year, self.current_month) != (year, month):
+                # Пока месяц загружался, открыт другой
+                return
+            self._shifts_cache = month_data or {}
+            self._grid_month = (year, month)
+            self.calendar_grid_container.controls = [self.get_calendar_grid(year, month)]
+            self._prefetch_adjacent_months(year, month)
+        
+        cached = month_cache.get(kind, year, month) if kind else None
+        if cached is not None:
+            show_month(cached)
+            if self.page:
+                self.page.update()
+            return
         
-        self.current_month_display.value = f"{RUSSIAN_MONTHS[self.current_month]} {self.current_year}"
-        self.calendar_grid_container.controls = [self.get_calendar_grid(self.current_year, self.current_month)]
+        if getattr(self, '_grid_month', None) != (year, month):
+            self.calendar_grid_container.controls = [loading_placeholder()]
         if self.page:
             self.page.update()
+        
+        generation = month_cache.generation()
+        
+        def store_and_show(month_data):
+            if kind:
+                month_cache.put(kind, year, month, month_data, generation)
+            show_month(month_data)
+        
+        self.run_in_background("month", lambda: self._load_month(year, month), store_and_show)
+    
+    def _load_month(self, year, month):
+        """Загружает данные месяца (выполняется в db_executor)"""
+        first_day = date(year, month, 1)
+        last_day = date(year, month, calendar.monthrange(year, month)[1])
+        return self._get_month_data(first_day, last_day) or {}
+    
+    def _prefetch_adjacent_months(self, year, month):
+        """Загружает в кэш предыдущий и следующий месяцы, если их там нет"""
+        from database.executor import db_executor
+        from database.month_cache import month_cache, adjacent_months
+        kind = self.CALENDAR_KIND
+        if not kind:
+            return
+        for adjacent_year, adjacent_month in adjacent_months(year, month):
+            if (kind, adjacent_year, adjacent_month) in month_cache:
+                continue
+            generation = month_cache.generation()
+            db_executor.submit(
+                (kind, "prefetch", adjacent_year, adjacent_month),
+                lambda y=adjacent_year, m=adjacent_month: self._load_month(y, m),
+                lambda month_data, y=adjacent_year, m=adjacent_month, g=generation: month_cache.put(kind, y, m, month_data, g)
+            )
+    
+    def _invalidate_months(self, table, *dates):
+        """
+        Сбрасывает данные месяцев с измененными датами во всех календарях
+        
+        Args:
+            table: имя модели смен ('Assignment', 'CashWithdrawal', 'DutyShift')
+            dates: даты добавленных, измененных или удаленных смен
+        """
+        from database.month_cache import month_cache
+        month_cache.invalidate_dates(table, dates)
     
     def change_month(self, direction):
         """Смена месяца"""
@@ -195,23 +275,8 @@ class BaseCalendar(BasePage):
     
     def get_shifts_count_for_date(self, date_obj):
         """Получает количество смен для даты"""
-        if not hasattr(self, '_shifts_cache'):
-            self._load_shifts_cache()
         return self._shifts_cache.get(date_obj, 0)
     
-    def _load_shifts_cache(self):
-        """Загружает кеш смен для месяца"""
-        def operation():
-            first_day = date(self.current_year, self.current_month, 1)
-            if self.current_month == 12:
-                last_day = date(self.current_year + 1, 1, 1) - timedelta(days=1)
-            else:
-                last_day = date(self.current_year, self.current_month + 1, 1) - timedelta(days=1)
-            
-            return self._get_month_data(first_day, last_day)
-        
-        self._shifts_cache = self.safe_db_operation(operation) or {}
-    
     def _create_day_content(self, day, cell_date, day_data, is_today):
         """Создает содержимое ячейки дня (переопределяется в дочерних классах)"""
         return ft.Column([
@@ -248,22 +313,10 @@ class BaseCalendar(BasePage):
     def show_shifts_for_date(self, date_obj):
         """Показывает смены для даты"""
         self.current_shift_date = date_obj
-        self.shifts_page = 0
-        
-        # Открываем диалог сразу с заглушкой
         self.shifts_dialog.title.value = f"{self._get_shifts_dialog_title()} на {date_obj.strftime('%d.%m.%Y')}"
-        self.shifts_list_view.controls.clear()
-        self.shifts_list_view.controls.append(ft.Text("Загрузка...", size=16))
-        self.shifts_page_text.value = "Страница 1"
-        
         self.shifts_dialog.open = True
-        self.page.update()
-        
-        # Загружаем данные асинхронно
-        shifts_data = self._get_shifts_for_date(date_obj)
-        self.all_shifts = shifts_data if shifts_data else []
-        
-        self.update_shifts_list()
+        # Список открывается с заглушкой, первая порция загружается в фоне
+        self.update_shifts_list(clear=True)
     
     def close_shifts_dialog(self):
         """Закрывает диалог смен"""
@@ -342,23 +395,52 @@ class BaseCalendar(BasePage):
         
         self.add_vzn_dialog.content.controls = controls
     
+    def _lookup(self, name, find, show, results_column, matches):
+        """
+        Поиск с выпадающим списком результатов (не больше 5 строк)
+        
+        Запрос find(query) выполняется вне потока интерфейса после паузы
+        в вводе, show(query, rows) показывает результат. Дописанный запрос
+        фильтрует прошлый результат в памяти по matches(row, query).
+        """
+        if name not in self._lookups:
+            def hide(query):
+                results_column.visible = False
+            
+            self._lookups[name] = SearchController(
+                show,
+                search=lambda query: self.safe_db_operation(lambda: find(query)) or [],
+                min_length=2,
+                on_short=hide,
+                matches=matches,
+                limit=5,
+                page=self.page
+            )
+        return self._lookups[name]
+    
+    def _matches_employee(self, employee, query):
+        """Подходит ли сотрудник под запрос (начала слов ФИО, как в индексе поиска)"""
+        from database.name_index import matches_name
+        return matches_name(employee.full_name, query)
+    
+    def _matches_object(self, obj, query):
+        """Подходит ли объект под запрос (подстрока названия, как ILIKE)"""
+        return query.lower() in obj.name.lower()
+    
+    def _on_shifts_filter_change(self, e):
+        """Обработчик полей поиска в списке смен"""
+        self._shifts_filter.on_change(e)
+    
     def search_employees(self, query):
         """Поиск сотрудников"""
-        if not query or len(query) < 2:
-            self.search_results.visible = False
-            if self.page:
-                self.page.update()
-            return
-        
-        def operation():
-            from database.models import GuardEmployee
-            return list(GuardEmployee.select().where(
-                (GuardEmployee.full_name.contains(query)) & 
-                (GuardEmployee.termination_date.is_null())
-            )[:5])
-        
-        employees = self.safe_db_operation(operation) or []
-        
+        self._lookup("employees", self._find_employees, self._show_employees_results, self.search_results, self._matches_employee).submit(query)
+    
+    def _find_employees(self, query):
+        from database.models import GuardEmployee
+        from database.name_index import name_index, load_ranked
+        return load_ranked(GuardEmployee, name_index.search(query, 5, types=('guard',), terminated=False))
+    
+    def _show_employees_results(self, query, employees):
         self.search_results.controls.clear()
         if employees:
             for emp in employees:
@@ -369,8 +451,6 @@ class BaseCalendar(BasePage):
         else:
             self.search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
             self.search_results.visible = True
-        if self.page:
-            self.page.update()
     
     def select_employee(self, employee):
         """Выбор сотрудника"""
@@ -381,21 +461,14 @@ class BaseCalendar(BasePage):
     
     def search_vzn_employees(self, query):
         """Поиск сотрудников для ВЗН"""
-        if not query or len(query) < 2:
-            self.vzn_search_results.visible = False
-            if self.page:
-                self.page.update()
-            return
-        
-        def operation():
-            from database.models import GuardEmployee
-            return list(GuardEmployee.select().where(
-                (GuardEmployee.full_name.contains(query)) & 
-                (GuardEmployee.termination_date.is_null())
-            )[:5])
-        
-        employees = self.safe_db_operation(operation) or []
-        
+        self._lookup("vzn_employees", self._find_vzn_employees, self._show_vzn_employees_results, self.vzn_search_results, self._matches_employee).submit(query)
+    
+    def _find_vzn_employees(self, query):
+        from database.models import GuardEmployee
+        from database.name_index import name_index, load_ranked
+        return load_ranked(GuardEmployee, name_index.search(query, 5, types=('guard',), terminated=False))
+    
+    def _show_vzn_employees_results(self, query, employees):
         self.vzn_search_results.controls.clear()
         if employees:
             for emp in employees:
@@ -406,8 +479,6 @@ class BaseCalendar(BasePage):
         else:
             self.vzn_search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
             self.vzn_search_results.visible = True
-        if self.page:
-            self.page.update()
     
     def select_vzn_employee(self, employee):
         """Выбор сотрудника для ВЗН"""
@@ -417,91 +488,61 @@ class BaseCalendar(BasePage):
             self.page.update()
     
     def reset_page_and_update(self):
-        """Сбрасывает на первую страницу и обновляет список"""
-        self.shifts_page = 0
+        """Показывает список смен заново с первой порции"""
         self.update_shifts_list()
     
-    def update_shifts_list(self):
-        """Обновляет список смен с пагинацией"""
-        # Фильтрация по типу
-        all_items = []
-        if self.show_shifts_cb.value:
-            # Обычные смены (не ВЗН)
-            all_items.extend([item for item in self.all_shifts if not (hasattr(item, 'description') and item.description and "ВЗН" in item.description)])
-        if self.show_vzn_cb.value:
-            # ВЗН
-            all_items.extend([item for item in self.all_shifts if hasattr(item, 'description') and item.description and "ВЗН" in item.description])
+    def update_shifts_list(self, clear=False):
+        """
+        Показывает смены дня с текущими фильтрами с первой порции
         
-        # Поиск по сотруднику
-        employee_query = self.employee_search_field.value.lower() if self.employee_search_field.value else ""
-        if employee_query:
-            all_items = [item for item in all_items if employee_query in item.employee.full_name.lower()]
-        
-        # Поиск по объекту (из описания)
-        object_query = self.object_search_field.value.lower() if self.object_search_field.value else ""
-        if object_query:
-            all_items = [item for item in all_items if object_query in (getattr(item, 'description', '') or "").lower()]
-        
-        self.shifts_list_view.controls.clear()
-        
-        if not all_items:
-            self.shifts_list_view.controls.append(ft.Text(self._get_no_shifts_text(), size=16, color=ft.Colors.GREY))
-        else:
-            start = self.shifts_page * self.shifts_page_size
-            end = start + self.shifts_page_size
-            page_items = all_items[start:end]
-            
-            for item in page_items:
-                self.shifts_list_view.controls.append(self._create_shift_list_item(item))
-        
-        total_pages = (len(all_items) + self.shifts_page_size - 1) // self.shifts_page_size if all_items else 1
-        self.shifts_page_text.value = f"Страница {self.shifts_page + 1} из {total_pages}"
-        
-        if self.page:
-            self.page.update()
+        Фильтры, число строк и порции выполняются в БД (database/day_shifts.py).
+        """
+        from database.day_shifts import ShiftFilters, day_shifts_query
+        if self.current_shift_date is None:
+            return
+        filters = ShiftFilters(
+            self.show_shifts_cb.value,
+            self.show_vzn_cb.value,
+            (self.employee_search_field.value or "").strip(),
+            (self.object_search_field.value or "").strip()
+        )
+        self._shifts_query = day_shifts_query(
+            self.current_shift_date, self.SHIFT_SOURCES, filters, self.MERGE_SHIFTS_BY_EMPLOYEE
+        )
+        self.shift_rows.empty_text = self._get_no_shifts_text()
+        self.shift_rows.reset(clear=clear)
+    
+    def _create_shift_rows(self):
+        """Строки списка смен: порции из БД при прокрутке, элементы по ключу (тип записи, id)"""
+        from database.day_shifts import fetch_day_shifts, count_day_shifts, shift_cursor
+        self._shifts_query = None
+        return InfiniteList(
+            self.shifts_list_view,
+            lambda after, limit: fetch_day_shifts(self._shifts_query, after, limit),
+            self._create_shift_list_item,
+            cursor=shift_cursor,
+            key=lambda shift: (type(shift).__name__, shift.id),
+            signature=self._shift_item_signature,
+            update=lambda item, shift: patch_list_tile(item, self._create_shift_list_item(shift)),
+            count=lambda: count_day_shifts(self._shifts_query),
+            window=SHIFTS_WINDOW,
+            status=self.shifts_page_text,
+            page=self.page
+        )
     
-    def prev_shifts_page(self):
-        """Предыдущая страница смен"""
-        if self.shifts_page > 0:
-            self.shifts_page -= 1
-            self.update_shifts_list()
-    
-    def next_shifts_page(self):
-        """Следующая страница смен"""
-        # Получаем отфильтрованные элементы
-        all_items = []
-        if self.show_shifts_cb.value:
-            all_items.extend([item for item in self.all_shifts if not (hasattr(item, 'description') and item.description and "ВЗН" in item.description)])
-        if self.show_vzn_cb.value:
-            all_items.extend([item for item in self.all_shifts if hasattr(item, 'description') and item.description and "ВЗН" in item.description])
-        
-        employee_query = self.employee_search_field.value.lower() if self.employee_search_field.value else ""
-        if employee_query:
-            all_items = [item for item in all_items if employee_query in item.employee.full_name.lower()]
-        
-        object_query = self.object_search_field.value.lower() if self.object_search_field.value else ""
-        if object_query:
-            all_items = [item for item in all_items if object_query in (item.description or "").lower()]
-        
-        total_pages = (len(all_items) + self.shifts_page_size - 1) // self.shifts_page_size
-        if self.shifts_page < total_pages - 1:
-            self.shifts_page += 1
-            self.update_shifts_list()
+    def _shift_item_signature(self, shift):
+        """Данные, от которых зависит вид строки смены (переопределяется в дочерних классах)"""
+        return dict(shift.__data__)
     
     def search_objects(self, query):
         """Поиск объектов"""
-        if not query or len(query) < 2:
-            self.object_search_results.visible = False
-            if self.page:
-                self.page.update()
-            return
-        
-        def operation():
-            from database.models import Object
-            return list(Object.select().where(Object.name.contains(query))[:5])
-        
-        objects = self.safe_db_operation(operation) or []
-        
+        self._lookup("objects", self._find_objects, self._show_objects_results, self.object_search_results, self._matches_object).submit(query)
+    
+    def _find_objects(self, query):
+        from database.models import Object
+        return list(Object.select().where(Object.name.contains(query))[:5])
+    
+    def _show_objects_results(self, query, objects):
         self.object_search_results.controls.clear()
         if objects:
             for obj in objects:
@@ -512,8 +553,6 @@ class BaseCalendar(BasePage):
         else:
             self.object_search_results.controls.append(ft.Text("Объект не найден", color=ft.Colors.ERROR))
             self.object_search_results.visible = True
-        if self.page:
-            self.page.update()
     
     def select_object(self, obj):
         """Выбор объекта"""
@@ -584,11 +623,6 @@ class BaseCalendar(BasePage):
         """Возвращает данные для месяца"""
         pass
     
-    @abstractmethod
-    def _get_shifts_for_date(self, date_obj):
-        """Возвращает смены для даты"""
-        pass
-    
     @abstractmethod
     def _create_shift_list_item(self, shift):
         """Создает элемент списка смены"""
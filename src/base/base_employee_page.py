@@ -1,7 +1,9 @@
 import flet as ft
 from abc import abstractmethod
 from datetime import datetime
-from base.base_page import BasePage
+from base.base_page import BasePage, loading_placeholder
+from base.search_controller import SearchController
+from base.keyed_list import KeyedList, patch_list_tile
 import os
 
 class BaseEmployeePage(BasePage):
@@ -17,6 +19,18 @@ class BaseEmployeePage(BasePage):
         self.page_size = 9
         self.sort_ascending = True
         self.sort_by_name = True
+        self.list_avatars = {}
+        # Выбор нескольких сотрудников для групповых операций
+        self.selection_mode = False
+        self.selected_ids = set()
+        self.page_rows = []
+        # Поиск выполняется после паузы в вводе, под тем же ключом, что и фоновое обновление списка
+        self.search_controller = SearchController(
+            self._show_search_results,
+            search=lambda text: self._load_list_page(),
+            key=(id(self), "list"),
+            page=page
+        )
         self._init_components()
     
     def _init_components(self):
@@ -41,39 +55,82 @@ class BaseEmployeePage(BasePage):
         self.next_btn = ft.IconButton(icon=ft.Icons.ARROW_FORWARD, on_click=self.next_page)
         self.page_info = ft.Text("Страница 1 из 1")
     
-    def refresh_list(self):
-        """Обновляет данные в списке"""
-        def operation():
-            query = self._get_base_query()
-            query = self._apply_search_filter(query)
-            
-            all_employees = list(query)
-            
-            # Сортируем в Python
-            if self.sort_by_name:
-                all_employees.sort(key=lambda x: x.full_name.strip().lower(), reverse=not self.sort_ascending)
-            else:
-                # Сортировка по дополнительному полю (переопределяется в дочерних классах)
-                all_employees.sort(key=self._get_sort_key, reverse=not self.sort_ascending)
-            
-            # Пагинация
-            start_idx = self.current_page * self.page_size
-            end_idx = start_idx + self.page_size
-            page_employees = all_employees[start_idx:end_idx]
-            
-            self.employees_list.controls.clear()
-            for employee in page_employees:
-                self.employees_list.controls.append(self._create_list_item(employee))
-            
-            # Обновляем кнопки пагинации
-            total_pages = (len(all_employees) + self.page_size - 1) // self.page_size
-            self.prev_btn.disabled = self.current_page == 0
-            self.next_btn.disabled = self.current_page >= total_pages - 1
-            self.page_info.value = f"Страница {self.current_page + 1} из {max(1, total_pages)}"
-            
-            return True
+    def refresh_list(self, background=False):
+        """
+        Обновляет данные в списке
         
-        self.safe_db_operation(operation)
+        При background=True запрос выполняется вне потока интерфейса,
+        а на время загрузки в списке показывается заглушка.
+        """
+        if background:
+            self.employees_list.controls = [loading_placeholder()]
+            if self.page:
+                self.page.update()
+            self.run_in_background("list", self._load_list_page, self._show_list_page)
+        else:
+            result = self.safe_db_operation(self._load_list_page)
+            if result:
+                self._show_list_page(result)
+    
+    def _load_list_page(self):
+        """
+        Загружает строки текущей страницы списка и число страниц
+        
+        Сортировка и LIMIT/OFFSET выполняются в БД, число страниц
+        считается отдельным COUNT. Выполняется и в потоке БД, поэтому
+        номер показанной страницы возвращается, а меняется в _show_list_page.
+        """
+        from database.projections import project
+        from database.blob_store import get_blobs_base64
+        query = self._get_base_query()
+        query = self._apply_search_filter(query)
+        model = query.model
+        
+        total_pages = (query.count() + self.page_size - 1) // self.page_size
+        # Страница могла исчезнуть после удаления или увольнения
+        current_page = max(0, min(self.current_page, total_pages - 1))
+        
+        if self.sort_by_name:
+            order = [self._get_order_field()]
+        else:
+            # Сортировка по дополнительному полю (переопределяется в дочерних классах), затем по ФИО
+            order = [self._get_secondary_order(), self._get_order_field()]
+        order = [field.asc() if self.sort_ascending else field.desc() for field in order]
+        
+        query = query.order_by(*order, model.id).paginate(current_page + 1, self.page_size)
+        
+        # Для списка нужны только отображаемые колонки и уменьшенное фото
+        rows = project(query, *self._get_list_fields(), model.photo_thumb_blob.alias('avatar_blob_id'))
+        avatars = get_blobs_base64(row.avatar_blob_id for row in rows)
+        return rows, current_page, total_pages, avatars
+    
+    def _show_list_page(self, result):
+        """Заполняет список загруженными строками"""
+        page_employees, self.current_page, total_pages, self.list_avatars = result
+        self.page_rows = page_employees
+        self._render_list_items()
+        self._update_company_counts()
+        
+        # Обновляем кнопки пагинации
+        self.prev_btn.disabled = self.current_page == 0
+        self.next_btn.disabled = self.current_page >= total_pages - 1
+        self.page_info.value = f"Страница {self.current_page + 1} из {max(1, total_pages)}"
+    
+    def _get_list_fields(self):
+        """Возвращает колонки строки списка (переопределяется в дочерних классах)"""
+        model = self._get_base_query().model
+        return [model.id, model.full_name]
+    
+    def open_employee(self, employee_id, show):
+        """Загружает карточку сотрудника из строки списка и передает запись сотрудника в show"""
+        dossier = self._load_dossier(employee_id)
+        if dossier:
+            show(dossier.employee)
+        else:
+            # Запись удалена или уволена, пока список был открыт
+            self.refresh_list()
+            if self.page:
+                self.page.update()
     
     def show_detail_dialog(self, employee):
         """Показывает диалог с детальной информацией"""
@@ -193,8 +250,16 @@ class BaseEmployeePage(BasePage):
             self.show_snackbar(str(ex), True)
     
     def show_edit_dialog(self, employee):
-        """Показывает диалог редактирования"""
+        """
+        Показывает диалог редактирования
+
+        Запись перечитывается из БД (карточка в кэше могла устареть после
+        изменений с другого рабочего места), а ее значения запоминаются:
+        при сохранении записываются только поля, измененные в диалоге.
+        """
+        employee = self._reload_employee(employee)
         self.current_employee = employee
+        self._edit_original = dict(employee.__data__)
         self._populate_edit_fields(employee)
         self.edit_dialog.title = ft.Text(f"Редактировать {self._get_employee_type()}")
         self.edit_dialog.content = ft.Column(self._get_edit_fields(), spacing=15)
@@ -208,6 +273,22 @@ class BaseEmployeePage(BasePage):
         if self.page:
             self.page.update()
     
+    def _reload_employee(self, employee):
+        """Текущая запись сотрудника из БД (если ее не удалось прочитать - переданная)"""
+        model = type(employee)
+        fresh = self.safe_db_operation(lambda: model.get_or_none(model.id == employee.id))
+        return fresh or employee
+    
+    def _save_changed_fields(self, employee):
+        """Сохраняет только поля, измененные после открытия диалога редактирования"""
+        original = getattr(self, '_edit_original', None) or {}
+        changed = [
+            field for name, field in type(employee)._meta.fields.items()
+            if name in employee.__data__ and employee.__data__[name] != original.get(name)
+        ]
+        if changed:
+            employee.save(only=changed)
+    
     def close_edit_dialog(self, e=None):
         """Закрывает диалог редактирования"""
         self.edit_dialog.open = False
@@ -225,6 +306,83 @@ class BaseEmployeePage(BasePage):
         except ValueError as ex:
             self.show_snackbar(str(ex), True)
     
+    def show_import_dialog(self, e=None):
+        """Выбор CSV/XLSX для импорта: сначала файл проверяется без записи"""
+        def on_result(ev: ft.FilePickerResultEvent):
+            if ev.files:
+                self._run_import(ev.files[0].path, dry_run=True)
+        
+        file_picker = ft.FilePicker(on_result=on_result)
+        self.page.overlay.append(file_picker)
+        self.page.update()
+        file_picker.pick_files(
+            dialog_title="Выберите файл с сотрудниками",
+            allowed_extensions=["csv", "xlsx"]
+        )
+    
+    def _run_import(self, path, dry_run):
+        """Проверяет (dry_run) или импортирует файл в фоне и показывает отчет"""
+        from database.executor import db_executor
+        from utils.employee_import import import_employees
+        
+        created_by_user_id = None
+        if hasattr(self.page, 'auth_manager') and self.page.auth_manager.current_user:
+            created_by_user_id = self.page.auth_manager.current_user.id
+        
+        def done(report):
+            if not report.dry_run and report.created:
+                if hasattr(self.page, 'auth_manager'):
+                    self.page.auth_manager.log_action("Импорт сотрудников", f"Импортировано из файла {os.path.basename(path)}: {report.created}")
+                self.refresh_list(background=True)
+            self._show_import_report(path, report)
+        
+        def failed(ex):
+            self.show_snackbar(f"Ошибка импорта: {ex}", True)
+        
+        self.show_snackbar("Проверка файла..." if dry_run else "Импорт...")
+        db_executor.submit(
+            (id(self), "import"),
+            lambda: import_employees(self.employee_kind, path, dry_run=dry_run, created_by_user_id=created_by_user_id),
+            done,
+            failed
+        )
+    
+    def _show_import_report(self, path, report):
+        """Отчет импорта; после проверки - кнопка записи прошедших проверку строк"""
+        lines = [ft.Text(f"Строк в файле: {report.total}", size=16)]
+        if report.dry_run:
+            lines.append(ft.Text(f"Будет добавлено: {report.valid}", size=16, weight="bold"))
+        else:
+            lines.append(ft.Text(f"Добавлено: {report.created}", size=16, weight="bold"))
+        if report.error_count:
+            lines.append(ft.Text(f"Строк с ошибками (пропускаются): {report.error_count}", size=16, color=ft.Colors.RED))
+            errors = [ft.Text(f"Строка {line}: {message}", size=13) for line, message in report.errors]
+            if report.error_count > len(report.errors):
+                errors.append(ft.Text(f"... и еще {report.error_count - len(report.errors)}", size=13, color=ft.Colors.GREY))
+            lines.append(ft.Container(ft.ListView(errors, spacing=2), height=250, width=600))
+        
+        def close(e=None):
+            report_dialog.open = False
+            self.page.update()
+        
+        def confirm(e):
+            close()
+            self._run_import(path, dry_run=False)
+        
+        actions = [ft.TextButton("Закрыть", on_click=close)]
+        if report.dry_run and report.valid:
+            actions.insert(0, ft.ElevatedButton(f"Импортировать ({report.valid})", on_click=confirm))
+        
+        report_dialog = ft.AlertDialog(
+            title=ft.Text("Проверка файла" if report.dry_run else "Импорт завершен"),
+            content=ft.Column(lines, tight=True, spacing=8),
+            actions=actions,
+            modal=True
+        )
+        self.page.overlay.append(report_dialog)
+        report_dialog.open = True
+        self.page.update()
+    
     def _create_termination_fields(self):
         """Создает поля для увольнения"""
         self.termination_date_field = ft.TextField(label="Дата увольнения (дд.мм.гггг)", width=200, on_change=self.format_date_input, max_length=10)
@@ -278,13 +436,18 @@ class BaseEmployeePage(BasePage):
             
             self.current_employee.termination_date = termination_date
             self.current_employee.termination_reason = termination_reason_value
-            self.current_employee.save()
+            model = type(self.current_employee)
+            self.current_employee.save(only=[model.termination_date, model.termination_reason])
+            self._invalidate_dossier(self.current_employee)
+            
+            from database.company_index import company_index
+            from database.name_index import name_index
+            company_index.set_terminated(self.employee_kind, self.current_employee.id, True)
+            name_index.set_terminated(self.employee_kind, self.current_employee.id, True)
             
             # Логирование
             if hasattr(self.page, 'auth_manager'):
-                print(f"Логирую увольнение: {self.current_employee.full_name}")
                 self.page.auth_manager.log_action("Увольнение сотрудника", f"Уволен сотрудник: {self.current_employee.full_name}")
-                print("Лог создан")
             
             return True
         
@@ -301,9 +464,12 @@ class BaseEmployeePage(BasePage):
         """Обработчик изменения поиска"""
         self.search_value = e.control.value.strip()
         self.current_page = 0
-        self.refresh_list()
-        if self.page:
-            self.page.update()
+        self.search_controller.submit(self.search_value)
+    
+    def _show_search_results(self, text, result):
+        """Показывает страницу списка, найденную поиском"""
+        if result:
+            self._show_list_page(result)
     
     def prev_page(self, e):
         """Предыдущая страница"""
@@ -347,20 +513,34 @@ class BaseEmployeePage(BasePage):
     def on_company_filter_change(self, e):
         """Обработчик изменения фильтра по компании"""
         self.current_page = 0
-        self.refresh_list()
-        if self.page:
-            self.page.update()
+        self.refresh_list(background=True)
     
 
     
+    def get_list_avatar(self, row) -> ft.Control:
+        """Уменьшенное фото для строки списка (загружено вместе со страницей списка)"""
+        avatar_base64 = self.list_avatars.get(getattr(row, 'avatar_blob_id', None))
+        if avatar_base64:
+            return ft.Image(
+                src_base64=avatar_base64,
+                width=40,
+                height=40,
+                fit=ft.ImageFit.COVER,
+                border_radius=20
+            )
+        return ft.CircleAvatar(content=ft.Icon(ft.Icons.PERSON), radius=20)
+    
     def get_photo_widget(self, employee) -> ft.Control:
         """Возвращает виджет с фотографией сотрудника"""
-        import base64
+        from database.blob_store import get_blob_base64
         
-        if hasattr(employee, 'photo_base64') and employee.photo_base64:
+        # Фото загружается из хранилища только при показе
+        blob_id = getattr(employee, 'photo_blob_id', None)
+        photo_base64 = self.safe_db_operation(lambda: get_blob_base64(blob_id)) if blob_id else None
+        if photo_base64:
             try:
                 return ft.Image(
-                    src_base64=employee.photo_base64,
+                    src_base64=photo_base64,
                     width=150,
                     height=200,
                     fit=ft.ImageFit.COVER,
@@ -369,7 +549,7 @@ class BaseEmployeePage(BasePage):
             except:
                 pass
         
-        # Если нет base64 фото, показываем заглушку
+        # Если фото нет, показываем заглушку
         return ft.Container(
             content=ft.Icon(ft.Icons.PERSON, size=100, color=ft.Colors.GREY),
             width=150,
@@ -395,39 +575,21 @@ class BaseEmployeePage(BasePage):
         except Exception as e:
             self.show_snackbar(f"Ошибка открытия PDF: {e}", True)
     
-    def open_base64_file(self, file_base64, filename):
-        """Открывает файл из base64"""
-        import base64
-        import tempfile
-        import os
-        from pathlib import Path
+    def open_blob_file(self, blob_id, filename):
+        """Открывает файл из хранилища (файл записывается в кэш на диске в фоне)"""
+        from database.executor import db_executor
+        from utils.file_cache import file_cache
         
-        try:
-            # Декодируем base64
-            file_data = base64.b64decode(file_base64)
-            
-            # Создаем временный файл
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(filename).suffix)
-            temp_file.write(file_data)
-            temp_file.close()
-            temp_path = temp_file.name
-            
-            # Открываем файл
-            self.open_pdf(temp_path)
-            
-            # Удаляем временный файл через некоторое время
-            import threading
-            def cleanup():
-                import time
-                time.sleep(5)  # Ждем 5 секунд
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
-            threading.Thread(target=cleanup, daemon=True).start()
-            
-        except Exception as e:
-            self.show_snackbar(f"Ошибка открытия файла: {e}", True)
+        def opened(path):
+            if path:
+                self.open_pdf(str(path))
+            else:
+                self.show_snackbar("Файл не найден", True)
+        
+        def failed(ex):
+            self.show_snackbar(f"Ошибка открытия файла: {ex}", True)
+        
+        db_executor.submit(("open_file", blob_id), lambda: file_cache.get_path(blob_id, filename), opened, failed)
     
     def get_employee_folder_type(self):
         """Возвращает тип папки для сотрудника"""
@@ -435,89 +597,83 @@ class BaseEmployeePage(BasePage):
         return "Сотрудник охраны"
     
     def save_personal_card(self, employee, file_path, company):
-        """Сохраняет личную карточку в base64"""
-        from database.models import PersonalCard
+        """Сохраняет личную карточку в хранилище файлов"""
+        from database.models import PersonalCard, db
+        from database.session import db_session
+        from database.blob_store import put_blob_file
         from datetime import date
-        import base64
         from pathlib import Path
         
         source_file = Path(file_path)
         
-        # Читаем файл и конвертируем в base64
-        with open(source_file, 'rb') as f:
-            file_data = f.read()
-        
-        file_base64 = base64.b64encode(file_data).decode('utf-8')
-        
-        # Создаем запись в БД
-        if hasattr(employee, 'guard_rank'):
-            PersonalCard.create(
-                guard_employee=employee, 
-                company=company, 
-                issue_date=date.today(),
-                file_base64=file_base64,
-                filename=source_file.name
-            )
-        else:
+        # Файл и карточка записываются в одной транзакции (см. database/blob_store.py)
+        with db_session(), db.atomic():
+            # Файл записывается в хранилище частями, без чтения в память целиком
+            file_blob = put_blob_file(source_file)
+            
+            # Создаем запись в БД (у руководителей тоже есть guard_rank, поэтому поле владельца - по типу страницы)
             PersonalCard.create(
-                chief_employee=employee, 
+                **{f"{self.employee_kind}_employee": employee},
                 company=company, 
                 issue_date=date.today(),
-                file_base64=file_base64,
+                file_blob=file_blob,
                 filename=source_file.name
             )
+        self._invalidate_dossier(employee)
         
         return True
     
     def change_photo(self, employee, photo_name=None, callback=None):
-        """Изменение фотографии сотрудника"""
+        """
+        Изменение фотографии сотрудника
+        
+        Файл обрабатывается в пуле процессов (utils/image_pipeline.py), версии фото
+        сохраняются в фоновом потоке БД - окно не ждет ни обработки, ни записи.
+        Если задан callback, он получает версии фото {avatar, detail, original} (байты)
+        вместо обновления сотрудника: новый сотрудник записывает их через _store_photo
+        в транзакции сохранения, и отмена диалога не оставляет файлов в хранилище.
+        """
+        from utils.image_pipeline import image_pipeline
+        
+        def save_photo(renditions):
+            from database.models import db
+            from database.blob_store import release_blob
+            old_blob_ids = {employee.photo_blob_id, employee.photo_thumb_blob_id, employee.photo_original_blob_id}
+            # Версии фото и ссылки на них записываются в одной транзакции (см. database/blob_store.py)
+            with db.atomic():
+                blobs = self._store_photo(employee, renditions)
+                employee.save(only=[type(employee).photo_blob, type(employee).photo_thumb_blob, type(employee).photo_original_blob])
+            self._invalidate_dossier(employee)
+            for blob_id in old_blob_ids - {blob.id for blob in blobs.values()}:
+                release_blob(blob_id)
+            return True
+        
+        def on_saved(result):
+            self.show_snackbar("Фотография обновлена!")
+            # Принудительно обновляем диалог
+            for dialog in self.page.overlay[:]:
+                if hasattr(dialog, 'open') and dialog.open:
+                    dialog.open = False
+            self.page.update()
+            self.show_basic_info_with_tabs(employee)
+            # Аватар в строке списка
+            self.refresh_list(background=True)
+        
+        def on_error(ex):
+            self.show_snackbar(f"Ошибка сохранения фото: {ex}", True)
+        
+        def on_processed(renditions):
+            from database.executor import db_executor
+            if callback:
+                callback(renditions)
+                self.show_snackbar("Фотография загружена")
+                return
+            db_executor.submit(("photo", self.employee_kind, employee.id), lambda: save_photo(renditions), on_saved, on_error)
+        
         def on_result(e: ft.FilePickerResultEvent):
             if e.files:
-                try:
-                    import base64
-                    from PIL import Image
-                    import io
-                    
-                    # Читаем файл и конвертируем в base64
-                    with open(e.files[0].path, 'rb') as f:
-                        image_data = f.read()
-                    
-                    # Оптимизируем размер изображения
-                    try:
-                        img = Image.open(io.BytesIO(image_data))
-                        # Масштабируем до 300x400 максимум
-                        img.thumbnail((300, 400), Image.Resampling.LANCZOS)
-                        
-                        # Конвертируем в JPEG для уменьшения размера
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        
-                        output = io.BytesIO()
-                        img.save(output, format='JPEG', quality=85, optimize=True)
-                        image_data = output.getvalue()
-                    except:
-                        pass  # Используем оригинальные данные
-                    
-                    # Конвертируем в base64
-                    photo_base64 = base64.b64encode(image_data).decode('utf-8')
-                    
-                    if callback:
-                        callback(photo_base64)
-                    else:
-                        employee.photo_base64 = photo_base64
-                        employee.save()
-                    
-                    self.show_snackbar("Фотография обновлена!")
-                    
-                    # Принудительно обновляем диалог
-                    for dialog in self.page.overlay[:]:
-                        if hasattr(dialog, 'open') and dialog.open:
-                            dialog.open = False
-                    self.page.update()
-                    self.show_basic_info_with_tabs(employee)
-                    
-                except Exception as ex:
-                    self.show_snackbar(f"Ошибка сохранения фото: {ex}", True)
+                self.show_snackbar("Фотография обрабатывается...")
+                image_pipeline.submit(e.files[0].path, on_processed, on_error)
         
         file_picker = ft.FilePicker(on_result=on_result)
         if self.page and file_picker not in self.page.overlay:
@@ -525,15 +681,32 @@ class BaseEmployeePage(BasePage):
             self.page.update()
         file_picker.pick_files(
             dialog_title="Выберите фотографию",
-            allowed_extensions=["jpg", "jpeg", "png", "bmp"]
+            allowed_extensions=["jpg", "jpeg", "png", "bmp", "webp"]
         )
     
+    def _store_photo(self, employee, renditions):
+        """
+        Записывает версии фото в хранилище и ставит ссылки на них сотруднику
+        
+        Вызывается в транзакции, которая сохраняет запись сотрудника.
+        
+        Returns:
+            dict: записи Blob версий фото по имени версии
+        """
+        from database.blob_store import put_blob
+        blobs = {name: put_blob(data) for name, data in renditions.items()}
+        employee.photo_blob = blobs['detail']
+        employee.photo_thumb_blob = blobs['avatar']
+        employee.photo_original_blob = blobs['original']
+        return blobs
+    
     def create_company_filter_dropdown(self):
         """Создает dropdown с чекбоксами для фильтрации компаний"""
-        from database.models import Company
+        from database.company_index import company_index
         
         # Инициализируем фильтры для всех компаний
-        companies = list(Company.select())
+        companies = company_index.companies()
+        self.company_filter_checkboxes = {}
         for company in companies:
             attr_name = f"show_{company.name.lower().replace(' ', '_')}"
             if not hasattr(self, attr_name):
@@ -570,10 +743,11 @@ class BaseEmployeePage(BasePage):
                 return handler
             
             checkbox = ft.Checkbox(
-                label=company.name,
+                label=self._company_filter_label(company),
                 value=getattr(self, attr_name, True),
                 on_change=make_checkbox_handler(company.name)
             )
+            self.company_filter_checkboxes[company.id] = (company, checkbox)
             
             menu_items.append(
                 ft.PopupMenuItem(
@@ -601,11 +775,22 @@ class BaseEmployeePage(BasePage):
         
         return self.company_button
     
+    def _company_filter_label(self, company):
+        """Название компании с числом работающих сотрудников (если индекс загружен)"""
+        from database.company_index import company_index
+        count = company_index.count(self.employee_kind, company.id)
+        return company.name if count is None else f"{company.name} ({count})"
+    
+    def _update_company_counts(self):
+        """Обновляет числа сотрудников в фильтре компаний"""
+        for company, checkbox in getattr(self, 'company_filter_checkboxes', {}).values():
+            checkbox.label = self._company_filter_label(company)
+    
     def create_edit_company_popup_button(self, width=500):
         """Создает popup button для редактирования компаний"""
-        from database.models import Company
+        from database.company_index import company_index
         
-        companies = list(Company.select())
+        companies = company_index.companies()
         self.edit_company_checkboxes = []
         
         for company in companies:
@@ -662,9 +847,9 @@ class BaseEmployeePage(BasePage):
     
     def _create_company_checkboxes(self, first_checked=True):
         """Создает чекбоксы для компаний"""
-        from database.models import Company
+        from database.company_index import company_index
         checkboxes = []
-        for i, company in enumerate(Company.select()):
+        for i, company in enumerate(company_index.companies()):
             checkboxes.append(ft.Checkbox(
                 label=company.name, 
                 value=first_checked and i == 0
@@ -673,9 +858,9 @@ class BaseEmployeePage(BasePage):
     
     def create_company_popup_button(self, width=500):
         """Создает popup button для выбора компаний"""
-        from database.models import Company
+        from database.company_index import company_index
         
-        companies = list(Company.select())
+        companies = company_index.companies()
         self.company_checkboxes = []
         
         for i, company in enumerate(companies):
@@ -738,6 +923,214 @@ class BaseEmployeePage(BasePage):
             padding=10,
             height=500
         )
+        self.selection_text = ft.Text("Выбрано: 0", weight="bold")
+        self.selection_bar = ft.Row([
+            self.selection_text,
+            ft.TextButton("Выбрать всех на странице", on_click=self.select_page_rows),
+            ft.TextButton("Снять выбор", on_click=self.clear_selection),
+            ft.ElevatedButton("Уволить", icon=ft.Icons.PERSON_OFF, on_click=self.show_bulk_termination_dialog, color=ft.Colors.RED),
+            ft.ElevatedButton("Компании", icon=ft.Icons.BUSINESS, on_click=self.show_bulk_company_dialog),
+            ft.ElevatedButton("Статус", icon=ft.Icons.EDIT, on_click=self.show_bulk_status_dialog),
+        ], spacing=10, visible=False, wrap=True)
+        self.list_rows = KeyedList(
+            self.employees_list,
+            self._build_list_item,
+            signature=self._list_item_signature,
+            update=lambda item, row: patch_list_tile(item, self._build_list_item(row))
+        )
+    
+    def _render_list_items(self):
+        """
+        Показывает строки загруженной страницы (в режиме выбора - с флажками)
+        
+        Строки с теми же данными и отметкой остаются прежними элементами,
+        при смене отметки у элемента меняется только флажок.
+        """
+        self.list_rows.set_rows(self.page_rows)
+    
+    def _build_list_item(self, row):
+        """Строка списка с учетом режима выбора"""
+        item = self._create_list_item(row)
+        if self.selection_mode:
+            item.leading = ft.Checkbox(
+                value=row.id in self.selected_ids,
+                on_change=lambda e, row_id=row.id: self.toggle_selected(row_id, e.control.value)
+            )
+            item.on_click = lambda e, row_id=row.id: self.toggle_selected(row_id)
+        return item
+    
+    def _list_item_signature(self, row):
+        """Данные, от которых зависит вид строки списка"""
+        selected = self.selection_mode and row.id in self.selected_ids
+        return row, self.selection_mode, selected, getattr(row, 'avatar_blob_id', None) in self.list_avatars
+    
+    def toggle_selection_mode(self, e=None):
+        """Включает и выключает выбор нескольких сотрудников"""
+        self.selection_mode = not self.selection_mode
+        self.selected_ids.clear()
+        self.selection_bar.visible = self.selection_mode
+        self._update_selection()
+    
+    def toggle_selected(self, row_id, value=None):
+        """Отмечает сотрудника (value=None - переключает отметку)"""
+        if value is None:
+            value = row_id not in self.selected_ids
+        if value:
+            self.selected_ids.add(row_id)
+        else:
+            self.selected_ids.discard(row_id)
+        self._update_selection()
+    
+    def select_page_rows(self, e=None):
+        """Отмечает всех сотрудников текущей страницы"""
+        self.selected_ids.update(row.id for row in self.page_rows)
+        self._update_selection()
+    
+    def clear_selection(self, e=None):
+        self.selected_ids.clear()
+        self._update_selection()
+    
+    def _update_selection(self):
+        self.selection_text.value = f"Выбрано: {len(self.selected_ids)}"
+        self._render_list_items()
+        if self.page:
+            self.page.update()
+    
+    def _run_bulk(self, operation, message):
+        """
+        Выполняет групповую операцию для отмеченных сотрудников в фоне
+        
+        Args:
+            operation: operation(employee_type, employee_ids, auth_manager) из database/bulk_actions.py
+            message: текст уведомления (к нему добавляется число измененных)
+        """
+        from database.executor import db_executor
+        employee_ids = sorted(self.selected_ids)
+        if not employee_ids:
+            self.show_snackbar("Не выбрано ни одного сотрудника", True)
+            return
+        auth_manager = getattr(self.page, 'auth_manager', None)
+        
+        def done(result):
+            self.selected_ids.clear()
+            self.selection_text.value = "Выбрано: 0"
+            self.show_snackbar(f"{message}: {len(result.changed)}")
+            self.refresh_list(background=True)
+        
+        def failed(ex):
+            self.show_snackbar(f"Ошибка: {ex}", True)
+        
+        db_executor.submit(
+            (id(self), "bulk"),
+            lambda: operation(self.employee_kind, employee_ids, auth_manager=auth_manager),
+            done,
+            failed
+        )
+    
+    def _show_bulk_dialog(self, title, controls, actions):
+        """Диалог групповой операции; actions - пары (текст кнопки, функция без аргументов)"""
+        def close(e=None):
+            dialog.open = False
+            self.page.update()
+        
+        def make_handler(action):
+            def handler(e):
+                try:
+                    action()
+                except ValueError as ex:
+                    self.show_snackbar(str(ex), True)
+                    return
+                close()
+            return handler
+        
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"{title} (выбрано: {len(self.selected_ids)})"),
+            content=ft.Column(controls, tight=True, spacing=10),
+            actions=[ft.TextButton(text, on_click=make_handler(action)) for text, action in actions]
+                    + [ft.TextButton("Отмена", on_click=close)],
+            modal=True
+        )
+        self.page.overlay.append(dialog)
+        dialog.open = True
+        self.page.update()
+    
+    def show_bulk_termination_dialog(self, e=None):
+        """Увольнение отмеченных сотрудников"""
+        from database.bulk_actions import bulk_terminate
+        date_field = ft.TextField(label="Дата увольнения (дд.мм.гггг)", value=datetime.now().strftime("%d.%m.%Y"),
+                                  width=400, on_change=self.format_date_input, max_length=10)
+        reason_field = ft.TextField(label="Причина увольнения", width=400, multiline=True)
+        
+        def terminate():
+            if not reason_field.value or not reason_field.value.strip():
+                raise ValueError("Причина увольнения обязательна!")
+            try:
+                termination_date = datetime.strptime(date_field.value.strip(), "%d.%m.%Y").date()
+            except ValueError:
+                raise ValueError("Неверный формат даты!")
+            reason = reason_field.value.strip()
+            self._run_bulk(
+                lambda employee_type, ids, auth_manager: bulk_terminate(employee_type, ids, termination_date, reason, auth_manager),
+                "Уволено"
+            )
+        
+        self._show_bulk_dialog("Увольнение", [date_field, reason_field], [("Уволить", terminate)])
+    
+    def show_bulk_company_dialog(self, e=None):
+        """Добавление отмеченных сотрудников в компанию или удаление из неё"""
+        from database.bulk_actions import bulk_set_company
+        from database.company_index import company_index
+        companies = {company.name: company for company in company_index.companies()}
+        company_dropdown = ft.Dropdown(
+            label="Компания",
+            width=400,
+            options=[ft.dropdown.Option(name) for name in companies],
+            value=next(iter(companies), None)
+        )
+        
+        def run(assign):
+            company = companies.get(company_dropdown.value)
+            if company is None:
+                raise ValueError("Выберите компанию!")
+            self._run_bulk(
+                lambda employee_type, ids, auth_manager: bulk_set_company(employee_type, ids, company, assign, auth_manager),
+                "Добавлено в компанию" if assign else "Удалено из компании"
+            )
+        
+        self._show_bulk_dialog("Компании", [company_dropdown], [
+            ("Добавить в компанию", lambda: run(True)),
+            ("Убрать из компании", lambda: run(False)),
+        ])
+    
+    def show_bulk_status_dialog(self, e=None):
+        """Смена статуса штата или ответственности отмеченных сотрудников"""
+        from database.bulk_actions import bulk_set_field, BULK_FIELDS
+        value_dropdown = ft.Dropdown(label="Значение", width=400)
+        
+        def on_field_change(ev=None):
+            _, options = BULK_FIELDS[field_dropdown.value]
+            value_dropdown.options = [ft.dropdown.Option(option) for option in options]
+            value_dropdown.value = options[0]
+            if ev is not None:
+                self.page.update()
+        
+        field_dropdown = ft.Dropdown(
+            label="Поле",
+            width=400,
+            options=[ft.dropdown.Option(field, title) for field, (title, _) in BULK_FIELDS.items()],
+            value=next(iter(BULK_FIELDS)),
+            on_change=on_field_change
+        )
+        on_field_change()
+        
+        def apply():
+            field, value = field_dropdown.value, value_dropdown.value
+            self._run_bulk(
+                lambda employee_type, ids, auth_manager: bulk_set_field(employee_type, ids, field, value, auth_manager),
+                "Изменено"
+            )
+        
+        self._show_bulk_dialog("Статус", [field_dropdown, value_dropdown], [("Применить", apply)])
     
     def render(self) -> ft.Column:
         """Возвращает интерфейс страницы"""
@@ -754,10 +1147,15 @@ class BaseEmployeePage(BasePage):
         return ft.Column([
             ft.Row([
                 ft.Text(self._get_page_title(), size=24, weight="bold"),
-                ft.ElevatedButton(self._get_add_button_text(), icon=ft.Icons.ADD, on_click=self.show_add_dialog),
+                ft.Row([
+                    ft.OutlinedButton("Выбрать несколько", icon=ft.Icons.CHECKLIST, on_click=self.toggle_selection_mode),
+                    ft.OutlinedButton("Импорт из файла", icon=ft.Icons.UPLOAD_FILE, on_click=self.show_import_dialog),
+                    ft.ElevatedButton(self._get_add_button_text(), icon=ft.Icons.ADD, on_click=self.show_add_dialog),
+                ], spacing=10),
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
             ft.Divider(),
             search_row,
+            self.selection_bar,
             self.employees_list,
             ft.Row([self.prev_btn, self.page_info, self.next_btn], alignment=ft.MainAxisAlignment.CENTER),
         ], spacing=10, expand=True)
@@ -819,15 +1217,15 @@ class BaseEmployeePage(BasePage):
             if current_user.role != "Admin":
                 query = self._apply_user_filter(query, current_user.id)
         
-        # Применяем фильтр по компаниям
-        from database.models import Company
+        # Применяем фильтр по компаниям (список компаний берется из индекса, без запроса)
+        from database.company_index import company_index
         companies = []
-        all_companies = list(Company.select())
+        all_companies = company_index.companies()
         
         for company in all_companies:
             attr_name = f"show_{company.name.lower().replace(' ', '_')}"
             if getattr(self, attr_name, True):
-                companies.append(company.name)
+                companies.append(company.id)
         
         # Применяем фильтр только если выбрана не вся компания
         if len(companies) < len(all_companies) and len(companies) > 0:
@@ -838,15 +1236,56 @@ class BaseEmployeePage(BasePage):
         
         return query
     
-    @abstractmethod
     def _apply_name_filter(self, query):
-        """Применяет фильтр по имени"""
-        pass
-    
-    @abstractmethod
-    def _apply_company_filter(self, query, companies):
-        """Применяет фильтр по компании"""
-        pass
+        """Применяет фильтр по ФИО (слова в любом порядке, ё = е)"""
+        from database.name_index import name_condition
+        return query.where(name_condition(query.model.full_name, self.search_value))
+    
+    def _apply_company_filter(self, query, company_ids):
+        """Применяет фильтр по компаниям (id сотрудников из индекса или EXISTS)"""
+        from database.company_index import company_index
+        return query.where(company_index.filter_expression(query.model, self.employee_kind, company_ids))
+    
+    def _save_employee_companies(self, employee, checkboxes, replace=False):
+        """Сохраняет компании, отмеченные в чекбоксах, и обновляет индекс компаний"""
+        from database.models import EmployeeCompany
+        from database.company_index import company_index
+        employee_field = f"{self.employee_kind}_employee"
+        if replace:
+            EmployeeCompany.delete().where(getattr(EmployeeCompany, employee_field) == employee).execute()
+        
+        ids_by_name = {company.name: company.id for company in company_index.companies()}
+        company_ids = [ids_by_name[checkbox.label] for checkbox in checkboxes if checkbox.value and checkbox.label in ids_by_name]
+        for company_id in company_ids:
+            EmployeeCompany.create(**{employee_field: employee, 'company': company_id})
+        company_index.set_employee_companies(self.employee_kind, employee.id, company_ids)
+        self._invalidate_dossier(employee)
+    
+    def _load_dossier(self, employee_id):
+        """Карточка сотрудника (запись, компании, карточки, документы) из кэша или одним запросом"""
+        from database.dossier import dossier_cache
+        return self.safe_db_operation(lambda: dossier_cache.get(self.employee_kind, employee_id))
+    
+    def _get_dossier(self, employee):
+        """Карточка сотрудника; если её не удалось загрузить - пустая, с самой записью"""
+        from database.dossier import Dossier
+        dossier = self._load_dossier(employee.id)
+        return dossier if dossier else Dossier(self.employee_kind, employee, [], [], [])
+    
+    def _invalidate_dossier(self, employee):
+        """Сбрасывает карточку сотрудника после изменения"""
+        from database.dossier import dossier_cache
+        dossier_cache.invalidate(self.employee_kind, employee.id)
+    
+    def _get_employee_companies(self, employee):
+        """Возвращает список компаний сотрудника"""
+        companies = self._get_dossier(employee).companies
+        return ", ".join(companies) if companies else "Не указано"
+    
+    def _index_employee_name(self, employee):
+        """Обновляет ФИО сотрудника в индексе поиска после сохранения"""
+        from database.name_index import name_index
+        name_index.set_employee(self.employee_kind, employee.id, employee.full_name, employee.termination_date is not None)
     
     @abstractmethod
     def _get_order_field(self):
@@ -943,9 +1382,9 @@ class BaseEmployeePage(BasePage):
         """Возвращает тип сотрудника"""
         pass
     
-    def _get_sort_key(self, employee):
-        """Возвращает ключ для сортировки по дополнительному полю (переопределяется в дочерних классах)"""
-        return employee.full_name.lower()
+    def _get_secondary_order(self):
+        """Возвращает SQL-выражение для сортировки по дополнительному полю (переопределяется в дочерних классах)"""
+        return self._get_order_field()
     
     def _get_secondary_sort_icon(self):
         """Возвращает иконку для дополнительной сортировки (переопределяется в дочерних классах)"""
@@ -1009,14 +1448,12 @@ class BaseEmployeePage(BasePage):
     
     def _get_personal_cards_content(self, employee, dialog_ref=None):
         """Возвращает содержимое страницы личных карточек"""
-        from database.models import PersonalCard
+        from database.company_index import company_index
         from datetime import date
         
-        # Определяем тип сотрудника для правильного запроса
-        if hasattr(employee, 'guard_rank'):
-            cards = list(PersonalCard.select().where((PersonalCard.guard_employee == employee) & (PersonalCard.is_discarded == False)).order_by(PersonalCard.issue_date.desc()))
-        else:
-            cards = list(PersonalCard.select().where((PersonalCard.chief_employee == employee) & (PersonalCard.is_discarded == False)).order_by(PersonalCard.issue_date.desc()))
+        # Карточки без содержимого файлов, из карточки сотрудника
+        cards = self._get_dossier(employee).cards
+        companies = self.safe_db_operation(company_index.companies) or []
         
         # Форма добавления
         date_field = ft.TextField(
@@ -1027,12 +1464,11 @@ class BaseEmployeePage(BasePage):
             max_length=10
         )
         
-        from database.models import Company
         company_dropdown = ft.Dropdown(
             label="Компания",
             width=150,
-            options=[ft.dropdown.Option(c.name) for c in Company.select()],
-            value=Company.select().first().name if Company.select().exists() else None
+            options=[ft.dropdown.Option(c.name) for c in companies],
+            value=companies[0].name if companies else None
         )
         
         selected_file_path = [None]
@@ -1070,13 +1506,15 @@ class BaseEmployeePage(BasePage):
                     return
                 
                 issue_date = datetime.strptime(date_value, "%d.%m.%Y").date()
-                from database.models import Company
-                company = Company.get(Company.name == company_dropdown.value)
+                company = next((c for c in companies if c.name == company_dropdown.value), None)
+                if company is None:
+                    self.show_snackbar("Компания не найдена!", True)
+                    return
                 saved_path = self.save_personal_card(employee, selected_file_path[0], company)
                 
                 # Очищаем форму
                 date_field.value = date.today().strftime("%d.%m.%Y")
-                company_dropdown.value = Company.select().first().name if Company.select().exists() else None
+                company_dropdown.value = companies[0].name if companies else None
                 selected_file_path[0] = None
                 file_button.text = "Выбрать файл"
                 
@@ -1111,7 +1549,7 @@ class BaseEmployeePage(BasePage):
                 
                 cards_list.append(
                     ft.ListTile(
-                        title=ft.Text(f"Карточка #{i+1} ({card.company.name})"),
+                        title=ft.Text(f"Карточка #{i+1} ({card.company_name})"),
                         subtitle=ft.Text(f"Дата: {self.format_date(card.issue_date)}"),
                         trailing=ft.Row([
                             ft.IconButton(ft.Icons.VISIBILITY, on_click=make_view_handler(card)),
@@ -1130,13 +1568,8 @@ class BaseEmployeePage(BasePage):
     
     def _get_documents_content(self, employee, dialog_ref=None):
         """Возвращает содержимое страницы документов"""
-        from database.models import EmployeeDocument
-        
-        # Определяем тип сотрудника для правильного запроса
-        if hasattr(employee, 'guard_rank'):
-            docs = list(EmployeeDocument.select().where(EmployeeDocument.guard_employee == employee).order_by(EmployeeDocument.created_at.desc()))
-        else:
-            docs = list(EmployeeDocument.select().where(EmployeeDocument.chief_employee == employee).order_by(EmployeeDocument.created_at.desc()))
+        # Документы без содержимого файлов, из карточки сотрудника
+        docs = self._get_dossier(employee).documents
         
         # Форма добавления
         doc_name_field = ft.TextField(
@@ -1229,46 +1662,39 @@ class BaseEmployeePage(BasePage):
         ]
     
     def save_document(self, employee, file_path, doc_name):
-        from database.models import EmployeeDocument
-        import base64
+        from database.models import EmployeeDocument, db
+        from database.session import db_session
+        from database.blob_store import put_blob_file
         from pathlib import Path
         
         source_file = Path(file_path)
         
-        # Читаем файл и конвертируем в base64
-        with open(source_file, 'rb') as f:
-            file_data = f.read()
-        
-        file_base64 = base64.b64encode(file_data).decode('utf-8')
-        
-        # Создаем запись в БД
-        if hasattr(employee, 'guard_rank'):
-            EmployeeDocument.create(
-                guard_employee=employee,
-                document_type=doc_name,
-                file_base64=file_base64,
-                filename=source_file.name
-            )
-        else:
+        # Файл и документ записываются в одной транзакции (см. database/blob_store.py)
+        with db_session(), db.atomic():
+            # Файл записывается в хранилище частями, без чтения в память целиком
+            file_blob = put_blob_file(source_file)
+            
+            # Создаем запись в БД (документы есть у всех трех типов сотрудников)
             EmployeeDocument.create(
-                chief_employee=employee,
+                **{f"{self.employee_kind}_employee": employee},
                 document_type=doc_name,
-                file_base64=file_base64,
+                file_blob=file_blob,
                 filename=source_file.name
             )
+        self._invalidate_dossier(employee)
         
         return True
     
     def view_personal_card(self, card):
         """Просматривает личную карточку"""
-        if hasattr(card, 'file_base64') and card.file_base64:
-            self.open_base64_file(card.file_base64, card.filename or 'card')
+        if getattr(card, 'file_blob_id', None):
+            self.open_blob_file(card.file_blob_id, card.filename or 'card')
         else:
             self.show_snackbar("Файл не найден", True)
     
     def view_document(self, doc):
-        if hasattr(doc, 'file_base64') and doc.file_base64:
-            self.open_base64_file(doc.file_base64, doc.filename or 'document')
+        if getattr(doc, 'file_blob_id', None):
+            self.open_blob_file(doc.file_blob_id, doc.filename or 'document')
         else:
             self.show_snackbar("Файл не найден", True)
     
@@ -1288,9 +1714,11 @@ class BaseEmployeePage(BasePage):
             try:
                 from datetime import datetime
                 discard_date = datetime.strptime(discard_date_field.value, "%d.%m.%Y").date()
-                card.is_discarded = True
-                card.discarded_date = discard_date
-                card.save()
+                from database.models import PersonalCard
+                from database.session import db_session
+                with db_session():
+                    PersonalCard.update(is_discarded=True, discarded_date=discard_date).where(PersonalCard.id == card.id).execute()
+                self._invalidate_dossier(employee)
                 
                 discard_dialog.open = False
                 if dialog_to_update:
@@ -1326,8 +1754,16 @@ class BaseEmployeePage(BasePage):
         self.page.update()
     
     def delete_document_simple(self, doc, employee, dialog_to_update=None):
+        from database.blob_store import release_blob
+        from database.session import db_session
         try:
-            doc.delete_instance()
+            from database.models import EmployeeDocument
+            blob_id = doc.file_blob_id
+            with db_session():
+                EmployeeDocument.delete().where(EmployeeDocument.id == doc.id).execute()
+                self._invalidate_dossier(employee)
+                if blob_id:
+                    release_blob(blob_id)
             if dialog_to_update:
                 if hasattr(dialog_to_update, 'tabs_ref'):
                     dialog_to_update.tabs_ref.tabs[2].content = ft.Column(self._get_documents_content(employee, dialog_to_update), scroll=ft.ScrollMode.AUTO)
@@ -1338,5 +1774,5 @@ class BaseEmployeePage(BasePage):
                     dialog_to_update.content.controls.extend(new_content)
                     dialog_to_update.content.update()
                     self.page.update()
-        except:
-            pass
+        except Exception as ex:
+            self.show_snackbar(f"Ошибка удаления документа: {ex}", True)
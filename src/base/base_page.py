@@ -1,8 +1,15 @@
 import flet as ft
 from abc import ABC, abstractmethod
-from database.models import db
+from database.session import db_session
 from datetime import datetime
 
+def loading_placeholder(text="Загрузка..."):
+    """Заглушка на время фоновой загрузки"""
+    return ft.Row([
+        ft.ProgressRing(width=16, height=16, stroke_width=2),
+        ft.Text(text, size=16, color=ft.Colors.GREY)
+    ], spacing=10)
+
 class BasePage(ABC):
     """Базовый класс для всех страниц приложения"""
     
@@ -39,18 +46,31 @@ class BasePage(ABC):
     def safe_db_operation(self, operation):
         """Безопасное выполнение операций с БД"""
         try:
-            if db.is_closed():
-                db.connect()
-            return operation()
+            with db_session():
+                return operation()
         except UnicodeDecodeError as ex:
             print(f"Ошибка кодировки БД: {ex}")
             return []
         except Exception as ex:
             print(f"Ошибка БД: {ex}")
             return None
-        finally:
-            if not db.is_closed():
-                db.close()
+    
+    def run_in_background(self, key, operation, on_done=None):
+        """
+        Выполняет операцию с БД вне потока интерфейса
+        
+        Новый вызов с тем же key вытесняет предыдущий: on_done(result)
+        вызывается только для последнего запроса, после него обновляется страница.
+        """
+        from database.executor import db_executor
+        
+        def done(result):
+            if on_done:
+                on_done(result)
+            if self.page:
+                self.page.update()
+        
+        return db_executor.submit((id(self), key), operation, done)
     
     def show_snackbar(self, message, is_error=False):
         """Показывает уведомление"""
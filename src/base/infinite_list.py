@@ -0,0 +1,186 @@
+"""
+Список с подгрузкой при прокрутке
+
+Списки уволенных, списанных карточек и логов загружали все строки сразу
+и строили элемент для каждой. InfiniteList загружает строки порциями
+(window): первая порция - при открытии и смене фильтров, следующая -
+когда список прокручен почти до конца (событие on_scroll ListView).
+
+Следующая порция выбирается по ключу последней загруженной строки
+(keyset: WHERE (ключ сортировки) > (ключ последней строки) LIMIT window),
+а не OFFSET: запрос не перебирает пропущенные строки, и строки, добавленные
+во время прокрутки, не сдвигают порции. Функция fetch(after, limit)
+получает ключ последней строки (None для первой порции) и возвращает
+строки по порядку.
+
+ListView строит на клиенте только видимые элементы (build_controls_on_demand),
+строки порций хранятся и отображаются через KeyedList: после смены фильтров
+уже показанные строки не пересоздаются, а элементы следующей порции
+добавляются в конец без сверки уже загруженных строк.
+
+Запросы выполняются через db_executor; новая первая порция (смена фильтров)
+вытесняет загрузку следующей.
+"""
+import threading
+import flet as ft
+from base.base_page import loading_placeholder
+from base.keyed_list import KeyedList
+
+# Строк в одной порции
+WINDOW_SIZE = 50
+# Следующая порция загружается, когда до конца списка осталось меньше стольких пикселей
+LOAD_THRESHOLD = 400
+# Частота событий прокрутки, мс
+SCROLL_INTERVAL = 100
+
+
+class InfiniteList:
+    """Строки ListView, загружаемые порциями при прокрутке"""
+
+    def __init__(self, list_view, fetch, build, cursor=None, key=None, signature=None, update=None,
+                 count=None, window=WINDOW_SIZE, empty_text="Нет данных", status=None, page=None):
+        """
+        Args:
+            list_view: ft.ListView, который заполняется строками
+            fetch: fetch(after, limit) -> строки порции по порядку сортировки
+                (выполняется в db_executor)
+            build: build(row) -> элемент строки
+            cursor: cursor(row) -> ключ сортировки строки для следующей порции;
+                без него следующей порции передается число загруженных строк
+                (для списков, уже загруженных в память)
+            key, signature, update: как в KeyedList
+            count: count() -> число всех строк (вызывается вместе с первой порцией)
+            window: строк в порции
+            empty_text: текст пустого списка
+            status: ft.Text для надписи "Показано N из M"
+            page: страница для обновления после загрузки
+        """
+        self.list_view = list_view
+        self.fetch = fetch
+        self.cursor = cursor
+        self.count = count
+        self.window = window
+        self.empty_text = empty_text
+        self.status = status
+        self.page = page
+        self.rows = []
+        self.total = None
+        self.has_more = False
+        self._rows = KeyedList(list_view, build, key=key, signature=signature, update=update)
+        self._lock = threading.Lock()
+        self._loading = False
+        self._generation = 0
+        self._executor_key = (id(list_view), "window")
+        # Заглушка в конце списка, пока загружается следующая порция
+        self._more_placeholder = None
+
+        list_view.build_controls_on_demand = True
+        list_view.on_scroll_interval = SCROLL_INTERVAL
+        list_view.on_scroll = self._on_scroll
+
+    def reset(self, clear=False):
+        """
+        Загружает первую порцию заново (после смены фильтров или изменения данных)
+        
+        Args:
+            clear: сразу убрать показанные строки (список открыт для других данных)
+        """
+        from database.executor import db_executor
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._loading = True
+        if clear:
+            self.rows = []
+            self.has_more = False
+        if not self.rows:
+            # Уже показанные строки остаются до загрузки: совпадающие будут использованы повторно
+            self.list_view.controls = [loading_placeholder()]
+            self._update_page()
+
+        def operation():
+            rows = list(self.fetch(None, self.window + 1))
+            return rows, self.count() if self.count else None
+
+        db_executor.submit(
+            self._executor_key,
+            operation,
+            lambda result: self._show(generation, result, first=True),
+            lambda ex: self._failed(generation)
+        )
+
+    def load_more(self):
+        """Загружает следующую порцию, если она есть и не загружается"""
+        from database.executor import db_executor
+        with self._lock:
+            if self._loading or not self.has_more or not self.rows:
+                return
+            self._loading = True
+            generation = self._generation
+        after = self.cursor(self.rows[-1]) if self.cursor else len(self.rows)
+        self._more_placeholder = loading_placeholder()
+        self.list_view.controls.append(self._more_placeholder)
+        self._update_page()
+
+        db_executor.submit(
+            self._executor_key,
+            lambda: (list(self.fetch(after, self.window + 1)), None),
+            lambda result: self._show(generation, result, first=False),
+            lambda ex: self._failed(generation)
+        )
+
+    def _show(self, generation, result, first):
+        rows, total = result
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._loading = False
+        self._remove_more_placeholder()
+        # Лишняя строка запроса только показывает, что есть следующая порция
+        self.has_more = len(rows) > self.window
+        rows = rows[:self.window]
+        if first:
+            if len(self.rows) > self.window and self.list_view.page:
+                # Список был прокручен дальше первой порции - новые строки показываются с начала
+                self.list_view.scroll_to(offset=0)
+            self.rows = rows
+            self.total = total
+            self._rows.set_rows(self.rows, empty=ft.Text(self.empty_text, size=16, color=ft.Colors.GREY))
+        else:
+            self.rows.extend(rows)
+            self._rows.append_rows(rows)
+        if self.status is not None:
+            shown = len(self.rows)
+            self.status.value = f"Показано {shown} из {self.total}" if self.total is not None else f"Показано {shown}"
+        self._update_page()
+
+    def _failed(self, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._loading = False
+        if self._remove_more_placeholder():
+            # Следующая порция не загрузилась - показанные строки остаются
+            self._update_page()
+            return
+        self._rows.set_rows(self.rows, empty=ft.Text("Ошибка загрузки", size=16, color=ft.Colors.ERROR))
+        self._update_page()
+
+    def _remove_more_placeholder(self):
+        """Убирает заглушку следующей порции; True, если она была в списке"""
+        placeholder, self._more_placeholder = self._more_placeholder, None
+        if placeholder is not None and placeholder in self.list_view.controls:
+            self.list_view.controls.remove(placeholder)
+            return True
+        return False
+
+    def _on_scroll(self, e):
+        if e.pixels is None or e.max_scroll_extent is None:
+            return
+        if e.max_scroll_extent - e.pixels <= LOAD_THRESHOLD:
+            self.load_more()
+
+    def _update_page(self):
+        if self.page:
+            self.page.update()
+
@@ -0,0 +1,175 @@
+"""
+Список с повторным использованием строк
+
+Списки обновлялись так: controls.clear(), новые ListTile/Container на каждую
+строку и page.update(). Flet передает клиенту каждый новый элемент целиком,
+поэтому обновление страницы списка (даже без изменений) пересылало все строки.
+
+KeyedList хранит элементы по ключу строки (обычно id). При обновлении:
+- строка с тем же ключом и теми же данными - элемент используется как есть
+  (Flet ничего не передает);
+- строка с тем же ключом и другими данными - элемент обновляется на месте
+  функцией update, если она задана (передаются только изменившиеся свойства),
+  иначе создается заново;
+- новая строка - элемент создается функцией build.
+
+Счетчики последнего обновления (stats) и накопленные (totals) показывают,
+сколько элементов создано, обновлено на месте, использовано повторно и удалено.
+"""
+from collections import OrderedDict
+
+COUNTERS = ("created", "updated", "reused", "removed")
+
+
+class KeyedList:
+    """Строки списка Flet (ListView/Column) по ключам"""
+
+    def __init__(self, container, build, key=None, signature=None, update=None):
+        """
+        Args:
+            container: ft.ListView или ft.Column, чьи controls заполняются
+            build: build(row) -> элемент строки
+            key: key(row) -> ключ строки (по умолчанию row.id)
+            signature: signature(row) -> данные, от которых зависит вид строки
+                (по умолчанию сама строка; для записей peewee - копия __data__)
+            update: update(control, row) -> True, если элемент обновлен на месте;
+                False - элемент нужно создать заново
+        """
+        self.container = container
+        self.build = build
+        self.key = key or (lambda row: row.id)
+        self.signature = signature or _default_signature
+        self.update = update
+        # ключ -> (элемент, signature)
+        self._items = OrderedDict()
+        self.stats = dict.fromkeys(COUNTERS, 0)
+        self.totals = dict.fromkeys(COUNTERS, 0)
+
+    def set_rows(self, rows, empty=None):
+        """
+        Показывает строки rows, повторно используя элементы прошлого обновления
+
+        Args:
+            empty: элемент вместо списка, если строк нет (например, текст "Нет данных")
+        """
+        stats = dict.fromkeys(COUNTERS, 0)
+        items = OrderedDict()
+        for row in rows:
+            key = self.key(row)
+            signature = self.signature(row)
+            cached = self._items.pop(key, None)
+            if key in items:
+                # Повторяющийся ключ: второй элемент создается отдельно
+                cached = None
+                key = (key, len(items))
+            if cached is not None and cached[1] == signature:
+                control = cached[0]
+                stats["reused"] += 1
+            elif cached is not None and self.update is not None and self.update(cached[0], row):
+                control = cached[0]
+                stats["updated"] += 1
+            else:
+                control = self.build(row)
+                stats["created"] += 1
+            items[key] = (control, signature)
+        stats["removed"] = len(self._items)
+        self._items = items
+
+        controls = [control for control, _ in items.values()]
+        if not controls and empty is not None:
+            controls = [empty]
+        self.container.controls = controls
+
+        self.stats = stats
+        for name in COUNTERS:
+            self.totals[name] += stats[name]
+        return stats
+
+    def append_rows(self, rows):
+        """
+        Добавляет строки в конец списка (следующая порция при прокрутке)
+
+        Уже показанные строки не сверяются: работа зависит от размера порции,
+        а не от числа строк в списке.
+        """
+        stats = dict.fromkeys(COUNTERS, 0)
+        controls = []
+        for row in rows:
+            key = self.key(row)
+            if key in self._items:
+                # Повторяющийся ключ: второй элемент создается отдельно
+                key = (key, len(self._items))
+            control = self.build(row)
+            self._items[key] = (control, self.signature(row))
+            controls.append(control)
+        stats["created"] = len(controls)
+        self.container.controls.extend(controls)
+
+        self.stats = stats
+        for name in COUNTERS:
+            self.totals[name] += stats[name]
+        return stats
+
+
+def _default_signature(row):
+    data = getattr(row, '__data__', None)
+    # Запись peewee может измениться на месте - запоминаем копию её полей
+    return dict(data) if isinstance(data, dict) else row
+
+
+def patch_list_tile(control, new):
+    """
+    Переносит в существующий ListTile значения из только что построенного
+
+    Меняются тексты title/subtitle, флажок или фото в leading и обработчики;
+    Flet передает клиенту только изменившиеся свойства. Если строение элементов
+    отличается (другой тип leading, trailing и т.п.), возвращает False.
+    """
+    import flet as ft
+    if type(control) is not type(new):
+        return False
+    if isinstance(control, ft.Container):
+        return isinstance(control.content, ft.ListTile) and patch_list_tile(control.content, new.content)
+    if not isinstance(control, ft.ListTile):
+        return False
+    if not _patch_leading(control.leading, new.leading) or not _patch_trailing(control.trailing, new.trailing):
+        return False
+    for name in ("title", "subtitle"):
+        old_part, new_part = getattr(control, name), getattr(new, name)
+        if isinstance(old_part, ft.Text) and isinstance(new_part, ft.Text):
+            old_part.value = new_part.value
+            old_part.color = new_part.color
+        elif old_part is not None or new_part is not None:
+            return False
+    control.on_click = new.on_click
+    return True
+
+
+def _patch_leading(old, new):
+    import flet as ft
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, ft.Checkbox):
+        old.value = new.value
+        old.on_change = new.on_change
+    elif isinstance(old, ft.Image):
+        old.src_base64 = new.src_base64
+    elif isinstance(old, ft.Icon):
+        old.name = new.name
+        old.color = new.color
+    elif not isinstance(old, (ft.CircleAvatar, type(None))):
+        return False
+    return True
+
+
+def _patch_trailing(old, new):
+    import flet as ft
+    if type(old) is not type(new):
+        return False
+    if isinstance(old, ft.IconButton):
+        # Обработчик мог запомнить прежнюю запись - заменяем его
+        old.icon = new.icon
+        old.on_click = new.on_click
+    elif old is not None:
+        return False
+    return True
@@ -0,0 +1,175 @@
+"""
+Поиск по мере ввода
+
+Раньше каждое нажатие клавиши в поле поиска выполняло полный запрос
+и page.update. SearchController ждет паузу в вводе (delay), выполняет
+запрос через db_executor (новый запрос вытесняет выполняющийся)
+и передает результат в on_results только для последнего текста.
+
+Если задана функция matches, результаты запоминаются по тексту запроса.
+Когда новый текст начинается с уже найденного (пользователь дописывает
+запрос), результат получается фильтрацией сохраненного в памяти,
+без обращения к БД. Запомненный результат используется так только
+если он полный: не обрезан лимитом (limit) и все его строки подходят
+под matches.
+"""
+import threading
+from collections import OrderedDict
+
+# Пауза в вводе перед запросом, секунды
+SEARCH_DELAY = 0.3
+
+
+class SearchController:
+    """Отложенный, отменяемый поиск с кэшем результатов по префиксу"""
+
+    def __init__(self, on_results, search=None, key=None, delay=SEARCH_DELAY, min_length=0,
+                 on_short=None, matches=None, limit=None, cache_size=32, page=None):
+        """
+        Args:
+            on_results: callback(text, results); results равен None, если search не задан
+            search: функция search(text) с запросами, выполняется в db_executor;
+                без неё контроллер только откладывает on_results до паузы в вводе
+            key: ключ для db_executor (по умолчанию собственный); запросы
+                с тем же ключом, например обновление списка, вытесняют друг друга
+            delay: пауза в вводе перед запросом
+            min_length: более короткий текст не ищется, вызывается on_short(text)
+            matches: matches(item, text) - подходит ли строка результата под текст
+                (как условие запроса); включает кэш результатов
+            limit: лимит строк запроса; результат длиной limit считается неполным
+            cache_size: число запоминаемых запросов
+            page: страница, обновляемая после on_results и on_short
+        """
+        self.on_results = on_results
+        self.search = search
+        self.key = key if key is not None else ("search", id(self))
+        self.delay = delay
+        self.min_length = min_length
+        self.on_short = on_short
+        self.matches = matches
+        self.limit = limit
+        self.cache_size = cache_size
+        self.page = page
+        self._lock = threading.Lock()
+        self._timer = None
+        self._latest = None
+        self._cache = OrderedDict()
+
+    def on_change(self, e):
+        """Обработчик on_change поля поиска"""
+        self.submit(e.control.value)
+
+    def submit(self, text, immediate=False):
+        """Запускает поиск text после паузы в вводе (immediate=True - сразу)"""
+        text = (text or "").strip()
+        with self._lock:
+            self._latest = text
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if len(text) < self.min_length:
+            self._cancel_query()
+            if self.on_short:
+                self.on_short(text)
+                self._update_page()
+            return
+
+        cached = self._from_cache(text)
+        if cached is not None:
+            # Дописанный запрос: фильтруем сохраненный результат
+            self._cancel_query()
+            self._deliver(text, cached)
+            return
+
+        if immediate or self.delay <= 0:
+            self._run(text)
+            return
+        timer = threading.Timer(self.delay, self._run, args=(text,))
+        timer.daemon = True
+        with self._lock:
+            self._timer = timer
+        timer.start()
+
+    def cancel(self):
+        """Отменяет отложенный и выполняющийся поиск"""
+        with self._lock:
+            self._latest = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._cancel_query()
+
+    def clear_cache(self):
+        """Сбрасывает запомненные результаты (после изменения данных или других фильтров)"""
+        with self._lock:
+            self._cache.clear()
+
+    def _cancel_query(self):
+        if self.search is not None:
+            from database.executor import db_executor
+            db_executor.cancel(self.key)
+
+    def _is_latest(self, text):
+        with self._lock:
+            return self._latest == text
+
+    def _run(self, text):
+        if not self._is_latest(text):
+            return
+        if self.search is None:
+            self._deliver(text, None)
+            return
+
+        from database.executor import db_executor
+
+        def done(results):
+            self._remember(text, results)
+            self._deliver(text, results)
+
+        db_executor.submit(self.key, lambda: self.search(text), done)
+
+    def _deliver(self, text, results):
+        if not self._is_latest(text):
+            return
+        self.on_results(text, results)
+        self._update_page()
+
+    def _update_page(self):
+        if self.page:
+            self.page.update()
+
+    def _remember(self, text, results):
+        if self.matches is None or results is None:
+            return
+        results = list(results)
+        # Результат с похожими, но не подходящими под matches строками (поиск с опечатками)
+        # нельзя уточнять фильтром: новый запрос может найти другие похожие строки
+        complete = (self.limit is None or len(results) < self.limit) and all(self.matches(item, text) for item in results)
+        with self._lock:
+            self._cache[text.lower()] = (results, complete)
+            self._cache.move_to_end(text.lower())
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _from_cache(self, text):
+        """Результат для text из сохраненного результата более общего запроса или None"""
+        if self.matches is None:
+            return None
+        lowered = text.lower()
+        with self._lock:
+            exact = self._cache.get(lowered)
+            if exact is not None:
+                self._cache.move_to_end(lowered)
+                return list(exact[0])
+            # Самый длинный полный запрос, с которого начинается новый текст
+            candidates = [(cached_text, results) for cached_text, (results, complete) in self._cache.items()
+                          if complete and lowered.startswith(cached_text)]
+        if not candidates:
+            return None
+        base_text, base_results = max(candidates, key=lambda candidate: len(candidate[0]))
+        results = [item for item in base_results if self.matches(item, text)]
+        if self.limit is not None:
+            results = results[:self.limit]
+        self._remember(text, results)
+        return results
@@ -0,0 +1,328 @@
+"""
+Хранилище файлов (фотографии, личные карточки, документы)
+
+Файлы хранятся в таблице blobs в виде bytea и адресуются по SHA-256:
+одинаковые файлы записываются один раз. Строки сотрудников, карточек
+и документов ссылаются на файл по id, поэтому обычный select() не тянет
+содержимое файлов. Содержимое загружается только при показе фото или
+открытии файла.
+
+Файлы больше CHUNK_SIZE (сканы карточек и документов) записываются
+частями фиксированного размера в blob_chunks: файл читается с диска
+блоками, в памяти одновременно только одна часть. При чтении части
+выдаются по одной (iter_blob_chunks), а SHA-256 содержимого сверяется
+с записанным.
+
+Одинаковый файл может одновременно записываться одним клиентом и
+освобождаться (release_blob) другим. Поэтому put_blob блокирует уже
+существующую запись blobs (FOR KEY SHARE) до конца транзакции, а release_blob
+перед удалением берет блокировку FOR UPDATE. Файл и строку, которая на него
+ссылается, нужно записывать в одной транзакции (db.atomic()): иначе
+блокировка снимается до появления ссылки.
+
+Сжатие zstd включается переменной BLOB_COMPRESSION=zstd (нужен пакет zstandard).
+Размер части задается переменной BLOB_CHUNK_SIZE (байт, по умолчанию 1 МБ).
+"""
+import base64
+import hashlib
+import os
+
+BLOB_COMPRESSION = os.getenv('BLOB_COMPRESSION', '')
+CHUNK_SIZE = int(os.getenv('BLOB_CHUNK_SIZE', 1024 * 1024))
+
+# Таблицы и колонки, которые ссылаются на blobs
+BLOB_REFERENCES = [
+    ("guard_employees", "photo_blob_id"),
+    ("chief_employees", "photo_blob_id"),
+    ("office_employees", "photo_blob_id"),
+    ("guard_employees", "photo_thumb_blob_id"),
+    ("chief_employees", "photo_thumb_blob_id"),
+    ("office_employees", "photo_thumb_blob_id"),
+    ("guard_employees", "photo_original_blob_id"),
+    ("chief_employees", "photo_original_blob_id"),
+    ("office_employees", "photo_original_blob_id"),
+    ("personal_cards", "file_blob_id"),
+    ("employee_documents", "file_blob_id"),
+]
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+# Предупреждение один раз при импорте, а не при каждой записи файла
+if BLOB_COMPRESSION == 'zstd' and _zstd() is None:
+    print("BLOB_COMPRESSION=zstd, но пакет zstandard не установлен - файлы сохраняются без сжатия")
+
+
+def encode_blob(data):
+    """
+    Готовит данные к записи
+
+    Returns:
+        tuple: (sha256, данные для записи, сжатие или None)
+    """
+    sha256 = hashlib.sha256(data).hexdigest()
+    if BLOB_COMPRESSION == 'zstd':
+        zstandard = _zstd()
+        if zstandard is not None:
+            compressed = zstandard.ZstdCompressor(level=3).compress(data)
+            # Уже сжатые форматы (JPEG, PDF) могут не уменьшиться
+            if len(compressed) < len(data):
+                return sha256, compressed, 'zstd'
+    return sha256, data, None
+
+
+def decode_blob(payload, compression):
+    """Восстанавливает исходные данные"""
+    payload = bytes(payload)
+    if compression == 'zstd':
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("Для чтения файла нужен пакет zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return payload
+
+
+class BlobChecksumError(Exception):
+    """Содержимое файла не совпадает с записанной контрольной суммой"""
+
+
+def _find_blob(sha256):
+    """Существующая запись по SHA-256, заблокированная от удаления до конца транзакции"""
+    from database.models import Blob
+    return Blob.select(Blob.id, Blob.sha256).where(Blob.sha256 == sha256).for_update('FOR KEY SHARE').first()
+
+
+def _find_or_insert_blob(sha256, data, size, stored_size, compression):
+    """
+    Существующая запись (с блокировкой) или новая
+
+    Returns:
+        tuple: (Blob, True - запись новая)
+    """
+    while True:
+        blob = _find_blob(sha256)
+        if blob:
+            return blob, False
+        blob = _insert_blob(sha256, data, size, stored_size, compression)
+        if blob:
+            return blob, True
+        # Запись добавил другой клиент - повторяем поиск с блокировкой
+
+
+def _insert_blob(sha256, data, size, stored_size, compression):
+    """
+    Добавляет запись blobs одним запросом
+
+    Одинаковый файл, одновременно записанный другим клиентом, не приводит
+    к ошибке уникальности: INSERT ... ON CONFLICT DO NOTHING ничего не добавляет.
+
+    Returns:
+        Blob: новая запись или None, если файл с таким SHA-256 уже есть
+    """
+    from datetime import datetime
+    from database.models import Blob, db
+    cursor = db.execute_sql(
+        "INSERT INTO blobs (sha256, data, size, stored_size, compression, chunk_count, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, 0, %s) ON CONFLICT (sha256) DO NOTHING RETURNING id",
+        (sha256, data, size, stored_size, compression, datetime.now())
+    )
+    row = cursor.fetchone()
+    return Blob(id=row[0], sha256=sha256) if row else None
+
+
+def put_blob(data):
+    """
+    Сохраняет файл и возвращает запись Blob (повторно не записывает одинаковые файлы)
+
+    Вызывается в той же транзакции, что и запись строки со ссылкой на файл.
+    """
+    if len(data) > CHUNK_SIZE:
+        import io
+        return put_blob_stream(io.BytesIO(data))
+    sha256, payload, compression = encode_blob(data)
+    blob, _ = _find_or_insert_blob(sha256, payload, len(data), len(payload), compression)
+    return blob
+
+
+def _read_blocks(stream):
+    while True:
+        block = stream.read(CHUNK_SIZE)
+        if not block:
+            return
+        yield block
+
+
+def _compress_chunk(chunk):
+    """Сжимает часть файла, если включено сжатие (все части файла сжимаются одинаково)"""
+    if BLOB_COMPRESSION == 'zstd':
+        zstandard = _zstd()
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=3).compress(chunk), 'zstd'
+    return chunk, None
+
+
+def put_blob_stream(stream):
+    """
+    Сохраняет файл из потока частями по CHUNK_SIZE
+
+    Поток читается дважды (сначала считается SHA-256 для проверки дубликата),
+    поэтому должен поддерживать seek. В памяти одновременно одна часть.
+    Вызывается в той же транзакции, что и запись строки со ссылкой на файл.
+
+    Returns:
+        Blob: новая или уже существующая запись
+    """
+    from database.models import Blob, db
+    digest = hashlib.sha256()
+    size = 0
+    for block in _read_blocks(stream):
+        digest.update(block)
+        size += len(block)
+    sha256 = digest.hexdigest()
+
+    stream.seek(0)
+    with db.atomic():
+        blob, created = _find_or_insert_blob(sha256, None, size, 0, None)
+        if not created:
+            return blob
+        stored_size = 0
+        compression = None
+        seq = 0
+        for seq, block in enumerate(_read_blocks(stream)):
+            payload, compression = _compress_chunk(block)
+            db.execute_sql(
+                "INSERT INTO blob_chunks (blob_id, seq, data) VALUES (%s, %s, %s)",
+                (blob.id, seq, payload)
+            )
+            stored_size += len(payload)
+        chunk_count = seq + 1 if size else 0
+        Blob.update(stored_size=stored_size, compression=compression, chunk_count=chunk_count).where(Blob.id == blob.id).execute()
+    return blob
+
+
+def put_blob_file(path):
+    """Сохраняет файл с диска частями, не читая его в память целиком"""
+    with open(path, 'rb') as f:
+        return put_blob_stream(f)
+
+
+def iter_blob_chunks(blob_id):
+    """
+    Выдает содержимое файла частями (по одному запросу на часть)
+
+    Для файлов, записанных частями, SHA-256 сверяется после последней части.
+
+    Raises:
+        BlobChecksumError: содержимое повреждено
+    """
+    from database.models import Blob, db
+    blob = Blob.select(Blob.sha256, Blob.data, Blob.compression, Blob.chunk_count).where(Blob.id == blob_id).first()
+    if blob is None:
+        return
+    if not blob.chunk_count:
+        # Небольшой файл хранится в самой записи blobs
+        if blob.data is not None:
+            yield decode_blob(blob.data, blob.compression)
+        return
+
+    digest = hashlib.sha256()
+    for seq in range(blob.chunk_count):
+        row = db.execute_sql(
+            "SELECT data FROM blob_chunks WHERE blob_id = %s AND seq = %s", (blob_id, seq)
+        ).fetchone()
+        if row is None:
+            raise BlobChecksumError(f"нет части {seq} файла {blob_id}")
+        chunk = decode_blob(row[0], blob.compression)
+        digest.update(chunk)
+        yield chunk
+    if digest.hexdigest() != blob.sha256:
+        raise BlobChecksumError(f"контрольная сумма файла {blob_id} не совпадает")
+
+
+def write_blob_to_file(blob_id, path):
+    """
+    Записывает файл из хранилища на диск частями
+
+    Returns:
+        int: число записанных байт; при ошибке файл удаляется
+    """
+    written = 0
+    try:
+        with open(path, 'wb') as f:
+            for chunk in iter_blob_chunks(blob_id):
+                f.write(chunk)
+                written += len(chunk)
+    except Exception:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def get_blobs_base64(blob_ids):
+    """Возвращает содержимое нескольких небольших файлов (фото) в base64 одним запросом: {id: base64}"""
+    from database.models import Blob
+    blob_ids = {blob_id for blob_id in blob_ids if blob_id}
+    if not blob_ids:
+        return {}
+    query = Blob.select(Blob.id, Blob.data, Blob.compression).where(Blob.id.in_(sorted(blob_ids)) & Blob.data.is_null(False))
+    return {
+        blob.id: base64.b64encode(decode_blob(blob.data, blob.compression)).decode('utf-8')
+        for blob in query
+    }
+
+
+def get_blob_bytes(blob_id):
+    """Возвращает содержимое файла целиком или None (для фото; большие файлы - write_blob_to_file)"""
+    if not blob_id:
+        return None
+    chunks = list(iter_blob_chunks(blob_id))
+    return b"".join(chunks) if chunks else None
+
+
+def get_blob_base64(blob_id):
+    """Возвращает содержимое файла в base64 (для ft.Image) или None"""
+    data = get_blob_bytes(blob_id)
+    return base64.b64encode(data).decode('utf-8') if data is not None else None
+
+
+def release_blob(blob_id):
+    """Удаляет файл, если на него больше никто не ссылается"""
+    from database.models import db
+    if not blob_id:
+        return False
+    conditions = " AND ".join(
+        f"NOT EXISTS (SELECT 1 FROM {table} WHERE {column} = blobs.id)" for table, column in BLOB_REFERENCES
+    )
+    with db.atomic():
+        # Блокировка ждет транзакции, которые взяли этот файл в put_blob; DELETE -
+        # отдельный запрос, поэтому проверка ссылок видит строки, записанные ими
+        if db.execute_sql("SELECT id FROM blobs WHERE id = %s FOR UPDATE", (blob_id,)).fetchone() is None:
+            return False
+        cursor = db.execute_sql(f"DELETE FROM blobs WHERE id = %s AND {conditions}", (blob_id,))
+    return cursor.rowcount > 0
+
+
+def employee_blob_ids(employee):
+    """
+    id файлов сотрудника: версии фото, файлы личных карточек и документов
+
+    Собираются до удаления сотрудника (карточки и документы удаляются каскадом),
+    после удаления каждый файл освобождается через release_blob.
+    """
+    blob_ids = {employee.photo_blob_id, employee.photo_thumb_blob_id, employee.photo_original_blob_id}
+    # У сотрудников офиса нет личных карточек
+    for backref in ('personal_cards', 'documents'):
+        rows = getattr(employee, backref, None)
+        if rows is not None:
+            blob_ids.update(row.file_blob_id for row in rows)
+    blob_ids.discard(None)
+    return blob_ids
@@ -0,0 +1,93 @@
+import threading
+
+
+class DataLayer:
+    """
+    Фоновая подготовка слоя данных
+
+    Подключение к БД, миграции и создание администратора выполняются
+    в отдельном потоке, чтобы окно и форма входа появлялись сразу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self._callbacks = []
+        self.error = None
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout=None):
+        """Ждет готовности слоя данных"""
+        return self._ready.wait(timeout)
+
+    def on_ready(self, callback):
+        """
+        Подписывает callback(error) на завершение подготовки
+
+        error равен None при успехе. Если подготовка уже закончилась,
+        callback вызывается сразу.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+            finished = self._ready.is_set() or (self.error is not None and not self.is_running())
+            if self._ready.is_set():
+                self._callbacks.remove(callback)
+        if finished:
+            callback(self.error)
+
+    def start(self, auth_manager=None):
+        """Запускает подготовку в фоне (повторный вызов после ошибки перезапускает её)"""
+        with self._lock:
+            if self._ready.is_set() or self.is_running():
+                return
+            self.error = None
+            self._thread = threading.Thread(target=self._run, args=(auth_manager,), daemon=True)
+            self._thread.start()
+
+    def _run(self, auth_manager):
+        from database.models import init_database
+        try:
+            init_database()
+            self._warm_indexes()
+            if auth_manager:
+                auth_manager.bootstrap()
+        except Exception as e:
+            print(f"Ошибка подготовки базы данных: {e}")
+            self.error = e
+
+        with self._lock:
+            if self.error is None:
+                self._ready.set()
+            callbacks = self._callbacks
+            self._callbacks = [] if self.error is None else list(callbacks)
+
+        for callback in callbacks:
+            try:
+                callback(self.error)
+            except Exception as e:
+                print(f"Ошибка обработчика готовности БД: {e}")
+
+    def _warm_indexes(self):
+        """Загружает индексы компаний и ФИО (фильтр и числа компаний, ранжированный поиск)"""
+        from database.company_index import company_index
+        from database.name_index import name_index
+        from database.session import db_session
+        try:
+            with db_session():
+                company_index.warm()
+        except Exception as e:
+            print(f"Ошибка загрузки индекса компаний: {e}")
+        try:
+            with db_session():
+                name_index.warm()
+        except Exception as e:
+            print(f"Ошибка загрузки индекса поиска по ФИО: {e}")
+
+
+data_layer = DataLayer()
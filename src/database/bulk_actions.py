@@ -0,0 +1,115 @@
+"""
+Групповые операции над сотрудниками
+
+Увольнение, смена компаний, статуса штата и ответственности выполнялись
+по одному сотруднику: save() и запись в журнал на каждого. Функции модуля
+выполняют операцию для выбранных сотрудников одним UPDATE / INSERT ... SELECT /
+DELETE в одной транзакции, а записи журнала добавляются одним запросом
+в той же транзакции. После записи обновляются индексы и кэш карточек.
+
+Каждая функция возвращает список (id, ФИО) сотрудников, которых операция
+изменила, - по нему строятся записи журнала.
+"""
+from collections import namedtuple
+
+# Поля, которые можно менять группой: поле -> (название, допустимые значения)
+BULK_FIELDS = {
+    'staff_status': ("Статус штата", ("в штате", "за штатом")),
+    'criminal_liability': ("Уголовная/административная ответственность", ("нет", "да")),
+}
+
+BulkResult = namedtuple('BulkResult', ['changed', 'log_entries'])
+
+
+def _names(model, condition):
+    """(id, ФИО) сотрудников, подходящих под условие, одним запросом"""
+    return list(model.select(model.id, model.full_name).where(condition).order_by(model.full_name).tuples())
+
+
+def _finish(employee_type, changed, log_entries, auth_manager):
+    """
+    Записывает журнал одним запросом и сбрасывает карточки измененных сотрудников
+
+    Вызывается внутри транзакции операции: ошибка записи журнала не
+    перехватывается и откатывает операцию вместе с журналом.
+    """
+    from database.dossier import dossier_cache
+    if auth_manager is not None:
+        auth_manager.log_actions(log_entries, raise_errors=True)
+    for employee_id, _ in changed:
+        dossier_cache.invalidate(employee_type, employee_id)
+    return BulkResult(changed, log_entries)
+
+
+def bulk_terminate(employee_type, employee_ids, termination_date, reason, auth_manager=None):
+    """Увольняет работающих сотрудников из employee_ids одним UPDATE"""
+    from database.models import db, EmployeeDirectory
+    from database.company_index import company_index
+    from database.name_index import name_index
+
+    model = EmployeeDirectory.model_for_type(employee_type)
+    condition = model.id.in_(list(employee_ids)) & model.termination_date.is_null()
+    with db.atomic():
+        changed = _names(model, condition)
+        model.update(termination_date=termination_date, termination_reason=reason).where(condition).execute()
+        log_entries = [("Увольнение сотрудника", f"Уволен сотрудник: {full_name}") for _, full_name in changed]
+        result = _finish(employee_type, changed, log_entries, auth_manager)
+
+    for employee_id, _ in changed:
+        company_index.set_terminated(employee_type, employee_id, True)
+        name_index.set_terminated(employee_type, employee_id, True)
+    return result
+
+
+def bulk_set_company(employee_type, employee_ids, company, assign=True, auth_manager=None):
+    """
+    Добавляет сотрудников в компанию (один INSERT ... SELECT для тех, кого в ней нет)
+    или убирает из неё (один DELETE)
+    """
+    from peewee import SQL, Value, fn
+    from database.models import db, EmployeeDirectory, EmployeeCompany
+    from database.company_index import company_index
+
+    model = EmployeeDirectory.model_for_type(employee_type)
+    employee_field = getattr(EmployeeCompany, f"{employee_type}_employee")
+    linked = fn.EXISTS(
+        EmployeeCompany.select(SQL('1')).where((employee_field == model.id) & (EmployeeCompany.company == company.id))
+    )
+    ids = list(employee_ids)
+    with db.atomic():
+        if assign:
+            condition = model.id.in_(ids) & ~linked
+            changed = _names(model, condition)
+            EmployeeCompany.insert_from(
+                model.select(model.id, Value(company.id)).where(condition),
+                [employee_field, EmployeeCompany.company]
+            ).execute()
+            action, text = "Добавление в компанию", f"добавлен в компанию {company.name}"
+        else:
+            changed = _names(model, model.id.in_(ids) & linked)
+            EmployeeCompany.delete().where(employee_field.in_(ids) & (EmployeeCompany.company == company.id)).execute()
+            action, text = "Удаление из компании", f"удален из компании {company.name}"
+        log_entries = [(action, f"Сотрудник {full_name} {text}") for _, full_name in changed]
+        result = _finish(employee_type, changed, log_entries, auth_manager)
+
+    company_index.set_company_members(employee_type, company.id, [employee_id for employee_id, _ in changed], member=assign)
+    return result
+
+
+def bulk_set_field(employee_type, employee_ids, field, value, auth_manager=None):
+    """Меняет статус штата или ответственность сотрудников одним UPDATE"""
+    from database.models import db, EmployeeDirectory
+
+    title, options = BULK_FIELDS[field]
+    if value not in options:
+        raise ValueError(f"{title}: недопустимое значение \"{value}\"")
+    model = EmployeeDirectory.model_for_type(employee_type)
+    column = getattr(model, field)
+    condition = model.id.in_(list(employee_ids)) & (column != value)
+    with db.atomic():
+        changed = _names(model, condition)
+        model.update({column: value}).where(condition).execute()
+        log_entries = [
+            ("Редактирование сотрудника", f"{title} сотрудника {full_name}: {value}") for _, full_name in changed
+        ]
+        return _finish(employee_type, changed, log_entries, auth_manager)
@@ -0,0 +1,205 @@
+"""
+Индекс принадлежности сотрудников компаниям
+
+Фильтр по компаниям в списках сотрудников раньше на каждом обновлении
+выбирал компании, все строки employee_companies и передавал id обратно
+огромным IN (...). Индекс держит в памяти список компаний и множества id
+сотрудников по (тип сотрудника, компания), а также множества уволенных.
+Он загружается одним запросом к employee_directory и обновляется
+при сохранении сотрудника, увольнении, восстановлении и удалении.
+
+По загруженному индексу фильтр передает в БД список id, а выпадающий список
+показывает числа сотрудников компаний. Пока индекс не загружен (или выбранных
+сотрудников слишком много для списка id), фильтр выполняется в SQL через
+EXISTS по employee_companies, а числа не показываются.
+
+Сохранения с других рабочих мест индекс не видит: он перечитывается в фоне
+(db_executor) раз в RELOAD_INTERVAL секунд и сразу после invalidate(),
+до конца загрузки действует прежний индекс. Сотрудник, добавленный или
+переведенный с другого рабочего места, может не попадать в фильтр
+и числа не дольше RELOAD_INTERVAL секунд.
+"""
+import threading
+import time
+
+# Больше id фильтр передает в БД через EXISTS, а не списком
+IN_LIST_LIMIT = 1000
+# Через сколько секунд индекс перечитывается (изменения с других рабочих мест)
+RELOAD_INTERVAL = 60
+
+
+class CompanyIndex:
+    """Компании и их сотрудники по типам (guard, chief, office)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._companies = None
+        self._members = None
+        self._terminated = None
+        self._loaded_at = None
+        self._reloading = False
+        # Номер изменения индекса: загрузка, во время которой он изменился, сразу устаревает
+        self._version = 0
+
+    def is_warm(self):
+        return self._members is not None
+
+    def is_stale(self):
+        """Индекс не загружен или загружен раньше, чем RELOAD_INTERVAL секунд назад"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > RELOAD_INTERVAL
+
+    def warm(self):
+        """Загружает индекс одним запросом к представлению employee_directory"""
+        from database.models import EmployeeDirectory
+        with self._lock:
+            version = self._version
+        members = {}
+        terminated = {}
+        query = EmployeeDirectory.select(
+            EmployeeDirectory.employee_type,
+            EmployeeDirectory.employee_id,
+            EmployeeDirectory.termination_date.is_null(False).alias('is_terminated'),
+            EmployeeDirectory.company_ids,
+        ).tuples()
+        for employee_type, employee_id, is_terminated, company_ids in query:
+            for company_id in company_ids or []:
+                members.setdefault((employee_type, company_id), set()).add(employee_id)
+            if is_terminated:
+                terminated.setdefault(employee_type, set()).add(employee_id)
+        companies = self._load_companies()
+        with self._lock:
+            self._companies = companies
+            self._members = members
+            self._terminated = terminated
+            # Сохранение во время загрузки могло не попасть в прочитанные данные
+            self._loaded_at = time.monotonic() if version == self._version else None
+
+    def reload(self):
+        """Перечитывает индекс в фоне (db_executor); повторный вызов до конца загрузки не нужен"""
+        from database.executor import db_executor
+
+        def finished(_=None):
+            with self._lock:
+                self._reloading = False
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        db_executor.submit(("company_index",), self.warm, finished, finished)
+
+    def _reload_if_stale(self):
+        if self.is_stale():
+            self.reload()
+
+    def invalidate(self):
+        """Сбрасывает индекс (например, после добавления или удаления компании) и перечитывает его в фоне"""
+        with self._lock:
+            self._version += 1
+            self._companies = None
+            self._members = None
+            self._terminated = None
+            self._loaded_at = None
+        self.reload()
+
+    def _load_companies(self):
+        from database.models import Company
+        from database.session import db_session
+        # Список компаний читается и при построении страниц, вне фоновых запросов
+        with db_session():
+            return list(Company.select().order_by(Company.id))
+
+    def companies(self):
+        """Список компаний (без запроса к БД, если он уже загружен)"""
+        with self._lock:
+            if self._companies is None:
+                self._companies = self._load_companies()
+            return list(self._companies)
+
+    def members(self, employee_type, company_ids):
+        """
+        id сотрудников типа employee_type, состоящих хотя бы в одной из компаний
+
+        Returns:
+            set или None, если индекс не загружен
+        """
+        self._reload_if_stale()
+        with self._lock:
+            if self._members is None:
+                return None
+            result = set()
+            for company_id in company_ids:
+                result |= self._members.get((employee_type, company_id), set())
+            return result
+
+    def count(self, employee_type, company_id, terminated=False):
+        """Число работающих (или уволенных) сотрудников компании; None, если индекс не загружен"""
+        self._reload_if_stale()
+        with self._lock:
+            if self._members is None:
+                return None
+            ids = self._members.get((employee_type, company_id), set())
+            fired = self._terminated.get(employee_type, set())
+            return len(ids & fired) if terminated else len(ids - fired)
+
+    def set_employee_companies(self, employee_type, employee_id, company_ids):
+        """Обновляет компании сотрудника после сохранения"""
+        with self._lock:
+            self._version += 1
+            if self._members is None:
+                return
+            for (member_type, _), ids in self._members.items():
+                if member_type == employee_type:
+                    ids.discard(employee_id)
+            for company_id in company_ids:
+                self._members.setdefault((employee_type, company_id), set()).add(employee_id)
+
+    def set_company_members(self, employee_type, company_id, employee_ids, member=True):
+        """Добавляет сотрудников в компанию или убирает из неё (групповые операции)"""
+        with self._lock:
+            self._version += 1
+            if self._members is None:
+                return
+            ids = self._members.setdefault((employee_type, company_id), set())
+            if member:
+                ids.update(employee_ids)
+            else:
+                ids.difference_update(employee_ids)
+
+    def set_terminated(self, employee_type, employee_id, terminated):
+        """Отмечает увольнение или восстановление сотрудника"""
+        with self._lock:
+            self._version += 1
+            if self._terminated is None:
+                return
+            ids = self._terminated.setdefault(employee_type, set())
+            if terminated:
+                ids.add(employee_id)
+            else:
+                ids.discard(employee_id)
+
+    def remove_employee(self, employee_type, employee_id):
+        """Убирает удаленного сотрудника из индекса"""
+        self.set_employee_companies(employee_type, employee_id, [])
+        self.set_terminated(employee_type, employee_id, False)
+
+    def filter_expression(self, model, employee_type, company_ids):
+        """
+        Условие "сотрудник состоит хотя бы в одной из компаний company_ids"
+
+        По загруженному индексу - список id, иначе EXISTS по employee_companies.
+        """
+        from peewee import fn, SQL
+        from database.models import EmployeeCompany
+        ids = self.members(employee_type, company_ids)
+        if ids is not None and len(ids) <= IN_LIST_LIMIT:
+            return model.id.in_(sorted(ids))
+        employee_field = getattr(EmployeeCompany, f"{employee_type}_employee")
+        return fn.EXISTS(
+            EmployeeCompany.select(SQL('1')).where(
+                (employee_field == model.id) & EmployeeCompany.company.in_(list(company_ids))
+            )
+        )
+
+
+company_index = CompanyIndex()
@@ -0,0 +1,149 @@
+"""
+Список смен за день с фильтрами и порциями в SQL
+
+Диалог смен за день загружал все смены и ВЗН даты (генератор тестовых
+данных создает ~130 в день) и на каждое нажатие флажка или порцию списка
+заново фильтровал их в памяти.
+
+Теперь фильтры (тип смены, поиск по сотруднику и объекту) и порции
+выполняются в БД:
+- смены нужных таблиц за день объединяются (UNION ALL) в строки
+  (источник, id, сотрудник, объект, ВЗН или нет);
+- число строк - один COUNT по объединению;
+- порция - ORDER BY ФИО, приоритет источника, id LIMIT по объединению,
+  следующая порция - по ключу последней строки (keyset, см. base/infinite_list.py);
+- записи порции загружаются по id вместе с сотрудником и объектом
+  (один запрос на таблицу, без отдельных запросов на строку).
+
+Календарь бухгалтерии показывает одну строку на сотрудника: объединение
+сначала сокращается до одной смены сотрудника (DISTINCT ON, приоритет:
+смена начальника > дежурная > ВЗН), фильтры применяются после.
+"""
+from collections import namedtuple
+
+# Фильтры списка: флажки "Обычные смены" и "ВЗН", строки поиска
+ShiftFilters = namedtuple('ShiftFilters', ['shifts', 'vzn', 'employee', 'object'])
+
+# Источники смен в порядке приоритета при объединении по сотруднику
+SOURCES = ('chief', 'duty', 'vzn')
+
+
+def _source_model(source):
+    from database.models import Assignment, DutyShift, CashWithdrawal
+    return {'chief': Assignment, 'duty': DutyShift, 'vzn': CashWithdrawal}[source]
+
+
+def _source_rows(source, date_obj):
+    """Смены таблицы source за день: источник, приоритет, id, сотрудник, объект, ВЗН"""
+    from peewee import Value, JOIN, fn
+    from database.models import GuardEmployee, Object
+
+    model = _source_model(source)
+    if source == 'duty':
+        # Объект дежурной смены записан в описании, ВЗН отмечается в нем же
+        object_text = model.description
+        is_vzn = fn.COALESCE(fn.STRPOS(model.description, "ВЗН"), 0) > 0
+    else:
+        object_text = Object.name
+        is_vzn = Value(source == 'vzn')
+
+    query = model.select(
+        Value(source).alias('source'),
+        Value(SOURCES.index(source)).alias('priority'),
+        model.id.alias('id'),
+        model.employee.alias('employee_id'),
+        GuardEmployee.full_name.alias('employee_name'),
+        object_text.alias('object_text'),
+        is_vzn.alias('is_vzn'),
+    ).join(GuardEmployee)
+    if source != 'duty':
+        query = query.switch(model).join(Object, JOIN.LEFT_OUTER)
+    return query.where(model.date == date_obj)
+
+
+def day_shifts_query(date_obj, sources, filters, merge_by_employee=False):
+    """
+    Строки списка смен за день с фильтрами и порядком (без порций)
+
+    Args:
+        sources: источники ('chief', 'duty', 'vzn')
+        filters: ShiftFilters
+        merge_by_employee: одна строка на сотрудника (календарь бухгалтерии)
+    """
+    from peewee import Select, SQL
+    from database.models import db
+
+    union = None
+    for source in sources:
+        rows = _source_rows(source, date_obj)
+        union = rows if union is None else union + rows
+    columns = ('source', 'priority', 'id', 'employee_id', 'employee_name', 'object_text', 'is_vzn')
+    rows = union.alias('day_shifts')
+
+    if merge_by_employee:
+        merged = Select([rows], [getattr(rows.c, name) for name in columns]).distinct(
+            rows.c.employee_id
+        ).order_by(rows.c.employee_id, rows.c.priority).alias('merged_shifts')
+        rows = merged
+
+    query = Select([rows], [getattr(rows.c, name) for name in columns]).bind(db)
+    if not filters.shifts or not filters.vzn:
+        # Без обоих флажков список пуст
+        query = query.where(rows.c.is_vzn == bool(filters.vzn)) if filters.shifts or filters.vzn else query.where(SQL('FALSE'))
+    if filters.employee:
+        query = query.where(rows.c.employee_name.contains(filters.employee))
+    if filters.object:
+        query = query.where(rows.c.object_text.contains(filters.object))
+    return query.order_by(rows.c.employee_name, rows.c.priority, rows.c.id)
+
+
+def count_day_shifts(query):
+    """Число строк списка (COUNT по запросу day_shifts_query)"""
+    return query.order_by().count()
+
+
+def fetch_day_shifts(query, after, limit):
+    """
+    Порция списка: записи смен (Assignment, DutyShift, CashWithdrawal) по порядку
+
+    Args:
+        after: ключ последней строки предыдущей порции (shift_cursor) или None
+
+    Записи загружаются вместе с сотрудником и объектом.
+    """
+    from peewee import Select, Tuple
+    from database.models import db
+
+    rows = query.order_by().alias('day_shifts_page')
+    page = Select([rows], [rows.c.source, rows.c.id]).bind(db)
+    if after is not None:
+        page = page.where(Tuple(rows.c.employee_name, rows.c.priority, rows.c.id) > Tuple(*after))
+    page = page.order_by(rows.c.employee_name, rows.c.priority, rows.c.id).limit(limit)
+    return load_shifts(list(page.tuples()))
+
+
+def shift_cursor(shift):
+    """Ключ сортировки записи смены (ФИО, приоритет источника, id) для следующей порции"""
+    source = next(source for source in SOURCES if isinstance(shift, _source_model(source)))
+    return (shift.employee.full_name, SOURCES.index(source), shift.id)
+
+
+def load_shifts(keys):
+    """Записи смен по (источник, id) в том же порядке, одним запросом на таблицу"""
+    from peewee import JOIN
+    from database.models import GuardEmployee, Object
+
+    ids_by_source = {}
+    for source, shift_id in keys:
+        ids_by_source.setdefault(source, []).append(shift_id)
+
+    loaded = {}
+    for source, ids in ids_by_source.items():
+        model = _source_model(source)
+        if source == 'duty':
+            query = model.select(model, GuardEmployee).join(GuardEmployee)
+        else:
+            query = model.select(model, GuardEmployee, Object).join(GuardEmployee).switch(model).join(Object, JOIN.LEFT_OUTER)
+        for shift in query.where(model.id.in_(ids)):
+            loaded[(source, shift.id)] = shift
+    return [loaded[key] for key in keys if key in loaded]
@@ -0,0 +1,66 @@
+"""
+Список списанных личных карточек
+
+Запрос страницы "Списанные карточки" (views/discarded_cards.py). Проверка
+планов (database/query_plans.py) строит запрос этими же функциями.
+"""
+
+
+def discarded_cards_query(company_ids=None, search_value=""):
+    """
+    Списанные карточки с сотрудником и компанией
+
+    Args:
+        company_ids: id выбранных компаний или None (все компании)
+        search_value: строка поиска по ФИО сотрудника
+    """
+    from peewee import JOIN
+    from database.models import PersonalCard, GuardEmployee, ChiefEmployee, Company
+    query = (PersonalCard.select()
+             .join(GuardEmployee, JOIN.LEFT_OUTER, on=(PersonalCard.guard_employee == GuardEmployee.id))
+             .switch(PersonalCard)
+             .join(ChiefEmployee, JOIN.LEFT_OUTER, on=(PersonalCard.chief_employee == ChiefEmployee.id))
+             .switch(PersonalCard)
+             .join(Company, on=(PersonalCard.company == Company.id))
+             .where(PersonalCard.is_discarded == True))
+
+    if company_ids is not None:
+        # Если ни одна компания не выбрана, ничего не показываем
+        query = query.where(PersonalCard.company.in_(list(company_ids)) if company_ids else False)
+
+    if search_value:
+        # Поиск по имени сотрудника
+        query = query.where(
+            GuardEmployee.full_name.contains(search_value) |
+            ChiefEmployee.full_name.contains(search_value)
+        )
+    return query
+
+
+def discarded_cards_page(query, after, limit):
+    """
+    Порция строк списка, отсортированных по компании (запрос, без выполнения)
+
+    Из карточки, сотрудника и компании выбираются только отображаемые
+    колонки, полная карточка загружается при открытии.
+
+    Args:
+        query: запрос discarded_cards_query
+        after: (компания, id) последней загруженной строки или None
+        limit: число строк
+    """
+    from peewee import Tuple, fn
+    from database.models import PersonalCard, GuardEmployee, ChiefEmployee, Company
+    if after is not None:
+        # Следующая порция - по ключу сортировки последней строки (без OFFSET)
+        query = query.where(Tuple(Company.name, PersonalCard.id) > Tuple(*after))
+    return (query
+            .select(
+                PersonalCard.id,
+                PersonalCard.issue_date,
+                PersonalCard.discarded_date,
+                Company.name.alias('company_name'),
+                fn.COALESCE(GuardEmployee.full_name, ChiefEmployee.full_name, 'Неизвестно').alias('employee_name'),
+            )
+            .order_by(Company.name, PersonalCard.id)
+            .limit(limit))
@@ -0,0 +1,193 @@
+"""
+Карточка сотрудника одним запросом
+
+Диалог сотрудника раньше выполнял отдельные запросы на запись сотрудника,
+его компании (с ленивой загрузкой каждой компании), личные карточки
+и документы, а списки карточек и документов читали записи целиком.
+load_dossier выбирает запись сотрудника, названия его компаний
+и метаданные карточек и документов (без содержимого файлов) одним
+запросом: компании, карточки и документы собираются в подзапросах
+через array_agg / json_agg.
+
+DossierCache хранит загруженные карточки по (тип сотрудника, id)
+до изменения сотрудника, его компаний, карточек или документов.
+Запись сотрудника выдается копией: страница меняет поля записи перед
+save(), и неудачное сохранение не должно оставлять эти значения в кэше.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime
+
+# Число карточек сотрудников, хранимых в памяти
+CACHE_SIZE = 64
+
+Dossier = namedtuple('Dossier', ['employee_type', 'employee', 'companies', 'cards', 'documents'])
+DossierCard = namedtuple('DossierCard', ['id', 'issue_date', 'company_name', 'filename', 'file_blob_id'])
+DossierDocument = namedtuple('DossierDocument', ['id', 'document_type', 'created_at', 'filename', 'file_blob_id'])
+
+
+def _cards_subquery(employee_type, model):
+    from peewee import fn
+    from database.models import PersonalCard, Company
+    employee_field = getattr(PersonalCard, f"{employee_type}_employee", None)
+    if employee_field is None:
+        # Личные карточки есть только у охранников и руководителей
+        return None
+    card = fn.json_build_object(
+        'id', PersonalCard.id,
+        'issue_date', PersonalCard.issue_date,
+        'company_name', Company.name,
+        'filename', PersonalCard.filename,
+        'file_blob_id', PersonalCard.file_blob,
+    )
+    return (PersonalCard
+            .select(fn.json_agg(card).order_by(PersonalCard.issue_date.desc(), PersonalCard.id.desc()))
+            .join(Company)
+            .where((employee_field == model.id) & (PersonalCard.is_discarded == False)))
+
+
+def _documents_subquery(employee_type, model):
+    from peewee import fn
+    from database.models import EmployeeDocument
+    employee_field = getattr(EmployeeDocument, f"{employee_type}_employee")
+    document = fn.json_build_object(
+        'id', EmployeeDocument.id,
+        'document_type', EmployeeDocument.document_type,
+        # Без долей секунды: fromisoformat до Python 3.11 не разбирает их в записи PostgreSQL
+        'created_at', fn.to_char(EmployeeDocument.created_at, 'YYYY-MM-DD"T"HH24:MI:SS'),
+        'filename', EmployeeDocument.filename,
+        'file_blob_id', EmployeeDocument.file_blob,
+    )
+    return (EmployeeDocument
+            .select(fn.json_agg(document).order_by(EmployeeDocument.created_at.desc(), EmployeeDocument.id.desc()))
+            .where(employee_field == model.id))
+
+
+def _companies_subquery(employee_type, model):
+    from peewee import fn
+    from database.models import EmployeeCompany, Company
+    employee_field = getattr(EmployeeCompany, f"{employee_type}_employee")
+    return (EmployeeCompany
+            .select(fn.array_agg(Company.name).order_by(Company.id))
+            .join(Company)
+            .where(employee_field == model.id))
+
+
+def _parse_date(value, parser):
+    if not value:
+        return None
+    try:
+        return parser(value)
+    except ValueError:
+        return None
+
+
+def load_dossier(employee_type, employee_id):
+    """
+    Загружает сотрудника с компаниями, карточками и документами одним запросом
+
+    Returns:
+        Dossier или None, если сотрудника нет
+    """
+    from peewee import SQL
+    from database.models import EmployeeDirectory
+    model = EmployeeDirectory.model_for_type(employee_type)
+    cards = _cards_subquery(employee_type, model)
+    employee = (model
+                .select(
+                    model,
+                    _companies_subquery(employee_type, model).alias('dossier_companies'),
+                    (cards if cards is not None else SQL('NULL')).alias('dossier_cards'),
+                    _documents_subquery(employee_type, model).alias('dossier_documents'),
+                )
+                .where(model.id == employee_id)
+                .first())
+    if employee is None:
+        return None
+
+    companies = list(getattr(employee, 'dossier_companies', None) or [])
+    card_rows = [
+        DossierCard(
+            row['id'],
+            _parse_date(row['issue_date'], date.fromisoformat),
+            row['company_name'],
+            row['filename'],
+            row['file_blob_id'],
+        )
+        for row in getattr(employee, 'dossier_cards', None) or []
+    ]
+    document_rows = [
+        DossierDocument(
+            row['id'],
+            row['document_type'],
+            _parse_date(row['created_at'], datetime.fromisoformat),
+            row['filename'],
+            row['file_blob_id'],
+        )
+        for row in getattr(employee, 'dossier_documents', None) or []
+    ]
+    for name in ('dossier_companies', 'dossier_cards', 'dossier_documents'):
+        employee.__dict__.pop(name, None)
+    return Dossier(employee_type, employee, companies, card_rows, document_rows)
+
+
+def _with_employee_copy(dossier):
+    """Карточка с копией записи сотрудника (поля копии можно менять, кэш не меняется)"""
+    employee = dossier.employee
+    return dossier._replace(employee=type(employee)(**employee.__data__))
+
+
+class DossierCache:
+    """Загруженные карточки сотрудников по (тип, id) с вытеснением давно открытых"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._size = size
+        self._items = OrderedDict()
+        # Номера сбросов: по карточке и всего кэша (clear)
+        self._generations = {}
+        self._clear_generation = 0
+
+    def _generation(self, key):
+        return self._clear_generation, self._generations.get(key, 0)
+
+    def get(self, employee_type, employee_id):
+        """
+        Карточка сотрудника из памяти или из БД (None, если сотрудника нет)
+
+        Загрузка, начатая до сброса карточки, могла прочитать старые данные:
+        такая карточка возвращается, но в кэш не попадает.
+        """
+        key = (employee_type, employee_id)
+        with self._lock:
+            dossier = self._items.get(key)
+            if dossier is not None:
+                self._items.move_to_end(key)
+                return _with_employee_copy(dossier)
+            generation = self._generation(key)
+        dossier = load_dossier(employee_type, employee_id)
+        if dossier is not None:
+            with self._lock:
+                if self._generation(key) == generation:
+                    self._items[key] = dossier
+                    while len(self._items) > self._size:
+                        self._items.popitem(last=False)
+            return _with_employee_copy(dossier)
+        return dossier
+
+    def invalidate(self, employee_type, employee_id):
+        """Сбрасывает карточку после изменения сотрудника, его компаний, карточек или документов"""
+        key = (employee_type, employee_id)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._items.pop(key, None)
+
+    def clear(self):
+        """Сбрасывает все карточки (например, после переименования или удаления компании)"""
+        with self._lock:
+            self._clear_generation += 1
+            self._generations.clear()
+            self._items.clear()
+
+
+dossier_cache = DossierCache()
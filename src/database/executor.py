@@ -0,0 +1,102 @@
+"""
+Выполнение запросов вне потока интерфейса
+
+Обработчики Flet вызывают запросы синхронно, и медленный запрос замораживает
+окно. DbExecutor выполняет их в ограниченном пуле потоков (каждая задача
+берет соединение из пула БД на время выполнения) и передает результат
+в callback.
+
+Запросы группируются по ключу (например, поле поиска или календарь).
+Новый запрос с тем же ключом вытесняет старый: не начатый снимается
+с очереди, результат уже выполняющегося отбрасывается. Так результат
+предыдущего нажатия клавиши не перезапишет результат последнего.
+
+Переменные окружения:
+    DB_EXECUTOR_WORKERS - число потоков (по умолчанию 4, меньше DB_POOL_MAX)
+"""
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DbExecutor:
+    """Пул потоков для запросов к БД с вытеснением устаревших запросов"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        # Номера запросов сквозные, чтобы номер не повторился после очистки ключа
+        self._counter = itertools.count(1)
+        self._generations = {}
+        self._futures = {}
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        return self._pool
+
+    def submit(self, key, operation, on_done=None, on_error=None):
+        """
+        Выполняет operation() в фоне
+
+        Args:
+            key: ключ источника запроса; новый запрос с тем же ключом вытесняет старый
+            operation: функция с запросами, выполняется внутри db_session()
+            on_done: callback(result), вызывается только для актуального запроса
+            on_error: callback(exception), вызывается только для актуального запроса
+
+        Returns:
+            Future: результат operation() или None, если запрос вытеснен
+        """
+        with self._lock:
+            generation = next(self._counter)
+            self._generations[key] = generation
+            previous = self._futures.get(key)
+            if previous is not None:
+                previous.cancel()
+            future = self._get_pool().submit(self._run, key, generation, operation, on_done, on_error)
+            self._futures[key] = future
+        return future
+
+    def cancel(self, key):
+        """Отменяет запрос с ключом key (результат выполняющегося будет отброшен)"""
+        with self._lock:
+            self._generations.pop(key, None)
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_current(self, key, generation):
+        """True, если запрос не вытеснен более новым"""
+        with self._lock:
+            return self._generations.get(key) == generation
+
+    def _run(self, key, generation, operation, on_done, on_error):
+        from database.session import db_session
+        if not self.is_current(key, generation):
+            return None
+        try:
+            # Callback выполняется в той же сессии: ленивые обращения
+            # к связям при построении строк списка используют это соединение
+            with db_session():
+                result = operation()
+                if not self.is_current(key, generation):
+                    return None
+                if on_done:
+                    on_done(result)
+            return result
+        except Exception as e:
+            print(f"Ошибка фонового запроса ({key}): {e}")
+            if on_error and self.is_current(key, generation):
+                on_error(e)
+            return None
+        finally:
+            with self._lock:
+                if self._generations.get(key) == generation:
+                    self._generations.pop(key, None)
+                    self._futures.pop(key, None)
+
+
+db_executor = DbExecutor(max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", 4)))
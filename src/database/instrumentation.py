@@ -0,0 +1,198 @@
+"""
+Инструментирование SQL-запросов
+
+Включается переменной окружения DB_QUERY_STATS=1. Для каждого запроса
+записываются форма SQL, длительность, число строк и вызвавшая его функция
+представления. Запросы одного потока, идущие друг за другом без паузы,
+считаются одним действием пользователя; по завершении действия в консоль
+выводится сводка и предупреждения о N+1.
+
+Переменные окружения:
+    DB_QUERY_STATS           - 1, чтобы включить
+    DB_SLOW_QUERY_MS         - порог медленного запроса в мс (по умолчанию 200)
+    DB_SLOW_QUERY_LOG        - файл журнала медленных запросов (slow_queries.log)
+    DB_N_PLUS_ONE_THRESHOLD  - сколько одинаковых запросов за действие считать N+1 (10)
+    DB_ACTION_GAP_MS         - пауза, после которой действие считается завершенным (500)
+"""
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Каталоги, функции из которых считаются источником запроса
+SOURCE_DIRS = ("views", "base", "auth", "utils", "menu")
+
+
+def normalize_sql(sql):
+    """Приводит SQL к форме без конкретных значений"""
+    shape = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "?", shape)
+    shape = re.sub(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)", "(?...)", shape)
+    shape = shape.replace("%s", "?")
+    return re.sub(r"\s+", " ", shape).strip()
+
+
+def find_origin():
+    """Возвращает 'файл:функция' ближайшего кода приложения в стеке вызовов"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        parts = filename.split("/")
+        if len(parts) >= 2 and parts[-2] in SOURCE_DIRS:
+            return f"{parts[-2]}/{parts[-1]}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryAction:
+    """Запросы одного действия пользователя"""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.origin = None
+        self.started_at = time.time()
+        self.last_query_at = self.started_at
+        self.queries = 0
+        self.total_time = 0.0
+        self.rows = 0
+        self.shapes = {}
+
+    def add(self, shape, duration, rows, origin):
+        if self.origin is None:
+            self.origin = origin
+        self.queries += 1
+        self.total_time += duration
+        self.rows += rows
+        self.last_query_at = time.time()
+        count, total, origins = self.shapes.get(shape, (0, 0.0, set()))
+        origins.add(origin)
+        self.shapes[shape] = (count + 1, total + duration, origins)
+
+
+class QueryStats:
+    """Сборщик статистики запросов"""
+
+    def __init__(self, slow_query_ms=200, slow_query_log="slow_queries.log",
+                 n_plus_one_threshold=10, action_gap_ms=500):
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.action_gap = action_gap_ms / 1000
+        self._lock = threading.Lock()
+        self._actions = {}
+        self._local = threading.local()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def record(self, sql, duration, rows):
+        """Регистрирует выполненный запрос"""
+        shape = normalize_sql(sql)
+        origin = find_origin()
+        thread_id = threading.get_ident()
+        named = getattr(self._local, "action", None)
+
+        with self._lock:
+            action = named or self._actions.get(thread_id)
+            if action is None:
+                action = QueryAction()
+                self._actions[thread_id] = action
+            action.add(shape, duration, rows, origin)
+
+        if duration * 1000 >= self.slow_query_ms:
+            self._log_slow_query(sql, duration, rows, origin)
+
+    def _log_slow_query(self, sql, duration, rows, origin):
+        line = f"{datetime.now().strftime('%d.%m.%Y %H:%M:%S')} | {duration * 1000:.1f} мс | строк: {rows} | {origin} | {sql}\n"
+        try:
+            with open(self.slow_query_log, "a", encoding="utf-8") as f:
+                f.write(line)
+        except Exception as e:
+            print(f"Ошибка записи журнала медленных запросов: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.action_gap / 2)
+            now = time.time()
+            finished = []
+            with self._lock:
+                for thread_id, action in list(self._actions.items()):
+                    if now - action.last_query_at >= self.action_gap:
+                        finished.append(self._actions.pop(thread_id))
+            for action in finished:
+                self.report(action)
+
+    def begin_action(self, name):
+        """Начинает именованное действие в текущем потоке"""
+        self._local.action = QueryAction(name)
+        return self._local.action
+
+    def end_action(self):
+        """Завершает именованное действие и выводит сводку"""
+        action = getattr(self._local, "action", None)
+        self._local.action = None
+        if action is not None and action.queries:
+            self.report(action)
+
+    def report(self, action):
+        """Выводит сводку по действию и предупреждения о N+1"""
+        title = action.name or action.origin or "unknown"
+        print(f"[SQL] {title}: запросов {action.queries}, {action.total_time * 1000:.1f} мс, строк {action.rows}")
+
+        top = sorted(action.shapes.items(), key=lambda item: item[1][1], reverse=True)[:3]
+        for shape, (count, total, _) in top:
+            print(f"[SQL]     {count} x {total * 1000:.1f} мс  {shape[:150]}")
+
+        for shape, (count, total, origins) in action.shapes.items():
+            if count > self.n_plus_one_threshold:
+                print(f"[SQL] Возможен N+1: {count} одинаковых запросов из {', '.join(sorted(origins))}: {shape[:150]}")
+
+
+query_stats = None
+
+
+class query_action:
+    """
+    Контекстный менеджер и декоратор для именования действия
+
+    При выключенной статистике ничего не делает.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if query_stats is not None:
+            query_stats.begin_action(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if query_stats is not None:
+            query_stats.end_action()
+        return False
+
+    def __call__(self, func):
+        from functools import wraps
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_action(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def install_from_env(db):
+    """Включает статистику запросов для db, если задан DB_QUERY_STATS=1"""
+    global query_stats
+    if os.getenv("DB_QUERY_STATS", "0") != "1":
+        return None
+    query_stats = QueryStats(
+        slow_query_ms=int(os.getenv("DB_SLOW_QUERY_MS", 200)),
+        slow_query_log=os.getenv("DB_SLOW_QUERY_LOG", "slow_queries.log"),
+        n_plus_one_threshold=int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", 10)),
+        action_gap_ms=int(os.getenv("DB_ACTION_GAP_MS", 500)),
+    )
+    db.query_observer = query_stats
+    print("Статистика SQL-запросов включена")
+    return query_stats
@@ -0,0 +1,476 @@
+"""
+Версионные миграции схемы БД
+
+Применённые миграции записываются в таблицу schema_version.
+При запуске актуальность схемы проверяется одним запросом.
+
+Использование (из каталога src):
+    python -m database.migrations list    - список миграций и их статус
+    python -m database.migrations apply   - применить недостающие миграции (и повторить пропущенные)
+    python -m database.migrations verify  - проверить, что схема совпадает с моделями
+    python -m database.migrations explain - проверить планы частых запросов (см. database/query_plans.py)
+"""
+import sys
+from datetime import datetime
+
+SCHEMA_VERSION_TABLE = "schema_version"
+
+# Представления, создаваемые миграциями (модели для них не входят в _all_models)
+VIEWS = ["employee_directory"]
+
+
+class MigrationSkipped(Exception):
+    """
+    Необязательную миграцию нельзя применить на этом сервере (например, нет расширения)
+
+    Пропущенная миграция записывается в schema_version с отметкой skipped:
+    следующие миграции применяются, проверка схемы при запуске остается
+    одним запросом, а повторяет пропущенные команда apply.
+    """
+
+
+def _all_models():
+    """Возвращает все текущие модели (для проверки схемы в verify_schema)"""
+    from database import models as m
+    return [
+        m.Blob, m.BlobChunk, m.Company, m.GuardEmployee, m.ChiefEmployee, m.OfficeEmployee, m.EmployeeCompany,
+        m.Settings, m.Role, m.User, m.UserLog, m.Object, m.ObjectAddress, m.ObjectRate,
+        m.Assignment, m.ChiefObjectAssignment, m.PersonalCard, m.PersonalCardPhoto,
+        m.EmployeeDocument, m.EmployeeDocumentPhoto, m.CashWithdrawal, m.DutyShift,
+        m.AccountingOperation,
+    ]
+
+
+def _initial_schema(db):
+    """Таблицы и данные по умолчанию (снимок схемы из database/schema_v1.py)"""
+    from database.schema_v1 import INITIAL_SCHEMA
+    for sql in INITIAL_SCHEMA:
+        db.execute_sql(sql)
+
+    # Компании по умолчанию
+    for company_name in ["Легион", "Норд", "Росбезопасность"]:
+        db.execute_sql("INSERT INTO companies (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (company_name,))
+
+    # Настройка темы по умолчанию
+    db.execute_sql("INSERT INTO settings (key, value) VALUES (%s, %s) ON CONFLICT (key) DO NOTHING", ("theme", "light"))
+
+    # Роли по умолчанию
+    for role_name, description in [("Admin", "Администратор системы"), ("user", "Обычный пользователь")]:
+        db.execute_sql(
+            "INSERT INTO roles (name, description, created_at) VALUES (%s, %s, %s) ON CONFLICT (name) DO NOTHING",
+            (role_name, description, datetime.now())
+        )
+
+
+def _additional_columns(db):
+    """Колонки, добавленные после первой версии схемы"""
+    statements = [
+        "ALTER TABLE assignments ADD COLUMN IF NOT EXISTS comment TEXT",
+        "ALTER TABLE guard_employees ADD COLUMN IF NOT EXISTS created_by_user_id INTEGER",
+        "ALTER TABLE chief_employees ADD COLUMN IF NOT EXISTS created_by_user_id INTEGER",
+        "ALTER TABLE office_employees ADD COLUMN IF NOT EXISTS created_by_user_id INTEGER",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS is_absent BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS absent_comment TEXT",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS deduction_amount DECIMAL(7,2) DEFAULT 0",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS bonus_amount DECIMAL(7,2) DEFAULT 0",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS bonus_comment TEXT",
+        "ALTER TABLE assignments ADD COLUMN IF NOT EXISTS created_by_user_id INTEGER",
+        "ALTER TABLE cash_withdrawals ADD COLUMN IF NOT EXISTS created_by_user_id INTEGER",
+        "ALTER TABLE guard_employees ADD COLUMN IF NOT EXISTS staff_status VARCHAR(20) DEFAULT 'в штате'",
+        "ALTER TABLE chief_employees ADD COLUMN IF NOT EXISTS staff_status VARCHAR(20) DEFAULT 'в штате'",
+        "ALTER TABLE office_employees ADD COLUMN IF NOT EXISTS staff_status VARCHAR(20) DEFAULT 'в штате'",
+        "ALTER TABLE guard_employees ADD COLUMN IF NOT EXISTS criminal_liability VARCHAR(20) DEFAULT 'нет'",
+        "ALTER TABLE chief_employees ADD COLUMN IF NOT EXISTS criminal_liability VARCHAR(20) DEFAULT 'нет'",
+        "ALTER TABLE office_employees ADD COLUMN IF NOT EXISTS criminal_liability VARCHAR(20) DEFAULT 'нет'",
+    ]
+    for sql in statements:
+        db.execute_sql(sql)
+
+
+def _shift_indexes(db):
+    """Индексы для календарей смен и ВЗН"""
+    db.execute_sql("CREATE INDEX IF NOT EXISTS idx_assignments_date ON assignments(date)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS idx_assignments_employee_date ON assignments(employee_id, date)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS idx_cash_withdrawals_date ON cash_withdrawals(date)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS idx_cash_withdrawals_employee_date ON cash_withdrawals(employee_id, date)")
+
+
+def _performance_indexes(db):
+    """Индексы для поиска по ФИО, фильтров уволенных, компаний, логов, карточек и документов"""
+    # Индексы внешних ключей peewee создал вместе с таблицами (миграция 1).
+    # Составные индексы описаны в Meta моделей UserLog и PersonalCard,
+    # имена совпадают с теми, что создает peewee (<модель>_<колонки>)
+
+    # Журнал действий: сортировка по дате и фильтр по пользователю
+    db.execute_sql("CREATE INDEX IF NOT EXISTS userlog_created_at ON user_logs(created_at)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS userlog_user_id_created_at ON user_logs(user_id, created_at)")
+
+    # Личные карточки сотрудника и списанные карточки
+    db.execute_sql("CREATE INDEX IF NOT EXISTS personalcard_guard_employee_id_is_discarded ON personal_cards(guard_employee_id, is_discarded)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS personalcard_chief_employee_id_is_discarded ON personal_cards(chief_employee_id, is_discarded)")
+    db.execute_sql("CREATE INDEX IF NOT EXISTS idx_personal_cards_discarded ON personal_cards(discarded_date) WHERE is_discarded")
+
+    # Частичные индексы: работающие сотрудники (списки) и уволенные (страница уволенных)
+    for table in ["guard_employees", "chief_employees", "office_employees"]:
+        db.execute_sql(f"CREATE INDEX IF NOT EXISTS idx_{table}_active_name ON {table}(full_name) WHERE termination_date IS NULL")
+        db.execute_sql(f"CREATE INDEX IF NOT EXISTS idx_{table}_terminated ON {table}(termination_date) WHERE termination_date IS NOT NULL")
+
+    # Триграммные индексы создает отдельная миграция 9 (_trigram_indexes)
+
+
+def _store_blob(db, data):
+    """Записывает файл в blobs (с дедупликацией по SHA-256) и возвращает id"""
+    from database.blob_store import encode_blob
+    sha256, payload, compression = encode_blob(data)
+    cursor = db.execute_sql(
+        "INSERT INTO blobs (sha256, data, size, stored_size, compression, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (sha256) DO NOTHING RETURNING id",
+        (sha256, payload, len(data), len(payload), compression, datetime.now())
+    )
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    return db.execute_sql("SELECT id FROM blobs WHERE sha256 = %s", (sha256,)).fetchone()[0]
+
+
+def _move_files_to_blob_store(db):
+    """Переносит фото и файлы из base64-колонок в таблицу blobs"""
+    import base64
+
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS blobs ("
+        "id SERIAL PRIMARY KEY, "
+        "sha256 VARCHAR(64) NOT NULL, "
+        "data BYTEA NOT NULL, "
+        "size INTEGER NOT NULL, "
+        "stored_size INTEGER NOT NULL, "
+        "compression VARCHAR(10), "
+        "created_at TIMESTAMP NOT NULL)"
+    )
+    # Имена индексов - те, что создает peewee для моделей (<модель>_<колонка>)
+    db.execute_sql("CREATE UNIQUE INDEX IF NOT EXISTS blob_sha256 ON blobs(sha256)")
+
+    columns = [
+        ("guard_employees", "guardemployee", "photo_base64", "photo_blob_id"),
+        ("chief_employees", "chiefemployee", "photo_base64", "photo_blob_id"),
+        ("office_employees", "officeemployee", "photo_base64", "photo_blob_id"),
+        ("personal_cards", "personalcard", "file_base64", "file_blob_id"),
+        ("employee_documents", "employeedocument", "file_base64", "file_blob_id"),
+    ]
+    for table, model_name, old_column, new_column in columns:
+        db.execute_sql(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {new_column} INTEGER "
+            "REFERENCES blobs(id) ON DELETE SET NULL"
+        )
+        db.execute_sql(f"CREATE INDEX IF NOT EXISTS {model_name}_{new_column} ON {table}({new_column})")
+
+        if old_column not in {column.name for column in db.get_columns(table)}:
+            continue
+
+        # Переносим порциями, чтобы не держать в памяти все файлы сразу
+        converted = 0
+        last_id = 0
+        while True:
+            rows = db.execute_sql(
+                f"SELECT id, {old_column} FROM {table} "
+                f"WHERE {old_column} IS NOT NULL AND {old_column} <> '' AND id > %s ORDER BY id LIMIT 50",
+                (last_id,)
+            ).fetchall()
+            if not rows:
+                break
+            for row_id, value in rows:
+                last_id = row_id
+                try:
+                    data = base64.b64decode(value)
+                except Exception as e:
+                    print(f"Пропущен повреждённый файл {table}.id={row_id}: {e}")
+                    continue
+                blob_id = _store_blob(db, data)
+                db.execute_sql(f"UPDATE {table} SET {new_column} = %s WHERE id = %s", (blob_id, row_id))
+                converted += 1
+
+        db.execute_sql(f"ALTER TABLE {table} DROP COLUMN {old_column}")
+        print(f"{table}: перенесено файлов в хранилище - {converted}")
+
+
+def _employee_directory_view(db):
+    """Представление employee_directory: сотрудники всех трех типов одним списком"""
+    parts = []
+    for employee_type, table, column in [
+        ("guard", "guard_employees", "guard_employee_id"),
+        ("chief", "chief_employees", "chief_employee_id"),
+        ("office", "office_employees", "office_employee_id"),
+    ]:
+        parts.append(
+            f"SELECT '{employee_type}'::varchar(10) AS employee_type, e.id AS employee_id, e.full_name, "
+            f"e.termination_date, e.termination_reason, e.created_by_user_id, "
+            f"ARRAY(SELECT ec.company_id FROM employee_companies ec WHERE ec.{column} = e.id "
+            f"ORDER BY ec.company_id) AS company_ids "
+            f"FROM {table} e"
+        )
+    # Обычное (не материализованное) представление: данные всегда актуальны,
+    # а ORDER BY full_name LIMIT выполняется слиянием индексов трех таблиц
+    db.execute_sql("CREATE OR REPLACE VIEW employee_directory AS " + " UNION ALL ".join(parts))
+
+    # Сортировка уволенных по ФИО (для работающих есть idx_<table>_active_name)
+    for table in ["guard_employees", "chief_employees", "office_employees"]:
+        db.execute_sql(f"CREATE INDEX IF NOT EXISTS idx_{table}_terminated_name ON {table}(full_name) WHERE termination_date IS NOT NULL")
+
+
+def _photo_renditions(db):
+    """Колонки уменьшенного фото для списков и исходного файла фото"""
+    for table, model_name in [
+        ("guard_employees", "guardemployee"),
+        ("chief_employees", "chiefemployee"),
+        ("office_employees", "officeemployee"),
+    ]:
+        for column in ["photo_thumb_blob_id", "photo_original_blob_id"]:
+            db.execute_sql(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} INTEGER "
+                "REFERENCES blobs(id) ON DELETE SET NULL"
+            )
+            # Имя индекса - то, что создает peewee для модели
+            db.execute_sql(f"CREATE INDEX IF NOT EXISTS {model_name}_{column} ON {table}({column})")
+
+
+def _blob_chunks(db):
+    """Хранение больших файлов частями (blob_chunks)"""
+    db.execute_sql("ALTER TABLE blobs ALTER COLUMN data DROP NOT NULL")
+    db.execute_sql("ALTER TABLE blobs ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0")
+    db.execute_sql(
+        "CREATE TABLE IF NOT EXISTS blob_chunks ("
+        "blob_id INTEGER NOT NULL REFERENCES blobs(id) ON DELETE CASCADE, "
+        "seq INTEGER NOT NULL, "
+        "data BYTEA NOT NULL, "
+        "PRIMARY KEY (blob_id, seq))"
+    )
+    # Индекс внешнего ключа, как у модели BlobChunk
+    db.execute_sql("CREATE INDEX IF NOT EXISTS blobchunk_blob_id ON blob_chunks(blob_id)")
+
+
+def _require_pg_trgm(db):
+    """Включает расширение pg_trgm или пропускает миграцию, если его нет на сервере"""
+    try:
+        db.execute_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        raise MigrationSkipped(
+            f"Не удалось включить расширение pg_trgm (нужен пакет postgresql-contrib "
+            f"и право CREATE в базе): {e}"
+        ) from e
+
+
+def _trigram_indexes(db):
+    """
+    Триграммные индексы для поиска full_name.contains() / name.contains() (ILIKE '%...%')
+
+    Нужно расширение pg_trgm (пакет postgresql-contrib). Без него миграция
+    пропускается (MigrationSkipped): приложение работает без этих индексов,
+    после установки расширения миграцию применяет команда apply.
+    """
+    _require_pg_trgm(db)
+    for table, column in [
+        ("guard_employees", "full_name"),
+        ("chief_employees", "full_name"),
+        ("office_employees", "full_name"),
+        ("objects", "name"),
+    ]:
+        db.execute_sql(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)")
+
+
+def _normalized_name_indexes(db):
+    """
+    Триграммные индексы по нормализованному ФИО (без регистра, ё = е)
+
+    Фильтр списков по ФИО (name_condition в database/name_index.py) ищет
+    по выражению REPLACE(LOWER(full_name), 'ё', 'е'). Индексы по full_name
+    для него не подходят. Без pg_trgm миграция пропускается, как и миграция 9.
+    """
+    _require_pg_trgm(db)
+    for table in ["guard_employees", "chief_employees", "office_employees"]:
+        db.execute_sql(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_full_name_normalized_trgm ON {table} "
+            "USING gin (REPLACE(LOWER(full_name), 'ё', 'е') gin_trgm_ops)"
+        )
+
+
+# Упорядоченный список миграций: (версия, описание, функция)
+# Новые миграции добавляются только в конец, уже выпущенные не меняются
+MIGRATIONS = [
+    (1, "Начальная схема и данные по умолчанию", _initial_schema),
+    (2, "Дополнительные колонки сотрудников и ВЗН", _additional_columns),
+    (3, "Индексы смен и ВЗН", _shift_indexes),
+    (4, "Индексы для поиска и фильтров", _performance_indexes),
+    (5, "Перенос фото и файлов в хранилище blobs", _move_files_to_blob_store),
+    (6, "Представление всех сотрудников", _employee_directory_view),
+    (7, "Версии фото сотрудников", _photo_renditions),
+    (8, "Хранение больших файлов частями", _blob_chunks),
+    (9, "Триграммные индексы для поиска", _trigram_indexes),
+    (10, "Индексы поиска по нормализованному ФИО", _normalized_name_indexes),
+]
+
+
+def latest_version():
+    """Возвращает номер последней известной миграции"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def _ensure_version_table(db):
+    db.execute_sql(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+        "version INTEGER PRIMARY KEY, "
+        "name VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL, "
+        "skipped BOOLEAN NOT NULL DEFAULT FALSE)"
+    )
+    # Таблица могла быть создана до появления пропускаемых миграций
+    db.execute_sql(f"ALTER TABLE {SCHEMA_VERSION_TABLE} ADD COLUMN IF NOT EXISTS skipped BOOLEAN NOT NULL DEFAULT FALSE")
+
+
+def current_version(db):
+    """Возвращает версию схемы в БД (0, если миграции ещё не применялись)"""
+    try:
+        cursor = db.execute_sql(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}")
+        return cursor.fetchone()[0]
+    except Exception:
+        # Таблицы schema_version ещё нет
+        return 0
+
+
+def applied_versions(db, skipped=False):
+    """Возвращает словарь {версия: дата применения} (skipped=True - пропущенных миграций)"""
+    _ensure_version_table(db)
+    cursor = db.execute_sql(f"SELECT version, applied_at FROM {SCHEMA_VERSION_TABLE} WHERE skipped = %s", (skipped,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def _record_version(db, number, name, skipped=False):
+    db.execute_sql(
+        f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name, applied_at, skipped) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (version) DO UPDATE SET applied_at = EXCLUDED.applied_at, skipped = EXCLUDED.skipped",
+        (number, name, datetime.now(), skipped)
+    )
+
+
+def apply_migrations(db, verbose=False, retry_skipped=False):
+    """
+    Применяет недостающие миграции
+
+    Если схема актуальна, выполняется ровно один запрос.
+    Каждая миграция применяется в отдельной транзакции вместе с записью в schema_version.
+    Необязательная миграция, которую нельзя применить (MigrationSkipped), записывается
+    как пропущенная, и применяются следующие.
+
+    Args:
+        retry_skipped: повторить пропущенные миграции (команда apply)
+
+    Returns:
+        list: Номера применённых миграций
+    """
+    version = current_version(db)
+    if version >= latest_version() and not retry_skipped:
+        return []
+
+    _ensure_version_table(db)
+    done = set(applied_versions(db))
+    if not retry_skipped:
+        done |= set(applied_versions(db, skipped=True))
+    applied = []
+    for number, name, migration in MIGRATIONS:
+        if number in done:
+            continue
+        if verbose:
+            print(f"Применяется миграция {number}: {name}")
+        try:
+            with db.atomic():
+                migration(db)
+                _record_version(db, number, name)
+        except MigrationSkipped as e:
+            print(f"Предупреждение: миграция {number} ({name}) пропущена: {e}")
+            with db.atomic():
+                _record_version(db, number, name, skipped=True)
+            continue
+        applied.append(number)
+    return applied
+
+
+def verify_schema(db):
+    """
+    Проверяет, что все миграции применены и таблицы БД содержат колонки моделей
+
+    Returns:
+        list: Список найденных проблем (пустой, если всё в порядке)
+    """
+    problems = []
+    done = applied_versions(db)
+    skipped = applied_versions(db, skipped=True)
+    for number, name, _ in MIGRATIONS:
+        if number in skipped:
+            problems.append(f"Миграция {number} ({name}) пропущена")
+        elif number not in done:
+            problems.append(f"Миграция {number} ({name}) не применена")
+
+    views = {view.name for view in db.get_views()}
+    for view in VIEWS:
+        if view not in views:
+            problems.append(f"Нет представления {view}")
+
+    for model in _all_models():
+        table = model._meta.table_name
+        if not db.table_exists(table):
+            problems.append(f"Нет таблицы {table}")
+            continue
+        columns = {column.name for column in db.get_columns(table)}
+        for field in model._meta.sorted_fields:
+            if field.column_name not in columns:
+                problems.append(f"Нет колонки {table}.{field.column_name}")
+    return problems
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "list"
+
+    from database.models import db
+    from database.session import db_session
+
+    with db_session():
+        if command == "list":
+            done = applied_versions(db)
+            skipped = applied_versions(db, skipped=True)
+            for number, name, _ in MIGRATIONS:
+                if number in done:
+                    status = f"применена {done[number].strftime('%d.%m.%Y %H:%M:%S')}"
+                elif number in skipped:
+                    status = f"пропущена {skipped[number].strftime('%d.%m.%Y %H:%M:%S')}"
+                else:
+                    status = "не применена"
+                print(f"{number:4d}  {name} - {status}")
+            return 0
+
+        if command == "apply":
+            applied = apply_migrations(db, verbose=True, retry_skipped=True)
+            if applied:
+                print(f"Применено миграций: {len(applied)}")
+            else:
+                print("Схема актуальна")
+            return 0
+
+        if command == "verify":
+            problems = verify_schema(db)
+            if problems:
+                for problem in problems:
+                    print(f"Ошибка: {problem}")
+                return 1
+            print(f"Схема соответствует версии {latest_version()}")
+            return 0
+
+        if command == "explain":
+            from database.query_plans import check_query_plans
+            min_rows = int(argv[2]) if len(argv) > 2 else 1000
+            return 0 if check_query_plans(db, min_rows=min_rows) else 1
+
+    print(f"Неизвестная команда: {command}. Доступно: list, apply, verify, explain")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
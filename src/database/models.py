@@ -1,7 +1,10 @@
 from peewee import *
+from playhouse.postgres_ext import ArrayField
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from database.pool import DatabasePool
+from database.instrumentation import install_from_env
 
 # Загружаем переменные из .env файла
 load_dotenv()
@@ -12,16 +15,35 @@ DB_PORT = os.getenv('DB_PORT', 5432)
 DB_NAME = os.getenv('DB_NAME', 'legion_employees')
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'admin')
-# Инициализация базы данных PostgreSQL
-db = PostgresqlDatabase(
+
+# Настройки пула соединений
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))
+DB_POOL_HEALTH_CHECK = int(os.getenv('DB_POOL_HEALTH_CHECK', 30))
+DB_POOL_WAIT_TIMEOUT = int(os.getenv('DB_POOL_WAIT_TIMEOUT', 10))
+
+# Инициализация базы данных PostgreSQL (пул соединений)
+# autoconnect=False: запрос вне db_session() (database/session.py) сразу падает,
+# а не берет соединение, которое потом никто не вернет в пул
+db = DatabasePool(
     DB_NAME,
     user=DB_USER,
     password=DB_PASSWORD,
     host=DB_HOST,
     port=DB_PORT,
-    options='-c client_encoding=utf8'
+    options='-c client_encoding=utf8',
+    min_connections=DB_POOL_MIN,
+    max_connections=DB_POOL_MAX,
+    idle_timeout=DB_POOL_IDLE_TIMEOUT,
+    health_check_interval=DB_POOL_HEALTH_CHECK,
+    timeout=DB_POOL_WAIT_TIMEOUT,
+    autoconnect=False
 )
 
+# Статистика запросов (DB_QUERY_STATS=1)
+install_from_env(db)
+
 class BaseModel(Model):
     class Meta:
         database = db
@@ -37,15 +59,47 @@ class Company(BaseModel):
     class Meta:
         table_name = 'companies'
 
+class Blob(BaseModel):
+    """Файл в хранилище (см. database/blob_store.py)"""
+    sha256 = CharField(max_length=64, unique=True, verbose_name="SHA-256 содержимого")
+    data = BlobField(null=True, verbose_name="Содержимое")  # NULL - файл хранится частями в blob_chunks
+    size = IntegerField(verbose_name="Исходный размер")
+    stored_size = IntegerField(verbose_name="Размер в БД")
+    compression = CharField(max_length=10, null=True, verbose_name="Сжатие")
+    chunk_count = IntegerField(default=0, constraints=[SQL('DEFAULT 0')], verbose_name="Число частей")
+    created_at = DateTimeField(default=datetime.now)
+    
+    class Meta:
+        table_name = 'blobs'
+
+class BlobChunk(BaseModel):
+    """Часть большого файла в хранилище"""
+    blob = ForeignKeyField(Blob, backref='chunks', on_delete='CASCADE')
+    seq = IntegerField(verbose_name="Номер части")
+    data = BlobField(verbose_name="Содержимое части")
+    
+    class Meta:
+        table_name = 'blob_chunks'
+        primary_key = CompositeKey('blob', 'seq')
+
 class GuardEmployee(BaseModel):
     @classmethod
     def exists_by_name(cls, full_name: str) -> bool:
         return cls.select().where(cls.full_name == full_name).exists()
+    @classmethod
+    def existing_names(cls, full_names) -> set:
+        """ФИО из full_names, которые уже есть в БД (одним запросом)"""
+        full_names = list(set(full_names))
+        if not full_names:
+            return set()
+        return {name for (name,) in cls.select(cls.full_name).where(cls.full_name.in_(full_names)).tuples()}
     """Модель сотрудника охраны"""
     full_name = CharField(max_length=200, verbose_name="ФИО")
     birth_date = DateField(verbose_name="Дата рождения")
     photo_path = CharField(max_length=500, null=True, verbose_name="Путь к фото")
-    photo_base64 = TextField(null=True, verbose_name="Фото в base64")
+    photo_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', verbose_name="Фото")
+    photo_thumb_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Фото для списка")
+    photo_original_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Исходное фото")
     certificate_number = CharField(max_length=20, null=True, verbose_name="Номер удостоверения")
     termination_date = DateField(null=True, verbose_name="Дата увольнения")
     termination_reason = TextField(null=True, verbose_name="Причина увольнения")
@@ -88,11 +142,20 @@ class ChiefEmployee(BaseModel):
     @classmethod
     def exists_by_name(cls, full_name: str) -> bool:
         return cls.select().where(cls.full_name == full_name).exists()
+    @classmethod
+    def existing_names(cls, full_names) -> set:
+        """ФИО из full_names, которые уже есть в БД (одним запросом)"""
+        full_names = list(set(full_names))
+        if not full_names:
+            return set()
+        return {name for (name,) in cls.select(cls.full_name).where(cls.full_name.in_(full_names)).tuples()}
     """Модель начальника охраны"""
     full_name = CharField(max_length=200, verbose_name="ФИО")
     birth_date = DateField(verbose_name="Дата рождения")
     photo_path = CharField(max_length=500, null=True, verbose_name="Путь к фото")
-    photo_base64 = TextField(null=True, verbose_name="Фото в base64")
+    photo_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', verbose_name="Фото")
+    photo_thumb_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Фото для списка")
+    photo_original_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Исходное фото")
     position = CharField(max_length=100, verbose_name="Должность")
     guard_rank = CharField(max_length=10, null=True, verbose_name="Разряд охранника")
     termination_date = DateField(null=True, verbose_name="Дата увольнения")
@@ -113,11 +176,20 @@ class OfficeEmployee(BaseModel):
     @classmethod
     def exists_by_name(cls, full_name: str) -> bool:
         return cls.select().where(cls.full_name == full_name).exists()
+    @classmethod
+    def existing_names(cls, full_names) -> set:
+        """ФИО из full_names, которые уже есть в БД (одним запросом)"""
+        full_names = list(set(full_names))
+        if not full_names:
+            return set()
+        return {name for (name,) in cls.select(cls.full_name).where(cls.full_name.in_(full_names)).tuples()}
     """Модель сотрудника офиса"""
     full_name = CharField(max_length=200, verbose_name="ФИО")
     birth_date = DateField(verbose_name="Дата рождения")
     photo_path = CharField(max_length=500, null=True, verbose_name="Путь к фото")
-    photo_base64 = TextField(null=True, verbose_name="Фото в base64")
+    photo_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', verbose_name="Фото")
+    photo_thumb_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Фото для списка")
+    photo_original_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', backref='+', verbose_name="Исходное фото")
     position = CharField(max_length=100, verbose_name="Должность")
     termination_date = DateField(null=True, verbose_name="Дата увольнения")
     termination_reason = TextField(null=True, verbose_name="Причина увольнения")
@@ -170,6 +242,10 @@ class UserLog(BaseModel):
     
     class Meta:
         table_name = 'user_logs'
+        indexes = (
+            (('created_at',), False),
+            (('user', 'created_at'), False),
+        )
 
 class Object(BaseModel):
     """Модель объекта"""
@@ -235,6 +311,36 @@ class EmployeeCompany(BaseModel):
     class Meta:
         table_name = 'employee_companies'
 
+class EmployeeDirectory(BaseModel):
+    """
+    Сотрудники всех трех типов (представление employee_directory, только чтение)
+    
+    Представление создается миграцией, а не create_tables(). Полная запись
+    сотрудника загружается через model_for_type(employee_type).
+    """
+    employee_type = CharField(max_length=10, verbose_name="Тип")  # guard, chief, office
+    employee_id = IntegerField(verbose_name="ID сотрудника")
+    full_name = CharField(max_length=200, verbose_name="ФИО")
+    termination_date = DateField(null=True, verbose_name="Дата увольнения")
+    termination_reason = TextField(null=True, verbose_name="Причина увольнения")
+    created_by_user_id = IntegerField(null=True, verbose_name="Создан пользователем")
+    company_ids = ArrayField(IntegerField, verbose_name="Компании")
+    
+    class Meta:
+        table_name = 'employee_directory'
+        primary_key = CompositeKey('employee_type', 'employee_id')
+    
+    MODELS = {
+        'guard': GuardEmployee,
+        'chief': ChiefEmployee,
+        'office': OfficeEmployee,
+    }
+    
+    @classmethod
+    def model_for_type(cls, employee_type):
+        """Возвращает модель сотрудника по типу"""
+        return cls.MODELS[employee_type]
+
 class ChiefObjectAssignment(BaseModel):
     """Модель назначения начальника на объект"""
     chief = ForeignKeyField(ChiefEmployee, backref='object_assignments', on_delete='CASCADE')
@@ -253,7 +359,7 @@ class PersonalCard(BaseModel):
     chief_employee = ForeignKeyField(ChiefEmployee, backref='personal_cards', on_delete='CASCADE', null=True)
     company = ForeignKeyField(Company, backref='personal_cards', on_delete='CASCADE')
     issue_date = DateField(verbose_name="Дата выдачи")
-    file_base64 = TextField(null=True, verbose_name="Файл в base64")
+    file_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', verbose_name="Файл")
     filename = CharField(max_length=255, null=True, verbose_name="Название файла")
     is_discarded = BooleanField(default=False, verbose_name="Списана")
     discarded_date = DateField(null=True, verbose_name="Дата списания")
@@ -261,6 +367,10 @@ class PersonalCard(BaseModel):
     
     class Meta:
         table_name = 'personal_cards'
+        indexes = (
+            (('guard_employee', 'is_discarded'), False),
+            (('chief_employee', 'is_discarded'), False),
+        )
 
 class PersonalCardPhoto(BaseModel):
     """Модель фотографий личных карточек"""
@@ -278,7 +388,7 @@ class EmployeeDocument(BaseModel):
     chief_employee = ForeignKeyField(ChiefEmployee, backref='documents', on_delete='CASCADE', null=True)
     office_employee = ForeignKeyField(OfficeEmployee, backref='documents', on_delete='CASCADE', null=True)
     document_type = CharField(max_length=50, verbose_name="Тип документа")
-    file_base64 = TextField(null=True, verbose_name="Файл в base64")
+    file_blob = ForeignKeyField(Blob, null=True, on_delete='SET NULL', verbose_name="Файл")
     filename = CharField(max_length=255, null=True, verbose_name="Название файла")
     created_at = DateTimeField(default=datetime.now)
     
@@ -353,135 +463,25 @@ class AccountingOperation(BaseModel):
             (('date',), False),
         )
 
-# Создание таблиц
+# Создание таблиц и применение миграций
 def init_database():
     """Инициализация базы данных"""
+    from database.migrations import apply_migrations
     try:
-        db.connect()
-        db.create_tables([Company, GuardEmployee, ChiefEmployee, OfficeEmployee, EmployeeCompany, Settings, Role, User, UserLog, Object, ObjectAddress, ObjectRate, Assignment, ChiefObjectAssignment, PersonalCard, PersonalCardPhoto, EmployeeDocument, EmployeeDocumentPhoto, CashWithdrawal, DutyShift, AccountingOperation], safe=True)
-        
-        # Создаем компании по умолчанию
-        for company_name in ["Легион", "Норд", "Росбезопасность"]:
-            Company.get_or_create(name=company_name)
-            
-        # Создаем настройку темы по умолчанию
-        try:
-            Settings.get(Settings.key == "theme")
-        except:
-            Settings.create(key="theme", value="light")
-            
-        # Создаем роли по умолчанию
-        try:
-            Role.get_or_create(name="Admin", defaults={'description': 'Администратор системы'})
-            Role.get_or_create(name="user", defaults={'description': 'Обычный пользователь'})
-        except Exception as role_error:
-            print(f"Ошибка создания ролей: {role_error}")
-            
-        # Миграция: добавляем поле комментария к сменам
-        try:
-            db.execute_sql("ALTER TABLE assignments ADD COLUMN comment TEXT")
-        except:
-            pass
-            
-        # Миграция: добавляем поле created_by_user_id к моделям сотрудников
-        try:
-            db.execute_sql("ALTER TABLE guard_employees ADD COLUMN created_by_user_id INTEGER")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE chief_employees ADD COLUMN created_by_user_id INTEGER")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE office_employees ADD COLUMN created_by_user_id INTEGER")
-        except:
-            pass
-            
-        # Миграция: добавляем поля для ВЗН
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN is_absent BOOLEAN DEFAULT FALSE")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN absent_comment TEXT")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN deduction_amount DECIMAL(7,2) DEFAULT 0")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN bonus_amount DECIMAL(7,2) DEFAULT 0")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN bonus_comment TEXT")
-        except:
-            pass
-            
-        # Миграция: добавляем created_by_user_id к назначениям и ВЗН
-        try:
-            db.execute_sql("ALTER TABLE assignments ADD COLUMN created_by_user_id INTEGER")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE cash_withdrawals ADD COLUMN created_by_user_id INTEGER")
-        except:
-            pass
-            
-        # Миграция: добавляем поле staff_status
-        try:
-            db.execute_sql("ALTER TABLE guard_employees ADD COLUMN staff_status VARCHAR(20) DEFAULT 'в штате'")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE chief_employees ADD COLUMN staff_status VARCHAR(20) DEFAULT 'в штате'")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE office_employees ADD COLUMN staff_status VARCHAR(20) DEFAULT 'в штате'")
-        except:
-            pass
-            
-        # Миграция: добавляем поле criminal_liability
-        try:
-            db.execute_sql("ALTER TABLE guard_employees ADD COLUMN criminal_liability VARCHAR(20) DEFAULT 'нет'")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE chief_employees ADD COLUMN criminal_liability VARCHAR(20) DEFAULT 'нет'")
-        except:
-            pass
-            
-        try:
-            db.execute_sql("ALTER TABLE office_employees ADD COLUMN criminal_liability VARCHAR(20) DEFAULT 'нет'")
-        except:
-            pass
-            
-        # Создаем индексы для производительности
-        try:
-            db.execute_sql("CREATE INDEX IF NOT EXISTS idx_assignments_date ON assignments(date);")
-            db.execute_sql("CREATE INDEX IF NOT EXISTS idx_assignments_employee_date ON assignments(employee_id, date);")
-            db.execute_sql("CREATE INDEX IF NOT EXISTS idx_cash_withdrawals_date ON cash_withdrawals(date);")
-            db.execute_sql("CREATE INDEX IF NOT EXISTS idx_cash_withdrawals_employee_date ON cash_withdrawals(employee_id, date);")
-        except:
-            pass
+        if db.is_closed():
+            db.connect()
+        applied = apply_migrations(db)
+        if applied:
+            print(f"Применены миграции БД: {', '.join(str(number) for number in applied)}")
             
     except Exception as e:
         print(f"Ошибка подключения к PostgreSQL: {e}")
         print("Убедитесь, что PostgreSQL запущен и настройки подключения корректны")
         raise
-
-# Инициализируем базу данных при импорте
-if __name__ != '__main__':
-    init_database()
\ No newline at end of file
+    finally:
+        # Возвращаем соединение в пул
+        if not db.is_closed():
+            db.close()
+    
+    db.warmup()
+    db.start_idle_reaper()
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Общий кэш данных месяца для календарей
+
+Календари загружали данные месяца (число смен по дням, конфликты) при каждой
+отрисовке: переход на соседний месяц и обратно повторял запрос, а новая
+страница календаря (после перехода по меню) начинала с пустого кэша.
+
+MonthCache хранит данные месяцев по ключу (календарь, год, месяц) для всех
+календарей сразу и вытесняет давно открытые месяцы. Записи смен сбрасывают
+только месяцы, в которые попадают измененные даты, и только у календарей,
+показывающих эту таблицу (KINDS_BY_TABLE). Календарь бухгалтерии проверяет
+смены подряд через полночь, поэтому у него сбрасываются и месяцы соседних дней.
+
+Загрузка, начатая до сброса, могла прочитать старые данные: put отбрасывает
+результат, если после generation() кэш сбрасывался.
+
+Смены, измененные с других рабочих мест, этот кэш не сбрасывают: месяц
+хранится не дольше TTL секунд и затем загружается заново.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+# Месяцев в кэше (по всем календарям)
+CACHE_SIZE = 36
+
+# Сколько секунд месяц берется из кэша до повторной загрузки
+TTL = 60
+
+# Таблица смен -> календари, чьи данные месяца от нее зависят
+KINDS_BY_TABLE = {
+    'Assignment': ('chief', 'accounting'),
+    'CashWithdrawal': ('chief', 'accounting'),
+    'DutyShift': ('duty', 'accounting'),
+}
+
+# Календари, у которых изменение дня меняет и соседние дни
+NEIGHBOUR_KINDS = ('accounting',)
+
+
+def adjacent_months(year, month):
+    """(год, месяц) предыдущего и следующего месяцев"""
+    previous = (year - 1, 12) if month == 1 else (year, month - 1)
+    following = (year + 1, 1) if month == 12 else (year, month + 1)
+    return previous, following
+
+
+class MonthCache:
+    """Данные месяцев календарей по (календарь, год, месяц) с вытеснением давно открытых"""
+
+    def __init__(self, size=CACHE_SIZE, ttl=TTL):
+        self._lock = threading.Lock()
+        self._size = size
+        self._ttl = ttl
+        self._items = OrderedDict()
+        self._generation = 0
+
+    def get(self, kind, year, month):
+        """Данные месяца или None, если месяц не загружен или загружен дольше TTL назад"""
+        key = (kind, year, month)
+        with self._lock:
+            if not self._fresh(key):
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._fresh(key)
+
+    def _fresh(self, key):
+        """Есть ли месяц в кэше и не устарел ли он (устаревший удаляется); вызывать под _lock"""
+        item = self._items.get(key)
+        if item is None:
+            return False
+        if time.monotonic() - item[1] > self._ttl:
+            del self._items[key]
+            return False
+        return True
+
+    def generation(self):
+        """Номер сброса кэша; запоминается перед загрузкой и передается в put"""
+        with self._lock:
+            return self._generation
+
+    def put(self, kind, year, month, data, generation=None):
+        """
+        Запоминает данные месяца
+
+        Returns:
+            bool: False, если кэш сбрасывался после generation (данные могли устареть)
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._items[(kind, year, month)] = (data, time.monotonic())
+            self._items.move_to_end((kind, year, month))
+            while len(self._items) > self._size:
+                self._items.popitem(last=False)
+            return True
+
+    def invalidate_dates(self, table, dates):
+        """
+        Сбрасывает месяцы с датами dates у календарей, показывающих таблицу table
+
+        Args:
+            table: имя модели смен ('Assignment', 'CashWithdrawal', 'DutyShift')
+            dates: измененные даты (None пропускаются)
+        """
+        keys = set()
+        for day in dates:
+            if day is None:
+                continue
+            for kind in KINDS_BY_TABLE[table]:
+                days = (day - timedelta(days=1), day, day + timedelta(days=1)) if kind in NEIGHBOUR_KINDS else (day,)
+                keys.update((kind, d.year, d.month) for d in days)
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        """Сбрасывает все месяцы (например, после удаления сотрудника или объекта вместе со сменами)"""
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+
+month_cache = MonthCache()
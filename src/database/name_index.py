@@ -0,0 +1,336 @@
+"""
+Поиск сотрудников по ФИО
+
+Поиск full_name.contains(...) не находил сотрудника, если слова ФИО
+введены в другом порядке, с опечаткой или через "е" вместо "ё".
+NameIndex держит в памяти нормализованные ФИО сотрудников всех трех
+типов (guard, chief, office):
+
+- нормализация: нижний регистр, ё -> е, лишние пробелы и знаки убираются;
+- каждое слово запроса должно быть началом какого-то слова ФИО,
+  порядок слов любой ("иван петр" найдет "Петров Иван Сергеевич");
+- если таких совпадений мало, добираются похожие по триграммам (опечатки);
+- результаты ранжируются по триграммному сходству слов запроса и ФИО.
+
+Индекс загружается одним запросом к employee_directory, обновляется
+при сохранении, увольнении, восстановлении и удалении сотрудника
+и перечитывается раз в RELOAD_INTERVAL секунд: так в поиске появляются
+сотрудники, добавленные или переименованные с другого рабочего места.
+
+Индекс только ранжирует результаты поиска (search). Какие строки попадут
+в списки сотрудников, решает SQL (name_condition): то же правило
+начал слов по нормализованному ФИО, независимо от состояния индекса.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+# Через сколько секунд индекс перечитывается из БД перед поиском
+RELOAD_INTERVAL = 300
+# Минимальное сходство для совпадений с опечаткой (как pg_trgm.similarity_threshold)
+SIMILARITY_THRESHOLD = 0.3
+# Сколько слов-кандидатов проверяется на сходство для каждого слова запроса с опечаткой
+FUZZY_CANDIDATES = 50
+
+NameMatch = namedtuple('NameMatch', ['employee_type', 'employee_id', 'full_name', 'terminated', 'score'])
+
+_SEPARATORS = re.compile(r"[^0-9a-zа-я]+")
+
+
+def normalize(text):
+    """Нормализует ФИО или запрос: нижний регистр, ё -> е, слова через один пробел"""
+    text = (text or "").lower().replace("ё", "е")
+    return " ".join(_SEPARATORS.split(text)).strip()
+
+
+def word_trigrams(word):
+    """Триграммы слова (с отступами, как в pg_trgm)"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(grams, other):
+    """Триграммное сходство двух слов по их триграммам (0..1, как similarity() в pg_trgm)"""
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared) if grams or other else 0.0
+
+
+def matches_name(full_name, text):
+    """True, если каждое слово запроса - начало какого-то слова ФИО"""
+    name_tokens = normalize(full_name).split()
+    return all(any(token.startswith(query) for token in name_tokens) for query in normalize(text).split())
+
+
+def load_ranked(model, matches):
+    """Загружает записи найденных сотрудников одним запросом, сохраняя порядок результатов"""
+    ids = [match.employee_id for match in matches]
+    if not ids:
+        return []
+    rows = {row.id: row for row in model.select().where(model.id.in_(ids))}
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+def normalized_name_sql(field):
+    """SQL-выражение нормализованного ФИО (для фильтра в БД; индекс по нему - миграция 10)"""
+    from peewee import fn
+    return fn.REPLACE(fn.LOWER(field), 'ё', 'е')
+
+
+def name_condition(field, text):
+    """
+    Условие "ФИО подходит под запрос" для запросов списков
+
+    Каждое слово запроса должно быть началом какого-то слова нормализованного
+    ФИО (как в поиске по индексу, без опечаток). Слова запроса после
+    normalize содержат только буквы и цифры, поэтому подставляются в регулярное
+    выражение как есть; триграммный индекс миграции 10 подходит и для него.
+    """
+    import operator
+    from functools import reduce
+    query_tokens = normalize(text).split()
+    if not query_tokens:
+        return field.is_null(False)
+    normalized = normalized_name_sql(field)
+    return reduce(operator.and_, [normalized.regexp(f"(^|[^0-9a-zа-я]){token}") for token in query_tokens])
+
+
+class NameIndex:
+    """
+    ФИО сотрудников всех типов с поиском по началам слов и триграммам
+
+    Слова ФИО хранятся отдельно: отсортированный список различных слов
+    (поиск по началу - bisect), для каждого слова - множество сотрудников,
+    для каждой триграммы - множество слов. Сходство считается для различных
+    слов, а не для каждого сотрудника, поэтому поиск не зависит от числа
+    людей с одинаковыми фамилиями и именами.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = None
+        self._loaded_at = None
+        self._postings = {}
+        self._tokens = []
+        self._token_trigrams = {}
+
+    def is_warm(self):
+        return self._entries is not None
+
+    def is_stale(self):
+        """Индекс не загружен или загружен раньше, чем RELOAD_INTERVAL секунд назад"""
+        return self._entries is None or time.monotonic() - self._loaded_at > RELOAD_INTERVAL
+
+    def warm(self):
+        """Загружает индекс одним запросом к представлению employee_directory"""
+        from database.models import EmployeeDirectory
+        query = EmployeeDirectory.select(
+            EmployeeDirectory.employee_type,
+            EmployeeDirectory.employee_id,
+            EmployeeDirectory.full_name,
+            EmployeeDirectory.termination_date.is_null(False).alias('is_terminated'),
+        ).tuples()
+        with self._lock:
+            self._reset({})
+            for employee_type, employee_id, full_name, is_terminated in query:
+                self._add((employee_type, employee_id), full_name, is_terminated)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Сбрасывает индекс"""
+        with self._lock:
+            self._reset(None)
+
+    def _reset(self, entries):
+        self._entries = entries
+        self._postings = {}
+        self._tokens = []
+        self._token_trigrams = {}
+
+    def _add(self, key, full_name, terminated):
+        tokens = tuple(normalize(full_name).split())
+        self._entries[key] = (full_name, tokens, bool(terminated))
+        for token in set(tokens):
+            keys = self._postings.get(token)
+            if keys is None:
+                keys = self._postings[token] = set()
+                bisect.insort(self._tokens, token)
+                for gram in word_trigrams(token):
+                    self._token_trigrams.setdefault(gram, set()).add(token)
+            keys.add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for token in set(entry[1]):
+            keys = self._postings.get(token)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if keys:
+                continue
+            # Слово больше не встречается ни в одном ФИО
+            del self._postings[token]
+            position = bisect.bisect_left(self._tokens, token)
+            if position < len(self._tokens) and self._tokens[position] == token:
+                del self._tokens[position]
+            for gram in word_trigrams(token):
+                tokens = self._token_trigrams.get(gram)
+                if tokens is not None:
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._token_trigrams[gram]
+
+    def set_employee(self, employee_type, employee_id, full_name, terminated=False):
+        """Добавляет или обновляет сотрудника после сохранения"""
+        with self._lock:
+            if self._entries is None:
+                return
+            key = (employee_type, employee_id)
+            self._remove(key)
+            self._add(key, full_name, terminated)
+
+    def set_terminated(self, employee_type, employee_id, terminated):
+        """Отмечает увольнение или восстановление сотрудника"""
+        with self._lock:
+            if self._entries is None:
+                return
+            entry = self._entries.get((employee_type, employee_id))
+            if entry is not None:
+                self._entries[(employee_type, employee_id)] = (entry[0], entry[1], bool(terminated))
+
+    def remove_employee(self, employee_type, employee_id):
+        """Убирает удаленного сотрудника из индекса"""
+        with self._lock:
+            if self._entries is not None:
+                self._remove((employee_type, employee_id))
+
+    def _prefix_tokens(self, prefix):
+        """Слова, начинающиеся с prefix"""
+        position = bisect.bisect_left(self._tokens, prefix)
+        end = bisect.bisect_left(self._tokens, prefix + "\uffff", position)
+        return self._tokens[position:end]
+
+    def _similar_tokens(self, grams):
+        """Слова, похожие на слово запроса (сходство не меньше SIMILARITY_THRESHOLD)"""
+        counts = Counter()
+        for gram in grams:
+            counts.update(self._token_trigrams.get(gram, ()))
+        result = {}
+        for token, _ in counts.most_common(FUZZY_CANDIDATES):
+            score = similarity(grams, word_trigrams(token))
+            if score >= SIMILARITY_THRESHOLD:
+                result[token] = score
+        return result
+
+    def _keys_for(self, tokens):
+        keys = set()
+        for token in tokens:
+            keys |= self._postings[token]
+        return keys
+
+    def _matching_keys(self, token_scores):
+        """Сотрудники, у которых для каждого слова запроса есть подходящее слово ФИО"""
+        sets = sorted((self._keys_for(scores) for scores in token_scores), key=len)
+        keys = sets[0]
+        for other in sets[1:]:
+            keys = keys & other
+        return keys
+
+    def _best_for_token(self, scores, limit, allowed):
+        """
+        top-k для запроса из одного слова
+
+        Слова перебираются от самого похожего: сотрудник впервые встречается
+        в слове с наибольшим для него сходством, поэтому всех совпадений
+        (при коротком запросе - почти всех людей) собирать не нужно.
+
+        Returns:
+            tuple: (результаты, все просмотренные сотрудники)
+        """
+        by_score = {}
+        for token, value in scores.items():
+            by_score.setdefault(value, []).append(token)
+        results = []
+        seen = set()
+        for value in sorted(by_score, reverse=True):
+            keys = self._keys_for(by_score[value]) - seen
+            seen |= keys
+            keys = [key for key in keys if allowed(key)]
+            for key in heapq.nsmallest(limit - len(results), keys, key=lambda key: self._entries[key][0]):
+                results.append(NameMatch(key[0], key[1], self._entries[key][0], self._entries[key][2], value))
+            if len(results) >= limit:
+                break
+        # Если top-k не набран, просмотрены все совпадения - они исключаются из поиска опечаток
+        return results, seen
+
+    def search(self, text, limit=10, types=None, terminated=None):
+        """
+        Ищет сотрудников по ФИО
+
+        Args:
+            text: запрос (слова ФИО или их начала в любом порядке)
+            limit: число результатов (None - все совпадения по началам слов)
+            types: типы сотрудников ('guard', 'chief', 'office'), по умолчанию все
+            terminated: False - только работающие, True - только уволенные, None - все
+
+        Returns:
+            list: NameMatch, сначала совпадения по началам слов, затем похожие
+        """
+        query_tokens = normalize(text).split()
+        if not query_tokens:
+            return []
+        query_grams = [word_trigrams(token) for token in query_tokens]
+        with self._lock:
+            if self.is_stale():
+                self.warm()
+
+            # Сходство считается один раз для каждого подходящего слова, а не для каждого сотрудника
+            token_scores = [
+                {token: similarity(grams, word_trigrams(token)) for token in self._prefix_tokens(query)}
+                for query, grams in zip(query_tokens, query_grams)
+            ]
+
+            def allowed(key):
+                if types is not None and key[0] not in types:
+                    return False
+                return terminated is None or self._entries[key][2] == terminated
+
+            # Сходство зависит только от слов ФИО - у однофамильцев-тезок оно одно
+            score_cache = {}
+
+            def score(key):
+                tokens = self._entries[key][1]
+                value = score_cache.get(tokens)
+                if value is None:
+                    value = sum(max(scores.get(token, 0.0) for token in tokens) for scores in token_scores) / len(token_scores)
+                    score_cache[tokens] = value
+                return value
+
+            def ranked(keys, count):
+                keys = [key for key in keys if allowed(key)]
+                order = {key: (-score(key), self._entries[key][0]) for key in keys}
+                best = sorted(keys, key=order.get) if count is None else heapq.nsmallest(count, keys, key=order.get)
+                return [NameMatch(key[0], key[1], self._entries[key][0], self._entries[key][2], -order[key][0]) for key in best]
+
+            if len(token_scores) == 1 and limit is not None:
+                results, exact = self._best_for_token(token_scores[0], limit, allowed)
+            else:
+                exact = self._matching_keys(token_scores)
+                results = ranked(exact, limit)
+            if limit is None or len(results) >= limit:
+                return results
+
+            # Опечатки: для каждого слова запроса добавляем похожие слова
+            for scores, grams in zip(token_scores, query_grams):
+                for token, value in self._similar_tokens(grams).items():
+                    scores[token] = max(scores.get(token, 0.0), value)
+            score_cache.clear()
+            results.extend(ranked(self._matching_keys(token_scores) - exact, limit - len(results)))
+            return results
+
+
+name_index = NameIndex()
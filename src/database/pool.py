@@ -0,0 +1,214 @@
+import heapq
+import threading
+import time
+from playhouse.pool import PooledPostgresqlDatabase, MaxConnectionsExceeded
+
+
+class PoolStats:
+    """Статистика работы пула соединений"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.health_check_failures = 0
+        self.idle_closed = 0
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 3),
+                'max_wait_time': round(self.max_wait_time, 3),
+                'health_check_failures': self.health_check_failures,
+                'idle_closed': self.idle_closed,
+            }
+
+
+class DatabasePool(PooledPostgresqlDatabase):
+    """
+    Потокобезопасный пул соединений PostgreSQL
+
+    Args:
+        min_connections: Сколько соединений держать открытыми заранее
+        max_connections: Максимальное количество соединений
+        idle_timeout: Через сколько секунд простоя соединение закрывается (при выдаче
+            из пула и фоновым потоком start_idle_reaper; min_connections остаются открытыми)
+        health_check_interval: После скольких секунд простоя соединение проверяется SELECT 1
+        timeout: Сколько секунд ждать свободное соединение
+    """
+
+    def __init__(self, database, min_connections=1, max_connections=10, idle_timeout=300,
+                 health_check_interval=30, **kwargs):
+        self._min_connections = min_connections
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._returned_at = {}
+        self._known = set()
+        self._wait_state = threading.local()
+        self._reaper = None
+        self.stats = PoolStats()
+        # Наблюдатель запросов (см. database/instrumentation.py)
+        self.query_observer = None
+        super().__init__(database, max_connections=max_connections, **kwargs)
+
+    def connect(self, reuse_if_open=False):
+        """Выдает соединение из пула и считает время ожидания"""
+        self._wait_state.waited = False
+        start = time.perf_counter()
+        result = super().connect(reuse_if_open)
+        if self._wait_state.waited:
+            elapsed = time.perf_counter() - start
+            with self.stats.lock:
+                self.stats.waits += 1
+                self.stats.wait_time += elapsed
+                self.stats.max_wait_time = max(self.stats.max_wait_time, elapsed)
+        return result
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        if self.query_observer is None:
+            return super().execute_sql(sql, params, *args, **kwargs)
+        start = time.perf_counter()
+        cursor = super().execute_sql(sql, params, *args, **kwargs)
+        duration = time.perf_counter() - start
+        try:
+            self.query_observer.record(sql, duration, max(cursor.rowcount, 0))
+        except Exception as e:
+            print(f"Ошибка статистики запросов: {e}")
+        return cursor
+
+    def _connect(self):
+        try:
+            conn = super()._connect()
+        except MaxConnectionsExceeded:
+            # Пул исчерпан - connect() подождет и повторит попытку
+            self._wait_state.waited = True
+            raise
+        with self.stats.lock:
+            self.stats.checkouts += 1
+            if id(conn) not in self._known:
+                self._known.add(id(conn))
+                self.stats.created += 1
+        self._returned_at.pop(id(conn), None)
+        return conn
+
+    def _close(self, conn, close_conn=False):
+        if not close_conn:
+            self._returned_at[id(conn)] = time.time()
+        else:
+            self._returned_at.pop(id(conn), None)
+            self._known.discard(id(conn))
+        super()._close(conn, close_conn)
+
+    def _is_closed(self, conn):
+        """Проверяет соединение перед повторной выдачей из пула"""
+        if super()._is_closed(conn):
+            self._returned_at.pop(id(conn), None)
+            self._known.discard(id(conn))
+            return True
+
+        idle = time.time() - self._returned_at.get(id(conn), time.time())
+
+        # Лишние соединения, простаивающие дольше idle_timeout, закрываем
+        if self._idle_timeout and idle > self._idle_timeout and len(self._connections) >= self._min_connections:
+            self._discard(conn)
+            with self.stats.lock:
+                self.stats.idle_closed += 1
+            return True
+
+        # Долго простаивавшее соединение могло быть разорвано сервером
+        if self._health_check_interval is not None and idle > self._health_check_interval:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+                cursor.close()
+                conn.rollback()
+            except Exception as e:
+                print(f"Соединение из пула не прошло проверку: {e}")
+                self._discard(conn)
+                with self.stats.lock:
+                    self.stats.health_check_failures += 1
+                return True
+        return False
+
+    def _discard(self, conn):
+        self._returned_at.pop(id(conn), None)
+        self._known.discard(id(conn))
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_idle_connections(self):
+        """
+        Закрывает соединения, простаивающие в пуле дольше idle_timeout
+
+        Недавно возвращенные соединения (min_connections штук) остаются открытыми.
+
+        Returns:
+            int: Число закрытых соединений
+        """
+        if not self._idle_timeout:
+            return 0
+        now = time.time()
+        closed = []
+        with self._lock:
+            # Элементы кучи пула - кортежи, последним в них идет соединение
+            entries = sorted(self._connections, key=lambda entry: self._returned_at.get(id(entry[-1]), now), reverse=True)
+            keep = []
+            for entry in entries:
+                idle = now - self._returned_at.get(id(entry[-1]), now)
+                if idle > self._idle_timeout and len(keep) >= self._min_connections:
+                    closed.append(entry[-1])
+                else:
+                    keep.append(entry)
+            heapq.heapify(keep)
+            self._connections = keep
+        for conn in closed:
+            self._discard(conn)
+        if closed:
+            with self.stats.lock:
+                self.stats.idle_closed += len(closed)
+        return len(closed)
+
+    def start_idle_reaper(self):
+        """Запускает фоновый поток, который закрывает простаивающие соединения (см. close_idle_connections)"""
+        if not self._idle_timeout or self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(self._idle_timeout / 2, 1))
+                try:
+                    self.close_idle_connections()
+                except Exception as e:
+                    print(f"Ошибка закрытия простаивающих соединений: {e}")
+
+        self._reaper = threading.Thread(target=reap, name="db-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def warmup(self):
+        """Заранее открывает min_connections соединений"""
+        with self._lock:
+            opened = []
+            try:
+                while len(self._connections) + len(opened) < self._min_connections:
+                    opened.append(self._connect())
+            finally:
+                for conn in opened:
+                    self._close(conn)
+
+    def pool_status(self):
+        """Возвращает текущее состояние пула и накопленную статистику"""
+        status = self.stats.as_dict()
+        status['in_use'] = len(self._in_use)
+        status['idle'] = len(self._connections)
+        status['min_connections'] = self._min_connections
+        status['max_connections'] = self._max_connections
+        return status
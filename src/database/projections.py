@@ -0,0 +1,27 @@
+"""
+Лёгкие строки для списков
+
+Списки показывают две-три колонки, а model.select() читает все поля записи
+и создает экземпляр модели на каждую строку. Функции модуля выбирают только
+нужные колонки и возвращают именованные кортежи. Полная запись загружается
+по id только при открытии карточки (load_full).
+"""
+
+
+def project(query, *fields):
+    """
+    Выполняет запрос, выбирая только указанные колонки
+
+    Условия, соединения и сортировка запроса сохраняются. Имена полей
+    кортежа совпадают с именами колонок (или с alias).
+
+    Returns:
+        list: именованные кортежи
+    """
+    return list(query.select(*fields).namedtuples())
+
+
+def load_full(model, row_id):
+    """Загружает полную запись по id строки списка (None, если записи уже нет)"""
+    return model.get_or_none(model.id == row_id)
+
@@ -0,0 +1,143 @@
+"""
+Проверка планов частых запросов
+
+Запускать на заполненной БД (например, после utils/faker_data.py):
+    python -m database.migrations explain [min_rows]
+
+Для каждого запроса выполняется EXPLAIN. Проверка не проходит, если план
+содержит Seq Scan по таблице, в которой не меньше min_rows строк
+(по умолчанию 1000). Маленькие таблицы PostgreSQL законно читает целиком.
+"""
+import json
+
+
+def _hot_queries():
+    """Возвращает список (описание, запрос peewee) для проверки"""
+    from database.name_index import name_condition
+    from database.discarded_cards import discarded_cards_query, discarded_cards_page
+    from database.models import (
+        GuardEmployee, ChiefEmployee, OfficeEmployee, Object, EmployeeCompany,
+        UserLog, PersonalCard, EmployeeDocument, EmployeeDirectory
+    )
+
+    queries = []
+    for model in (GuardEmployee, ChiefEmployee, OfficeEmployee):
+        table = model._meta.table_name
+        queries.append((
+            f"Поиск по ФИО ({table})",
+            model.select(model.id, model.full_name).where(
+                model.termination_date.is_null() & model.full_name.contains("иван")
+            )
+        ))
+        queries.append((
+            f"Фильтр по нормализованному ФИО ({table})",
+            model.select(model.id, model.full_name).where(
+                model.termination_date.is_null() & name_condition(model.full_name, "иван")
+            ).order_by(model.full_name).limit(9)
+        ))
+        queries.append((
+            f"Список работающих по алфавиту ({table})",
+            model.select(model.id, model.full_name).where(
+                model.termination_date.is_null()
+            ).order_by(model.full_name).limit(9)
+        ))
+        queries.append((
+            f"Уволенные ({table})",
+            model.select(model.id, model.full_name).where(
+                model.termination_date.is_null(False)
+            ).order_by(model.termination_date.desc()).limit(20)
+        ))
+
+    queries += [
+        ("Поиск сотрудника всех типов",
+         EmployeeDirectory.select(EmployeeDirectory.employee_id, EmployeeDirectory.full_name).where(
+             EmployeeDirectory.full_name.contains("иван")
+         ).order_by(EmployeeDirectory.full_name).limit(5)),
+        ("Фильтр уволенных по нормализованному ФИО",
+         EmployeeDirectory.select(EmployeeDirectory.employee_id, EmployeeDirectory.full_name).where(
+             EmployeeDirectory.termination_date.is_null(False)
+             & name_condition(EmployeeDirectory.full_name, "иван")
+         ).order_by(EmployeeDirectory.full_name).limit(20)),
+        ("Уволенные сотрудники всех типов",
+         EmployeeDirectory.select(EmployeeDirectory.employee_id, EmployeeDirectory.full_name).where(
+             EmployeeDirectory.termination_date.is_null(False)
+         ).order_by(EmployeeDirectory.full_name).limit(20)),
+        ("Поиск объекта по названию",
+         Object.select(Object.id, Object.name).where(Object.name.contains("объект"))),
+        ("Сотрудники компании",
+         EmployeeCompany.select(EmployeeCompany.guard_employee).where(EmployeeCompany.company == 1)),
+        ("Компании охранника",
+         EmployeeCompany.select(EmployeeCompany.company).where(EmployeeCompany.guard_employee == 1)),
+        ("Компании начальника",
+         EmployeeCompany.select(EmployeeCompany.company).where(EmployeeCompany.chief_employee == 1)),
+        ("Компании сотрудника офиса",
+         EmployeeCompany.select(EmployeeCompany.company).where(EmployeeCompany.office_employee == 1)),
+        ("Последние записи журнала",
+         UserLog.select(UserLog.id).order_by(UserLog.created_at.desc()).limit(20)),
+        ("Журнал пользователя",
+         UserLog.select(UserLog.id).where(UserLog.user == 1).order_by(UserLog.created_at.desc()).limit(20)),
+        ("Личные карточки охранника",
+         PersonalCard.select(PersonalCard.id).where(
+             (PersonalCard.guard_employee == 1) & (PersonalCard.is_discarded == False)
+         )),
+        ("Списанные карточки",
+         discarded_cards_page(discarded_cards_query(), None, 20)),
+        ("Документы охранника",
+         EmployeeDocument.select(EmployeeDocument.id).where(EmployeeDocument.guard_employee == 1)),
+        ("Документы начальника",
+         EmployeeDocument.select(EmployeeDocument.id).where(EmployeeDocument.chief_employee == 1)),
+        ("Документы сотрудника офиса",
+         EmployeeDocument.select(EmployeeDocument.id).where(EmployeeDocument.office_employee == 1)),
+    ]
+    return queries
+
+
+def _seq_scans(plan):
+    """Возвращает таблицы, которые план читает последовательно"""
+    tables = []
+    if plan.get("Node Type") == "Seq Scan":
+        tables.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        tables += _seq_scans(child)
+    return tables
+
+
+def _table_sizes(db):
+    cursor = db.execute_sql(
+        "SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r' "
+        "AND relnamespace = 'public'::regnamespace"
+    )
+    return {name: rows for name, rows in cursor.fetchall()}
+
+
+def check_query_plans(db, min_rows=1000, verbose=True):
+    """
+    Выполняет EXPLAIN для частых запросов
+
+    Returns:
+        bool: True, если ни один запрос не читает большую таблицу целиком
+    """
+    # Актуальная статистика нужна планировщику и для оценки размеров таблиц
+    db.execute_sql("ANALYZE")
+    sizes = _table_sizes(db)
+
+    ok = True
+    for title, query in _hot_queries():
+        sql, params = query.sql()
+        cursor = db.execute_sql(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plan = plan[0]["Plan"]
+
+        big_scans = [table for table in _seq_scans(plan) if sizes.get(table, 0) >= min_rows]
+        if big_scans:
+            ok = False
+            details = ", ".join(f"{table} ({sizes.get(table, 0)} строк)" for table in big_scans)
+            print(f"ОШИБКА  {title}: Seq Scan по {details}")
+        elif verbose:
+            print(f"OK      {title}: {plan.get('Node Type')}")
+
+    if ok:
+        print("Все частые запросы используют индексы")
+    return ok
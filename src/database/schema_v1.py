@@ -0,0 +1,313 @@
+"""
+Начальная схема БД (миграция 1)
+
+Снимок таблиц и индексов в том виде, в каком их создавали модели до
+введения миграций. Миграция 1 не строится из текущих моделей: иначе
+create_tables(safe=True) на существующей БД пропускал бы таблицы, но создавал
+индексы по колонкам, которые добавляют только более поздние миграции.
+Изменения схемы вносятся новыми миграциями, этот список не меняется.
+"""
+
+INITIAL_SCHEMA = (
+    (
+        'CREATE TABLE IF NOT EXISTS "guard_employees" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"full_name" VARCHAR(200) NOT NULL, '
+        '"birth_date" DATE NOT NULL, '
+        '"photo_path" VARCHAR(500), '
+        '"photo_base64" TEXT, '
+        '"certificate_number" VARCHAR(20), '
+        '"termination_date" DATE, '
+        '"termination_reason" TEXT, '
+        '"guard_license_date" DATE, '
+        '"guard_rank" VARCHAR(10), '
+        '"medical_exam_date" DATE, '
+        '"periodic_check_date" DATE, '
+        '"hours_worked" INTEGER NOT NULL, '
+        '"salary" NUMERIC(10, 2) NOT NULL, '
+        '"payment_method" VARCHAR(20) NOT NULL, '
+        '"staff_status" VARCHAR(20) NOT NULL, '
+        '"criminal_liability" VARCHAR(20) NOT NULL, '
+        '"created_by_user_id" INTEGER)'
+    ),
+    (
+        'CREATE TABLE IF NOT EXISTS "accounting_operations" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"date" DATE NOT NULL, '
+        '"operation_type" VARCHAR(50) NOT NULL, '
+        '"amount" NUMERIC(10, 2) NOT NULL, '
+        '"description" TEXT, '
+        '"employee_id" INTEGER, '
+        '"created_by_user_id" INTEGER, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "accountingoperation_employee_id" ON "accounting_operations" ("employee_id")',
+    'CREATE INDEX IF NOT EXISTS "accountingoperation_date" ON "accounting_operations" ("date")',
+    (
+        'CREATE TABLE IF NOT EXISTS "objects" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"name" VARCHAR(200) NOT NULL, '
+        '"description" TEXT, '
+        '"created_at" TIMESTAMP NOT NULL)'
+    ),
+    'CREATE UNIQUE INDEX IF NOT EXISTS "object_name" ON "objects" ("name")',
+    (
+        'CREATE TABLE IF NOT EXISTS "chief_employees" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"full_name" VARCHAR(200) NOT NULL, '
+        '"birth_date" DATE NOT NULL, '
+        '"photo_path" VARCHAR(500), '
+        '"photo_base64" TEXT, '
+        '"position" VARCHAR(100) NOT NULL, '
+        '"guard_rank" VARCHAR(10), '
+        '"termination_date" DATE, '
+        '"termination_reason" TEXT, '
+        '"salary" NUMERIC(10, 2) NOT NULL, '
+        '"payment_method" VARCHAR(20) NOT NULL, '
+        '"staff_status" VARCHAR(20) NOT NULL, '
+        '"criminal_liability" VARCHAR(20) NOT NULL, '
+        '"created_by_user_id" INTEGER)'
+    ),
+    (
+        'CREATE TABLE IF NOT EXISTS "assignments" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"employee_id" INTEGER NOT NULL, '
+        '"object_id" INTEGER NOT NULL, '
+        '"chief_id" INTEGER, '
+        '"date" DATE NOT NULL, '
+        '"hours" INTEGER NOT NULL, '
+        '"hourly_rate" NUMERIC(7, 2) NOT NULL, '
+        '"is_absent" BOOLEAN NOT NULL, '
+        '"absent_comment" TEXT, '
+        '"deduction_amount" NUMERIC(7, 2) NOT NULL, '
+        '"bonus_amount" NUMERIC(7, 2) NOT NULL, '
+        '"bonus_comment" TEXT, '
+        '"comment" TEXT, '
+        '"created_by_user_id" INTEGER, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("object_id") REFERENCES "objects" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("chief_id") REFERENCES "chief_employees" ("id") ON DELETE SET NULL)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "assignment_employee_id" ON "assignments" ("employee_id")',
+    'CREATE INDEX IF NOT EXISTS "assignment_object_id" ON "assignments" ("object_id")',
+    'CREATE INDEX IF NOT EXISTS "assignment_chief_id" ON "assignments" ("chief_id")',
+    'CREATE INDEX IF NOT EXISTS "assignment_date" ON "assignments" ("date")',
+    'CREATE INDEX IF NOT EXISTS "assignment_employee_id_date" ON "assignments" ("employee_id", "date")',
+    (
+        'CREATE TABLE IF NOT EXISTS "cash_withdrawals" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"employee_id" INTEGER NOT NULL, '
+        '"object_id" INTEGER NOT NULL, '
+        '"chief_id" INTEGER, '
+        '"date" DATE NOT NULL, '
+        '"hours" INTEGER NOT NULL, '
+        '"hourly_rate" NUMERIC(7, 2) NOT NULL, '
+        '"is_absent" BOOLEAN NOT NULL, '
+        '"absent_comment" TEXT, '
+        '"deduction_amount" NUMERIC(7, 2) NOT NULL, '
+        '"bonus_amount" NUMERIC(7, 2) NOT NULL, '
+        '"bonus_comment" TEXT, '
+        '"comment" TEXT, '
+        '"created_by_user_id" INTEGER, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("object_id") REFERENCES "objects" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("chief_id") REFERENCES "chief_employees" ("id") ON DELETE SET NULL)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "cashwithdrawal_employee_id" ON "cash_withdrawals" ("employee_id")',
+    'CREATE INDEX IF NOT EXISTS "cashwithdrawal_object_id" ON "cash_withdrawals" ("object_id")',
+    'CREATE INDEX IF NOT EXISTS "cashwithdrawal_chief_id" ON "cash_withdrawals" ("chief_id")',
+    'CREATE INDEX IF NOT EXISTS "cashwithdrawal_date" ON "cash_withdrawals" ("date")',
+    'CREATE INDEX IF NOT EXISTS "cashwithdrawal_employee_id_date" ON "cash_withdrawals" ("employee_id", "date")',
+    (
+        'CREATE TABLE IF NOT EXISTS "chief_object_assignments" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"chief_id" INTEGER NOT NULL, '
+        '"object_id" INTEGER NOT NULL, '
+        '"assigned_date" DATE NOT NULL, '
+        'FOREIGN KEY ("chief_id") REFERENCES "chief_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("object_id") REFERENCES "objects" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "chiefobjectassignment_chief_id" ON "chief_object_assignments" ("chief_id")',
+    'CREATE INDEX IF NOT EXISTS "chiefobjectassignment_object_id" ON "chief_object_assignments" ("object_id")',
+    'CREATE UNIQUE INDEX IF NOT EXISTS "chiefobjectassignment_chief_id_object_id" ON "chief_object_assignments" ("chief_id", "object_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "companies" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"name" VARCHAR(50) NOT NULL)'
+    ),
+    'CREATE UNIQUE INDEX IF NOT EXISTS "company_name" ON "companies" ("name")',
+    (
+        'CREATE TABLE IF NOT EXISTS "duty_shifts" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"employee_id" INTEGER NOT NULL, '
+        '"date" DATE NOT NULL, '
+        '"hours" INTEGER NOT NULL, '
+        '"hourly_rate" NUMERIC(7, 2) NOT NULL, '
+        '"description" TEXT, '
+        '"created_by_user_id" INTEGER, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "dutyshift_employee_id" ON "duty_shifts" ("employee_id")',
+    'CREATE INDEX IF NOT EXISTS "dutyshift_date" ON "duty_shifts" ("date")',
+    'CREATE INDEX IF NOT EXISTS "dutyshift_employee_id_date" ON "duty_shifts" ("employee_id", "date")',
+    (
+        'CREATE TABLE IF NOT EXISTS "office_employees" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"full_name" VARCHAR(200) NOT NULL, '
+        '"birth_date" DATE NOT NULL, '
+        '"photo_path" VARCHAR(500), '
+        '"photo_base64" TEXT, '
+        '"position" VARCHAR(100) NOT NULL, '
+        '"termination_date" DATE, '
+        '"termination_reason" TEXT, '
+        '"salary" NUMERIC(10, 2) NOT NULL, '
+        '"payment_method" VARCHAR(20) NOT NULL, '
+        '"staff_status" VARCHAR(20) NOT NULL, '
+        '"criminal_liability" VARCHAR(20) NOT NULL, '
+        '"created_by_user_id" INTEGER)'
+    ),
+    (
+        'CREATE TABLE IF NOT EXISTS "employee_companies" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"guard_employee_id" INTEGER, '
+        '"chief_employee_id" INTEGER, '
+        '"office_employee_id" INTEGER, '
+        '"company_id" INTEGER NOT NULL, '
+        'FOREIGN KEY ("guard_employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("chief_employee_id") REFERENCES "chief_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("office_employee_id") REFERENCES "office_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("company_id") REFERENCES "companies" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "employeecompany_guard_employee_id" ON "employee_companies" ("guard_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "employeecompany_chief_employee_id" ON "employee_companies" ("chief_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "employeecompany_office_employee_id" ON "employee_companies" ("office_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "employeecompany_company_id" ON "employee_companies" ("company_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "employee_documents" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"guard_employee_id" INTEGER, '
+        '"chief_employee_id" INTEGER, '
+        '"office_employee_id" INTEGER, '
+        '"document_type" VARCHAR(50) NOT NULL, '
+        '"file_base64" TEXT, '
+        '"filename" VARCHAR(255), '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("guard_employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("chief_employee_id") REFERENCES "chief_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("office_employee_id") REFERENCES "office_employees" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "employeedocument_guard_employee_id" ON "employee_documents" ("guard_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "employeedocument_chief_employee_id" ON "employee_documents" ("chief_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "employeedocument_office_employee_id" ON "employee_documents" ("office_employee_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "employee_document_photos" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"document_id" INTEGER NOT NULL, '
+        '"photo_base64" TEXT NOT NULL, '
+        '"filename" VARCHAR(255) NOT NULL, '
+        '"page_number" INTEGER NOT NULL, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("document_id") REFERENCES "employee_documents" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "employeedocumentphoto_document_id" ON "employee_document_photos" ("document_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "object_addresses" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"object_id" INTEGER NOT NULL, '
+        '"address" VARCHAR(500) NOT NULL, '
+        '"is_primary" BOOLEAN NOT NULL, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("object_id") REFERENCES "objects" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "objectaddress_object_id" ON "object_addresses" ("object_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "object_rates" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"object_id" INTEGER NOT NULL, '
+        '"rate" NUMERIC(7, 2) NOT NULL, '
+        '"description" VARCHAR(200), '
+        '"is_default" BOOLEAN NOT NULL, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("object_id") REFERENCES "objects" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "objectrate_object_id" ON "object_rates" ("object_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "personal_cards" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"guard_employee_id" INTEGER, '
+        '"chief_employee_id" INTEGER, '
+        '"company_id" INTEGER NOT NULL, '
+        '"issue_date" DATE NOT NULL, '
+        '"file_base64" TEXT, '
+        '"filename" VARCHAR(255), '
+        '"is_discarded" BOOLEAN NOT NULL, '
+        '"discarded_date" DATE, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("guard_employee_id") REFERENCES "guard_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("chief_employee_id") REFERENCES "chief_employees" ("id") ON DELETE CASCADE, '
+        'FOREIGN KEY ("company_id") REFERENCES "companies" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "personalcard_guard_employee_id" ON "personal_cards" ("guard_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "personalcard_chief_employee_id" ON "personal_cards" ("chief_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "personalcard_company_id" ON "personal_cards" ("company_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "personal_card_photos" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"personal_card_id" INTEGER NOT NULL, '
+        '"photo_base64" TEXT NOT NULL, '
+        '"filename" VARCHAR(255) NOT NULL, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("personal_card_id") REFERENCES "personal_cards" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "personalcardphoto_personal_card_id" ON "personal_card_photos" ("personal_card_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "roles" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"name" VARCHAR(50) NOT NULL, '
+        '"description" TEXT, '
+        '"created_at" TIMESTAMP NOT NULL)'
+    ),
+    'CREATE UNIQUE INDEX IF NOT EXISTS "role_name" ON "roles" ("name")',
+    (
+        'CREATE TABLE IF NOT EXISTS "settings" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"key" VARCHAR(255) NOT NULL, '
+        '"value" VARCHAR(255) NOT NULL)'
+    ),
+    'CREATE UNIQUE INDEX IF NOT EXISTS "settings_key" ON "settings" ("key")',
+    (
+        'CREATE TABLE IF NOT EXISTS "users" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"username" VARCHAR(50) NOT NULL, '
+        '"password_hash" VARCHAR(255) NOT NULL, '
+        '"role" VARCHAR(20) NOT NULL, '
+        '"guard_employee_id" INTEGER, '
+        '"chief_employee_id" INTEGER, '
+        '"office_employee_id" INTEGER, '
+        '"allowed_pages" TEXT NOT NULL, '
+        '"is_active" BOOLEAN NOT NULL, '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("guard_employee_id") REFERENCES "guard_employees" ("id"), '
+        'FOREIGN KEY ("chief_employee_id") REFERENCES "chief_employees" ("id"), '
+        'FOREIGN KEY ("office_employee_id") REFERENCES "office_employees" ("id"))'
+    ),
+    'CREATE UNIQUE INDEX IF NOT EXISTS "user_username" ON "users" ("username")',
+    'CREATE INDEX IF NOT EXISTS "user_guard_employee_id" ON "users" ("guard_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "user_chief_employee_id" ON "users" ("chief_employee_id")',
+    'CREATE INDEX IF NOT EXISTS "user_office_employee_id" ON "users" ("office_employee_id")',
+    (
+        'CREATE TABLE IF NOT EXISTS "user_logs" ('
+        '"id" SERIAL NOT NULL PRIMARY KEY, '
+        '"user_id" INTEGER NOT NULL, '
+        '"action" VARCHAR(100) NOT NULL, '
+        '"description" TEXT, '
+        '"ip_address" VARCHAR(45), '
+        '"created_at" TIMESTAMP NOT NULL, '
+        'FOREIGN KEY ("user_id") REFERENCES "users" ("id") ON DELETE CASCADE)'
+    ),
+    'CREATE INDEX IF NOT EXISTS "userlog_user_id" ON "user_logs" ("user_id")',
+)
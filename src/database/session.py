@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from functools import wraps
+from database.models import db
+
+
+@contextmanager
+def db_session():
+    """
+    Выдает соединение из пула на время блока with
+
+    Вложенные блоки используют уже открытое соединение потока,
+    возвращает его в пул только тот блок, который его открыл.
+    """
+    opened = False
+    if db.is_closed():
+        db.connect()
+        opened = True
+    try:
+        yield db
+    finally:
+        if opened and not db.is_closed():
+            db.close()
+
+
+def with_db(func):
+    """Декоратор: выполняет функцию внутри db_session()"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with db_session():
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,205 @@
+"""
+Реестр настроек приложения
+
+Настройки читались запросом к таблице settings при каждом обращении:
+календарь начальника охраны читал форму ячеек для каждого дня месяца
+(~31 запрос на отрисовку), главная страница и настройки отдельно читали
+тему и показ дней рождения.
+
+SettingsRegistry загружает всю таблицу settings одним запросом при первом
+обращении и дальше отвечает из памяти. Настройки описаны в SETTINGS:
+тип, значение по умолчанию и допустимые значения; get возвращает значение
+нужного типа. set сначала записывает значение в БД, затем в память
+и сообщает подписчикам (subscribe) - открытые страницы применяют
+изменение без повторного чтения.
+
+Тему и форму ячеек пользователь может задать только для себя: такие
+значения хранятся в той же таблице под ключом "user:<id>:<настройка>"
+и при чтении заменяют общее значение для вошедшего пользователя (set_user).
+"""
+import threading
+from collections import namedtuple
+
+# kind - тип значения (str или bool), per_user - можно задать для пользователя
+SettingDef = namedtuple('SettingDef', ['kind', 'default', 'choices', 'per_user'])
+
+SETTINGS = {
+    'theme': SettingDef(str, "light", (
+        "light", "dark", "dark_green", "purple", "amber", "brown", "deep_orange", "light_green"
+    ), True),
+    'cell_shape': SettingDef(str, "square", ("square", "round"), True),
+    'show_birthdays': SettingDef(bool, True, None, False),
+}
+
+
+def _user_key(user_id, key):
+    return f"user:{user_id}:{key}"
+
+
+def _decode(definition, raw):
+    if raw is None:
+        return definition.default
+    if definition.kind is bool:
+        return raw == "true"
+    if definition.choices and raw not in definition.choices:
+        return definition.default
+    return raw
+
+
+def _encode(definition, value):
+    if definition.kind is bool:
+        return "true" if value else "false"
+    value = str(value)
+    if definition.choices and value not in definition.choices:
+        raise ValueError(f"Недопустимое значение настройки: {value}")
+    return value
+
+
+class SettingsRegistry:
+    """Настройки из таблицы settings в памяти с записью в БД и подписками на изменения"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # ключ в таблице -> строковое значение
+        self._values = None
+        self._user_id = None
+        # настройка -> {владелец: callback(value)}
+        self._subscribers = {}
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._values is None:
+                from database.models import Settings
+                from database.session import db_session
+                with db_session():
+                    self._values = dict(Settings.select(Settings.key, Settings.value).tuples())
+            return self._values
+
+    def reload(self):
+        """Перечитывает таблицу (например, после изменения настроек другим клиентом)"""
+        with self._lock:
+            self._values = None
+        self._ensure_loaded()
+
+    def get(self, key, user_id=None):
+        """
+        Значение настройки для пользователя (по умолчанию - вошедшего)
+
+        Значение пользователя заменяет общее, если настройку можно задавать
+        для пользователя и оно сохранено.
+        """
+        definition = SETTINGS[key]
+        values = self._ensure_loaded()
+        with self._lock:
+            user_id = user_id if user_id is not None else self._user_id
+            raw = None
+            if definition.per_user and user_id is not None:
+                raw = values.get(_user_key(user_id, key))
+            if raw is None:
+                raw = values.get(key)
+        return _decode(definition, raw)
+
+    def has_user_overrides(self, user_id=None):
+        """Заданы ли у пользователя собственные настройки"""
+        values = self._ensure_loaded()
+        with self._lock:
+            user_id = user_id if user_id is not None else self._user_id
+            if user_id is None:
+                return False
+            return any(_user_key(user_id, key) in values for key, definition in SETTINGS.items() if definition.per_user)
+
+    def set(self, key, value, user_id=None):
+        """
+        Сохраняет настройку в БД и в памяти, затем сообщает подписчикам
+
+        Args:
+            user_id: сохранить значение только для этого пользователя
+        """
+        from database.models import Settings
+        from database.session import db_session
+        definition = SETTINGS[key]
+        if user_id is not None and not definition.per_user:
+            raise ValueError(f"Настройку {key} нельзя задать для пользователя")
+        raw = _encode(definition, value)
+        row_key = _user_key(user_id, key) if user_id is not None else key
+        self._ensure_loaded()
+        before = self.get(key)
+
+        with db_session():
+            Settings.insert(key=row_key, value=raw).on_conflict(
+                conflict_target=[Settings.key], preserve=[Settings.value]
+            ).execute()
+        with self._lock:
+            self._values[row_key] = raw
+        self._notify_changed({key: before})
+
+    def clear_user_overrides(self, user_id=None):
+        """Удаляет собственные настройки пользователя: снова действуют общие"""
+        from database.models import Settings
+        from database.session import db_session
+        self._ensure_loaded()
+        with self._lock:
+            user_id = user_id if user_id is not None else self._user_id
+        if user_id is None:
+            return
+        keys = [_user_key(user_id, key) for key, definition in SETTINGS.items() if definition.per_user]
+        before = {key: self.get(key) for key in SETTINGS}
+
+        with db_session():
+            Settings.delete().where(Settings.key.in_(keys)).execute()
+        with self._lock:
+            for row_key in keys:
+                self._values.pop(row_key, None)
+        self._notify_changed(before)
+
+    @property
+    def user_id(self):
+        """Вошедший пользователь, чьи настройки действуют (None - только общие)"""
+        return self._user_id
+
+    def set_user(self, user_id):
+        """Задает вошедшего пользователя (None после выхода) и применяет его настройки"""
+        self._ensure_loaded()
+        before = {key: self.get(key) for key in SETTINGS}
+        with self._lock:
+            self._user_id = user_id
+        self._notify_changed(before)
+
+    def subscribe(self, key, callback, owner=None):
+        """
+        Вызывает callback(value) при изменении значения настройки для вошедшего пользователя
+
+        Args:
+            owner: владелец подписки; новая подписка того же владельца
+                заменяет прежнюю (страницы создаются заново при каждом открытии)
+
+        Returns:
+            функция отмены подписки
+        """
+        owner = owner if owner is not None else callback
+        with self._lock:
+            self._subscribers.setdefault(key, {})[owner] = callback
+
+        def unsubscribe():
+            with self._lock:
+                subscribers = self._subscribers.get(key, {})
+                if subscribers.get(owner) is callback:
+                    del subscribers[owner]
+        return unsubscribe
+
+    def _notify_changed(self, before):
+        """Сообщает подписчикам настроек, чье значение изменилось"""
+        for key, old_value in before.items():
+            value = self.get(key)
+            if value == old_value:
+                continue
+            with self._lock:
+                callbacks = list(self._subscribers.get(key, {}).values())
+            for callback in callbacks:
+                try:
+                    callback(value)
+                except Exception as e:
+                    print(f"Ошибка обработчика настройки {key}: {e}")
+
+
+settings_registry = SettingsRegistry()
@@ -0,0 +1,151 @@
+"""
+Поиск конфликтов смен
+
+Календарь бухгалтерии проверял конфликты для каждой строки списка смен
+отдельно: три запроса (смены начальника, дежурной части, ВЗН) на строку.
+find_shift_conflicts находит все конфликты за день или месяц одним запросом:
+смены трех календарей объединяются (UNION ALL) и группируются по дню
+и сотруднику, соседние дни сотрудника берутся оконными функциями LAG/LEAD.
+Запрос возвращает одну строку на сотрудника за день, тексты конфликтов
+собираются в памяти.
+
+Конфликты:
+- несколько смен в одном календаре (начальник, дежурная часть, ВЗН);
+- разные часы или ставка у смены начальника и смены дежурной части;
+- смена 24 ч и смена на следующий день подряд (через полночь без перерыва).
+
+Результат - ShiftConflictIndex: по дню и сотруднику - список конфликтов,
+по дню - число сотрудников со сменой. Список смен и сетка месяца
+строятся по нему без дополнительных запросов.
+"""
+from datetime import timedelta
+
+# Смена такой длины заканчивается утром следующего дня
+FULL_DAY_HOURS = 24
+
+
+class ShiftConflictIndex:
+    """Конфликты смен по дням и сотрудникам"""
+
+    def __init__(self):
+        # дата -> {id сотрудника: [тексты конфликтов]}
+        self._conflicts = {}
+        # дата -> число сотрудников со сменой
+        self._employee_counts = {}
+
+    def add(self, day, employee_id, conflicts):
+        self._employee_counts[day] = self._employee_counts.get(day, 0) + 1
+        if conflicts:
+            self._conflicts.setdefault(day, {})[employee_id] = conflicts
+
+    def days(self):
+        """Дни, в которых есть смены"""
+        return list(self._employee_counts)
+
+    def employee_count(self, day):
+        """Число сотрудников со сменой за день (каждый считается один раз)"""
+        return self._employee_counts.get(day, 0)
+
+    def conflicts_for_day(self, day):
+        """{id сотрудника: [тексты конфликтов]} за день"""
+        return self._conflicts.get(day, {})
+
+    def conflicts(self, day, employee_id):
+        """Тексты конфликтов сотрудника за день"""
+        return self.conflicts_for_day(day).get(employee_id, [])
+
+
+def _shifts_query(first_day, last_day):
+    """Смены трех календарей за период: дата, сотрудник, календарь, часы, ставка"""
+    from peewee import Value
+    from database.models import Assignment, DutyShift, CashWithdrawal
+
+    def shifts(model, source):
+        return model.select(
+            model.date.alias('date'),
+            model.employee.alias('employee_id'),
+            Value(source).alias('source'),
+            model.hours.alias('hours'),
+            model.hourly_rate.alias('hourly_rate'),
+        ).where((model.date >= first_day) & (model.date <= last_day))
+
+    return shifts(Assignment, 'chief') + shifts(DutyShift, 'duty') + shifts(CashWithdrawal, 'vzn')
+
+
+def _conflicts_query(first_day, last_day):
+    """Одна строка на сотрудника за день с числом смен по календарям и соседними днями"""
+    from peewee import Select, Case, fn
+    from database.models import db
+
+    # Соседние дни нужны для проверки смен подряд на границах периода
+    shifts = _shifts_query(first_day - timedelta(days=1), last_day + timedelta(days=1)).alias('shifts')
+
+    def count_of(source):
+        return fn.SUM(Case(None, [(shifts.c.source == source, 1)], 0))
+
+    def max_of(source, column):
+        return fn.MAX(Case(None, [(shifts.c.source == source, column)]))
+
+    full_day = fn.BOOL_OR(shifts.c.hours >= FULL_DAY_HOURS)
+    window = dict(partition_by=[shifts.c.employee_id], order_by=[shifts.c.date])
+    per_employee = Select([shifts], [
+        shifts.c.date,
+        shifts.c.employee_id,
+        count_of('chief').alias('chief_count'),
+        count_of('duty').alias('duty_count'),
+        count_of('vzn').alias('vzn_count'),
+        max_of('chief', shifts.c.hours).alias('chief_hours'),
+        max_of('duty', shifts.c.hours).alias('duty_hours'),
+        max_of('chief', shifts.c.hourly_rate).alias('chief_rate'),
+        max_of('duty', shifts.c.hourly_rate).alias('duty_rate'),
+        full_day.alias('full_day'),
+        fn.LAG(shifts.c.date).over(**window).alias('previous_date'),
+        fn.LAG(full_day).over(**window).alias('previous_full_day'),
+        fn.LEAD(shifts.c.date).over(**window).alias('next_date'),
+    ]).group_by(shifts.c.date, shifts.c.employee_id).alias('per_employee')
+
+    return Select([per_employee], [getattr(per_employee.c, name) for name in (
+        'date', 'employee_id', 'chief_count', 'duty_count', 'vzn_count', 'chief_hours', 'duty_hours',
+        'chief_rate', 'duty_rate', 'full_day', 'previous_date', 'previous_full_day', 'next_date',
+    )]).where(per_employee.c.date.between(first_day, last_day)).bind(db)
+
+
+def _row_conflicts(row):
+    """Тексты конфликтов сотрудника за день по строке запроса"""
+    conflicts = []
+    if row.chief_count and row.duty_count:
+        if row.chief_hours != row.duty_hours:
+            conflicts.append(f"Несоответствие часов: {row.chief_hours} (начальник) против {row.duty_hours} (дежурная)")
+        if abs(float(row.chief_rate) - float(row.duty_rate)) > 0.01:
+            conflicts.append(f"Несоответствие ставок: {row.chief_rate}₽ (начальник) против {row.duty_rate}₽ (дежурная)")
+
+    if row.chief_count > 1:
+        conflicts.append(f"Несколько смен начальника охраны: {row.chief_count}")
+    if row.duty_count > 1:
+        conflicts.append(f"Несколько смен дежурной части: {row.duty_count}")
+    if row.vzn_count > 1:
+        conflicts.append(f"Несколько ВЗН: {row.vzn_count}")
+
+    if row.previous_full_day and row.previous_date == row.date - timedelta(days=1):
+        conflicts.append(f"Смена сразу после смены {FULL_DAY_HOURS} ч {row.previous_date.strftime('%d.%m.%Y')}")
+    if row.full_day and row.next_date == row.date + timedelta(days=1):
+        conflicts.append(f"Смена {FULL_DAY_HOURS} ч, а {row.next_date.strftime('%d.%m.%Y')} следующая смена без перерыва")
+    return conflicts
+
+
+def find_shift_conflicts(first_day, last_day=None):
+    """
+    Находит конфликты смен за день или период одним запросом
+
+    Args:
+        first_day: первый день периода
+        last_day: последний день (по умолчанию first_day)
+
+    Returns:
+        ShiftConflictIndex
+    """
+    last_day = last_day or first_day
+    index = ShiftConflictIndex()
+    for row in _conflicts_query(first_day, last_day).namedtuples():
+        index.add(row.date, row.employee_id, _row_conflicts(row))
+    return index
@@ -1,7 +1,8 @@
 import openpyxl
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
-from database.models import Assignment, Employee, Object, CashWithdrawal, db
+from database.models import Assignment, Employee, Object, CashWithdrawal
+from database.session import db_session
 from datetime import datetime
 import os
 
@@ -159,160 +160,155 @@ def export_to_excel(data, filename):
 def export_assignments_to_excel(month=None, year=None):
     """Экспортирует назначения за указанный месяц в Excel файлы по объектам"""
     try:
-        if db.is_closed():
-            db.connect()
+        with db_session():
+            # Если месяц и год не указаны, используем текущие
+            if month is None or year is None:
+                current_date = datetime.now()
+                month = current_date.month
+                year = current_date.year
         
-        # Если месяц и год не указаны, используем текущие
-        if month is None or year is None:
-            current_date = datetime.now()
-            month = current_date.month
-            year = current_date.year
+            # Фильтруем назначения по месяцу и году
+            assignments = Assignment.select(Assignment, Employee, Object).join(Employee).switch(Assignment).join(Object).where(
+                (Assignment.date.year == year) & (Assignment.date.month == month)
+            )
         
-        # Фильтруем назначения по месяцу и году
-        assignments = Assignment.select(Assignment, Employee, Object).join(Employee).switch(Assignment).join(Object).where(
-            (Assignment.date.year == year) & (Assignment.date.month == month)
-        )
+            # Получаем ВЗН за тот же период
+            cash_withdrawals = CashWithdrawal.select(CashWithdrawal, Employee, Object).join(Employee).switch(CashWithdrawal).join(Object).where(
+                (CashWithdrawal.date.year == year) & (CashWithdrawal.date.month == month)
+            )
         
-        # Получаем ВЗН за тот же период
-        cash_withdrawals = CashWithdrawal.select(CashWithdrawal, Employee, Object).join(Employee).switch(CashWithdrawal).join(Object).where(
-            (CashWithdrawal.date.year == year) & (CashWithdrawal.date.month == month)
-        )
+            if not assignments.exists():
+                return False, "Нет данных для экспорта. Добавьте сотрудников и назначения."
         
-        if not assignments.exists():
-            return False, "Нет данных для экспорта. Добавьте сотрудников и назначения."
+            objects_data = {}
         
-        objects_data = {}
-        
-        # Обрабатываем обычные назначения
-        for assignment in assignments:
-            obj_name = assignment.object.name
-            if obj_name not in objects_data:
-                objects_data[obj_name] = []
+            # Обрабатываем обычные назначения
+            for assignment in assignments:
+                obj_name = assignment.object.name
+                if obj_name not in objects_data:
+                    objects_data[obj_name] = []
+            
+                day = assignment.date.day
+                employee_found = False
+                for emp_data in objects_data[obj_name]:
+                    if emp_data['name'] == assignment.employee.full_name:
+                        emp_data['разряд'] = assignment.employee.guard_rank
+                        emp_data['days'][str(day)] = assignment.hours
+                        emp_data['итого_часов'] += assignment.hours
+                        emp_data['поощрение'] += float(assignment.bonus_amount)
+                        emp_data['удержания'] += float(assignment.deduction_amount)
+                        emp_data['итого_в_гроссе'] = emp_data['итого_часов'] * emp_data['тарифная_ставка']
+                        # Инициализируем ВЗН, если его нет
+                        if 'взн' not in emp_data:
+                            emp_data['взн'] = 0
+                        payment_method = getattr(assignment.employee, 'payment_method', 'на карту')
+                        # ВЗН не входит в итоговую сумму выдачи
+                        final_salary = emp_data['итого_в_гроссе'] - emp_data['удержания'] + emp_data['поощрение']
+                        emp_data['на_карту'] = final_salary if payment_method == 'на карту' else 0
+                        emp_data['итого_на_руки'] = final_salary if payment_method == 'на руки' else 0
+                        employee_found = True
+                        break
             
-            day = assignment.date.day
-            employee_found = False
-            for emp_data in objects_data[obj_name]:
-                if emp_data['name'] == assignment.employee.full_name:
-                    emp_data['разряд'] = assignment.employee.guard_rank
-                    emp_data['days'][str(day)] = assignment.hours
-                    emp_data['итого_часов'] += assignment.hours
-                    emp_data['поощрение'] += float(assignment.bonus_amount)
-                    emp_data['удержания'] += float(assignment.deduction_amount)
-                    emp_data['итого_в_гроссе'] = emp_data['итого_часов'] * emp_data['тарифная_ставка']
-                    # Инициализируем ВЗН, если его нет
-                    if 'взн' not in emp_data:
-                        emp_data['взн'] = 0
+                if not employee_found:
+                    total_salary = assignment.hours * float(assignment.hourly_rate)
                     payment_method = getattr(assignment.employee, 'payment_method', 'на карту')
+                    bonus = float(assignment.bonus_amount)
+                    deductions = float(assignment.deduction_amount)
                     # ВЗН не входит в итоговую сумму выдачи
-                    final_salary = emp_data['итого_в_гроссе'] - emp_data['удержания'] + emp_data['поощрение']
-                    emp_data['на_карту'] = final_salary if payment_method == 'на карту' else 0
-                    emp_data['итого_на_руки'] = final_salary if payment_method == 'на руки' else 0
-                    employee_found = True
-                    break
-            
-            if not employee_found:
-                total_salary = assignment.hours * float(assignment.hourly_rate)
-                payment_method = getattr(assignment.employee, 'payment_method', 'на карту')
-                bonus = float(assignment.bonus_amount)
-                deductions = float(assignment.deduction_amount)
-                # ВЗН не входит в итоговую сумму выдачи
-                final_salary = total_salary - deductions + bonus
+                    final_salary = total_salary - deductions + bonus
                 
-                objects_data[obj_name].append({
-                    'name': assignment.employee.full_name,
-                    'разряд': assignment.employee.guard_rank,
-                    'days': {str(day): assignment.hours},
-                    'итого_часов': assignment.hours,
-                    'итого_в_гроссе': total_salary,
-                    'тарифная_ставка': float(assignment.hourly_rate),
-                    'поощрение': bonus,
-                    'удержания': deductions,
-                    'взн': 0,
-                    'на_карту': final_salary if payment_method == 'на карту' else 0,
-                    'итого_на_руки': final_salary if payment_method == 'на руки' else 0
-                })
+                    objects_data[obj_name].append({
+                        'name': assignment.employee.full_name,
+                        'разряд': assignment.employee.guard_rank,
+                        'days': {str(day): assignment.hours},
+                        'итого_часов': assignment.hours,
+                        'итого_в_гроссе': total_salary,
+                        'тарифная_ставка': float(assignment.hourly_rate),
+                        'поощрение': bonus,
+                        'удержания': deductions,
+                        'взн': 0,
+                        'на_карту': final_salary if payment_method == 'на карту' else 0,
+                        'итого_на_руки': final_salary if payment_method == 'на руки' else 0
+                    })
         
-        # Обрабатываем ВЗН отдельно
-        for cash_withdrawal in cash_withdrawals:
-            obj_name = cash_withdrawal.object.name
-            if obj_name not in objects_data:
-                objects_data[obj_name] = []
+            # Обрабатываем ВЗН отдельно
+            for cash_withdrawal in cash_withdrawals:
+                obj_name = cash_withdrawal.object.name
+                if obj_name not in objects_data:
+                    objects_data[obj_name] = []
             
-            employee_found = False
-            for emp_data in objects_data[obj_name]:
-                if emp_data['name'] == cash_withdrawal.employee.full_name:
-                    # Добавляем ВЗН к существующему сотруднику
-                    vzn_amount = cash_withdrawal.hours * float(cash_withdrawal.hourly_rate)
-                    emp_data['взн'] += vzn_amount
-                    emp_data['поощрение'] += float(cash_withdrawal.bonus_amount)
-                    emp_data['удержания'] += float(cash_withdrawal.deduction_amount)
-                    # Добавляем часы ВЗН в соответствующий день
-                    day = str(cash_withdrawal.date.day)
-                    if day in emp_data['days']:
-                        emp_data['days'][day] += cash_withdrawal.hours
-                    else:
-                        emp_data['days'][day] = cash_withdrawal.hours
-                    emp_data['итого_часов'] += cash_withdrawal.hours
-                    employee_found = True
-                    break
+                employee_found = False
+                for emp_data in objects_data[obj_name]:
+                    if emp_data['name'] == cash_withdrawal.employee.full_name:
+                        # Добавляем ВЗН к существующему сотруднику
+                        vzn_amount = cash_withdrawal.hours * float(cash_withdrawal.hourly_rate)
+                        emp_data['взн'] += vzn_amount
+                        emp_data['поощрение'] += float(cash_withdrawal.bonus_amount)
+                        emp_data['удержания'] += float(cash_withdrawal.deduction_amount)
+                        # Добавляем часы ВЗН в соответствующий день
+                        day = str(cash_withdrawal.date.day)
+                        if day in emp_data['days']:
+                            emp_data['days'][day] += cash_withdrawal.hours
+                        else:
+                            emp_data['days'][day] = cash_withdrawal.hours
+                        emp_data['итого_часов'] += cash_withdrawal.hours
+                        employee_found = True
+                        break
             
-            if not employee_found:
-                # Создаем новую запись только для ВЗН
-                vzn_amount = cash_withdrawal.hours * float(cash_withdrawal.hourly_rate)
-                payment_method = getattr(cash_withdrawal.employee, 'payment_method', 'на карту')
-                day = cash_withdrawal.date.day
+                if not employee_found:
+                    # Создаем новую запись только для ВЗН
+                    vzn_amount = cash_withdrawal.hours * float(cash_withdrawal.hourly_rate)
+                    payment_method = getattr(cash_withdrawal.employee, 'payment_method', 'на карту')
+                    day = cash_withdrawal.date.day
                 
-                objects_data[obj_name].append({
-                    'name': cash_withdrawal.employee.full_name,
-                    'разряд': cash_withdrawal.employee.guard_rank,
-                    'days': {str(day): cash_withdrawal.hours},
-                    'итого_часов': cash_withdrawal.hours,
-                    'итого_в_гроссе': 0,
-                    'тарифная_ставка': float(cash_withdrawal.hourly_rate),
-                    'поощрение': float(cash_withdrawal.bonus_amount),
-                    'удержания': float(cash_withdrawal.deduction_amount),
-                    'взн': vzn_amount,
-                    'на_карту': 0,
-                    'итого_на_руки': 0
-                })
+                    objects_data[obj_name].append({
+                        'name': cash_withdrawal.employee.full_name,
+                        'разряд': cash_withdrawal.employee.guard_rank,
+                        'days': {str(day): cash_withdrawal.hours},
+                        'итого_часов': cash_withdrawal.hours,
+                        'итого_в_гроссе': 0,
+                        'тарифная_ставка': float(cash_withdrawal.hourly_rate),
+                        'поощрение': float(cash_withdrawal.bonus_amount),
+                        'удержания': float(cash_withdrawal.deduction_amount),
+                        'взн': vzn_amount,
+                        'на_карту': 0,
+                        'итого_на_руки': 0
+                    })
         
-        month_names = {
-            1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
-            5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
-            9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
-        }
-        month_name = month_names[month]
+            month_names = {
+                1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель',
+                5: 'Май', 6: 'Июнь', 7: 'Июль', 8: 'Август',
+                9: 'Сентябрь', 10: 'Октябрь', 11: 'Ноябрь', 12: 'Декабрь'
+            }
+            month_name = month_names[month]
         
-        for obj_name, rows in objects_data.items():
-            try:
-                obj_record = Object.get(Object.name == obj_name)
-                obj_address = obj_record.address or ''
-            except:
-                obj_address = ''
+            for obj_name, rows in objects_data.items():
+                try:
+                    obj_record = Object.get(Object.name == obj_name)
+                    obj_address = obj_record.address or ''
+                except:
+                    obj_address = ''
             
-            data = {
-                'title': obj_name,
-                'address': obj_address,
-                'rows': rows,
-                'footer': {
-                    'итого_часов': sum(r['итого_часов'] for r in rows),
-                    'итого_в_гроссе': sum(r['итого_в_гроссе'] for r in rows),
-                    'поощрение': sum(r['поощрение'] for r in rows),
-                    'на_карту': sum(r['на_карту'] for r in rows),
-                    'взн': sum(r['взн'] for r in rows),
-                    'удержания': sum(r['удержания'] for r in rows),
-                    'итого_на_руки': sum(r['итого_на_руки'] for r in rows)
+                data = {
+                    'title': obj_name,
+                    'address': obj_address,
+                    'rows': rows,
+                    'footer': {
+                        'итого_часов': sum(r['итого_часов'] for r in rows),
+                        'итого_в_гроссе': sum(r['итого_в_гроссе'] for r in rows),
+                        'поощрение': sum(r['поощрение'] for r in rows),
+                        'на_карту': sum(r['на_карту'] for r in rows),
+                        'взн': sum(r['взн'] for r in rows),
+                        'удержания': sum(r['удержания'] for r in rows),
+                        'итого_на_руки': sum(r['итого_на_руки'] for r in rows)
+                    }
                 }
-            }
             
-            filename = f"{obj_name} {month_name} {year}.xlsx"
-            filepath = os.path.join(os.path.expanduser('~'), 'Downloads', filename)
-            export_to_excel(data, filepath)
+                filename = f"{obj_name} {month_name} {year}.xlsx"
+                filepath = os.path.join(os.path.expanduser('~'), 'Downloads', filename)
+                export_to_excel(data, filepath)
         
-        return True, f"Данные экспортированы в Загрузки"
+            return True, f"Данные экспортированы в Загрузки"
         
     except Exception as ex:
         return False, f"Ошибка экспорта: {str(ex)}"
-    finally:
-        if not db.is_closed():
-            db.close()
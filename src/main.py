@@ -2,33 +2,19 @@ import flet
 from flet import app
 ft = flet
 import sys
-from peewee import *
-from menu.drawer import drawer
-from views.home import home_page
-from views.employees import employees_page
-from views.chief_employees import chief_employees_page
-from views.office_employees import office_employees_page
-from views.settings import settings_page, load_theme_from_db
 import os
-from views.objects import objects_page
-from views.calendar import calendar_page
-from views.statistics import statistics_page
-from views.notes import notes_page
-from views.terminated import terminated_page
-from views.discarded_cards import discarded_cards_page
-from views.logs import logs_page
-from views.administration import administration_page
-from views.staff_list import staff_list_page
-from views.duty_calendar import duty_calendar_page
-from views.accounting_calendar import accounting_calendar_page
-
-from database.models import Employee
 from datetime import datetime
-from utils.faker_data import generate_all_fake_data, create_december_shifts
+from database.bootstrap import data_layer
+from database.instrumentation import query_action
+from database.session import db_session
 from auth.auth import AuthManager, create_login_page
 
+# Модули страниц импортируются при первом открытии страницы,
+# чтобы окно входа появлялось без ожидания загрузки всех представлений
+
 def main(page: ft.Page):
-    # Генерируем тестовые данные при первом запуске
+    # Генерируем тестовые данные при первом запуске (после готовности БД)
+    #from utils.faker_data import generate_all_fake_data, create_december_shifts
     #generate_all_fake_data()  # Раскомментируйте для генерации данных
     #create_december_shifts()  # Создаем 100 смен на каждый день декабря
     
@@ -46,35 +32,51 @@ def main(page: ft.Page):
     # Инициализируем менеджер авторизации
     auth_manager = AuthManager()
     
-    # Загружаем тему из БД при старте
-    theme = load_theme_from_db()
+    def apply_theme(theme):
+        """Применяет тему, сохраненную в БД"""
+        if theme == "dark":
+            page.theme_mode = ft.ThemeMode.DARK
+            page.theme = None
+        elif theme == "dark_green":
+            page.theme_mode = ft.ThemeMode.DARK
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.GREEN)
+        elif theme == "purple":
+            page.theme_mode = ft.ThemeMode.DARK
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.PURPLE)
+        elif theme == "amber":
+            page.theme_mode = ft.ThemeMode.LIGHT
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.AMBER)
+        elif theme == "brown":
+            page.theme_mode = ft.ThemeMode.DARK
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.BROWN)
+        elif theme == "deep_orange":
+            page.theme_mode = ft.ThemeMode.LIGHT
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.DEEP_ORANGE)
+        elif theme == "light_green":
+            page.theme_mode = ft.ThemeMode.LIGHT
+            page.theme = ft.Theme(color_scheme_seed=ft.Colors.LIGHT_GREEN)
+        else:
+            page.theme_mode = ft.ThemeMode.LIGHT
+            page.theme = None
     
-    if theme == "dark":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = None
-    elif theme == "dark_green":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.GREEN)
-    elif theme == "purple":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.PURPLE)
-    elif theme == "amber":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.AMBER)
-    elif theme == "brown":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.BROWN)
-    elif theme == "deep_orange":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.DEEP_ORANGE)
-    elif theme == "light_green":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.LIGHT_GREEN)
-    else:
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = None
+    def theme_changed(theme):
+        """Применяет тему после ее изменения в настройках или входа пользователя со своей темой"""
+        apply_theme(theme)
+        page.update()
+    
+    def handle_data_layer_ready(error):
+        """Загружает настройки и применяет тему, когда БД готова"""
+        if error is not None:
+            return
+        from database.settings_registry import settings_registry
+        settings_registry.subscribe('theme', theme_changed, owner='main')
+        apply_theme(settings_registry.get('theme'))
+        page.update()
+    
+    # Подключение к БД, миграции и администратор - в фоне
+    data_layer.on_ready(handle_data_layer_ready)
+    data_layer.start(auth_manager)
     
-
     # Контейнер для отображения текущей страницы
     content_container = ft.Container(
         expand=True,
@@ -90,52 +92,70 @@ def main(page: ft.Page):
         if not page_name:
             return
         
-        # Переключаем страницу по названию
-        if page_name == "home":
-            content_container.content = home_page(page)
-        elif page_name == "settings":
-            content_container.content = settings_page(page)
-        elif page_name == "employees":
-            page.auth_manager = auth_manager
-            content_container.content = employees_page(page)
-        elif page_name == "chief_employees":
-            page.auth_manager = auth_manager
-            content_container.content = chief_employees_page(page)
-        elif page_name == "office_employees":
-            page.auth_manager = auth_manager
-            content_container.content = office_employees_page(page)
-        elif page_name == "objects":
-            page.auth_manager = auth_manager
-            content_container.content = objects_page(page)
-        elif page_name == "calendar":
-            shifts_content, shifts_dialog = calendar_page(page)
-            content_container.content = shifts_content
-            if shifts_dialog not in page.overlay:
-                page.overlay.append(shifts_dialog)
-        elif page_name == "statistics":
-            content_container.content = statistics_page(page)
-        elif page_name == "notes":
-            content_container.content = notes_page(page)
-        elif page_name == "terminated":
-            content_container.content = terminated_page(page)
-        elif page_name == "discarded_cards":
-            content_container.content = discarded_cards_page(page)
-        elif page_name == "logs":
-            content_container.content = logs_page(page)
-        elif page_name == "administration":
-            content_container.content = administration_page(page)
-        elif page_name == "staff_list":
-            content_container.content = staff_list_page(page)
-        elif page_name == "duty_calendar":
-            duty_content, duty_dialog = duty_calendar_page(page)
-            content_container.content = duty_content
-            if duty_dialog not in page.overlay:
-                page.overlay.append(duty_dialog)
-        elif page_name == "accounting_calendar":
-            accounting_content, accounting_dialog = accounting_calendar_page(page)
-            content_container.content = accounting_content
-            if accounting_dialog not in page.overlay:
-                page.overlay.append(accounting_dialog)
+        # Переключаем страницу по названию (запросы открытия страницы считаются одним действием
+        # и выполняются на одном соединении, которое затем возвращается в пул)
+        with query_action(f"Открытие страницы {page_name}"), db_session():
+            if page_name == "home":
+                from views.home import home_page
+                content_container.content = home_page(page)
+            elif page_name == "settings":
+                from views.settings import settings_page
+                content_container.content = settings_page(page)
+            elif page_name == "employees":
+                page.auth_manager = auth_manager
+                from views.employees import employees_page
+                content_container.content = employees_page(page)
+            elif page_name == "chief_employees":
+                page.auth_manager = auth_manager
+                from views.chief_employees import chief_employees_page
+                content_container.content = chief_employees_page(page)
+            elif page_name == "office_employees":
+                page.auth_manager = auth_manager
+                from views.office_employees import office_employees_page
+                content_container.content = office_employees_page(page)
+            elif page_name == "objects":
+                page.auth_manager = auth_manager
+                from views.objects import objects_page
+                content_container.content = objects_page(page)
+            elif page_name == "calendar":
+                from views.calendar import calendar_page
+                shifts_content, shifts_dialog = calendar_page(page)
+                content_container.content = shifts_content
+                if shifts_dialog not in page.overlay:
+                    page.overlay.append(shifts_dialog)
+            elif page_name == "statistics":
+                from views.statistics import statistics_page
+                content_container.content = statistics_page(page)
+            elif page_name == "notes":
+                from views.notes import notes_page
+                content_container.content = notes_page(page)
+            elif page_name == "terminated":
+                from views.terminated import terminated_page
+                content_container.content = terminated_page(page)
+            elif page_name == "discarded_cards":
+                from views.discarded_cards import discarded_cards_page
+                content_container.content = discarded_cards_page(page)
+            elif page_name == "logs":
+                from views.logs import logs_page
+                content_container.content = logs_page(page)
+            elif page_name == "administration":
+                from views.administration import administration_page
+                content_container.content = administration_page(page)
+            elif page_name == "staff_list":
+                from views.staff_list import staff_list_page
+                content_container.content = staff_list_page(page)
+            elif page_name == "duty_calendar":
+                from views.duty_calendar import duty_calendar_page
+                duty_content, duty_dialog = duty_calendar_page(page)
+                content_container.content = duty_content
+                if duty_dialog not in page.overlay:
+                    page.overlay.append(duty_dialog)
+            elif page_name == "accounting_calendar":
+                from views.accounting_calendar import accounting_calendar_page
+                accounting_content, accounting_dialog = accounting_calendar_page(page)
+                content_container.content = accounting_content
+                if accounting_dialog not in page.overlay:
+                    page.overlay.append(accounting_dialog)
 
         page.close_drawer()
         page.update()
@@ -145,11 +165,15 @@ def main(page: ft.Page):
         page.controls.clear()
         
         
+        from menu.drawer import drawer
+        from views.home import home_page
+        
         # Создаём drawer с обработчиком и проверкой доступа
         page.drawer = drawer(handle_navigation_change, auth_manager)
         
         # Устанавливаем главную страницу по умолчанию
-        content_container.content = home_page(page)
+        with db_session():
+            content_container.content = home_page(page)
         
         # Добавляем кнопку меню и контейнер с содержимым
         page.add( 
@@ -193,7 +217,7 @@ def main(page: ft.Page):
     def show_login():
         """Показывает экран авторизации"""
         page.controls.clear()
-        login_content = create_login_page(page, auth_manager, show_main_app)
+        login_content = create_login_page(page, auth_manager, show_main_app, data_layer)
         page.add(
             ft.Container(
                 content=login_content,
@@ -206,4 +230,11 @@ def main(page: ft.Page):
     # Показываем экран авторизации
     show_login()
 
-flet.app(target=main)
\ No newline at end of file
+# Фото обрабатываются в пуле процессов (utils/image_pipeline.py): при запуске
+# процессов через spawn модуль импортируется заново и не должен открывать окно.
+# freeze_support нужен собранному приложению (flet pack / PyInstaller): без него
+# процесс пула запускает exe заново с окном приложения вместо обработки фото
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    flet.app(target=main)
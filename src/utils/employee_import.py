@@ -0,0 +1,352 @@
+"""
+Массовый импорт сотрудников из CSV и XLSX
+
+Раньше сотрудников можно было добавить только по одному через диалог.
+Импорт читает файл построчно (CSV - csv.reader, XLSX - openpyxl в режиме
+read_only), проверяет строки порциями по BATCH_SIZE и записывает их
+insert_many вместе со связями с компаниями в одной транзакции.
+
+Проверки строки:
+- обязательные поля и даты (дд.мм.гггг, ГГГГ-ММ-ДД или дата ячейки XLSX);
+- номер удостоверения в формате "А№ 000000" (как в поле ввода);
+- разряд, способ выдачи зарплаты, статус штата, ответственность - из списков;
+- компании - существующие (через запятую или точку с запятой);
+- ФИО не повторяется ни в файле, ни в БД (одним запросом на порцию).
+
+Строки с ошибками пропускаются и попадают в отчет. При dry_run=True
+файл только проверяется: отчет показывает, сколько строк будет добавлено.
+"""
+import csv
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from pathlib import Path
+
+# Строк в одной порции проверки и вставки
+BATCH_SIZE = 1000
+# Ошибок в отчете (остальные только считаются)
+MAX_REPORTED_ERRORS = 200
+
+GUARD_RANKS = ("ОВН", "Сторож", "4", "5", "6")
+PAYMENT_METHODS = ("на карту", "на руки")
+STAFF_STATUSES = ("в штате", "за штатом")
+CRIMINAL_LIABILITY = ("нет", "да")
+
+# Заголовок колонки (в нижнем регистре) -> поле
+HEADERS = {
+    "фио": "full_name", "full_name": "full_name",
+    "дата рождения": "birth_date", "birth_date": "birth_date",
+    "номер удостоверения": "certificate_number", "удостоверение": "certificate_number",
+    "certificate_number": "certificate_number",
+    "дата выдачи удостоверения": "guard_license_date", "guard_license_date": "guard_license_date",
+    "разряд": "guard_rank", "разряд охранника": "guard_rank", "guard_rank": "guard_rank",
+    "медкомиссия": "medical_exam_date", "дата прохождения медкомиссии": "medical_exam_date",
+    "medical_exam_date": "medical_exam_date",
+    "периодическая проверка": "periodic_check_date", "дата периодической проверки": "periodic_check_date",
+    "periodic_check_date": "periodic_check_date",
+    "должность": "position", "position": "position",
+    "зарплата": "salary", "salary": "salary",
+    "способ выдачи зарплаты": "payment_method", "payment_method": "payment_method",
+    "статус штата": "staff_status", "staff_status": "staff_status",
+    "ответственность": "criminal_liability",
+    "уголовная/административная ответственность": "criminal_liability",
+    "criminal_liability": "criminal_liability",
+    "компании": "companies", "компания": "companies", "companies": "companies",
+}
+
+DATE_FIELDS = ("birth_date", "guard_license_date", "medical_exam_date", "periodic_check_date")
+
+# Поля по типу сотрудника: (обязательные, необязательные)
+FIELDS = {
+    'guard': (
+        ("full_name", "birth_date"),
+        ("certificate_number", "guard_license_date", "guard_rank", "medical_exam_date",
+         "periodic_check_date", "payment_method", "staff_status", "criminal_liability"),
+    ),
+    'chief': (
+        ("full_name", "birth_date", "position"),
+        ("guard_rank", "salary", "payment_method", "staff_status", "criminal_liability"),
+    ),
+    'office': (
+        ("full_name", "birth_date", "position"),
+        ("salary", "payment_method", "staff_status", "criminal_liability"),
+    ),
+}
+
+FIELD_NAMES = {
+    "full_name": "ФИО", "birth_date": "Дата рождения", "position": "Должность",
+}
+
+ImportReport = namedtuple('ImportReport', ['total', 'valid', 'created', 'errors', 'error_count', 'dry_run'])
+
+_CERTIFICATE = re.compile(r"^[^\W\d_]№ \d{6}$")
+
+
+class ImportFormatError(Exception):
+    """Файл не удалось прочитать как таблицу сотрудников"""
+
+
+def format_certificate_number(value):
+    """Приводит номер удостоверения к виду "А№ 000000" (как поле ввода в диалоге)"""
+    value = (value or "").upper().replace("№", "").replace(" ", "")
+    if not value or not value[0].isalpha():
+        return ""
+    numbers = ''.join(filter(str.isdigit, value[1:]))[:6]
+    return f"{value[0]}№ {numbers}"
+
+
+def _detect_encoding(path):
+    """UTF-8, если весь файл в ней декодируется (проверка блоками), иначе Windows-1251"""
+    import codecs
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def _read_csv(path):
+    """Строки CSV по одной (кодировка UTF-8 или Windows-1251, разделитель определяется)"""
+    with open(path, newline='', encoding=_detect_encoding(path)) as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            yield row
+
+
+def _read_xlsx(path):
+    """Строки первого листа XLSX по одной"""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFormatError("для импорта XLSX нужен пакет openpyxl")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    """
+    Читает таблицу сотрудников по строкам
+
+    Yields:
+        tuple: (номер строки в файле, dict поле -> значение)
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        rows = _read_csv(path)
+    elif suffix in (".xlsx", ".xlsm"):
+        rows = _read_xlsx(path)
+    else:
+        raise ImportFormatError("поддерживаются файлы CSV и XLSX")
+
+    columns = None
+    for line, row in enumerate(rows, start=1):
+        if columns is None:
+            columns = [HEADERS.get(str(cell or "").strip().lower()) for cell in row]
+            if "full_name" not in columns:
+                raise ImportFormatError("в первой строке нет заголовка \"ФИО\"")
+            continue
+        values = {field: cell for field, cell in zip(columns, row) if field}
+        if all(cell is None or str(cell).strip() == "" for cell in values.values()):
+            continue
+        yield line, values
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for date_format in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"неверная дата \"{text}\" (нужно дд.мм.гггг)")
+
+
+def _choice(value, options, title):
+    text = _text(value)
+    for option in options:
+        if text.lower() == option.lower():
+            return option
+    raise ValueError(f"{title} \"{text}\" не из списка: {', '.join(options)}")
+
+
+def validate_row(employee_type, values, company_ids_by_name):
+    """
+    Проверяет строку и приводит значения к полям модели
+
+    Returns:
+        tuple: (поля для insert, id компаний)
+
+    Raises:
+        ValueError: текст ошибки для отчета
+    """
+    required, optional = FIELDS[employee_type]
+    row = {}
+    for field in required:
+        if not _text(values.get(field)):
+            raise ValueError(f"не заполнено поле \"{FIELD_NAMES.get(field, field)}\"")
+
+    for field in required + optional:
+        value = values.get(field)
+        if field not in required and not _text(value):
+            continue
+        if field in DATE_FIELDS:
+            row[field] = _parse_date(value)
+        elif field == "certificate_number":
+            certificate = format_certificate_number(_text(value))
+            if not _CERTIFICATE.match(certificate):
+                raise ValueError(f"номер удостоверения \"{_text(value)}\" не в формате А№ 000000")
+            row[field] = certificate
+        elif field == "guard_rank":
+            row[field] = _choice(value, GUARD_RANKS, "разряд")
+        elif field == "payment_method":
+            row[field] = _choice(value, PAYMENT_METHODS, "способ выдачи зарплаты")
+        elif field == "staff_status":
+            row[field] = _choice(value, STAFF_STATUSES, "статус штата")
+        elif field == "criminal_liability":
+            row[field] = _choice(value, CRIMINAL_LIABILITY, "ответственность")
+        elif field == "salary":
+            try:
+                row[field] = float(_text(value).replace(",", ".").replace(" ", ""))
+            except ValueError:
+                raise ValueError(f"неверная зарплата \"{_text(value)}\"")
+        else:
+            row[field] = _text(value)
+
+    company_ids = []
+    for name in re.split(r"[;,]", _text(values.get("companies"))):
+        name = name.strip()
+        if not name:
+            continue
+        company_id = company_ids_by_name.get(name.lower())
+        if company_id is None:
+            raise ValueError(f"компания \"{name}\" не найдена")
+        if company_id not in company_ids:
+            company_ids.append(company_id)
+    return row, company_ids
+
+
+def _batches(rows):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_employees(employee_type, path, dry_run=False, created_by_user_id=None):
+    """
+    Импортирует сотрудников типа employee_type ('guard', 'chief', 'office') из файла
+
+    Args:
+        dry_run: только проверить файл, ничего не записывая
+        created_by_user_id: пользователь, от имени которого создаются записи
+
+    Returns:
+        ImportReport: всего строк, прошедших проверку, добавлено, ошибки [(строка, текст)]
+
+    Raises:
+        ImportFormatError: файл не читается или без заголовка
+    """
+    from database.models import db, EmployeeDirectory, EmployeeCompany
+    from database.company_index import company_index
+    from database.name_index import name_index
+    from database.dossier import dossier_cache
+
+    model = EmployeeDirectory.model_for_type(employee_type)
+    company_field = f"{employee_type}_employee"
+    company_ids_by_name = {company.name.lower(): company.id for company in company_index.companies()}
+
+    total = valid = created = error_count = 0
+    errors = []
+    seen_names = set()
+
+    def add_error(line, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((line, message))
+
+    with db.atomic() as transaction:
+        for batch in _batches(read_rows(path)):
+            total += len(batch)
+            checked = []
+            for line, values in batch:
+                try:
+                    row, company_ids = validate_row(employee_type, values, company_ids_by_name)
+                except ValueError as e:
+                    add_error(line, str(e))
+                    continue
+                if row["full_name"] in seen_names:
+                    add_error(line, f"ФИО \"{row['full_name']}\" повторяется в файле")
+                    continue
+                seen_names.add(row["full_name"])
+                checked.append((line, row, company_ids))
+
+            # Дубликаты в БД - одним запросом на порцию
+            existing = model.existing_names(row["full_name"] for _, row, _ in checked)
+            rows = []
+            for line, row, company_ids in checked:
+                if row["full_name"] in existing:
+                    add_error(line, f"сотрудник \"{row['full_name']}\" уже есть в базе")
+                    continue
+                rows.append((row, company_ids))
+            valid += len(rows)
+            if dry_run or not rows:
+                continue
+
+            for row, _ in rows:
+                row["created_by_user_id"] = created_by_user_id
+                # insert_many требует одинаковые колонки во всех строках (поля с default подставит peewee)
+                for field in FIELDS[employee_type][1]:
+                    if field not in row and getattr(model, field).default is None:
+                        row[field] = None
+            ids = [
+                employee_id for (employee_id,) in
+                model.insert_many([row for row, _ in rows]).returning(model.id).tuples().execute()
+            ]
+            links = [
+                {company_field: employee_id, 'company': company_id}
+                for employee_id, (_, company_ids) in zip(ids, rows)
+                for company_id in company_ids
+            ]
+            for start in range(0, len(links), BATCH_SIZE):
+                EmployeeCompany.insert_many(links[start:start + BATCH_SIZE]).execute()
+            created += len(ids)
+
+        if dry_run:
+            transaction.rollback()
+
+    if created:
+        # Строки добавлены в обход индексов
+        company_index.invalidate()
+        name_index.invalidate()
+        dossier_cache.clear()
+    return ImportReport(total, valid, created, errors, error_count, dry_run)
@@ -1,5 +1,6 @@
 from faker import Faker
-from database.models import Employee, Object, Assignment, CashWithdrawal, Company, EmployeeCompany, ChiefEmployee, OfficeEmployee, db
+from database.models import Employee, Object, Assignment, CashWithdrawal, Company, EmployeeCompany, ChiefEmployee, OfficeEmployee
+from database.session import db_session
 from datetime import datetime, date, timedelta
 import random
 
@@ -129,78 +130,73 @@ def create_fake_cash_withdrawals(employees, objects, days=30):
 def create_december_shifts():
     """Создает 10 смен на каждый день декабря"""
     try:
-        if db.is_closed():
-            db.connect()
+        with db_session():
+            employees = list(Employee.select())
+            objects = list(Object.select())
         
-        employees = list(Employee.select())
-        objects = list(Object.select())
+            if not employees or not objects:
+                print("Нет сотрудников или объектов")
+                return
         
-        if not employees or not objects:
-            print("Нет сотрудников или объектов")
-            return
+            print("Создание смен на весь декабрь...")
         
-        print("Создание смен на весь декабрь...")
+            import calendar
+            days_in_december = calendar.monthrange(2025, 12)[1]  # Получаем количество дней в декабре
         
-        import calendar
-        days_in_december = calendar.monthrange(2025, 12)[1]  # Получаем количество дней в декабре
-        
-        for day in range(1, days_in_december + 1):  # Декабрь 1-31
-            current_date = date(2025, 12, day)
-            print(f"Создание смен на {day} декабря...")
+            for day in range(1, days_in_december + 1):  # Декабрь 1-31
+                current_date = date(2025, 12, day)
+                print(f"Создание смен на {day} декабря...")
             
-            # Получаем список пользователей
-            from database.models import User
-            users = list(User.select())
+                # Получаем список пользователей
+                from database.models import User
+                users = list(User.select())
             
-            for _ in range(100):  # 100 смен на день
-                employee = random.choice(employees)
-                obj = random.choice(objects)
-                hours = random.choice([8, 12, 24])
-                hourly_rate = random.randint(150, 250)
-                user = random.choice(users) if users else None
+                for _ in range(100):  # 100 смен на день
+                    employee = random.choice(employees)
+                    obj = random.choice(objects)
+                    hours = random.choice([8, 12, 24])
+                    hourly_rate = random.randint(150, 250)
+                    user = random.choice(users) if users else None
                 
-                Assignment.create(
-                    employee=employee,
-                    object=obj,
-                    date=current_date,
-                    hours=hours,
-                    hourly_rate=hourly_rate,
-                    is_absent=random.random() < 0.1,
-                    bonus_amount=random.randint(0, 1000) if random.random() < 0.2 else 0,
-                    deduction_amount=random.randint(0, 500) if random.random() < 0.1 else 0,
-                    bonus_comment=fake.sentence() if random.random() < 0.2 else "",
-                    absent_comment=fake.sentence() if random.random() < 0.1 else "",
-                    created_by_user_id=user.id if user else None
-                )
+                    Assignment.create(
+                        employee=employee,
+                        object=obj,
+                        date=current_date,
+                        hours=hours,
+                        hourly_rate=hourly_rate,
+                        is_absent=random.random() < 0.1,
+                        bonus_amount=random.randint(0, 1000) if random.random() < 0.2 else 0,
+                        deduction_amount=random.randint(0, 500) if random.random() < 0.1 else 0,
+                        bonus_comment=fake.sentence() if random.random() < 0.2 else "",
+                        absent_comment=fake.sentence() if random.random() < 0.1 else "",
+                        created_by_user_id=user.id if user else None
+                    )
             
-            # Создаем ВЗН для этого дня
-            for _ in range(30):  # 30 ВЗН на день
-                employee = random.choice(employees)
-                obj = random.choice(objects)
-                hours = random.choice([4, 6, 8])
-                hourly_rate = random.randint(200, 300)
-                user = random.choice(users) if users else None
+                # Создаем ВЗН для этого дня
+                for _ in range(30):  # 30 ВЗН на день
+                    employee = random.choice(employees)
+                    obj = random.choice(objects)
+                    hours = random.choice([4, 6, 8])
+                    hourly_rate = random.randint(200, 300)
+                    user = random.choice(users) if users else None
                 
-                CashWithdrawal.create(
-                    employee=employee,
-                    object=obj,
-                    date=current_date,
-                    hours=hours,
-                    hourly_rate=hourly_rate,
-                    is_absent=random.random() < 0.05,
-                    bonus_amount=random.randint(0, 500) if random.random() < 0.15 else 0,
-                    deduction_amount=random.randint(0, 300) if random.random() < 0.08 else 0,
-                    bonus_comment=fake.sentence() if random.random() < 0.15 else "",
-                    created_by_user_id=user.id if user else None
-                )
+                    CashWithdrawal.create(
+                        employee=employee,
+                        object=obj,
+                        date=current_date,
+                        hours=hours,
+                        hourly_rate=hourly_rate,
+                        is_absent=random.random() < 0.05,
+                        bonus_amount=random.randint(0, 500) if random.random() < 0.15 else 0,
+                        deduction_amount=random.randint(0, 300) if random.random() < 0.08 else 0,
+                        bonus_comment=fake.sentence() if random.random() < 0.15 else "",
+                        created_by_user_id=user.id if user else None
+                    )
         
-        print("Смены на весь декабрь созданы!")
+            print("Смены на весь декабрь созданы!")
         
     except Exception as e:
         print(f"Ошибка при создании смен: {e}")
-    finally:
-        if not db.is_closed():
-            db.close()
 
 def create_fake_chiefs(count=100):
     """Создает тестовых начальников охраны"""
@@ -252,31 +248,34 @@ def create_fake_office_employees(count=100):
 def generate_all_fake_data():
     """Генерирует все тестовые данные"""
     try:
-        if db.is_closed():
-            db.connect()
+        with db_session():
+            print("Создание тестовых сотрудников...")
+            employees = create_fake_employees(100)
         
-        print("Создание тестовых сотрудников...")
-        employees = create_fake_employees(100)
+            print("Создание начальников охраны...")
+            chiefs = create_fake_chiefs(100)
         
-        print("Создание начальников охраны...")
-        chiefs = create_fake_chiefs(100)
+            print("Создание сотрудников офиса...")
+            office_employees = create_fake_office_employees(100)
         
-        print("Создание сотрудников офиса...")
-        office_employees = create_fake_office_employees(100)
+            print("Создание тестовых объектов...")
+            objects = create_fake_objects(8)
         
-        print("Создание тестовых объектов...")
-        objects = create_fake_objects(8)
+            print("Создание тестовых назначений...")
+            assignments = create_fake_assignments(employees, objects, 60)
         
-        print("Создание тестовых назначений...")
-        assignments = create_fake_assignments(employees, objects, 60)
+            print("Создание тестовых ВЗН...")
+            withdrawals = create_fake_cash_withdrawals(employees, objects, 60)
         
-        print("Создание тестовых ВЗН...")
-        withdrawals = create_fake_cash_withdrawals(employees, objects, 60)
+            # Сотрудники и их связи с компаниями созданы в обход индексов
+            from database.company_index import company_index
+            from database.name_index import name_index
+            from database.dossier import dossier_cache
+            company_index.invalidate()
+            name_index.invalidate()
+            dossier_cache.clear()
         
-        print(f"Создано: {len(employees)} сотрудников, {len(chiefs)} начальников, {len(office_employees)} офисных сотрудников, {len(objects)} объектов, {len(assignments)} назначений, {len(withdrawals)} ВЗН")
+            print(f"Создано: {len(employees)} сотрудников, {len(chiefs)} начальников, {len(office_employees)} офисных сотрудников, {len(objects)} объектов, {len(assignments)} назначений, {len(withdrawals)} ВЗН")
         
     except Exception as e:
-        print(f"Ошибка при создании тестовых данных: {e}")
-    finally:
-        if not db.is_closed():
-            db.close()
\ No newline at end of file
+        print(f"Ошибка при создании тестовых данных: {e}")
\ No newline at end of file
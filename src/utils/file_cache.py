@@ -0,0 +1,85 @@
+"""
+Кэш открытых файлов на диске
+
+Раньше открываемый файл целиком загружался в память, записывался
+во временный файл и удалялся потоком через 5 секунд - иногда раньше,
+чем внешняя программа успевала его открыть. Теперь файл записывается
+из хранилища частями в каталог сеанса и остается там: повторное открытие
+не обращается к БД. Когда общий размер превышает лимит, удаляются давно
+открытые файлы. Каталог удаляется при выходе из приложения.
+
+Переменные окружения:
+    FILE_CACHE_MB - лимит размера кэша в МБ (по умолчанию 500)
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class FileCache:
+    """Файлы из хранилища на диске с вытеснением давно открытых (LRU)"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._directory = None
+        # blob_id -> (путь, размер), от давно открытых к недавним
+        self._files = OrderedDict()
+        self._total = 0
+
+    def _get_directory(self):
+        if self._directory is None:
+            self._directory = Path(tempfile.mkdtemp(prefix="kursovaya_files_"))
+            atexit.register(shutil.rmtree, self._directory, True)
+        return self._directory
+
+    def get_path(self, blob_id, filename):
+        """
+        Путь к файлу на диске (записывает файл из хранилища, если его нет в кэше)
+
+        Returns:
+            Path или None, если файла нет в хранилище
+        """
+        from database.blob_store import write_blob_to_file
+        with self._lock:
+            cached = self._files.get(blob_id)
+            if cached is not None and cached[0].exists():
+                self._files.move_to_end(blob_id)
+                return cached[0]
+            folder = self._get_directory() / str(blob_id)
+
+        # Исходное имя файла сохраняется: внешняя программа показывает его в заголовке
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / (Path(filename).name or "file")
+        size = write_blob_to_file(blob_id, path)
+        if not size:
+            path.unlink(missing_ok=True)
+            return None
+
+        with self._lock:
+            previous = self._files.pop(blob_id, None)
+            if previous is not None:
+                self._total -= previous[1]
+            self._files[blob_id] = (path, size)
+            self._total += size
+            self._evict(keep=blob_id)
+        return path
+
+    def _evict(self, keep):
+        """Удаляет давно открытые файлы, пока размер кэша больше лимита"""
+        for blob_id in list(self._files):
+            if self._total <= self.max_bytes:
+                break
+            if blob_id == keep:
+                continue
+            path, size = self._files.pop(blob_id)
+            self._total -= size
+            # Файл может быть еще открыт внешней программой (Windows) - тогда он удалится при выходе
+            shutil.rmtree(path.parent, ignore_errors=True)
+
+
+file_cache = FileCache(max_bytes=int(os.getenv("FILE_CACHE_MB", 500)) * 1024 * 1024)
@@ -0,0 +1,142 @@
+"""
+Обработка фотографий сотрудников вне окна приложения
+
+Раньше фото открывалось, уменьшалось и кодировалось Pillow прямо в обработчике
+FilePicker (в потоке интерфейса), а при ошибке Pillow в БД молча записывался
+исходный файл полного размера. Теперь файл читается и обрабатывается в пуле
+процессов, а результат передается в callback. Из одного файла получаются:
+
+- avatar   - 48x48 для списков (обрезка по центру);
+- detail   - до 300x400 для карточки сотрудника;
+- original - исходный файл без изменений.
+
+Ориентация поворачивается по EXIF. avatar и detail кодируются в WebP
+(если Pillow собран без WebP - в JPEG), качество снижается, пока файл
+не уложится в бюджет размера. Если изображение не открывается, вызывается
+on_error: файл полного размера вместо фото больше не сохраняется.
+
+Переменные окружения:
+    IMAGE_WORKERS - число процессов обработки (по умолчанию 2)
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Версии фото: имя -> (максимальный размер, бюджет в байтах, обрезать до размера)
+RENDITIONS = {
+    'avatar': ((48, 48), 4 * 1024, True),
+    'detail': ((300, 400), 60 * 1024, False),
+}
+# Ступени качества при подгонке под бюджет
+QUALITY_STEPS = (85, 75, 65, 55, 45, 35)
+# Больший исходный файл не обрабатывается
+MAX_SOURCE_SIZE = 30 * 1024 * 1024
+
+
+class ImageProcessingError(Exception):
+    """Файл не удалось обработать как изображение"""
+
+
+def _encode(image, budget):
+    """Кодирует изображение с наибольшим качеством, укладывающимся в бюджет"""
+    import io
+    from PIL import features
+
+    if features.check('webp'):
+        image_format, options = 'WEBP', {'method': 6}
+    else:
+        image_format, options = 'JPEG', {'optimize': True, 'progressive': True}
+
+    data = None
+    for quality in QUALITY_STEPS:
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, **options)
+        data = output.getvalue()
+        if len(data) <= budget:
+            break
+    # Если бюджет не достигнут и на минимальном качестве, остается самый маленький вариант
+    return data
+
+
+def make_renditions(data):
+    """
+    Делает версии фото из содержимого файла (выполняется в процессе пула)
+
+    Returns:
+        dict: имя версии -> bytes (avatar, detail, original)
+    """
+    import io
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise ImageProcessingError("для обработки фото нужен пакет Pillow")
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ImageProcessingError(f"файл не является изображением ({e})")
+
+    # Фото с телефона хранят поворот в EXIF, а не в пикселях
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    result = {'original': data}
+    for name, (size, budget, crop) in RENDITIONS.items():
+        if crop:
+            rendition = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            rendition = image.copy()
+            rendition.thumbnail(size, Image.Resampling.LANCZOS)
+        result[name] = _encode(rendition, budget)
+    return result
+
+
+def make_renditions_from_file(path):
+    """Читает файл и делает версии фото (выполняется в процессе пула)"""
+    if os.path.getsize(path) > MAX_SOURCE_SIZE:
+        raise ImageProcessingError(f"файл больше {MAX_SOURCE_SIZE // (1024 * 1024)} МБ")
+    with open(path, 'rb') as f:
+        return make_renditions(f.read())
+
+
+class ImagePipeline:
+    """Пул процессов для обработки фото"""
+
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def submit(self, path, on_done, on_error=None):
+        """
+        Обрабатывает файл path в фоне
+
+        Args:
+            path: путь к файлу изображения
+            on_done: callback(renditions) с версиями фото (см. make_renditions)
+            on_error: callback(exception)
+        """
+        def done(future):
+            try:
+                renditions = future.result()
+            except Exception as e:
+                print(f"Ошибка обработки фото: {e}")
+                if on_error:
+                    on_error(e)
+                return
+            on_done(renditions)
+
+        future = self._get_pool().submit(make_renditions_from_file, path)
+        future.add_done_callback(done)
+        return future
+
+
+image_pipeline = ImagePipeline(max_workers=int(os.getenv("IMAGE_WORKERS", 2)))
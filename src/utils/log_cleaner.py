@@ -1,4 +1,5 @@
-from database.models import UserLog, db
+from database.models import UserLog
+from database.session import db_session
 from datetime import datetime, timedelta
 
 def cleanup_old_logs(days_to_keep=90, auth_manager=None):
@@ -10,35 +11,30 @@ def cleanup_old_logs(days_to_keep=90, auth_manager=None):
         auth_manager: Менеджер авторизации для логирования
     """
     try:
-        if db.is_closed():
-            db.connect()
+        with db_session():
+            # Вычисляем дату, старше которой нужно удалить логи
+            cutoff_date = datetime.now() - timedelta(days=days_to_keep)
         
-        # Вычисляем дату, старше которой нужно удалить логи
-        cutoff_date = datetime.now() - timedelta(days=days_to_keep)
+            # Логируем операцию очистки перед удалением
+            if auth_manager:
+                auth_manager.log_action("Очистка старых логов", f"Начата очистка логов старше {days_to_keep} дней")
         
-        # Логируем операцию очистки перед удалением
-        if auth_manager:
-            auth_manager.log_action("Очистка старых логов", f"Начата очистка логов старше {days_to_keep} дней")
+            # Удаляем старые логи, исключая записи об очистке логов
+            deleted_count = UserLog.delete().where(
+                (UserLog.created_at < cutoff_date) & 
+                (~UserLog.action.contains("Очистка старых логов"))
+            ).execute()
         
-        # Удаляем старые логи, исключая записи об очистке логов
-        deleted_count = UserLog.delete().where(
-            (UserLog.created_at < cutoff_date) & 
-            (~UserLog.action.contains("Очистка старых логов"))
-        ).execute()
+            # Логируем результат
+            if auth_manager:
+                auth_manager.log_action("Очистка старых логов", f"Удалено {deleted_count} записей логов старше {days_to_keep} дней")
         
-        # Логируем результат
-        if auth_manager:
-            auth_manager.log_action("Очистка старых логов", f"Удалено {deleted_count} записей логов старше {days_to_keep} дней")
-        
-        print(f"Удалено {deleted_count} старых записей логов (старше {days_to_keep} дней)")
-        return deleted_count
+            print(f"Удалено {deleted_count} старых записей логов (старше {days_to_keep} дней)")
+            return deleted_count
         
     except Exception as e:
         print(f"Ошибка при очистке логов: {e}")
         return 0
-    finally:
-        if not db.is_closed():
-            db.close()
 
 def get_logs_statistics():
     """
@@ -48,29 +44,27 @@ def get_logs_statistics():
         dict: Словарь со статистикой
     """
     try:
-        if db.is_closed():
-            db.connect()
-        
-        total_logs = UserLog.select().count()
+        with db_session():
+            total_logs = UserLog.select().count()
         
-        # Логи за последние 30 дней
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        recent_logs = UserLog.select().where(UserLog.created_at >= thirty_days_ago).count()
+            # Логи за последние 30 дней
+            thirty_days_ago = datetime.now() - timedelta(days=30)
+            recent_logs = UserLog.select().where(UserLog.created_at >= thirty_days_ago).count()
         
-        # Самый старый лог
-        oldest_log = UserLog.select().order_by(UserLog.created_at.asc()).first()
-        oldest_date = oldest_log.created_at if oldest_log else None
+            # Самый старый лог
+            oldest_log = UserLog.select().order_by(UserLog.created_at.asc()).first()
+            oldest_date = oldest_log.created_at if oldest_log else None
         
-        # Самый новый лог
-        newest_log = UserLog.select().order_by(UserLog.created_at.desc()).first()
-        newest_date = newest_log.created_at if newest_log else None
+            # Самый новый лог
+            newest_log = UserLog.select().order_by(UserLog.created_at.desc()).first()
+            newest_date = newest_log.created_at if newest_log else None
         
-        return {
-            'total_logs': total_logs,
-            'recent_logs': recent_logs,
-            'oldest_date': oldest_date,
-            'newest_date': newest_date
-        }
+            return {
+                'total_logs': total_logs,
+                'recent_logs': recent_logs,
+                'oldest_date': oldest_date,
+                'newest_date': newest_date
+            }
         
     except Exception as e:
         print(f"Ошибка при получении статистики логов: {e}")
@@ -80,9 +74,6 @@ def get_logs_statistics():
             'oldest_date': None,
             'newest_date': None
         }
-    finally:
-        if not db.is_closed():
-            db.close()
 
 if __name__ == "__main__":
     # Пример использования
@@ -1,11 +1,19 @@
 from base.base_calendar import BaseCalendar
-from database.models import Assignment, DutyShift, CashWithdrawal, GuardEmployee, Object
+from database.models import Assignment, DutyShift
 from peewee import fn
+from collections import namedtuple
 import flet as ft
 
+# Итоги дня в сетке месяца: число сотрудников со сменой, {id сотрудника: [конфликты]}
+DayTotals = namedtuple('DayTotals', ['count', 'conflicts'])
+
 class AccountingCalendarPage(BaseCalendar):
     """Календарь бухгалтерии"""
     
+    CALENDAR_KIND = 'accounting'
+    SHIFT_SOURCES = ('chief', 'duty', 'vzn')
+    MERGE_SHIFTS_BY_EMPLOYEE = True
+    
     def _get_calendar_title(self):
         return "Календарь бухгалтерии"
     
@@ -25,54 +33,33 @@ class AccountingCalendarPage(BaseCalendar):
         return ft.Colors.GREEN
     
     def _get_month_data(self, first_day, last_day):
-        """Возвращает данные для месяца"""
-        cache = {}
-        
-        # Проходим по каждому дню месяца
-        current_date = first_day
-        while current_date <= last_day:
-            # Получаем объединенные смены для даты
-            merged_shifts = self._get_shifts_for_date(current_date)
-            cache[current_date] = len(merged_shifts)
-            
-            # Переходим к следующему дню
-            from datetime import timedelta
-            current_date += timedelta(days=1)
-        
-        return cache
-    
-    def _get_shifts_for_date(self, date_obj):
-        """Возвращает смены для даты"""
-        # Получаем смены начальников охраны
-        assignments = list(Assignment.select().join(GuardEmployee).switch(Assignment).join(Object).where(Assignment.date == date_obj))
-        
-        # Получаем смены дежурной части
-        duty_shifts = list(DutyShift.select().join(GuardEmployee).where(DutyShift.date == date_obj))
-        
-        # Получаем ВЗН
-        vzn_records = list(CashWithdrawal.select().join(GuardEmployee).switch(CashWithdrawal).join(Object).where(CashWithdrawal.date == date_obj))
-        
-        # Объединяем смены по сотрудникам
-        merged_shifts = {}
-        
-        # Добавляем смены начальников
-        for assignment in assignments:
-            key = assignment.employee.id
-            merged_shifts[key] = assignment
-        
-        # Добавляем смены дежурной части (если нет смены начальника)
-        for duty in duty_shifts:
-            key = duty.employee.id
-            if key not in merged_shifts:
-                merged_shifts[key] = duty
-        
-        # Добавляем ВЗН (если нет других смен)
-        for vzn in vzn_records:
-            key = vzn.employee.id
-            if key not in merged_shifts:
-                merged_shifts[key] = vzn
-        
-        return list(merged_shifts.values())
+        """
+        Возвращает данные для месяца: дата -> DayTotals(число сотрудников, конфликты)
+        
+        Один запрос (database/shift_conflicts.py): смены трех календарей
+        группируются по дню и сотруднику. Число в ячейке - сотрудники со сменой
+        за день, каждый считается один раз, как при объединении смен
+        в списке смен за день (смена начальника > дежурная > ВЗН).
+        Конфликты дня по сотрудникам используются и списком смен.
+        """
+        from database.shift_conflicts import find_shift_conflicts
+        index = find_shift_conflicts(first_day, last_day)
+        return {day: DayTotals(index.employee_count(day), index.conflicts_for_day(day)) for day in index.days()}
+    
+    def get_shifts_count_for_date(self, date_obj):
+        """Получает число сотрудников со сменой за дату"""
+        totals = super().get_shifts_count_for_date(date_obj)
+        return totals.count if totals else 0
+    
+    def create_day_cell(self, day, date_obj):
+        """Создает ячейку дня (дни с конфликтами выделяются)"""
+        cell = super().create_day_cell(day, date_obj)
+        totals = self._shifts_cache.get(date_obj)
+        if totals and totals.conflicts:
+            cell.content.controls[1].color = ft.Colors.RED
+            cell.border = ft.border.all(2, ft.Colors.RED)
+            cell.tooltip = "Есть конфликты смен"
+        return cell
     
     def _create_shift_list_item(self, shift):
         """Создает элемент списка смены"""
@@ -116,33 +103,6 @@ class AccountingCalendarPage(BaseCalendar):
             on_click=lambda e: self._show_shift_details(shift)
         )
     
-    def _check_shift_conflict(self, shift):
-        """Проверяет конфликт между сменами"""
-        # Получаем все смены для этого сотрудника на эту дату
-        employee_id = shift.employee.id
-        date = shift.date
-        
-        # Получаем смены начальника охраны
-        chief_shifts = list(Assignment.select().where(
-            (Assignment.employee_id == employee_id) & (Assignment.date == date)
-        ))
-        
-        # Получаем смены дежурной части
-        duty_shifts = list(DutyShift.select().where(
-            (DutyShift.employee_id == employee_id) & (DutyShift.date == date)
-        ))
-        
-        # Получаем ВЗН
-        vzn_records = list(CashWithdrawal.select().where(
-            (CashWithdrawal.employee_id == employee_id) & (CashWithdrawal.date == date)
-        ))
-        
-        # Проверяем наличие конфликтов (больше одной смены в одном календаре)
-        if len(chief_shifts) > 1 or len(duty_shifts) > 1 or len(vzn_records) > 1:
-            return True
-        
-        return False
-    
     def save_new_shift(self):
         """Календарь бухгалтерии только отображает данные"""
         pass
@@ -207,97 +167,13 @@ class AccountingCalendarPage(BaseCalendar):
         self.page.update()
     
     def _get_shift_conflicts(self, shift):
-        """Возвращает список конфликтов"""
-        conflicts = []
-        employee_id = shift.employee.id
-        date = shift.date
-        
-        # Получаем все смены этого сотрудника на эту дату
-        chief_shifts = list(Assignment.select().where(
-            (Assignment.employee_id == employee_id) & (Assignment.date == date)
-        ))
-        
-        duty_shifts = list(DutyShift.select().where(
-            (DutyShift.employee_id == employee_id) & (DutyShift.date == date)
-        ))
-        
-        vzn_records = list(CashWithdrawal.select().where(
-            (CashWithdrawal.employee_id == employee_id) & (CashWithdrawal.date == date)
-        ))
-        
-        # Проверяем соответствие между календарями
-        if chief_shifts and duty_shifts:
-            for chief_shift in chief_shifts:
-                for duty_shift in duty_shifts:
-                    if chief_shift.hours != duty_shift.hours:
-                        conflicts.append(f"Несоответствие часов: {chief_shift.hours} (начальник) против {duty_shift.hours} (дежурная)")
-                    
-                    if abs(float(chief_shift.hourly_rate) - float(duty_shift.hourly_rate)) > 0.01:
-                        conflicts.append(f"Несоответствие ставок: {chief_shift.hourly_rate}₽ (начальник) против {duty_shift.hourly_rate}₽ (дежурная)")
-        
-        # Проверяем дублирование смен (только если в одном календаре больше одной смены)
-        if len(chief_shifts) > 1:
-            conflicts.append(f"Несколько смен начальника охраны: {len(chief_shifts)}")
-        if len(duty_shifts) > 1:
-            conflicts.append(f"Несколько смен дежурной части: {len(duty_shifts)}")
-        if len(vzn_records) > 1:
-            conflicts.append(f"Несколько ВЗН: {len(vzn_records)}")
-        
-        return conflicts
+        """Возвращает список конфликтов (из данных месяца, без запросов)"""
+        totals = self._shifts_cache.get(shift.date)
+        return list(totals.conflicts.get(shift.employee_id, [])) if totals else []
     
-    def update_shifts_list(self):
-        """Обновляет список смен с пагинацией"""
-        # Фильтрация по типу
-        all_items = []
-        if self.show_shifts_cb.value:
-            # Обычные смены (начальники охраны и дежурная часть без ВЗН)
-            for item in self.all_shifts:
-                if isinstance(item, Assignment):
-                    all_items.append(item)
-                elif isinstance(item, DutyShift) and not (hasattr(item, 'description') and item.description and "ВЗН" in item.description):
-                    all_items.append(item)
-        
-        if self.show_vzn_cb.value:
-            # ВЗН (из обоих календарей)
-            for item in self.all_shifts:
-                if isinstance(item, CashWithdrawal):
-                    all_items.append(item)
-                elif isinstance(item, DutyShift) and hasattr(item, 'description') and item.description and "ВЗН" in item.description:
-                    all_items.append(item)
-        
-        # Поиск по сотруднику
-        employee_query = self.employee_search_field.value.lower() if self.employee_search_field.value else ""
-        if employee_query:
-            all_items = [item for item in all_items if employee_query in item.employee.full_name.lower()]
-        
-        # Поиск по объекту
-        object_query = self.object_search_field.value.lower() if self.object_search_field.value else ""
-        if object_query:
-            filtered_items = []
-            for item in all_items:
-                if hasattr(item, 'object') and item.object and object_query in item.object.name.lower():
-                    filtered_items.append(item)
-                elif hasattr(item, 'description') and item.description and object_query in item.description.lower():
-                    filtered_items.append(item)
-            all_items = filtered_items
-        
-        self.shifts_list_view.controls.clear()
-        
-        if not all_items:
-            self.shifts_list_view.controls.append(ft.Text(self._get_no_shifts_text(), size=16, color=ft.Colors.GREY))
-        else:
-            start = self.shifts_page * self.shifts_page_size
-            end = start + self.shifts_page_size
-            page_items = all_items[start:end]
-            
-            for item in page_items:
-                self.shifts_list_view.controls.append(self._create_shift_list_item(item))
-        
-        total_pages = (len(all_items) + self.shifts_page_size - 1) // self.shifts_page_size if all_items else 1
-        self.shifts_page_text.value = f"Страница {self.shifts_page + 1} из {total_pages}"
-        
-        if self.page:
-            self.page.update()
+    def _shift_item_signature(self, shift):
+        """Строка смены зависит и от конфликтов сотрудника за день"""
+        return dict(shift.__data__), self._get_shift_conflicts(shift)
 
 def accounting_calendar_page(page=None):
     calendar_instance = AccountingCalendarPage(page)
@@ -58,7 +58,6 @@ def administration_page(page: ft.Page = None):
             )
             
             # Поиск сотрудников
-            employees = auth_manager.get_all_employees()
             selected_employee = {"id": None, "type": None}
             
             # Определяем текущего сотрудника
@@ -88,9 +87,7 @@ def administration_page(page: ft.Page = None):
             def update_employee_list(search_text):
                 employee_list.controls.clear()
                 if search_text and search_text != current_employee_text:
-                    filtered = [(emp_id, name, emp_type) for emp_id, name, emp_type in employees 
-                               if search_text.lower() in name.lower()]
-                    for emp_id, name, emp_type in filtered[:5]:
+                    for emp_id, name, emp_type in auth_manager.search_employees(search_text, limit=5):
                         employee_list.controls.append(
                             ft.TextButton(
                                 text=f"{name} ({emp_type})",
@@ -176,7 +173,6 @@ def administration_page(page: ft.Page = None):
             )
             
             # Поиск сотрудников
-            employees = auth_manager.get_all_employees()
             selected_employee = {"id": None, "type": None}
             
             employee_search = ft.TextField(
@@ -190,9 +186,7 @@ def administration_page(page: ft.Page = None):
             def update_employee_list(search_text):
                 employee_list.controls.clear()
                 if search_text:
-                    filtered = [(emp_id, name, emp_type) for emp_id, name, emp_type in employees 
-                               if search_text.lower() in name.lower()]
-                    for emp_id, name, emp_type in filtered[:5]:  # Показываем только 5 результатов
+                    for emp_id, name, emp_type in auth_manager.search_employees(search_text, limit=5):  # Показываем только 5 результатов
                         employee_list.controls.append(
                             ft.TextButton(
                                 text=f"{name} ({emp_type})",
@@ -2,7 +2,7 @@ import flet as ft
 import datetime
 from database.models import Assignment, Employee, Object, ChiefEmployee, ChiefObjectAssignment, CashWithdrawal, db
 from peewee import *
-from views.settings import load_cell_shape_from_db
+from database.settings_registry import settings_registry
 from base.base_calendar import BaseCalendar
 
 # Словарь русских названий месяцев
@@ -15,6 +15,9 @@ RUSSIAN_MONTHS = {
 class CalendarPage(BaseCalendar):
     """Страница календаря смен"""
     
+    CALENDAR_KIND = 'chief'
+    SHIFT_SOURCES = ('chief', 'vzn')
+    
     def __init__(self, page: ft.Page):
         super().__init__(page)
         self.current_assignment = None
@@ -25,7 +28,7 @@ class CalendarPage(BaseCalendar):
         return "Календарь начальника охраны"
     
     def _get_shifts_dialog_title(self):
-        return "Смены на дату"
+        return "Смены"
     
     def _get_add_shift_dialog_title(self):
         return "Добавить смену"
@@ -59,16 +62,11 @@ class CalendarPage(BaseCalendar):
         
         return cache
     
-    def _get_shifts_for_date(self, date_obj):
-        """Возвращает смены для даты"""
-        assignments = Assignment.select().join(Employee).switch(Assignment).join(Object).where(Assignment.date == date_obj)
-        vzn_records = CashWithdrawal.select().join(Employee).where(CashWithdrawal.date == date_obj)
-        return list(assignments), list(vzn_records)
-    
     def _create_shift_list_item(self, shift):
         """Создает элемент списка смены"""
-        # Этот метод не используется, так как переопределен update_shifts_list
-        pass
+        if isinstance(shift, Assignment):
+            return self._create_assignment_item(shift)
+        return self._create_vzn_item(shift)  # CashWithdrawal
     
     def _init_calendar_specific_components(self):
         """Инициализация специфичных компонентов"""
@@ -79,20 +77,21 @@ class CalendarPage(BaseCalendar):
     def _create_calendar_dialogs(self):
         """Создает диалоги"""
         self.shifts_list_view = ft.ListView(expand=True, spacing=5, height=500)
-        self.shifts_page_text = ft.Text("Страница 1")
+        self.shifts_page_text = ft.Text("", color=ft.Colors.GREY)
+        self.shift_rows = self._create_shift_rows()
         
         # Контролы поиска и фильтрации
-        self.show_assignments_cb = ft.Checkbox(label="Обычные смены", value=True, on_change=lambda e: self.update_shifts_list())
+        self.show_shifts_cb = ft.Checkbox(label="Обычные смены", value=True, on_change=lambda e: self.update_shifts_list())
         self.show_vzn_cb = ft.Checkbox(label="ВЗН", value=True, on_change=lambda e: self.update_shifts_list())
-        self.employee_search_field = ft.TextField(label="Поиск по сотруднику", width=200, on_change=lambda e: self.reset_page_and_update())
-        self.object_search_field = ft.TextField(label="Поиск по объекту", width=200, on_change=lambda e: self.reset_page_and_update())
+        self.employee_search_field = ft.TextField(label="Поиск по сотруднику", width=200, on_change=self._on_shifts_filter_change)
+        self.object_search_field = ft.TextField(label="Поиск по объекту", width=200, on_change=self._on_shifts_filter_change)
         
         self.shifts_dialog = ft.AlertDialog(
             modal=True,
             title=ft.Text("Смены на дату"),
             content=ft.Column([
                 ft.Row([
-                    self.show_assignments_cb,
+                    self.show_shifts_cb,
                     self.show_vzn_cb
                 ], alignment=ft.MainAxisAlignment.START),
                 ft.Row([
@@ -102,9 +101,7 @@ class CalendarPage(BaseCalendar):
                 ft.Divider(),
                 self.shifts_list_view,
                 ft.Row([
-                    ft.IconButton(ft.Icons.ARROW_BACK, on_click=lambda e: self.prev_shifts_page()),
-                    self.shifts_page_text,
-                    ft.IconButton(ft.Icons.ARROW_FORWARD, on_click=lambda e: self.next_shifts_page())
+                    self.shifts_page_text
                 ], alignment=ft.MainAxisAlignment.CENTER)
             ], height=650, width=900),
             actions=[
@@ -274,10 +271,7 @@ class CalendarPage(BaseCalendar):
                 return True
             
             if self.safe_db_operation(operation):
-                # Обновляем кеш для удаленной даты
-                if hasattr(self, '_shifts_cache') and self.current_shift_date in self._shifts_cache:
-                    self._shifts_cache[self.current_shift_date] = max(0, self._shifts_cache[self.current_shift_date] - 1)
-                
+                self._invalidate_months('Assignment', self.current_assignment.date)
                 try:
                     self.delete_confirm_dialog.open = False
                     self.edit_dialog.open = False
@@ -374,82 +368,17 @@ class CalendarPage(BaseCalendar):
                 return True
             
             if self.safe_db_operation(operation):
+                self._invalidate_months('Assignment', self.current_assignment.date)
                 self.close_edit_dialog()
                 self.update_calendar()
                 self.show_shifts_for_date(self.current_shift_date)
     
     def show_shifts_for_date(self, date_obj):
-        self.current_shift_date = date_obj
-        self.shifts_page = 0
-        
-        # Открываем диалог сразу с заглушкой
-        self.shifts_dialog.title.value = f"Смены на {date_obj.strftime('%d.%m.%Y')}"
-        self.shifts_list_view.controls.clear()
-        self.shifts_list_view.controls.append(ft.Text("Загрузка...", size=16))
-        self.shifts_page_text.value = "Страница 1"
-        
         self.page.dialog = self.shifts_dialog
-        self.shifts_dialog.open = True
-        self.page.update()
-        
-        # Загружаем данные асинхронно
-        def operation():
-            assignments = Assignment.select().join(Employee).switch(Assignment).join(Object).where(Assignment.date == date_obj)
-            vzn_records = CashWithdrawal.select().join(Employee).where(CashWithdrawal.date == date_obj)
-            return list(assignments), list(vzn_records)
-        
-        result = self.safe_db_operation(operation)
-        self.all_assignments = result[0] if result else []
-        self.all_vzn_records = result[1] if result else []
-        
-        self.update_shifts_list()
-    
-    def reset_page_and_update(self):
-        """Сбрасывает на первую страницу и обновляет список"""
-        self.shifts_page = 0
-        self.update_shifts_list()
-    
-    def update_shifts_list(self):
-        """Обновляет список смен с пагинацией"""
-        # Фильтрация по типу
-        all_items = []
-        if self.show_assignments_cb.value:
-            all_items.extend(self.all_assignments)
-        if self.show_vzn_cb.value:
-            all_items.extend(self.all_vzn_records)
-        
-        # Поиск по сотруднику
-        employee_query = self.employee_search_field.value.lower() if self.employee_search_field.value else ""
-        if employee_query:
-            all_items = [item for item in all_items if employee_query in item.employee.full_name.lower()]
-        
-        # Поиск по объекту
-        object_query = self.object_search_field.value.lower() if self.object_search_field.value else ""
-        if object_query:
-            all_items = [item for item in all_items if object_query in item.object.name.lower()]
-        
-        self.shifts_list_view.controls.clear()
-        
-        if not all_items:
-            self.shifts_list_view.controls.append(ft.Text("На эту дату смен и ВЗН нет", size=16, color=ft.Colors.GREY))
-        else:
-            start = self.shifts_page * self.shifts_page_size
-            end = start + self.shifts_page_size
-            page_items = all_items[start:end]
-            
-            for item in page_items:
-                if isinstance(item, Assignment):
-                    self.add_assignment_card(item)
-                else:  # CashWithdrawal
-                    self.add_vzn_card(item)
-        
-        total_pages = (len(all_items) + self.shifts_page_size - 1) // self.shifts_page_size if all_items else 1
-        self.shifts_page_text.value = f"Страница {self.shifts_page + 1} из {total_pages}"
-        
-        self.page.update()
+        super().show_shifts_for_date(date_obj)
     
-    def add_assignment_card(self, assignment):
-        """Добавляет элемент смены"""
+    def _create_assignment_item(self, assignment):
+        """Элемент смены"""
         subtitle_parts = [f"Объект: {assignment.object.name}", f"Часы: {assignment.hours}"]
         
         if assignment.is_absent:
@@ -459,17 +388,15 @@ class CalendarPage(BaseCalendar):
         if float(assignment.deduction_amount) > 0:
             subtitle_parts.append(f"Удержание: {assignment.deduction_amount} ₽")
         
-        self.shifts_list_view.controls.append(
-            ft.ListTile(
-                leading=ft.Icon(ft.Icons.WORK),
-                title=ft.Text(assignment.employee.full_name, weight="bold"),
-                subtitle=ft.Text(" | ".join(subtitle_parts)),
-                trailing=ft.IconButton(icon=ft.Icons.EDIT, on_click=lambda e, a=assignment: self.edit_shift(a))
-            )
+        return ft.ListTile(
+            leading=ft.Icon(ft.Icons.WORK),
+            title=ft.Text(assignment.employee.full_name, weight="bold"),
+            subtitle=ft.Text(" | ".join(subtitle_parts)),
+            trailing=ft.IconButton(icon=ft.Icons.EDIT, on_click=lambda e, a=assignment: self.edit_shift(a))
         )
     
-    def add_vzn_card(self, vzn):
-        """Добавляет элемент ВЗН"""
+    def _create_vzn_item(self, vzn):
+        """Элемент ВЗН"""
         subtitle_parts = [f"Объект: {vzn.object.name}", f"Часы: {vzn.hours}", "ВЗН"]
         
         if vzn.is_absent:
@@ -479,69 +406,16 @@ class CalendarPage(BaseCalendar):
         if float(vzn.deduction_amount) > 0:
             subtitle_parts.append(f"Удержание: {vzn.deduction_amount} ₽")
         
-        self.shifts_list_view.controls.append(
-            ft.ListTile(
-                leading=ft.Icon(ft.Icons.ATTACH_MONEY, color=ft.Colors.PURPLE),
-                title=ft.Text(vzn.employee.full_name, weight="bold"),
-                subtitle=ft.Text(" | ".join(subtitle_parts)),
-                trailing=ft.IconButton(icon=ft.Icons.EDIT, on_click=lambda e, vzn_record=vzn: self.edit_vzn(vzn_record))
-            )
+        return ft.ListTile(
+            leading=ft.Icon(ft.Icons.ATTACH_MONEY, color=ft.Colors.PURPLE),
+            title=ft.Text(vzn.employee.full_name, weight="bold"),
+            subtitle=ft.Text(" | ".join(subtitle_parts)),
+            trailing=ft.IconButton(icon=ft.Icons.EDIT, on_click=lambda e, vzn_record=vzn: self.edit_vzn(vzn_record))
         )
     
-    def prev_shifts_page(self):
-        """Предыдущая страница смен"""
-        if self.shifts_page > 0:
-            self.shifts_page -= 1
-            self.update_shifts_list()
-    
-    def next_shifts_page(self):
-        """Следующая страница смен"""
-        all_items = self.all_assignments + self.all_vzn_records
-        total_pages = (len(all_items) + self.shifts_page_size - 1) // self.shifts_page_size
-        if self.shifts_page < total_pages - 1:
-            self.shifts_page += 1
-            self.update_shifts_list()
-    
-    def get_shifts_count_for_date(self, date_obj):
-        if not hasattr(self, '_shifts_cache'):
-            self._load_shifts_cache()
-        return self._shifts_cache.get(date_obj, 0)
-    
-    def _load_shifts_cache(self):
-        """Загружает количество смен для всего месяца одним запросом"""
-        def operation():
-            first_day = datetime.date(self.current_year, self.current_month, 1)
-            if self.current_month == 12:
-                last_day = datetime.date(self.current_year + 1, 1, 1) - datetime.timedelta(days=1)
-            else:
-                last_day = datetime.date(self.current_year, self.current_month + 1, 1) - datetime.timedelta(days=1)
-            
-            # Подсчитываем обычные смены
-            assignments = Assignment.select(Assignment.date, fn.COUNT(Assignment.id).alias('count')).where(
-                (Assignment.date >= first_day) & (Assignment.date <= last_day)
-            ).group_by(Assignment.date)
-            
-            # Подсчитываем ВЗН
-            vzn_records = CashWithdrawal.select(CashWithdrawal.date, fn.COUNT(CashWithdrawal.id).alias('count')).where(
-                (CashWithdrawal.date >= first_day) & (CashWithdrawal.date <= last_day)
-            ).group_by(CashWithdrawal.date)
-            
-            cache = {}
-            # Добавляем обычные смены
-            for assignment in assignments:
-                cache[assignment.date] = assignment.count
-            
-            # Добавляем ВЗН к общему количеству
-            for vzn in vzn_records:
-                cache[vzn.date] = cache.get(vzn.date, 0) + vzn.count
-            
-            return cache
-        
-        self._shifts_cache = self.safe_db_operation(operation) or {}
-    
     def create_day_cell(self, day, date_obj):
         shifts_count = self.get_shifts_count_for_date(date_obj)
-        cell_shape = load_cell_shape_from_db()
+        cell_shape = settings_registry.get('cell_shape')
         border_radius = 25 if cell_shape == "round" else 5
         
         return ft.Container(
@@ -594,71 +468,42 @@ class CalendarPage(BaseCalendar):
             ])
         ])
     
-    def update_calendar(self):
-        # Сбрасываем кеш при смене месяца
-        if hasattr(self, '_shifts_cache'):
-            delattr(self, '_shifts_cache')
-        
-        self.current_month_display.value = f"{RUSSIAN_MONTHS[self.current_month]} {self.current_year}"
-        self.calendar_grid_container.controls = [self.get_calendar_grid(self.current_year, self.current_month)]
-        if self.page:
-            self.page.update()
-    
-    def change_month(self, direction):
-        if direction == -1:
-            self.current_month -= 1
-            if self.current_month < 1:
-                self.current_month = 12
-                self.current_year -= 1
-        else:
-            self.current_month += 1
-            if self.current_month > 12:
-                self.current_month = 1
-                self.current_year += 1
-        self.update_calendar()
-    
     def search_employees(self, query):
-        if not query or len(query) < 2:
-            self.search_results.visible = False
-            if self.page:
-                self.page.update()
-            return
+        self._lookup("employees", self._find_employees, self._show_employees_results, self.search_results, self._matches_employee).submit(query)
+    
+    def _find_employees(self, query):
+        from datetime import date
+        today = date.today()
         
-        def operation():
-            from datetime import date
-            today = date.today()
+        # Лучшие совпадения по ФИО (с запасом: часть отсеется по срокам документов)
+        from database.name_index import name_index, load_ranked
+        employees = []
+        all_employees = load_ranked(Employee, name_index.search(query, 50, types=('guard',), terminated=False))
+        
+        for emp in all_employees:
+            valid = True
             
-            employees = []
-            all_employees = Employee.select().where(
-                (Employee.full_name.contains(query)) & 
-                (Employee.termination_date.is_null())
-            )
+            if emp.guard_license_date:
+                guard_expiry = emp.guard_license_date.replace(year=emp.guard_license_date.year + 5)
+                if guard_expiry < today:
+                    valid = False
             
-            for emp in all_employees:
-                valid = True
-                
-                if emp.guard_license_date:
-                    guard_expiry = emp.guard_license_date.replace(year=emp.guard_license_date.year + 5)
-                    if guard_expiry < today:
-                        valid = False
-                
-                if emp.medical_exam_date:
-                    medical_expiry = emp.medical_exam_date.replace(year=emp.medical_exam_date.year + 1)
-                    if medical_expiry < today:
-                        valid = False
-                
-                if emp.periodic_check_date:
-                    periodic_expiry = emp.periodic_check_date.replace(year=emp.periodic_check_date.year + 1)
-                    if periodic_expiry < today:
-                        valid = False
-                
-                if valid:
-                    employees.append(emp)
+            if emp.medical_exam_date:
+                medical_expiry = emp.medical_exam_date.replace(year=emp.medical_exam_date.year + 1)
+                if medical_expiry < today:
+                    valid = False
             
-            return employees[:5]
-        
-        employees = self.safe_db_operation(operation) or []
+            if emp.periodic_check_date:
+                periodic_expiry = emp.periodic_check_date.replace(year=emp.periodic_check_date.year + 1)
+                if periodic_expiry < today:
+                    valid = False
+            
+            if valid:
+                employees.append(emp)
         
+        return employees[:5]
+    
+    def _show_employees_results(self, query, employees):
         self.search_results.controls.clear()
         if employees:
             for emp in employees:
@@ -669,8 +514,6 @@ class CalendarPage(BaseCalendar):
         else:
             self.search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
             self.search_results.visible = True
-        if self.page:
-            self.page.update()
     
     def select_employee(self, employee):
         self.employee_search.value = employee.full_name
@@ -815,55 +658,47 @@ class CalendarPage(BaseCalendar):
             return True
         
         if self.safe_db_operation(operation):
-            # Обновляем кеш для добавленной даты
-            if hasattr(self, '_shifts_cache'):
-                self._shifts_cache[self.current_shift_date] = self._shifts_cache.get(self.current_shift_date, 0) + 1
-            
+            self._invalidate_months('Assignment', self.current_shift_date)
             self.close_add_shift_dialog()
             self.update_calendar()
             self.show_shifts_for_date(self.current_shift_date)
     
     def search_vzn_employees(self, query):
-        if not query or len(query) < 2:
-            self.vzn_search_results.visible = False
-            self.page.update()
-            return
+        self._lookup("vzn_employees", self._find_vzn_employees, self._show_vzn_employees_results, self.vzn_search_results, self._matches_employee).submit(query)
+    
+    def _find_vzn_employees(self, query):
+        from datetime import date
+        today = date.today()
         
-        def operation():
-            from datetime import date
-            today = date.today()
+        # Лучшие совпадения по ФИО (с запасом: часть отсеется по срокам документов)
+        from database.name_index import name_index, load_ranked
+        employees = []
+        all_employees = load_ranked(Employee, name_index.search(query, 50, types=('guard',), terminated=False))
+        
+        for emp in all_employees:
+            valid = True
             
-            employees = []
-            all_employees = Employee.select().where(
-                (Employee.full_name.contains(query)) & 
-                (Employee.termination_date.is_null())
-            )
+            if emp.guard_license_date:
+                guard_expiry = emp.guard_license_date.replace(year=emp.guard_license_date.year + 5)
+                if guard_expiry < today:
+                    valid = False
             
-            for emp in all_employees:
-                valid = True
-                
-                if emp.guard_license_date:
-                    guard_expiry = emp.guard_license_date.replace(year=emp.guard_license_date.year + 5)
-                    if guard_expiry < today:
-                        valid = False
-                
-                if emp.medical_exam_date:
-                    medical_expiry = emp.medical_exam_date.replace(year=emp.medical_exam_date.year + 1)
-                    if medical_expiry < today:
-                        valid = False
-                
-                if emp.periodic_check_date:
-                    periodic_expiry = emp.periodic_check_date.replace(year=emp.periodic_check_date.year + 1)
-                    if periodic_expiry < today:
-                        valid = False
-                
-                if valid:
-                    employees.append(emp)
+            if emp.medical_exam_date:
+                medical_expiry = emp.medical_exam_date.replace(year=emp.medical_exam_date.year + 1)
+                if medical_expiry < today:
+                    valid = False
             
-            return employees[:5]
-        
-        employees = self.safe_db_operation(operation) or []
+            if emp.periodic_check_date:
+                periodic_expiry = emp.periodic_check_date.replace(year=emp.periodic_check_date.year + 1)
+                if periodic_expiry < today:
+                    valid = False
+            
+            if valid:
+                employees.append(emp)
         
+        return employees[:5]
+    
+    def _show_vzn_employees_results(self, query, employees):
         self.vzn_search_results.controls.clear()
         if employees:
             for emp in employees:
@@ -874,7 +709,6 @@ class CalendarPage(BaseCalendar):
         else:
             self.vzn_search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
             self.vzn_search_results.visible = True
-        self.page.update()
     
     def select_vzn_employee(self, employee):
         self.vzn_employee_search.value = employee.full_name
@@ -882,16 +716,12 @@ class CalendarPage(BaseCalendar):
         self.page.update()
     
     def search_vzn_objects(self, query):
-        if not query or len(query) < 2:
-            self.vzn_object_search_results.visible = False
-            self.page.update()
-            return
-        
-        def operation():
-            return list(Object.select().where(Object.name.contains(query))[:5])
-        
-        objects = self.safe_db_operation(operation) or []
-        
+        self._lookup("vzn_objects", self._find_vzn_objects, self._show_vzn_objects_results, self.vzn_object_search_results, self._matches_object).submit(query)
+    
+    def _find_vzn_objects(self, query):
+        return list(Object.select().where(Object.name.contains(query))[:5])
+    
+    def _show_vzn_objects_results(self, query, objects):
         self.vzn_object_search_results.controls.clear()
         if objects:
             for obj in objects:
@@ -902,7 +732,6 @@ class CalendarPage(BaseCalendar):
         else:
             self.vzn_object_search_results.controls.append(ft.Text("Объект не найден", color=ft.Colors.ERROR))
             self.vzn_object_search_results.visible = True
-        self.page.update()
     
     def select_vzn_object(self, obj):
         self.vzn_object_search.value = obj.name
@@ -1043,7 +872,9 @@ class CalendarPage(BaseCalendar):
             return True
         
         if self.safe_db_operation(operation):
+            self._invalidate_months('CashWithdrawal', self.current_shift_date)
             self.close_add_vzn_dialog()
+            self.update_calendar()
             self.show_shifts_for_date(self.current_shift_date)
     
     def delete_vzn(self, vzn_record):
@@ -1052,6 +883,8 @@ class CalendarPage(BaseCalendar):
             return True
         
         if self.safe_db_operation(operation):
+            self._invalidate_months('CashWithdrawal', vzn_record.date)
+            self.update_calendar()
             self.show_shifts_for_date(self.current_shift_date)
     
     def edit_vzn(self, vzn_record):
@@ -1101,6 +934,7 @@ class CalendarPage(BaseCalendar):
                 return True
             
             if self.safe_db_operation(operation):
+                self._invalidate_months('CashWithdrawal', self.current_vzn.date)
                 self.close_vzn_edit_dialog()
                 self.show_shifts_for_date(self.current_shift_date)
     
@@ -1111,7 +945,9 @@ class CalendarPage(BaseCalendar):
                 return True
             
             if self.safe_db_operation(operation):
+                self._invalidate_months('CashWithdrawal', self.current_vzn.date)
                 self.close_vzn_edit_dialog()
+                self.update_calendar()
                 self.show_shifts_for_date(self.current_shift_date)
     
     def close_vzn_edit_dialog(self):
@@ -1,11 +1,13 @@
 import flet as ft
-from database.models import ChiefEmployee, Object, ChiefObjectAssignment, db
+from database.models import ChiefEmployee, Object, ChiefObjectAssignment
+from database.session import db_session
 from datetime import datetime
 from base.base_employee_page import BaseEmployeePage
 import os
 
 class ChiefEmployeesPage(BaseEmployeePage):
     """Страница начальников охраны"""
+    employee_kind = "chief"
     
     def _create_form_fields(self):
         """Создает поля формы"""
@@ -21,32 +23,21 @@ class ChiefEmployeesPage(BaseEmployeePage):
     def _get_base_query(self):
         return ChiefEmployee.select().where(ChiefEmployee.termination_date.is_null())
     
-    def _apply_name_filter(self, query):
-        return query.where(ChiefEmployee.full_name.contains(self.search_value))
-    
-    def _apply_company_filter(self, query, companies):
-        from database.models import EmployeeCompany, Company
-        company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-        employee_ids = [ec.chief_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-        return query.where(ChiefEmployee.id.in_(employee_ids))
-    
     def _apply_user_filter(self, query, user_id):
         return query.where(ChiefEmployee.created_by_user_id == user_id)
     
-    def _get_employee_companies(self, employee):
-        """Возвращает список компаний сотрудника"""
-        from database.models import EmployeeCompany, Company
-        companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.chief_employee == employee)]
-        return ", ".join(companies) if companies else "Не указано"
-    
     def _get_order_field(self):
         return ChiefEmployee.full_name
     
+    def _get_list_fields(self):
+        return [ChiefEmployee.id, ChiefEmployee.full_name, ChiefEmployee.position]
+    
     def _create_list_item(self, employee):
         return ft.ListTile(
+            leading=self.get_list_avatar(employee),
             title=ft.Text(employee.full_name, weight="bold"),
             subtitle=ft.Text(f"Должность: {employee.position}"),
-            on_click=lambda e, emp=employee: self.show_detail_dialog(emp)
+            on_click=lambda e, emp_id=employee.id: self.open_employee(emp_id, self.show_detail_dialog)
         )
     
     def _get_detail_title(self):
@@ -115,15 +106,11 @@ class ChiefEmployeesPage(BaseEmployeePage):
         # Получаем закрепленные объекты
         assigned_objects = []
         try:
-            if db.is_closed():
-                db.connect()
-            assignments = ChiefObjectAssignment.select().where(ChiefObjectAssignment.chief == employee)
-            assigned_objects = [assignment.object.name for assignment in assignments]
+            with db_session():
+                assignments = ChiefObjectAssignment.select().where(ChiefObjectAssignment.chief == employee)
+                assigned_objects = [assignment.object.name for assignment in assignments]
         except Exception as e:
             print(f"Ошибка получения объектов: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
         
         objects_text = ", ".join(assigned_objects) if assigned_objects else "Нет закрепленных объектов"
         
@@ -187,11 +174,8 @@ class ChiefEmployeesPage(BaseEmployeePage):
         )
         
         # Сохраняем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        for checkbox in self.company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(chief_employee=employee, company=company)
+        self._save_employee_companies(employee, self.company_checkboxes)
+        self._index_employee_name(employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
@@ -232,8 +216,7 @@ class ChiefEmployeesPage(BaseEmployeePage):
         self.edit_staff_status_dropdown.value = getattr(employee, 'staff_status', 'в штате')
         self.edit_criminal_liability_dropdown.value = getattr(employee, 'criminal_liability', 'нет')
         # Заполняем чекбоксы компаний
-        from database.models import EmployeeCompany, Company
-        employee_companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.chief_employee == employee)]
+        employee_companies = self._get_dossier(employee).companies
         for checkbox in self.edit_company_checkboxes:
             checkbox.value = checkbox.label in employee_companies
         # Обновляем текст кнопки
@@ -271,17 +254,11 @@ class ChiefEmployeesPage(BaseEmployeePage):
         self.current_employee.staff_status = self.edit_staff_status_dropdown.value or "в штате"
         self.current_employee.criminal_liability = self.edit_criminal_liability_dropdown.value or "нет"
         
-        self.current_employee.save()
+        self._save_changed_fields(self.current_employee)
         
-        # Обновляем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        # Удаляем старые связи
-        EmployeeCompany.delete().where(EmployeeCompany.chief_employee == self.current_employee).execute()
-        # Создаем новые
-        for checkbox in self.edit_company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(chief_employee=self.current_employee, company=company)
+        # Обновляем связи с компаниями (старые удаляются)
+        self._save_employee_companies(self.current_employee, self.edit_company_checkboxes, replace=True)
+        self._index_employee_name(self.current_employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
@@ -297,73 +274,63 @@ class ChiefEmployeesPage(BaseEmployeePage):
     def show_objects_dialog(self, chief):
         """Показывает диалог управления объектами"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                # Получаем все объекты
+                all_objects = list(Object.select())
             
-            # Получаем все объекты
-            all_objects = list(Object.select())
+                # Получаем уже назначенные объекты
+                assigned_objects = set()
+                assignments = ChiefObjectAssignment.select().where(ChiefObjectAssignment.chief == chief)
+                for assignment in assignments:
+                    assigned_objects.add(assignment.object.id)
             
-            # Получаем уже назначенные объекты
-            assigned_objects = set()
-            assignments = ChiefObjectAssignment.select().where(ChiefObjectAssignment.chief == chief)
-            for assignment in assignments:
-                assigned_objects.add(assignment.object.id)
+                # Создаем чекбоксы для объектов
+                object_checkboxes = []
+                for obj in all_objects:
+                    checkbox = ft.Checkbox(
+                        label=obj.name,
+                        value=obj.id in assigned_objects,
+                        data=obj.id
+                    )
+                    object_checkboxes.append(checkbox)
             
-            # Создаем чекбоксы для объектов
-            object_checkboxes = []
-            for obj in all_objects:
-                checkbox = ft.Checkbox(
-                    label=obj.name,
-                    value=obj.id in assigned_objects,
-                    data=obj.id
-                )
-                object_checkboxes.append(checkbox)
-            
-            def save_assignments():
-                try:
-                    if db.is_closed():
-                        db.connect()
-                    
-                    # Удаляем все текущие назначения
-                    ChiefObjectAssignment.delete().where(ChiefObjectAssignment.chief == chief).execute()
+                def save_assignments():
+                    try:
+                        with db_session():
+                            # Удаляем все текущие назначения
+                            ChiefObjectAssignment.delete().where(ChiefObjectAssignment.chief == chief).execute()
                     
-                    # Добавляем новые назначения
-                    for checkbox in object_checkboxes:
-                        if checkbox.value:
-                            obj = Object.get_by_id(checkbox.data)
-                            ChiefObjectAssignment.create(chief=chief, object=obj)
+                            # Добавляем новые назначения
+                            for checkbox in object_checkboxes:
+                                if checkbox.value:
+                                    obj = Object.get_by_id(checkbox.data)
+                                    ChiefObjectAssignment.create(chief=chief, object=obj)
                     
-                    self.page.close(objects_dialog)
-                    self.show_snackbar("Объекты обновлены!")
+                            self.page.close(objects_dialog)
+                            self.show_snackbar("Объекты обновлены!")
                     
-                except Exception as e:
-                    self.show_snackbar(f"Ошибка: {str(e)}", True)
-                finally:
-                    if not db.is_closed():
-                        db.close()
+                    except Exception as e:
+                        self.show_snackbar(f"Ошибка: {str(e)}", True)
             
-            objects_dialog = ft.AlertDialog(
-                title=ft.Text(f"Управление объектами - {chief.full_name}"),
-                content=ft.Container(
-                    content=ft.Column(object_checkboxes, scroll=ft.ScrollMode.AUTO),
-                    width=400,
-                    height=300
-                ),
-                actions=[
-                    ft.TextButton("Сохранить", on_click=lambda e: save_assignments()),
-                    ft.TextButton("Отмена", on_click=lambda e: self.page.close(objects_dialog))
-                ]
-            )
+                objects_dialog = ft.AlertDialog(
+                    title=ft.Text(f"Управление объектами - {chief.full_name}"),
+                    content=ft.Container(
+                        content=ft.Column(object_checkboxes, scroll=ft.ScrollMode.AUTO),
+                        width=400,
+                        height=300
+                    ),
+                    actions=[
+                        ft.TextButton("Сохранить", on_click=lambda e: save_assignments()),
+                        ft.TextButton("Отмена", on_click=lambda e: self.page.close(objects_dialog))
+                    ]
+                )
             
-            self.page.overlay.append(objects_dialog)
-            self.page.update()
-            self.page.open(objects_dialog)
+                self.page.overlay.append(objects_dialog)
+                self.page.update()
+                self.page.open(objects_dialog)
             
         except Exception as e:
             self.show_snackbar(f"Ошибка: {str(e)}", True)
-        finally:
-            if not db.is_closed():
-                db.close()
 
 
     
@@ -1,5 +1,9 @@
 import flet as ft
-from database.models import PersonalCard, GuardEmployee, ChiefEmployee, Company, db
+from database.models import PersonalCard
+from database.session import db_session
+from database.company_index import company_index
+from base.search_controller import SearchController
+from base.infinite_list import InfiniteList
 from datetime import datetime
 import os
 
@@ -22,23 +26,26 @@ def discarded_cards_page(page: ft.Page = None):
     
     current_card = None
     
-    def show_card_actions(card):
+    def show_card_actions(row):
+        """Загружает полную карточку по строке списка и показывает действия"""
         nonlocal current_card
-        current_card = card
-        
-        # Определяем сотрудника
-        employee_name = "Неизвестно"
-        if card.guard_employee:
-            employee_name = card.guard_employee.full_name
-        elif card.chief_employee:
-            employee_name = card.chief_employee.full_name
+        try:
+            with db_session():
+                from database.projections import load_full
+                current_card = load_full(PersonalCard, row.id)
+        except Exception as ex:
+            print(f"Ошибка загрузки карточки: {ex}")
+            return
+        if current_card is None:
+            refresh_list()
+            return
         
-        actions_dialog.title.value = f"Карточка: {employee_name}"
+        actions_dialog.title.value = f"Карточка: {row.employee_name}"
         actions_dialog.content.controls = [
-            ft.Text(f"Сотрудник: {employee_name}", weight="bold"),
-            ft.Text(f"Компания: {card.company.name}"),
-            ft.Text(f"Дата выдачи: {format_date(card.issue_date)}"),
-            ft.Text(f"Дата списания: {format_date(card.discarded_date)}", color=ft.Colors.RED),
+            ft.Text(f"Сотрудник: {row.employee_name}", weight="bold"),
+            ft.Text(f"Компания: {row.company_name}"),
+            ft.Text(f"Дата выдачи: {format_date(row.issue_date)}"),
+            ft.Text(f"Дата списания: {format_date(row.discarded_date)}", color=ft.Colors.RED),
             ft.Text(f"Статус: Списана", color=ft.Colors.RED),
             ft.Divider(),
         ]
@@ -57,149 +64,152 @@ def discarded_cards_page(page: ft.Page = None):
     def restore_card(card):
         """Восстанавливает карточку (убирает пометку о списании)"""
         try:
-            if db.is_closed():
-                db.connect()
-            card.is_discarded = False
-            card.discarded_date = None
-            card.save()
-            close_actions_dialog()
-            refresh_list()
+            with db_session():
+                card.is_discarded = False
+                card.discarded_date = None
+                card.save()
+                # Карточка снова видна в карточке сотрудника
+                from database.dossier import dossier_cache
+                if card.guard_employee_id:
+                    dossier_cache.invalidate('guard', card.guard_employee_id)
+                if card.chief_employee_id:
+                    dossier_cache.invalidate('chief', card.chief_employee_id)
+                close_actions_dialog()
+                refresh_list()
         except Exception as ex:
             print(f"Ошибка восстановления: {ex}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def delete_card_permanently(card):
         """Удаляет карточку навсегда"""
         try:
-            if db.is_closed():
-                db.connect()
-            card.delete_instance()
-            close_actions_dialog()
-            refresh_list()
+            with db_session():
+                from database.blob_store import release_blob
+                blob_id = card.file_blob_id
+                card.delete_instance()
+                release_blob(blob_id)
+                close_actions_dialog()
+                refresh_list()
         except Exception as ex:
             print(f"Ошибка удаления: {ex}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def view_card(card):
-        """Просматривает карточку"""
-        if hasattr(card, 'file_base64') and card.file_base64:
-            # Показываем изображение в диалоге
-            image_dialog = ft.AlertDialog(
-                title=ft.Text(f"Просмотр карточки"),
-                content=ft.Image(
-                    src_base64=card.file_base64,
-                    width=600,
-                    height=800,
-                    fit=ft.ImageFit.CONTAIN
-                ),
-                actions=[ft.TextButton("Закрыть", on_click=lambda e: setattr(image_dialog, 'open', False) or page.update())],
-                modal=True
-            )
-            page.overlay.append(image_dialog)
-            image_dialog.open = True
-            page.update()
-        else:
+        """
+        Просматривает карточку
+        
+        Изображение показывается в диалоге в base64 (путь к файлу на диске
+        открывается только в настольном клиенте). PDF и другие файлы
+        открываются в системном приложении.
+        """
+        import base64
+        from utils.file_cache import file_cache
+        file_path = None
+        if getattr(card, 'file_blob_id', None):
+            try:
+                with db_session():
+                    # Файл записывается в кэш на диске частями, повторный просмотр не обращается к БД
+                    file_path = file_cache.get_path(card.file_blob_id, card.filename or 'card')
+            except Exception as ex:
+                print(f"Ошибка загрузки файла: {ex}")
+        
+        if not file_path:
             print("Файл не найден")
+            return
+        
+        if os.path.splitext(str(file_path))[1].lower() not in ('.jpg', '.jpeg', '.png', '.bmp'):
+            open_file(file_path)
+            return
+        
+        # Показываем изображение в диалоге
+        with open(file_path, 'rb') as f:
+            image_base64 = base64.b64encode(f.read()).decode('utf-8')
+        image_dialog = ft.AlertDialog(
+            title=ft.Text(f"Просмотр карточки"),
+            content=ft.Image(
+                src_base64=image_base64,
+                width=600,
+                height=800,
+                fit=ft.ImageFit.CONTAIN
+            ),
+            actions=[ft.TextButton("Закрыть", on_click=lambda e: setattr(image_dialog, 'open', False) or page.update())],
+            modal=True
+        )
+        page.overlay.append(image_dialog)
+        image_dialog.open = True
+        page.update()
+    
+    def open_file(file_path):
+        """Открывает файл карточки в системном приложении (только в настольном клиенте)"""
+        import subprocess
+        import platform
+        
+        if page and page.web:
+            print("Файлы этого типа открываются только в настольном приложении")
+            return
+        try:
+            if platform.system() == 'Windows':
+                os.startfile(str(file_path))
+            elif platform.system() == 'Darwin':  # macOS
+                subprocess.run(['open', str(file_path)])
+            else:  # Linux
+                subprocess.run(['xdg-open', str(file_path)])
+        except Exception as ex:
+            print(f"Ошибка открытия файла: {ex}")
     
     def format_date(date):
         """Форматирует дату в строку дд.мм.гггг"""
         return date.strftime("%d.%m.%Y") if date else "Не указано"
     
-    def get_discarded_cards():
-        """Получает список списанных карточек"""
-        try:
-            if db.is_closed():
-                db.connect()
-            
-            query = PersonalCard.select().where(PersonalCard.is_discarded == True)
-            
-            # Фильтр по компаниям
-            companies = []
-            all_companies = list(Company.select())
-            
-            for company in all_companies:
-                attr_name = f"show_{company.name.lower().replace(' ', '_')}"
-                if getattr(discarded_cards_page, attr_name, True):
-                    companies.append(company.name)
-            
-            # Применяем фильтр только если выбрана не вся компания
-            if len(companies) < len(all_companies) and len(companies) > 0:
-                company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-                query = query.where(PersonalCard.company.in_(company_ids))
-            elif len(companies) == 0:
-                # Если ни одна компания не выбрана, ничего не показываем
-                query = query.where(False)
-            
-            if search_value:
-                # Поиск по имени сотрудника
-                guard_query = query.join(GuardEmployee, on=(PersonalCard.guard_employee == GuardEmployee.id)).where(
-                    GuardEmployee.full_name.contains(search_value)
-                )
-                chief_query = query.join(ChiefEmployee, on=(PersonalCard.chief_employee == ChiefEmployee.id)).where(
-                    ChiefEmployee.full_name.contains(search_value)
-                )
-                cards = list(guard_query) + list(chief_query)
-            else:
-                cards = list(query)
-            
-            # Сортировка по компании
-            cards.sort(key=lambda c: c.company.name)
-            
-            return cards
-        except Exception as e:
-            print(f"Ошибка получения карточек: {e}")
-            return []
-        finally:
-            if not db.is_closed():
-                db.close()
+    def discarded_cards_query():
+        """Запрос списанных карточек с учетом фильтра компаний и поиска"""
+        from database.discarded_cards import discarded_cards_query as build_query
+        all_companies = company_index.companies()
+        company_ids = [
+            company.id for company in all_companies
+            if getattr(discarded_cards_page, f"show_{company.name.lower().replace(' ', '_')}", True)
+        ]
+        # Фильтр применяется, только если выбраны не все компании
+        return build_query(
+            company_ids if len(company_ids) < len(all_companies) else None,
+            search_value
+        )
     
-    def refresh_list():
-        """Обновляет список списанных карточек"""
-        discarded_cards = get_discarded_cards()
-        cards_list.controls.clear()
+    def get_discarded_cards(after, limit):
+        """
+        Порция списанных карточек, отсортированных по компании
         
-        if discarded_cards:
-            for card in discarded_cards:
-                employee_name = "Неизвестно"
-                if card.guard_employee:
-                    employee_name = card.guard_employee.full_name
-                elif card.chief_employee:
-                    employee_name = card.chief_employee.full_name
-                
-                cards_list.controls.append(
-                    ft.ListTile(
-                        title=ft.Text(employee_name, weight="bold"),
-                        subtitle=ft.Text(f"Компания: {card.company.name} | Выдана: {format_date(card.issue_date)} | Списана: {format_date(card.discarded_date)}"),
-                        trailing=ft.Text("Списана", color=ft.Colors.RED),
-                        on_click=lambda e, c=card: show_card_actions(c)
-                    )
-                )
-        else:
-            cards_list.controls.append(
-                ft.Container(
-                    content=ft.Text("Нет списанных карточек", size=16, color=ft.Colors.GREY),
-                    alignment=ft.alignment.center,
-                    padding=20
-                )
-            )
-        
-        if page:
-            page.update()
+        Args:
+            after: (компания, id) последней загруженной строки или None
+            limit: число строк
+        """
+        from database.discarded_cards import discarded_cards_page as page_query
+        return list(page_query(discarded_cards_query(), after, limit).namedtuples())
+    
+    def refresh_list():
+        """Загружает список списанных карточек заново (в фоне, с первой порции)"""
+        cards_rows.reset()
+    
+    def create_card_item(row):
+        """Строка списка списанных карточек"""
+        return ft.ListTile(
+            title=ft.Text(row.employee_name, weight="bold"),
+            subtitle=ft.Text(f"Компания: {row.company_name} | Выдана: {format_date(row.issue_date)} | Списана: {format_date(row.discarded_date)}"),
+            trailing=ft.Text("Списана", color=ft.Colors.RED),
+            on_click=lambda e, r=row: show_card_actions(r)
+        )
+    
+    # Поиск после паузы в вводе
+    search = SearchController(lambda text, results: refresh_list())
     
     def on_search_change(e):
         nonlocal search_value
         search_value = e.control.value.strip()
-        refresh_list()
+        search.submit(search_value)
     
     def create_company_filter_dropdown():
         """Создает dropdown с чекбоксами для фильтрации компаний"""
         
         # Инициализируем фильтры для всех компаний
-        companies = list(Company.select())
+        companies = company_index.companies()
         for company in companies:
             attr_name = f"show_{company.name.lower().replace(' ', '_')}"
             if not hasattr(discarded_cards_page, attr_name):
@@ -274,6 +284,7 @@ def discarded_cards_page(page: ft.Page = None):
     company_button = create_company_filter_dropdown()
     
     # Создаем список
+    status_text = ft.Text("", color=ft.Colors.GREY)
     cards_list = ft.ListView(
         expand=True,
         spacing=5,
@@ -281,6 +292,17 @@ def discarded_cards_page(page: ft.Page = None):
         height=500
     )
     
+    # Строки загружаются порциями при прокрутке
+    cards_rows = InfiniteList(
+        cards_list,
+        get_discarded_cards,
+        create_card_item,
+        cursor=lambda row: (row.company_name, row.id),
+        count=lambda: discarded_cards_query().count(),
+        empty_text="Нет списанных карточек",
+        status=status_text,
+        page=page
+    )
     refresh_list()
     
     return ft.Column([
@@ -295,6 +317,7 @@ def discarded_cards_page(page: ft.Page = None):
                 dense=True,
             ),
             company_button,
+            status_text,
         ], alignment=ft.MainAxisAlignment.START, spacing=20),
         ft.Container(
             content=cards_list,
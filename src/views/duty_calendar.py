@@ -6,6 +6,8 @@ import flet as ft
 class DutyCalendarPage(BaseCalendar):
     """Календарь дежурной части"""
     
+    CALENDAR_KIND = 'duty'
+    
     def __init__(self, page):
         super().__init__(page)
         self.selected_object = None
@@ -95,10 +97,6 @@ class DutyCalendarPage(BaseCalendar):
         
         return cache
     
-    def _get_shifts_for_date(self, date_obj):
-        """Возвращает смены для даты"""
-        return list(DutyShift.select().join(GuardEmployee).where(DutyShift.date == date_obj))
-    
     def _create_shift_list_item(self, shift):
         """Создает элемент списка смены"""
         is_vzn = shift.description and "ВЗН" in shift.description
@@ -115,17 +113,12 @@ class DutyCalendarPage(BaseCalendar):
     
     def search_vzn_objects(self, query):
         """Поиск объектов для ВЗН"""
-        if not query or len(query) < 2:
-            self.vzn_object_search_results.visible = False
-            if self.page:
-                self.page.update()
-            return
-        
-        def operation():
-            return list(Object.select().where(Object.name.contains(query))[:5])
-        
-        objects = self.safe_db_operation(operation) or []
-        
+        self._lookup("vzn_objects", self._find_vzn_objects, self._show_vzn_objects_results, self.vzn_object_search_results, self._matches_object).submit(query)
+    
+    def _find_vzn_objects(self, query):
+        return list(Object.select().where(Object.name.contains(query))[:5])
+    
+    def _show_vzn_objects_results(self, query, objects):
         self.vzn_object_search_results.controls.clear()
         if objects:
             for obj in objects:
@@ -136,8 +129,6 @@ class DutyCalendarPage(BaseCalendar):
         else:
             self.vzn_object_search_results.controls.append(ft.Text("Объект не найден", color=ft.Colors.ERROR))
             self.vzn_object_search_results.visible = True
-        if self.page:
-            self.page.update()
     
     def select_vzn_object(self, obj):
         """Выбор объекта для ВЗН"""
@@ -262,6 +253,7 @@ class DutyCalendarPage(BaseCalendar):
             return True
         
         if self.safe_db_operation(operation):
+            self._invalidate_months('DutyShift', self.current_shift_date)
             self.close_add_shift_dialog()
             self.update_calendar()
             self.show_shifts_for_date(self.current_shift_date)
@@ -285,6 +277,7 @@ class DutyCalendarPage(BaseCalendar):
             return True
         
         if self.safe_db_operation(operation):
+            self._invalidate_months('DutyShift', self.current_shift_date)
             self.close_add_vzn_dialog()
             self.update_calendar()
             self.show_shifts_for_date(self.current_shift_date)
@@ -1,10 +1,11 @@
 import flet as ft
-from database.models import GuardEmployee, Company
+from database.models import GuardEmployee
 from datetime import datetime
 from base.base_employee_page import BaseEmployeePage
 
 class EmployeesPage(BaseEmployeePage):
     """Страница сотрудников охраны"""
+    employee_kind = "guard"
     
     def __init__(self, page: ft.Page):
         self.selected_rank = "Все разряды"
@@ -49,34 +50,20 @@ class EmployeesPage(BaseEmployeePage):
         
         return query
     
-    def _apply_name_filter(self, query):
-        return query.where(GuardEmployee.full_name.contains(self.search_value))
-    
-    def _apply_company_filter(self, query, companies):
-        from database.models import EmployeeCompany, Company
-        company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-        employee_ids = [ec.guard_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-        return query.where(GuardEmployee.id.in_(employee_ids))
-    
     def _apply_user_filter(self, query, user_id):
         return query.where(GuardEmployee.created_by_user_id == user_id)
     
-    def _get_employee_companies(self, employee):
-        """Возвращает список компаний сотрудника"""
-        from database.models import EmployeeCompany
-        companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.guard_employee == employee)]
-        return ", ".join(companies) if companies else "Не указано"
-    
-    def _get_sort_key(self, employee):
-        """Возвращает ключ для сортировки по разряду"""
-        rank = getattr(employee, 'guard_rank', '') or ''
-        # Порядок сортировки: 4, 5, 6, Сторож, ОВН
-        if rank == '4': return 1
-        elif rank == '5': return 2
-        elif rank == '6': return 3
-        elif rank == 'Сторож': return 4
-        elif rank == 'ОВН': return 5
-        else: return 0
+    def _get_secondary_order(self):
+        """Возвращает порядок сортировки по разряду"""
+        from peewee import Case
+        # Порядок сортировки: 4, 5, 6, Сторож, ОВН (без разряда - в начале)
+        return Case(GuardEmployee.guard_rank, [
+            ('4', 1),
+            ('5', 2),
+            ('6', 3),
+            ('Сторож', 4),
+            ('ОВН', 5),
+        ], 0)
     
     def _get_secondary_sort_icon(self):
         return ft.Icons.MILITARY_TECH
@@ -87,12 +74,16 @@ class EmployeesPage(BaseEmployeePage):
     def _get_order_field(self):
         return GuardEmployee.full_name
     
+    def _get_list_fields(self):
+        return [GuardEmployee.id, GuardEmployee.full_name, GuardEmployee.guard_rank]
+    
     def _create_list_item(self, employee):
         guard_rank_text = str(getattr(employee, 'guard_rank', '')) if getattr(employee, 'guard_rank', None) else "Не указано"
         return ft.ListTile(
+            leading=self.get_list_avatar(employee),
             title=ft.Text(employee.full_name, weight="bold"),
             subtitle=ft.Text(f"Разряд: {guard_rank_text}"),
-            on_click=lambda e, emp=employee: self.show_basic_info(emp)
+            on_click=lambda e, emp_id=employee.id: self.open_employee(emp_id, self.show_basic_info)
         )
     
     def _get_detail_title(self):
@@ -159,8 +150,7 @@ class EmployeesPage(BaseEmployeePage):
         self.edit_criminal_liability_dropdown.value = getattr(employee, 'criminal_liability', 'нет')
         
         # Заполняем чекбоксы компаний
-        from database.models import EmployeeCompany
-        employee_companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.guard_employee == employee)]
+        employee_companies = self._get_dossier(employee).companies
         for checkbox in self.edit_company_checkboxes:
             checkbox.value = checkbox.label in employee_companies
         # Обновляем текст кнопки
@@ -213,11 +203,8 @@ class EmployeesPage(BaseEmployeePage):
         )
         
         # Сохраняем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        for checkbox in self.company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(guard_employee=employee, company=company)
+        self._save_employee_companies(employee, self.company_checkboxes)
+        self._index_employee_name(employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
@@ -253,17 +240,11 @@ class EmployeesPage(BaseEmployeePage):
         self.current_employee.staff_status = self.edit_staff_status_dropdown.value or 'в штате'
         self.current_employee.criminal_liability = self.edit_criminal_liability_dropdown.value or 'нет'
         
-        self.current_employee.save()
+        self._save_changed_fields(self.current_employee)
         
-        # Обновляем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        # Удаляем старые связи
-        EmployeeCompany.delete().where(EmployeeCompany.guard_employee == self.current_employee).execute()
-        # Создаем новые
-        for checkbox in self.edit_company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(guard_employee=self.current_employee, company=company)
+        # Обновляем связи с компаниями (старые удаляются)
+        self._save_employee_companies(self.current_employee, self.edit_company_checkboxes, replace=True)
+        self._index_employee_name(self.current_employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
@@ -293,16 +274,8 @@ class EmployeesPage(BaseEmployeePage):
     
     def _format_certificate_input(self, e):
         """Форматирует ввод номера удостоверения"""
-        value = e.control.value.upper().replace("№", "").replace(" ", "")
-        if len(value) > 0 and value[0].isalpha():
-            letter = value[0]
-            numbers = ''.join(filter(str.isdigit, value[1:]))[:6]
-            if numbers:
-                e.control.value = f"{letter}№ {numbers}"
-            else:
-                e.control.value = f"{letter}№ "
-        elif len(value) > 0 and not value[0].isalpha():
-            e.control.value = ""
+        from utils.employee_import import format_certificate_number
+        e.control.value = format_certificate_number(e.control.value)
         self.page.update()
     
     def _get_search_row(self):
@@ -1,8 +1,10 @@
 import datetime
 import flet as ft
-from database.models import Employee, db
+from database.models import Employee
+from database.session import db_session
+from base.search_controller import SearchController
 from datetime import date, timedelta
-from views.settings import load_birthday_display_from_db
+from database.settings_registry import settings_registry
 
 def home_page(page: ft.Page = None) -> ft.Column:
     # Поле поиска
@@ -10,151 +12,131 @@ def home_page(page: ft.Page = None) -> ft.Column:
         label="Поиск сотрудника",
         hint_text="Введите ФИО для поиска",
         width=300,
-        on_change=lambda e: update_containers(e.control.value)
+        on_change=lambda e: search.on_change(e)
     )
     
     def get_expiring_licenses(search_query=""):
         """Получает список сотрудников с истекающими УЧО (в течение 30 дней)"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                today = date.today()
             
-            today = date.today()
+                expiring = []
+                min_days = 999
+                for employee in Employee.select():
+                    if hasattr(employee, 'guard_license_date') and employee.guard_license_date:
+                        # Фильтрация по поисковому запросу
+                        if search_query and search_query.lower() not in employee.full_name.lower():
+                            continue
+                        # УЧО действует 5 лет
+                        try:
+                            expiry_date = employee.guard_license_date.replace(year=employee.guard_license_date.year + 5)
+                        except ValueError:
+                            # Обработка 29 февраля в невисокосном году
+                            expiry_date = employee.guard_license_date.replace(year=employee.guard_license_date.year + 5, day=28)
+                        days_left = (expiry_date - today).days
+                        if days_left <= 90:  # Показываем истёкшие и истекающие в течение 90 дней
+                            expiring.append((employee.full_name, expiry_date, days_left))
+                            min_days = min(min_days, days_left)
             
-            expiring = []
-            min_days = 999
-            for employee in Employee.select():
-                if hasattr(employee, 'guard_license_date') and employee.guard_license_date:
-                    # Фильтрация по поисковому запросу
-                    if search_query and search_query.lower() not in employee.full_name.lower():
-                        continue
-                    # УЧО действует 5 лет
-                    try:
-                        expiry_date = employee.guard_license_date.replace(year=employee.guard_license_date.year + 5)
-                    except ValueError:
-                        # Обработка 29 февраля в невисокосном году
-                        expiry_date = employee.guard_license_date.replace(year=employee.guard_license_date.year + 5, day=28)
-                    days_left = (expiry_date - today).days
-                    if days_left <= 90:  # Показываем истёкшие и истекающие в течение 90 дней
-                        expiring.append((employee.full_name, expiry_date, days_left))
-                        min_days = min(min_days, days_left)
-            
-            return expiring, min_days if expiring else 999
+                return expiring, min_days if expiring else 999
         except Exception as e:
             print(f"Ошибка при получении УЧО: {e}")
             return [], 999
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def get_expiring_medical(search_query=""):
         """Получает список сотрудников с истекающими медкомиссиями (в течение 30 дней)"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                today = date.today()
             
-            today = date.today()
+                expiring = []
+                min_days = 999
+                for employee in Employee.select():
+                    if hasattr(employee, 'medical_exam_date') and employee.medical_exam_date:
+                        # Фильтрация по поисковому запросу
+                        if search_query and search_query.lower() not in employee.full_name.lower():
+                            continue
+                        # Медкомиссия действует 1 год
+                        try:
+                            expiry_date = employee.medical_exam_date.replace(year=employee.medical_exam_date.year + 1)
+                        except ValueError:
+                            # Обработка 29 февраля в невисокосном году
+                            expiry_date = employee.medical_exam_date.replace(year=employee.medical_exam_date.year + 1, day=28)
+                        days_left = (expiry_date - today).days
+                        if days_left <= 60:  # Показываем истёкшие и истекающие в течение 60 дней
+                            expiring.append((employee.full_name, expiry_date, days_left))
+                            min_days = min(min_days, days_left)
             
-            expiring = []
-            min_days = 999
-            for employee in Employee.select():
-                if hasattr(employee, 'medical_exam_date') and employee.medical_exam_date:
-                    # Фильтрация по поисковому запросу
-                    if search_query and search_query.lower() not in employee.full_name.lower():
-                        continue
-                    # Медкомиссия действует 1 год
-                    try:
-                        expiry_date = employee.medical_exam_date.replace(year=employee.medical_exam_date.year + 1)
-                    except ValueError:
-                        # Обработка 29 февраля в невисокосном году
-                        expiry_date = employee.medical_exam_date.replace(year=employee.medical_exam_date.year + 1, day=28)
-                    days_left = (expiry_date - today).days
-                    if days_left <= 60:  # Показываем истёкшие и истекающие в течение 60 дней
-                        expiring.append((employee.full_name, expiry_date, days_left))
-                        min_days = min(min_days, days_left)
-            
-            return expiring, min_days if expiring else 999
+                return expiring, min_days if expiring else 999
         except Exception as e:
             print(f"Ошибка при получении медкомиссий: {e}")
             return [], 999
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def get_expiring_periodic_checks(search_query=""):
         """Получает список сотрудников с истекающими периодическими проверками (в течение 30 дней)"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                today = date.today()
             
-            today = date.today()
+                expiring = []
+                min_days = 999
+                for employee in Employee.select():
+                    if hasattr(employee, 'periodic_check_date') and employee.periodic_check_date:
+                        # Фильтрация по поисковому запросу
+                        if search_query and search_query.lower() not in employee.full_name.lower():
+                            continue
+                        # Периодическая проверка действует 1 год
+                        try:
+                            expiry_date = employee.periodic_check_date.replace(year=employee.periodic_check_date.year + 1)
+                        except ValueError:
+                            # Обработка 29 февраля в невисокосном году
+                            expiry_date = employee.periodic_check_date.replace(year=employee.periodic_check_date.year + 1, day=28)
+                        days_left = (expiry_date - today).days
+                        if days_left <= 30:  # Показываем истёкшие и истекающие в течение 30 дней
+                            expiring.append((employee.full_name, expiry_date, days_left))
+                            min_days = min(min_days, days_left)
             
-            expiring = []
-            min_days = 999
-            for employee in Employee.select():
-                if hasattr(employee, 'periodic_check_date') and employee.periodic_check_date:
-                    # Фильтрация по поисковому запросу
-                    if search_query and search_query.lower() not in employee.full_name.lower():
-                        continue
-                    # Периодическая проверка действует 1 год
-                    try:
-                        expiry_date = employee.periodic_check_date.replace(year=employee.periodic_check_date.year + 1)
-                    except ValueError:
-                        # Обработка 29 февраля в невисокосном году
-                        expiry_date = employee.periodic_check_date.replace(year=employee.periodic_check_date.year + 1, day=28)
-                    days_left = (expiry_date - today).days
-                    if days_left <= 30:  # Показываем истёкшие и истекающие в течение 30 дней
-                        expiring.append((employee.full_name, expiry_date, days_left))
-                        min_days = min(min_days, days_left)
-            
-            return expiring, min_days if expiring else 999
+                return expiring, min_days if expiring else 999
         except Exception as e:
             print(f"Ошибка при получении периодических проверок: {e}")
             return [], 999
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def get_upcoming_birthdays(search_query=""):
         """Получает список сотрудников с днями рождения в ближайшие 7 дней"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                today = date.today()
+                upcoming = []
             
-            today = date.today()
-            upcoming = []
-            
-            for employee in Employee.select():
-                # Фильтрация по поисковому запросу
-                if search_query and search_query.lower() not in employee.full_name.lower():
-                    continue
-                # Создаем дату дня рождения в текущем году
-                try:
-                    birthday_this_year = employee.birth_date.replace(year=today.year)
-                except ValueError:
-                    # Обработка 29 февраля в невисокосном году
-                    birthday_this_year = employee.birth_date.replace(year=today.year, day=28)
-                
-                # Если день рождения уже прошел в этом году, берем следующий год
-                if birthday_this_year < today:
+                for employee in Employee.select():
+                    # Фильтрация по поисковому запросу
+                    if search_query and search_query.lower() not in employee.full_name.lower():
+                        continue
+                    # Создаем дату дня рождения в текущем году
                     try:
-                        birthday_this_year = birthday_this_year.replace(year=today.year + 1)
+                        birthday_this_year = employee.birth_date.replace(year=today.year)
                     except ValueError:
                         # Обработка 29 февраля в невисокосном году
-                        birthday_this_year = birthday_this_year.replace(year=today.year + 1, day=28)
+                        birthday_this_year = employee.birth_date.replace(year=today.year, day=28)
                 
-                # Проверяем, попадает ли в ближайшие 7 дней
-                days_until = (birthday_this_year - today).days
-                if 0 <= days_until <= 7:
-                    upcoming.append((employee.full_name, birthday_this_year, days_until))
+                    # Если день рождения уже прошел в этом году, берем следующий год
+                    if birthday_this_year < today:
+                        try:
+                            birthday_this_year = birthday_this_year.replace(year=today.year + 1)
+                        except ValueError:
+                            # Обработка 29 февраля в невисокосном году
+                            birthday_this_year = birthday_this_year.replace(year=today.year + 1, day=28)
+                
+                    # Проверяем, попадает ли в ближайшие 7 дней
+                    days_until = (birthday_this_year - today).days
+                    if 0 <= days_until <= 7:
+                        upcoming.append((employee.full_name, birthday_this_year, days_until))
             
-            return sorted(upcoming, key=lambda x: x[2])
+                return sorted(upcoming, key=lambda x: x[2])
         except Exception as e:
             print(f"Ошибка при получении дней рождения: {e}")
             return []
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def get_license_color(min_days):
         """Определяет цвет контейнера УЧО"""
@@ -202,16 +184,37 @@ def home_page(page: ft.Page = None) -> ft.Column:
     # Контейнеры для обновления
     containers_row = ft.Row([], alignment=ft.MainAxisAlignment.SPACE_AROUND, spacing=15)
     
+    def load_dashboard(search_query):
+        """
+        Загружает строки всех контейнеров
+        
+        Returns:
+            list: (вид, (ФИО, дата, дней)) - один список, чтобы поиск мог фильтровать его в памяти
+        """
+        items = [("license", row) for row in get_expiring_licenses(search_query)[0]]
+        items += [("medical", row) for row in get_expiring_medical(search_query)[0]]
+        items += [("periodic", row) for row in get_expiring_periodic_checks(search_query)[0]]
+        items += [("birthday", row) for row in get_upcoming_birthdays(search_query)]
+        return items
+    
     def update_containers(search_query):
         """Обновляет контейнеры с учетом поискового запроса"""
+        # Данные могли измениться - результаты прошлых поисков устарели
+        search.clear_cache()
+        show_dashboard(load_dashboard(search_query))
+    
+    def show_dashboard(items):
+        """Перестраивает контейнеры по загруженным строкам"""
         nonlocal expiring_licenses, license_min_days, expiring_medical, medical_min_days
         nonlocal expiring_periodic_checks, periodic_min_days, upcoming_birthdays, birthday_min_days
         
-        # Получаем отфильтрованные данные
-        expiring_licenses, license_min_days = get_expiring_licenses(search_query)
-        expiring_medical, medical_min_days = get_expiring_medical(search_query)
-        expiring_periodic_checks, periodic_min_days = get_expiring_periodic_checks(search_query)
-        upcoming_birthdays = get_upcoming_birthdays(search_query)
+        expiring_licenses = [row for kind, row in items if kind == "license"]
+        expiring_medical = [row for kind, row in items if kind == "medical"]
+        expiring_periodic_checks = [row for kind, row in items if kind == "periodic"]
+        upcoming_birthdays = [row for kind, row in items if kind == "birthday"]
+        license_min_days = min([days for _, _, days in expiring_licenses], default=999)
+        medical_min_days = min([days for _, _, days in expiring_medical], default=999)
+        periodic_min_days = min([days for _, _, days in expiring_periodic_checks], default=999)
         birthday_min_days = min([days for _, _, days in upcoming_birthdays], default=999)
         
         # Обновляем контейнеры
@@ -223,7 +226,7 @@ def home_page(page: ft.Page = None) -> ft.Column:
         ]
         
         # Проверяем настройку отображения дней рождения
-        if load_birthday_display_from_db():
+        if settings_registry.get('show_birthdays'):
             containers.append(create_birthday_container())
         
         containers_row.controls.extend(containers)
@@ -231,6 +234,13 @@ def home_page(page: ft.Page = None) -> ft.Column:
         if page:
             page.update()
     
+    # Поиск после паузы в вводе; дописанный запрос фильтрует прошлый результат в памяти
+    search = SearchController(
+        lambda text, items: show_dashboard(items),
+        search=load_dashboard,
+        matches=lambda item, text: text.lower() in item[1][0].lower()
+    )
+    
     # Диалог для деталей
     details_dialog = ft.AlertDialog(
         modal=True,
@@ -251,29 +261,25 @@ def home_page(page: ft.Page = None) -> ft.Column:
         
         def update_license_date(employee_name, field_type, days_to_add=None, new_date=None):
             try:
-                if db.is_closed():
-                    db.connect()
-                employee = Employee.get(Employee.full_name == employee_name)
-                if days_to_add:
-                    current_date = employee.guard_license_date
-                    employee.guard_license_date = current_date + timedelta(days=days_to_add)
-                elif new_date:
-                    employee.guard_license_date = new_date
-                employee.save()
-                # Перезагружаем данные и обновляем контейнеры
-                nonlocal expiring_licenses, license_min_days
-                expiring_licenses, license_min_days = get_expiring_licenses()
-                update_containers(search_field.value if search_field else "")
+                with db_session():
+                    employee = Employee.get(Employee.full_name == employee_name)
+                    if days_to_add:
+                        current_date = employee.guard_license_date
+                        employee.guard_license_date = current_date + timedelta(days=days_to_add)
+                    elif new_date:
+                        employee.guard_license_date = new_date
+                    employee.save()
+                    # Перезагружаем данные и обновляем контейнеры
+                    nonlocal expiring_licenses, license_min_days
+                    expiring_licenses, license_min_days = get_expiring_licenses()
+                    update_containers(search_field.value if search_field else "")
                 
-                if expiring_licenses:
-                    show_license_details(None)
-                else:
-                    page.close(details_dialog)
+                    if expiring_licenses:
+                        show_license_details(None)
+                    else:
+                        page.close(details_dialog)
             except Exception as ex:
                 pass
-            finally:
-                if not db.is_closed():
-                    db.close()
         
         def show_update_dialog(employee_name):
             def format_date_input(e):
@@ -364,29 +370,25 @@ def home_page(page: ft.Page = None) -> ft.Column:
         
         def update_medical_date(employee_name, field_type, days_to_add=None, new_date=None):
             try:
-                if db.is_closed():
-                    db.connect()
-                employee = Employee.get(Employee.full_name == employee_name)
-                if days_to_add:
-                    current_date = employee.medical_exam_date
-                    employee.medical_exam_date = current_date + timedelta(days=days_to_add)
-                elif new_date:
-                    employee.medical_exam_date = new_date
-                employee.save()
-                # Перезагружаем данные и обновляем контейнеры
-                nonlocal expiring_medical, medical_min_days
-                expiring_medical, medical_min_days = get_expiring_medical()
-                update_containers(search_field.value if search_field else "")
+                with db_session():
+                    employee = Employee.get(Employee.full_name == employee_name)
+                    if days_to_add:
+                        current_date = employee.medical_exam_date
+                        employee.medical_exam_date = current_date + timedelta(days=days_to_add)
+                    elif new_date:
+                        employee.medical_exam_date = new_date
+                    employee.save()
+                    # Перезагружаем данные и обновляем контейнеры
+                    nonlocal expiring_medical, medical_min_days
+                    expiring_medical, medical_min_days = get_expiring_medical()
+                    update_containers(search_field.value if search_field else "")
                 
-                if expiring_medical:
-                    show_medical_details(None)
-                else:
-                    page.close(details_dialog)
+                    if expiring_medical:
+                        show_medical_details(None)
+                    else:
+                        page.close(details_dialog)
             except Exception as ex:
                 pass
-            finally:
-                if not db.is_closed():
-                    db.close()
         
         def show_update_dialog(employee_name):
             def format_date_input(e):
@@ -517,29 +519,25 @@ def home_page(page: ft.Page = None) -> ft.Column:
         
         def update_periodic_date(employee_name, field_type, days_to_add=None, new_date=None):
             try:
-                if db.is_closed():
-                    db.connect()
-                employee = Employee.get(Employee.full_name == employee_name)
-                if days_to_add:
-                    current_date = employee.periodic_check_date
-                    employee.periodic_check_date = current_date + timedelta(days=days_to_add)
-                elif new_date:
-                    employee.periodic_check_date = new_date
-                employee.save()
-                # Перезагружаем данные и обновляем контейнеры
-                nonlocal expiring_periodic_checks, periodic_min_days
-                expiring_periodic_checks, periodic_min_days = get_expiring_periodic_checks()
-                update_containers(search_field.value if search_field else "")
+                with db_session():
+                    employee = Employee.get(Employee.full_name == employee_name)
+                    if days_to_add:
+                        current_date = employee.periodic_check_date
+                        employee.periodic_check_date = current_date + timedelta(days=days_to_add)
+                    elif new_date:
+                        employee.periodic_check_date = new_date
+                    employee.save()
+                    # Перезагружаем данные и обновляем контейнеры
+                    nonlocal expiring_periodic_checks, periodic_min_days
+                    expiring_periodic_checks, periodic_min_days = get_expiring_periodic_checks()
+                    update_containers(search_field.value if search_field else "")
                 
-                if expiring_periodic_checks:
-                    show_periodic_details(None)
-                else:
-                    page.close(details_dialog)
+                    if expiring_periodic_checks:
+                        show_periodic_details(None)
+                    else:
+                        page.close(details_dialog)
             except Exception as ex:
                 pass
-            finally:
-                if not db.is_closed():
-                    db.close()
         
         def show_update_dialog(employee_name):
             def format_date_input(e):
@@ -634,7 +632,7 @@ def home_page(page: ft.Page = None) -> ft.Column:
     ]
     
     # Проверяем настройку отображения дней рождения
-    if load_birthday_display_from_db():
+    if settings_registry.get('show_birthdays'):
         containers.append(create_birthday_container())
     
     containers_row.controls.extend(containers)
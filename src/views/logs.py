@@ -1,13 +1,14 @@
 import flet as ft
-from database.models import UserLog, User, db
+from database.models import UserLog, User
+from database.session import db_session
+from base.search_controller import SearchController
+from base.infinite_list import InfiniteList
 from datetime import datetime, date
 
 def logs_page(page: ft.Page = None) -> ft.Column:
     """Страница просмотра логов действий пользователей"""
     
     search_value = ""
-    current_page = 0
-    page_size = 20
     selected_user = "Все пользователи"
     selected_action = "Все действия"
     date_from = None
@@ -65,9 +66,7 @@ def logs_page(page: ft.Page = None) -> ft.Column:
         dense=True
     )
     
-    page_info = ft.Text("Страница 1 из 1")
-    prev_btn = ft.IconButton(icon=ft.Icons.ARROW_BACK)
-    next_btn = ft.IconButton(icon=ft.Icons.ARROW_FORWARD)
+    status_text = ft.Text("", color=ft.Colors.GREY)
     
     def format_date_input(e):
         """Форматирует ввод даты"""
@@ -95,192 +94,170 @@ def logs_page(page: ft.Page = None) -> ft.Column:
     def load_users():
         """Загружает список пользователей для фильтра"""
         try:
-            if db.is_closed():
-                db.connect()
+            with db_session():
+                users = ["Все пользователи"]
+                for user in User.select():
+                    users.append(user.username)
             
-            users = ["Все пользователи"]
-            for user in User.select():
-                users.append(user.username)
-            
-            user_dropdown.options = [ft.dropdown.Option(u) for u in users]
+                user_dropdown.options = [ft.dropdown.Option(u) for u in users]
             
         except Exception as e:
             print(f"Ошибка загрузки пользователей: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
-    def get_logs():
-        """Получает логи с учетом фильтров"""
-        try:
-            if db.is_closed():
-                db.connect()
-            
-            query = UserLog.select().join(User)
-            
-            # Фильтр по пользователю
-            if selected_user != "Все пользователи":
-                query = query.where(User.username == selected_user)
-            
-            # Фильтр по действию
-            if selected_action != "Все действия":
-                query = query.where(UserLog.action.contains(selected_action))
-            
-            # Фильтр по описанию
-            if search_value:
-                query = query.where(UserLog.description.contains(search_value))
-            
-            # Фильтр по датам
-            if date_from:
-                query = query.where(UserLog.created_at >= date_from)
-            if date_to:
-                # Добавляем время до конца дня
-                date_to_end = datetime.combine(date_to, datetime.max.time())
-                query = query.where(UserLog.created_at <= date_to_end)
-            
-            # Сортировка по дате (новые сначала)
-            query = query.order_by(UserLog.created_at.desc())
-            
-            return list(query)
-            
-        except Exception as e:
-            print(f"Ошибка получения логов: {e}")
-            return []
-        finally:
-            if not db.is_closed():
-                db.close()
-    
-    def refresh_list():
-        """Обновляет список логов"""
-        all_logs = get_logs()
+    def logs_query():
+        """Запрос логов с учетом фильтров"""
+        # Пользователь выбирается тем же запросом: строки строятся без отдельных запросов
+        query = UserLog.select(UserLog, User).join(User)
         
-        # Пагинация
-        start_idx = current_page * page_size
-        end_idx = start_idx + page_size
-        page_logs = all_logs[start_idx:end_idx]
+        # Фильтр по пользователю
+        if selected_user != "Все пользователи":
+            query = query.where(User.username == selected_user)
         
-        logs_list.controls.clear()
+        # Фильтр по действию
+        if selected_action != "Все действия":
+            query = query.where(UserLog.action.contains(selected_action))
         
-        for log in page_logs:
-            # Определяем цвет в зависимости от типа действия
-            color = None
-            if "Удаление" in log.action:
-                color = ft.Colors.RED
-            elif "Создание" in log.action:
-                color = ft.Colors.GREEN
-            elif "Редактирование" in log.action:
-                color = ft.Colors.BLUE
-            elif "Восстановление" in log.action:
-                color = ft.Colors.ORANGE
-            
-            logs_list.controls.append(
-                ft.Container(
-                    content=ft.Column([
-                        ft.Row([
-                            ft.Text(
-                                log.created_at.strftime("%d.%m.%Y %H:%M:%S"),
-                                size=12,
-                                width=130
-                            ),
-                            ft.Text(
-                                log.user.username,
-                                size=12,
-                                weight="bold",
-                                width=100
-                            ),
-                            ft.Text(
-                                log.action,
-                                size=12,
-                                color=color,
-                                weight="bold",
-                                width=200
-                            ),
-                            ft.Text(
-                                log.description or "",
-                                size=12,
-                                expand=True
-                            )
-                        ], spacing=10)
-                    ], spacing=2),
-                    padding=ft.padding.all(8),
-                    border=ft.border.all(1),
-                    border_radius=5,
-                    margin=ft.margin.only(bottom=2)
-                )
-            )
+        # Фильтр по описанию
+        if search_value:
+            query = query.where(UserLog.description.contains(search_value))
         
-        # Обновляем пагинацию
-        total_pages = (len(all_logs) + page_size - 1) // page_size if all_logs else 1
-        prev_btn.disabled = current_page == 0
-        next_btn.disabled = current_page >= total_pages - 1
-        page_info.value = f"Страница {current_page + 1} из {max(1, total_pages)} (всего записей: {len(all_logs)})"
+        # Фильтр по датам
+        if date_from:
+            query = query.where(UserLog.created_at >= date_from)
+        if date_to:
+            # Добавляем время до конца дня
+            date_to_end = datetime.combine(date_to, datetime.max.time())
+            query = query.where(UserLog.created_at <= date_to_end)
+        return query
+    
+    def get_logs(after, limit):
+        """
+        Порция логов, новые сначала
+        
+        Args:
+            after: (дата, id) последней загруженной записи или None
+            limit: число записей
+        """
+        from peewee import Tuple
+        query = logs_query()
+        if after is not None:
+            # Следующая порция - записи старше последней загруженной (без OFFSET)
+            query = query.where(Tuple(UserLog.created_at, UserLog.id) < Tuple(*after))
+        return list(query.order_by(UserLog.created_at.desc(), UserLog.id.desc()).limit(limit))
+    
+    def refresh_list():
+        """Загружает логи заново (в фоне, с первой порции)"""
+        log_rows.reset()
+    
+    def create_log_item(log):
+        """Строка списка логов"""
+        # Определяем цвет в зависимости от типа действия
+        color = None
+        if "Удаление" in log.action:
+            color = ft.Colors.RED
+        elif "Создание" in log.action:
+            color = ft.Colors.GREEN
+        elif "Редактирование" in log.action:
+            color = ft.Colors.BLUE
+        elif "Восстановление" in log.action:
+            color = ft.Colors.ORANGE
         
-        if page:
-            page.update()
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Text(
+                        log.created_at.strftime("%d.%m.%Y %H:%M:%S"),
+                        size=12,
+                        width=130
+                    ),
+                    ft.Text(
+                        log.user.username,
+                        size=12,
+                        weight="bold",
+                        width=100
+                    ),
+                    ft.Text(
+                        log.action,
+                        size=12,
+                        color=color,
+                        weight="bold",
+                        width=200
+                    ),
+                    ft.Text(
+                        log.description or "",
+                        size=12,
+                        expand=True
+                    )
+                ], spacing=10)
+            ], spacing=2),
+            padding=ft.padding.all(8),
+            border=ft.border.all(1),
+            border_radius=5,
+            margin=ft.margin.only(bottom=2)
+        )
+    
+    # Записи загружаются порциями при прокрутке
+    log_rows = InfiniteList(
+        logs_list,
+        get_logs,
+        create_log_item,
+        cursor=lambda log: (log.created_at, log.id),
+        signature=lambda log: (log.created_at, log.user.username, log.action, log.description),
+        count=lambda: logs_query().count(),
+        empty_text="Нет записей",
+        status=status_text,
+        page=page
+    )
+    
+    # Поиск после паузы в вводе
+    search = SearchController(lambda text, results: refresh_list())
     
     def on_search_change(e):
-        nonlocal search_value, current_page
+        nonlocal search_value
         search_value = e.control.value.strip()
-        current_page = 0
-        refresh_list()
+        search.submit(search_value)
     
     def on_user_change(e):
-        nonlocal selected_user, current_page
+        nonlocal selected_user
         selected_user = e.control.value
-        current_page = 0
         refresh_list()
     
     def on_action_change(e):
-        nonlocal selected_action, current_page
+        nonlocal selected_action
         selected_action = e.control.value
-        current_page = 0
         refresh_list()
     
     def on_date_from_change(e):
-        nonlocal date_from, current_page
+        nonlocal date_from
         try:
             if e.control.value.strip():
                 date_from = datetime.strptime(e.control.value.strip(), "%d.%m.%Y").date()
             else:
                 date_from = None
-            current_page = 0
             refresh_list()
         except ValueError:
             pass
     
     def on_date_to_change(e):
-        nonlocal date_to, current_page
+        nonlocal date_to
         try:
             if e.control.value.strip():
                 date_to = datetime.strptime(e.control.value.strip(), "%d.%m.%Y").date()
             else:
                 date_to = None
-            current_page = 0
             refresh_list()
         except ValueError:
             pass
     
-    def prev_page_click(e):
-        nonlocal current_page
-        if current_page > 0:
-            current_page -= 1
-            refresh_list()
-    
-    def next_page_click(e):
-        nonlocal current_page
-        current_page += 1
-        refresh_list()
-    
     def clear_filters(e):
         """Очищает все фильтры"""
-        nonlocal search_value, selected_user, selected_action, date_from, date_to, current_page
+        nonlocal search_value, selected_user, selected_action, date_from, date_to
         
         search_value = ""
         selected_user = "Все пользователи"
         selected_action = "Все действия"
         date_from = None
         date_to = None
-        current_page = 0
         
         search_field.value = ""
         user_dropdown.value = "Все пользователи"
@@ -296,8 +273,6 @@ def logs_page(page: ft.Page = None) -> ft.Column:
     action_dropdown.on_change = on_action_change
     date_from_field.on_change = on_date_from_change
     date_to_field.on_change = on_date_to_change
-    prev_btn.on_click = prev_page_click
-    next_btn.on_click = next_page_click
     
     # Загружаем данные
     load_users()
@@ -345,11 +320,6 @@ def logs_page(page: ft.Page = None) -> ft.Column:
             expand=True,
         ),
         
-        # Пагинация
-        ft.Row([
-            prev_btn,
-            page_info,
-            next_btn
-        ], alignment=ft.MainAxisAlignment.CENTER),
+        ft.Row([status_text], alignment=ft.MainAxisAlignment.CENTER),
         
     ], spacing=10, expand=True)
\ No newline at end of file
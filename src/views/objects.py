@@ -1,6 +1,11 @@
 import flet as ft
 from database.models import Object, ObjectAddress, ObjectRate, db
+from database.session import db_session
 from excel_export import export_assignments_to_excel
+from database.executor import db_executor
+from base.base_page import loading_placeholder
+from base.search_controller import SearchController
+from base.keyed_list import KeyedList, patch_list_tile
 
 def objects_page(page: ft.Page = None):
     search_value = ""
@@ -45,7 +50,7 @@ def objects_page(page: ft.Page = None):
             description = description_field.value.strip()
             if not name:
                 raise ValueError("Название объекта обязательно!")
-            with db.atomic():
+            with db_session(), db.atomic():
                 Object.create(name=name, description=description)
             
             # Логирование
@@ -96,7 +101,11 @@ def objects_page(page: ft.Page = None):
 
     def delete_object(obj):
         object_name = obj.name
-        obj.delete_instance()
+        with db_session():
+            obj.delete_instance()
+        # Смены объекта удалены каскадом
+        from database.month_cache import month_cache
+        month_cache.clear()
         
         # Логирование
         if hasattr(page, 'auth_manager'):
@@ -114,7 +123,9 @@ def objects_page(page: ft.Page = None):
         
         def refresh_addresses():
             addresses_list.controls.clear()
-            for addr in obj.addresses:
+            with db_session():
+                addresses = list(obj.addresses)
+            for addr in addresses:
                 def make_delete_handler(address):
                     return lambda e: delete_address(address)
                 
@@ -130,12 +141,14 @@ def objects_page(page: ft.Page = None):
         
         def add_address(e):
             if new_address_field.value and new_address_field.value.strip():
-                ObjectAddress.create(object=obj, address=new_address_field.value.strip())
+                with db_session():
+                    ObjectAddress.create(object=obj, address=new_address_field.value.strip())
                 new_address_field.value = ""
                 refresh_addresses()
         
         def delete_address(addr):
-            addr.delete_instance()
+            with db_session():
+                addr.delete_instance()
             refresh_addresses()
         
         refresh_addresses()
@@ -152,7 +165,9 @@ def objects_page(page: ft.Page = None):
         
         def refresh_rates():
             rates_list.controls.clear()
-            for rate in obj.rates:
+            with db_session():
+                rates = list(obj.rates)
+            for rate in rates:
                 def make_delete_handler(rate_obj):
                     return lambda e: delete_rate(rate_obj)
                 
@@ -171,7 +186,8 @@ def objects_page(page: ft.Page = None):
             if new_rate_field.value and new_rate_field.value.strip():
                 try:
                     rate_value = float(new_rate_field.value.strip().replace(",", "."))
-                    ObjectRate.create(object=obj, rate=rate_value, description=rate_desc_field.value.strip() if rate_desc_field.value else None)
+                    with db_session():
+                        ObjectRate.create(object=obj, rate=rate_value, description=rate_desc_field.value.strip() if rate_desc_field.value else None)
                     new_rate_field.value = ""
                     rate_desc_field.value = ""
                     refresh_rates()
@@ -179,7 +195,8 @@ def objects_page(page: ft.Page = None):
                     pass
         
         def delete_rate(rate):
-            rate.delete_instance()
+            with db_session():
+                rate.delete_instance()
             refresh_rates()
         
         refresh_rates()
@@ -226,7 +243,7 @@ def objects_page(page: ft.Page = None):
             new_description = edit_description.value.strip()
             if not new_name:
                 raise ValueError("Название объекта обязательно!")
-            with db.atomic():
+            with db_session(), db.atomic():
                 object_to_update = Object.get_by_id(object_id)
                 old_name = object_to_update.name
                 object_to_update.name = new_name
@@ -244,61 +261,116 @@ def objects_page(page: ft.Page = None):
         except Exception as ex:
             pass
 
-    def refresh_list():
-        """Обновляет список объектов"""
+    def get_object_rows():
+        """
+        Получает строки списка объектов одним запросом
+        
+        Вместо загрузки адресов и ставок каждого объекта выбираются только
+        название, первый адрес, число адресов и диапазон ставок.
+        """
+        from peewee import fn
+        from database.projections import project
+        first_address = (ObjectAddress.select(ObjectAddress.address)
+                         .where(ObjectAddress.object == Object.id)
+                         .order_by(ObjectAddress.id)
+                         .limit(1))
+        address_count = ObjectAddress.select(fn.COUNT(ObjectAddress.id)).where(ObjectAddress.object == Object.id)
+        min_rate = ObjectRate.select(fn.MIN(ObjectRate.rate)).where(ObjectRate.object == Object.id)
+        max_rate = ObjectRate.select(fn.MAX(ObjectRate.rate)).where(ObjectRate.object == Object.id)
+        
+        query = Object.select()
         if search_value:
-            all_objects = list(Object.select().where(Object.name.contains(search_value)))
-        else:
-            all_objects = list(Object.select())
+            query = query.where(Object.name.contains(search_value))
+        return project(
+            query,
+            Object.id,
+            Object.name,
+            first_address.alias('first_address'),
+            address_count.alias('address_count'),
+            min_rate.alias('min_rate'),
+            max_rate.alias('max_rate'),
+        )
+
+    def refresh_list(background=False):
+        """
+        Обновляет список объектов
         
+        При background=True запрос выполняется вне потока интерфейса,
+        новый запрос (следующий символ поиска) вытесняет предыдущий.
+        """
+        # Список мог измениться - результаты прошлых поисков устарели
+        search.clear_cache()
+        if background:
+            objects_list_view.controls = [loading_placeholder()]
+            if page:
+                page.update()
+            db_executor.submit((id(objects_list_view), "list"), get_object_rows, show_list)
+        else:
+            with db_session():
+                rows = get_object_rows()
+            show_list(rows)
+
+    def create_object_item(row):
+        """Строка списка объектов"""
+        return ft.Container(
+            content=ft.ListTile(
+                leading=ft.Icon(ft.Icons.BUSINESS),
+                title=ft.Text(row.name, weight="bold"),
+                subtitle=ft.Text(get_object_info(row)),
+                trailing=ft.IconButton(
+                    icon=ft.Icons.EDIT,
+                    on_click=lambda e, object_id=row.id: open_object(object_id)
+                ),
+                on_click=lambda e, object_id=row.id: open_object(object_id)
+            ),
+            margin=ft.margin.only(left=-30)
+        )
+
+    object_rows = KeyedList(
+        objects_list_view,
+        create_object_item,
+        update=lambda control, row: patch_list_tile(control, create_object_item(row))
+    )
+
+    def show_list(all_objects):
+        """Заполняет список загруженными строками"""
         # Сортируем в Python
         if sort_by_name:
             all_objects.sort(key=lambda x: x.name.lower(), reverse=not sort_ascending)
         else:
             # Сортируем по минимальной ставке
-            def get_min_rate(obj):
-                rates = list(obj.rates)
-                return min([float(r.rate) for r in rates]) if rates else 0
-            all_objects.sort(key=get_min_rate, reverse=not sort_ascending)
+            all_objects.sort(key=lambda x: float(x.min_rate) if x.min_rate is not None else 0, reverse=not sort_ascending)
         
         # Пагинация
         start = current_page * page_size
         end = start + page_size
         objects_list = all_objects[start:end]
         
-        objects_list_view.controls.clear()
-        for obj in objects_list:
-            objects_list_view.controls.append(
-                ft.Container(
-                    content=ft.ListTile(
-                        leading=ft.Icon(ft.Icons.BUSINESS),
-                        title=ft.Text(obj.name, weight="bold"),
-                        subtitle=ft.Text(get_object_info(obj)),
-                        trailing=ft.IconButton(
-                            icon=ft.Icons.EDIT,
-                            on_click=lambda e, object_data=obj: show_edit_dialog(object_data)
-                        ),
-                        on_click=lambda e, object_data=obj: show_edit_dialog(object_data)
-                    ),
-                    margin=ft.margin.only(left=-30)
-                )
-            )
+        # Строки, уже показанные на странице, не пересоздаются; изменившиеся обновляются на месте
+        object_rows.set_rows(objects_list)
         
         page_text.value = f"Страница {current_page + 1}"
         if page:
             page.update()
 
-    def get_object_info(obj):
-        addresses = list(obj.addresses)
-        rates = list(obj.rates)
-        
-        addr_text = addresses[0].address if addresses else "Нет адресов"
-        if len(addresses) > 1:
-            addr_text += f" (+{len(addresses)-1})"
+    def open_object(object_id):
+        """Загружает полную запись объекта и открывает редактирование"""
+        from database.projections import load_full
+        with db_session():
+            obj = load_full(Object, object_id)
+        if obj:
+            show_edit_dialog(obj)
+        else:
+            refresh_list()
+
+    def get_object_info(row):
+        addr_text = row.first_address if row.address_count else "Нет адресов"
+        if row.address_count > 1:
+            addr_text += f" (+{row.address_count-1})"
         
-        if rates:
-            min_rate = min([float(r.rate) for r in rates])
-            max_rate = max([float(r.rate) for r in rates])
+        if row.min_rate is not None:
+            min_rate = float(row.min_rate)
+            max_rate = float(row.max_rate)
             if min_rate == max_rate:
                 rate_text = f"{min_rate:.2f} ₽/ч"
             else:
@@ -308,13 +380,19 @@ def objects_page(page: ft.Page = None):
         
         return f"{addr_text} • {rate_text}"
 
+    # Поиск после паузы в вводе; дописанный запрос фильтрует прошлый результат в памяти
+    search = SearchController(
+        lambda text, rows: show_list(rows),
+        search=lambda text: get_object_rows(),
+        key=(id(objects_list_view), "list"),
+        matches=lambda row, text: text.lower() in row.name.lower()
+    )
+    
     def on_search_change(e):
         nonlocal search_value, current_page
         search_value = e.control.value.strip()
         current_page = 0
-        refresh_list()
-        if page:
-            page.update()
+        search.submit(search_value)
     
     def prev_page(e):
         nonlocal current_page
@@ -386,19 +464,29 @@ def objects_page(page: ft.Page = None):
                 month = int(month_dropdown.value)
                 year = int(year_field.value)
                 
-                success, message = export_assignments_to_excel(month, year)
+                def show_result(result):
+                    success, message = result
+                    export_dialog.open = False
+                    page.update()
+                    
+                    snack = ft.SnackBar(
+                        content=ft.Text(message),
+                        bgcolor=ft.Colors.GREEN if success else ft.Colors.RED,
+                        duration=3000 if success else 5000
+                    )
+                    page.overlay.append(snack)
+                    snack.open = True
+                    page.update()
                 
-                export_dialog.open = False
+                # Выгрузка идет в фоне, окно остается отзывчивым
+                e.control.disabled = True
+                export_dialog.content.controls.append(loading_placeholder("Формирование файла..."))
                 page.update()
-                
-                snack = ft.SnackBar(
-                    content=ft.Text(message),
-                    bgcolor=ft.Colors.GREEN if success else ft.Colors.RED,
-                    duration=3000 if success else 5000
+                db_executor.submit(
+                    (id(export_dialog), "export"),
+                    lambda: export_assignments_to_excel(month, year),
+                    show_result
                 )
-                page.overlay.append(snack)
-                snack.open = True
-                page.update()
                 
             except ValueError:
                 snack = ft.SnackBar(
@@ -5,6 +5,7 @@ from base.base_employee_page import BaseEmployeePage
 
 class OfficeEmployeesPage(BaseEmployeePage):
     """Страница сотрудников офиса"""
+    employee_kind = "office"
     
     def _create_form_fields(self):
         """Создает поля формы"""
@@ -19,32 +20,21 @@ class OfficeEmployeesPage(BaseEmployeePage):
     def _get_base_query(self):
         return OfficeEmployee.select().where(OfficeEmployee.termination_date.is_null())
     
-    def _apply_name_filter(self, query):
-        return query.where(OfficeEmployee.full_name.contains(self.search_value))
-    
-    def _apply_company_filter(self, query, companies):
-        from database.models import EmployeeCompany, Company
-        company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-        employee_ids = [ec.office_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-        return query.where(OfficeEmployee.id.in_(employee_ids))
-    
     def _apply_user_filter(self, query, user_id):
         return query.where(OfficeEmployee.created_by_user_id == user_id)
     
-    def _get_employee_companies(self, employee):
-        """Возвращает список компаний сотрудника"""
-        from database.models import EmployeeCompany, Company
-        companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.office_employee == employee)]
-        return ", ".join(companies) if companies else "Не указано"
-    
     def _get_order_field(self):
         return OfficeEmployee.full_name
     
+    def _get_list_fields(self):
+        return [OfficeEmployee.id, OfficeEmployee.full_name, OfficeEmployee.position]
+    
     def _create_list_item(self, employee):
         return ft.ListTile(
+            leading=self.get_list_avatar(employee),
             title=ft.Text(employee.full_name, weight="bold"),
             subtitle=ft.Text(f"Должность: {employee.position}"),
-            on_click=lambda e, emp=employee: self.show_detail_dialog(emp)
+            on_click=lambda e, emp_id=employee.id: self.open_employee(emp_id, self.show_detail_dialog)
         )
     
     def _get_detail_title(self):
@@ -107,11 +97,8 @@ class OfficeEmployeesPage(BaseEmployeePage):
         )
         
         # Сохраняем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        for checkbox in self.company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(office_employee=employee, company=company)
+        self._save_employee_companies(employee, self.company_checkboxes)
+        self._index_employee_name(employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
@@ -150,8 +137,7 @@ class OfficeEmployeesPage(BaseEmployeePage):
         self.edit_staff_status_dropdown.value = getattr(employee, 'staff_status', 'в штате')
         self.edit_criminal_liability_dropdown.value = getattr(employee, 'criminal_liability', 'нет')
         # Заполняем чекбоксы компаний
-        from database.models import EmployeeCompany, Company
-        employee_companies = [ec.company.name for ec in EmployeeCompany.select().join(Company).where(EmployeeCompany.office_employee == employee)]
+        employee_companies = self._get_dossier(employee).companies
         for checkbox in self.edit_company_checkboxes:
             checkbox.value = checkbox.label in employee_companies
         # Обновляем текст кнопки
@@ -188,17 +174,11 @@ class OfficeEmployeesPage(BaseEmployeePage):
         self.current_employee.staff_status = self.edit_staff_status_dropdown.value or "в штате"
         self.current_employee.criminal_liability = self.edit_criminal_liability_dropdown.value or "нет"
         
-        self.current_employee.save()
+        self._save_changed_fields(self.current_employee)
         
-        # Обновляем связи с компаниями
-        from database.models import Company, EmployeeCompany
-        # Удаляем старые связи
-        EmployeeCompany.delete().where(EmployeeCompany.office_employee == self.current_employee).execute()
-        # Создаем новые
-        for checkbox in self.edit_company_checkboxes:
-            if checkbox.value:
-                company = Company.get(Company.name == checkbox.label)
-                EmployeeCompany.create(office_employee=self.current_employee, company=company)
+        # Обновляем связи с компаниями (старые удаляются)
+        self._save_employee_companies(self.current_employee, self.edit_company_checkboxes, replace=True)
+        self._index_employee_name(self.current_employee)
         
         # Логирование
         if hasattr(self.page, 'auth_manager'):
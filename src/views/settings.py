@@ -1,60 +1,32 @@
 import flet as ft
-from database.models import Settings, db
-from peewee import DoesNotExist
+from database.settings_registry import settings_registry
 
 
-def save_theme_to_db(theme: str):
-    try:
-        Settings.get(Settings.key == "theme")
-        Settings.update(value=theme).where(Settings.key == "theme").execute()
-    except DoesNotExist:
-        Settings.create(key="theme", value=theme)
+# Настройки хранятся в database/settings_registry.py (в памяти, запись сразу в БД);
+# значения читаются через settings_registry.get
 
-def load_theme_from_db() -> str:
-    try:
-        setting = Settings.get(Settings.key == "theme")
-        return setting.value
-    except DoesNotExist:
-        return "light"
+def save_theme_to_db(theme: str, user_id=None):
+    settings_registry.set('theme', theme, user_id)
 
-def save_cell_shape_to_db(shape: str):
-    try:
-        Settings.get(Settings.key == "cell_shape")
-        Settings.update(value=shape).where(Settings.key == "cell_shape").execute()
-    except DoesNotExist:
-        Settings.create(key="cell_shape", value=shape)
-
-def load_cell_shape_from_db() -> str:
-    try:
-        setting = Settings.get(Settings.key == "cell_shape")
-        return setting.value
-    except DoesNotExist:
-        return "square"
+def save_cell_shape_to_db(shape: str, user_id=None):
+    settings_registry.set('cell_shape', shape, user_id)
 
 def save_birthday_display_to_db(enabled: bool):
-    try:
-        Settings.get(Settings.key == "show_birthdays")
-        Settings.update(value="true" if enabled else "false").where(Settings.key == "show_birthdays").execute()
-    except DoesNotExist:
-        Settings.create(key="show_birthdays", value="true" if enabled else "false")
-
-def load_birthday_display_from_db() -> bool:
-    try:
-        setting = Settings.get(Settings.key == "show_birthdays")
-        return setting.value == "true"
-    except DoesNotExist:
-        return True  # По умолчанию включено
+    settings_registry.set('show_birthdays', enabled)
 
 def manage_companies_dialog(page: ft.Page):
     """Диалог управления компаниями"""
     from database.models import Company
+    from database.session import db_session
+    from database.company_index import company_index
+    from database.dossier import dossier_cache
     
     companies_list = ft.Column([], spacing=5)
     new_company_field = ft.TextField(label="Новая компания", width=300)
     
     def refresh_companies():
         companies_list.controls.clear()
-        for company in Company.select():
+        for company in company_index.companies():
             companies_list.controls.append(
                 ft.Row([
                     ft.Text(company.name, expand=True),
@@ -71,7 +43,9 @@ def manage_companies_dialog(page: ft.Page):
         name = new_company_field.value.strip()
         if name:
             try:
-                Company.create(name=name)
+                with db_session():
+                    Company.create(name=name)
+                company_index.invalidate()
                 new_company_field.value = ""
                 refresh_companies()
                 show_snackbar("Компания добавлена!")
@@ -80,11 +54,16 @@ def manage_companies_dialog(page: ft.Page):
     
     def delete_company(company):
         from database.models import EmployeeCompany
-        # Проверяем, есть ли сотрудники в этой компании
-        if EmployeeCompany.select().where(EmployeeCompany.company == company).exists():
+        with db_session():
+            # Проверяем, есть ли сотрудники в этой компании
+            has_employees = EmployeeCompany.select().where(EmployeeCompany.company == company).exists()
+            if not has_employees:
+                company.delete_instance()
+        if has_employees:
             show_snackbar("Нельзя удалить компанию с сотрудниками!", True)
         else:
-            company.delete_instance()
+            company_index.invalidate()
+            dossier_cache.clear()
             refresh_companies()
             show_snackbar("Компания удалена!")
     
@@ -128,67 +107,20 @@ def manage_companies_dialog(page: ft.Page):
     page.update()
 
 def settings_page(page: ft.Page) -> ft.Column:
-    def theme_changed(e):
-        selected_theme = e.control.value
-        
-        if selected_theme == "dark":
-            page.theme_mode = ft.ThemeMode.DARK
-            page.theme = None
-        elif selected_theme == "dark_green":
-            page.theme_mode = ft.ThemeMode.DARK
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.GREEN)
-        elif selected_theme == "purple":
-            page.theme_mode = ft.ThemeMode.DARK
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.PURPLE)
-        elif selected_theme == "amber":
-            page.theme_mode = ft.ThemeMode.LIGHT
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.AMBER)
-        elif selected_theme == "brown":
-            page.theme_mode = ft.ThemeMode.DARK
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.BROWN)
-        elif selected_theme == "deep_orange":
-            page.theme_mode = ft.ThemeMode.LIGHT
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.DEEP_ORANGE)
-        elif selected_theme == "light_green":
-            page.theme_mode = ft.ThemeMode.LIGHT
-            page.theme = ft.Theme(color_scheme_seed=ft.Colors.LIGHT_GREEN)
-        else:
-            page.theme_mode = ft.ThemeMode.LIGHT
-            page.theme = None
-        
-        save_theme_to_db(selected_theme)
-        page.update()
-
-    # Загружаем тему из БД
-    theme = load_theme_from_db()
+    def personal_user_id():
+        """Пользователь, для которого сохраняются тема и форма ячеек (None - для всех)"""
+        return settings_registry.user_id if personal_checkbox.value else None
     
-    if theme == "dark":
-        page.theme_mode = ft.ThemeMode.DARK
-    elif theme == "dark_green":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.GREEN)
-    elif theme == "purple":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.PURPLE)
-    elif theme == "amber":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.AMBER)
-    elif theme == "brown":
-        page.theme_mode = ft.ThemeMode.DARK
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.BROWN)
-    elif theme == "deep_orange":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.DEEP_ORANGE)
-    elif theme == "light_green":
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = ft.Theme(color_scheme_seed=ft.Colors.LIGHT_GREEN)
-    else:
-        page.theme_mode = ft.ThemeMode.LIGHT
-        page.theme = None
+    def theme_changed(e):
+        # Тему применяет подписчик настройки в main.py
+        try:
+            save_theme_to_db(e.control.value, personal_user_id())
+        except Exception as ex:
+            print(f"Ошибка сохранения темы: {ex}")
     
     theme_dropdown = ft.Dropdown(
         label="Выберите тему",
-        value=theme,
+        value=settings_registry.get('theme'),
         options=[
             ft.dropdown.Option("light", "Светлая тема"),
             ft.dropdown.Option("dark", "Тёмная тема"),
@@ -203,15 +135,14 @@ def settings_page(page: ft.Page) -> ft.Column:
     )
     
     def cell_shape_changed(e):
-        selected_shape = e.control.value
-        save_cell_shape_to_db(selected_shape)
-    
-    # Загружаем форму ячеек из БД
-    cell_shape = load_cell_shape_from_db()
+        try:
+            save_cell_shape_to_db(e.control.value, personal_user_id())
+        except Exception as ex:
+            print(f"Ошибка сохранения формы ячеек: {ex}")
     
     cell_shape_dropdown = ft.Dropdown(
         label="Форма ячеек календаря",
-        value=cell_shape,
+        value=settings_registry.get('cell_shape'),
         options=[
             ft.dropdown.Option("square", "Квадратные"),
             ft.dropdown.Option("round", "Круглые")
@@ -219,15 +150,36 @@ def settings_page(page: ft.Page) -> ft.Column:
         on_change=cell_shape_changed
     )
     
-    def birthday_display_changed(e):
-        save_birthday_display_to_db(e.control.value)
+    def personal_changed(e):
+        try:
+            if personal_checkbox.value:
+                # Текущие значения становятся собственными настройками пользователя
+                save_theme_to_db(theme_dropdown.value, settings_registry.user_id)
+                save_cell_shape_to_db(cell_shape_dropdown.value, settings_registry.user_id)
+            else:
+                settings_registry.clear_user_overrides()
+                theme_dropdown.value = settings_registry.get('theme')
+                cell_shape_dropdown.value = settings_registry.get('cell_shape')
+        except Exception as ex:
+            print(f"Ошибка сохранения настроек пользователя: {ex}")
+        page.update()
     
-    # Загружаем настройку отображения дней рождения из БД
-    show_birthdays = load_birthday_display_from_db()
+    personal_checkbox = ft.Checkbox(
+        label="Тема и форма ячеек только для моей учетной записи",
+        value=settings_registry.has_user_overrides(),
+        visible=settings_registry.user_id is not None,
+        on_change=personal_changed
+    )
+    
+    def birthday_display_changed(e):
+        try:
+            save_birthday_display_to_db(e.control.value)
+        except Exception as ex:
+            print(f"Ошибка сохранения настройки дней рождения: {ex}")
     
     birthday_checkbox = ft.Checkbox(
         label="Показывать контейнер дней рождения на главной странице",
-        value=show_birthdays,
+        value=settings_registry.get('show_birthdays'),
         on_change=birthday_display_changed
     )
 
@@ -238,6 +190,7 @@ def settings_page(page: ft.Page) -> ft.Column:
             ft.Text("Настройки", size=24, weight="bold"),
             theme_dropdown,
             cell_shape_dropdown,
+            personal_checkbox,
             birthday_checkbox,
 
 
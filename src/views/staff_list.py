@@ -5,35 +5,58 @@ from peewee import fn
 def staff_list_page(page: ft.Page):
     """Страница актуального перечня штатного состава"""
     
+    from database.models import User
+    
     # Получаем всех активных начальников охраны
-    chief_employees = ChiefEmployee.select().where(ChiefEmployee.termination_date.is_null())
+    chief_employees = list(
+        ChiefEmployee.select(ChiefEmployee.id, ChiefEmployee.full_name)
+        .where(ChiefEmployee.termination_date.is_null())
+        .order_by(ChiefEmployee.full_name)
+    )
+    chief_ids = [chief.id for chief in chief_employees]
+    
+    # Пользователи, связанные с начальниками (одним запросом)
+    chief_users = {}
+    if chief_ids:
+        for chief_id, user_id in User.select(User.chief_employee, User.id).where(User.chief_employee.in_(chief_ids)).tuples():
+            chief_users.setdefault(chief_id, user_id)
+    
+    # Подчиненные: созданные пользователем начальника (через created_by_user_id)
+    # или, если пользователя нет, назначенные к нему на смены (через Assignment)
+    subordinates = {chief_id: {} for chief_id in chief_ids}
+    user_chiefs = {user_id: chief_id for chief_id, user_id in chief_users.items()}
+    if user_chiefs:
+        created = GuardEmployee.select(
+            GuardEmployee.created_by_user_id, GuardEmployee.id, GuardEmployee.staff_status, GuardEmployee.criminal_liability
+        ).where(
+            (GuardEmployee.created_by_user_id.in_(list(user_chiefs))) &
+            (GuardEmployee.termination_date.is_null())
+        ).tuples()
+        for user_id, emp_id, staff_status, criminal_liability in created:
+            subordinates[user_chiefs[user_id]][emp_id] = (staff_status, criminal_liability)
+    
+    chiefs_without_user = [chief_id for chief_id in chief_ids if chief_id not in chief_users]
+    if chiefs_without_user:
+        assigned = GuardEmployee.select(
+            Assignment.chief, GuardEmployee.id, GuardEmployee.staff_status, GuardEmployee.criminal_liability
+        ).join(Assignment).where(
+            (Assignment.chief.in_(chiefs_without_user)) &
+            (GuardEmployee.termination_date.is_null())
+        ).distinct().tuples()
+        for chief_id, emp_id, staff_status, criminal_liability in assigned:
+            subordinates[chief_id][emp_id] = (staff_status, criminal_liability)
     
     rows = []
     
     for chief in chief_employees:
-        # Получаем всех сотрудников охраны, которые созданы этим начальником (через created_by_user_id)
-        from database.models import User
-        try:
-            # Находим пользователя, связанного с этим начальником
-            user = User.get(User.chief_employee == chief)
-            subordinates = GuardEmployee.select().where(
-                (GuardEmployee.created_by_user_id == user.id) & 
-                (GuardEmployee.termination_date.is_null())
-            )
-        except User.DoesNotExist:
-            # Если нет связанного пользователя, проверяем через Assignment
-            subordinates = GuardEmployee.select().join(Assignment).where(
-                (Assignment.chief == chief) & 
-                (GuardEmployee.termination_date.is_null())
-            ).distinct()
-        
-        total_staff = len(subordinates)  # Общее количество людей в штате
+        staff = subordinates[chief.id].values()
+        total_staff = len(staff)  # Общее количество людей в штате
         
         # Количество трудоустроенных (в штате)
-        employed_count = len([emp for emp in subordinates if getattr(emp, 'staff_status', 'в штате') == 'в штате'])
+        employed_count = len([1 for staff_status, _ in staff if staff_status == 'в штате'])
         
         # Количество людей с уголовной/административной ответственностью
-        criminal_count = len([emp for emp in subordinates if getattr(emp, 'criminal_liability', 'нет') == 'да'])
+        criminal_count = len([1 for _, criminal_liability in staff if criminal_liability == 'да'])
         
         rows.append(
             ft.DataRow(
@@ -1,5 +1,7 @@
 import flet as ft
-from database.models import Employee, Assignment, CashWithdrawal, db
+from database.models import Employee, Assignment, CashWithdrawal
+from database.session import db_session
+from base.search_controller import SearchController
 from datetime import datetime, date
 from peewee import fn
 
@@ -22,7 +24,7 @@ def statistics_page(page: ft.Page = None):
     employee_search = ft.TextField(
         label="Поиск сотрудника",
         width=300,
-        on_change=lambda e: search_employees(e.control.value)
+        on_change=lambda e: employee_search_controller.on_change(e)
     )
     
     # Контейнер для результатов поиска
@@ -105,53 +107,51 @@ def statistics_page(page: ft.Page = None):
     
 
     
-    def search_employees(query):
-        if not query or len(query) < 2:
-            search_results.visible = False
-            if page:
-                page.update()
-            return
-        
+    def hide_search_results(query):
+        search_results.visible = False
+    
+    def find_employees(query):
+        """Ищет активных сотрудников, а если таких нет - среди всех"""
+        from database.name_index import name_index, load_ranked
         try:
-            if db.is_closed():
-                db.connect()
-            
-            # Поиск среди активных сотрудников
-            employees = Employee.select().where(
-                (Employee.termination_date.is_null()) &
-                (fn.LOWER(Employee.full_name).contains(query.lower()))
-            ).limit(5)
-            
-            # Если не найдено, ищем среди всех сотрудников
-            if not employees.exists():
-                employees = Employee.select().where(
-                    fn.LOWER(Employee.full_name).contains(query.lower())
-                ).limit(5)
-            
-            search_results.controls.clear()
-            
-            if employees.exists():
-                for emp in employees:
-                    status = " (неактивен)" if emp.termination_date is not None else ""
-                    search_results.controls.append(
-                        ft.ListTile(
-                            title=ft.Text(f"{emp.full_name}{status}"),
-                            on_click=lambda e, employee=emp: select_employee(employee)
-                        )
-                    )
-                search_results.visible = True
-            else:
-                search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
-                search_results.visible = True
-            
-            if page:
-                page.update()
+            with db_session():
+                # Поиск среди активных сотрудников
+                matches = name_index.search(query, 5, types=('guard',), terminated=False)
             
+                # Если не найдено, ищем среди всех сотрудников
+                if not matches:
+                    matches = name_index.search(query, 5, types=('guard',))
+                return load_ranked(Employee, matches)
         except Exception as e:
             print(f"Ошибка при поиске сотрудников: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
+            return []
+    
+    def show_found_employees(query, employees):
+        """Показывает найденных сотрудников"""
+        search_results.controls.clear()
+        
+        if employees:
+            for emp in employees:
+                status = " (неактивен)" if emp.termination_date is not None else ""
+                search_results.controls.append(
+                    ft.ListTile(
+                        title=ft.Text(f"{emp.full_name}{status}"),
+                        on_click=lambda e, employee=emp: select_employee(employee)
+                    )
+                )
+            search_results.visible = True
+        else:
+            search_results.controls.append(ft.Text("Сотрудник не найден", color=ft.Colors.ERROR))
+            search_results.visible = True
+    
+    # Поиск после паузы в вводе (без кэша: при пустом результате поиск повторяется среди уволенных)
+    employee_search_controller = SearchController(
+        show_found_employees,
+        search=find_employees,
+        min_length=2,
+        on_short=hide_search_results,
+        page=page
+    )
     
     def select_employee(employee):
         employee_search.value = employee.full_name
@@ -164,81 +164,77 @@ def statistics_page(page: ft.Page = None):
             return
         
         try:
-            if db.is_closed():
-                db.connect()
-            
-            try:
-                employee = Employee.get(Employee.full_name == employee_search.value.replace(" (неактивен)", ""))
-                emp_id = employee.id
-            except Employee.DoesNotExist:
-                employee_stats_dialog.title.value = "Ошибка"
-                employee_stats_dialog.content.content.controls.clear()
-                employee_stats_dialog.content.content.controls.append(
-                    ft.Text("Сотрудник не найден. Пожалуйста, выберите сотрудника из списка.", color=ft.Colors.ERROR)
-                )
-                page.open(employee_stats_dialog)
-                return
+            with db_session():
+                try:
+                    employee = Employee.get(Employee.full_name == employee_search.value.replace(" (неактивен)", ""))
+                    emp_id = employee.id
+                except Employee.DoesNotExist:
+                    employee_stats_dialog.title.value = "Ошибка"
+                    employee_stats_dialog.content.content.controls.clear()
+                    employee_stats_dialog.content.content.controls.append(
+                        ft.Text("Сотрудник не найден. Пожалуйста, выберите сотрудника из списка.", color=ft.Colors.ERROR)
+                    )
+                    page.open(employee_stats_dialog)
+                    return
             
-            start_date = date(selected_year, selected_month, 1)
-            if selected_month == 12:
-                end_date = date(selected_year + 1, 1, 1)
-            else:
-                end_date = date(selected_year, selected_month + 1, 1)
+                start_date = date(selected_year, selected_month, 1)
+                if selected_month == 12:
+                    end_date = date(selected_year + 1, 1, 1)
+                else:
+                    end_date = date(selected_year, selected_month + 1, 1)
             
-            # Статистика по сменам
-            assignments = Assignment.select().where(
-                (Assignment.employee == emp_id) &
-                Assignment.date.between(start_date, end_date)
-            )
+                # Статистика по сменам
+                assignments = Assignment.select().where(
+                    (Assignment.employee == emp_id) &
+                    Assignment.date.between(start_date, end_date)
+                )
             
-            absences = sum(1 for a in assignments if a.is_absent)
-            base_salary = sum(float(a.hourly_rate) * a.hours for a in assignments if not a.is_absent)
-            bonuses = sum(float(a.bonus_amount) for a in assignments)
-            deductions = sum(float(a.deduction_amount) for a in assignments)
+                absences = sum(1 for a in assignments if a.is_absent)
+                base_salary = sum(float(a.hourly_rate) * a.hours for a in assignments if not a.is_absent)
+                bonuses = sum(float(a.bonus_amount) for a in assignments)
+                deductions = sum(float(a.deduction_amount) for a in assignments)
             
-            # Статистика по ВЗН
-            vzn_records = CashWithdrawal.select().where(
-                (CashWithdrawal.employee == emp_id) &
-                CashWithdrawal.date.between(start_date, end_date)
-            )
+                # Статистика по ВЗН
+                vzn_records = CashWithdrawal.select().where(
+                    (CashWithdrawal.employee == emp_id) &
+                    CashWithdrawal.date.between(start_date, end_date)
+                )
             
-            vzn_bonuses = sum(float(v.bonus_amount) for v in vzn_records)
-            total_salary = base_salary + bonuses - deductions
+                vzn_bonuses = sum(float(v.bonus_amount) for v in vzn_records)
+                total_salary = base_salary + bonuses - deductions
             
-            employee_stats_dialog.title.value = f"Статистика - {employee.full_name}"
-            employee_stats_dialog.content.content.controls.clear()
+                employee_stats_dialog.title.value = f"Статистика - {employee.full_name}"
+                employee_stats_dialog.content.content.controls.clear()
             
-            employee_stats_dialog.content.content.controls.extend([
-                ft.Text(f"Период: {RUSSIAN_MONTHS[selected_month]} {selected_year}", size=16, weight="bold"),
-                ft.Divider(),
-                ft.Row([
-                    ft.Text(f"Пропуски: {absences}", color=ft.Colors.RED),
-                    ft.Text(f"Премии: {bonuses + vzn_bonuses:.0f} ₽", color=ft.Colors.GREEN),
-                ]),
-                ft.Row([
-                    ft.Text(f"Удержания: {deductions:.0f} ₽", color=ft.Colors.ORANGE),
-                    ft.Text(f"Зарплата: {total_salary:.0f} ₽", color=ft.Colors.BLUE, weight="bold")
+                employee_stats_dialog.content.content.controls.extend([
+                    ft.Text(f"Период: {RUSSIAN_MONTHS[selected_month]} {selected_year}", size=16, weight="bold"),
+                    ft.Divider(),
+                    ft.Row([
+                        ft.Text(f"Пропуски: {absences}", color=ft.Colors.RED),
+                        ft.Text(f"Премии: {bonuses + vzn_bonuses:.0f} ₽", color=ft.Colors.GREEN),
+                    ]),
+                    ft.Row([
+                        ft.Text(f"Удержания: {deductions:.0f} ₽", color=ft.Colors.ORANGE),
+                        ft.Text(f"Зарплата: {total_salary:.0f} ₽", color=ft.Colors.BLUE, weight="bold")
+                    ])
                 ])
-            ])
             
-            page.open(employee_stats_dialog)
+                page.open(employee_stats_dialog)
             
         except Exception as e:
             print(f"Ошибка при загрузке статистики сотрудника: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def update_statistics():
-        try:
-            if db.is_closed():
-                db.connect()
-            
-            start_date = date(selected_year, selected_month, 1)
-            if selected_month == 12:
-                end_date = date(selected_year + 1, 1, 1)
+        """Загружает статистику за выбранный месяц вне потока интерфейса"""
+        from database.executor import db_executor
+        month, year = selected_month, selected_year
+        
+        def operation():
+            start_date = date(year, month, 1)
+            if month == 12:
+                end_date = date(year + 1, 1, 1)
             else:
-                end_date = date(selected_year, selected_month + 1, 1)
+                end_date = date(year, month + 1, 1)
             
             # Прямые агрегированные запросы без JOIN
             total_absences = Assignment.select(fn.SUM(Assignment.is_absent.cast('integer'))).where(
@@ -267,22 +263,33 @@ def statistics_page(page: ft.Page = None):
             ).where(CashWithdrawal.date.between(start_date, end_date)).scalar() or 0
             
             total_bonuses += vzn_bonuses
-            
+            return total_absences, total_bonuses, total_deductions, total_salary, vzn_total
+        
+        def show_statistics(result):
+            total_absences, total_bonuses, total_deductions, total_salary, vzn_total = result
             # Обновляем карточки
             absences_card.content.content.controls[1].value = str(int(total_absences))
             bonuses_card.content.content.controls[1].value = f"{total_bonuses:.0f} ₽"
             deductions_card.content.content.controls[1].value = f"{total_deductions:.0f} ₽"
             salary_card.content.content.controls[1].value = f"{total_salary:.0f} ₽"
             vzn_card.content.content.controls[1].value = f"{vzn_total:.0f} ₽"
-            
-        except Exception as e:
-            print(f"Ошибка при загрузке статистики: {e}")
-        finally:
-            if not db.is_closed():
-                db.close()
+            if page:
+                page.update()
         
-        if page:
-            page.update()
+        def set_placeholder(text):
+            for card in (absences_card, bonuses_card, deductions_card, salary_card, vzn_card):
+                card.content.content.controls[1].value = text
+            if page:
+                page.update()
+        
+        # Пока идет загрузка, в карточках показывается заглушка
+        set_placeholder("...")
+        
+        # Новый месяц вытесняет запрос за предыдущий
+        db_executor.submit(
+            (id(month_display), "statistics"), operation, show_statistics,
+            on_error=lambda e: set_placeholder("-")
+        )
     
     def change_month(delta):
         nonlocal selected_month, selected_year
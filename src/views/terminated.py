@@ -1,5 +1,12 @@
 import flet as ft
-from database.models import Employee, db
+from database.models import Employee
+from database.session import db_session
+from database.company_index import company_index
+from database.name_index import name_index, name_condition
+from database.dossier import dossier_cache
+from base.search_controller import SearchController
+from base.infinite_list import InfiniteList
+from database.projections import project
 from datetime import datetime
 
 def format_date(date):
@@ -70,30 +77,25 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
     def get_employee_companies(employee):
         """Получает все компании сотрудника"""
         try:
-            if db.is_closed():
-                db.connect()
-            
-            from database.models import Company, EmployeeCompany, GuardEmployee, ChiefEmployee, OfficeEmployee
-            
-            companies = []
-            if isinstance(employee, GuardEmployee):
-                company_relations = EmployeeCompany.select().where(EmployeeCompany.guard_employee == employee)
-            elif isinstance(employee, ChiefEmployee):
-                company_relations = EmployeeCompany.select().where(EmployeeCompany.chief_employee == employee)
-            elif isinstance(employee, OfficeEmployee):
-                company_relations = EmployeeCompany.select().where(EmployeeCompany.office_employee == employee)
-            else:
-                return ["Легион"]
-            
-            for relation in company_relations:
-                companies.append(relation.company.name)
-            
-            return companies if companies else ["Легион"]
+            with db_session():
+                from database.models import Company, EmployeeCompany, GuardEmployee, ChiefEmployee, OfficeEmployee
+            
+                companies = []
+                if isinstance(employee, GuardEmployee):
+                    company_relations = EmployeeCompany.select().where(EmployeeCompany.guard_employee == employee)
+                elif isinstance(employee, ChiefEmployee):
+                    company_relations = EmployeeCompany.select().where(EmployeeCompany.chief_employee == employee)
+                elif isinstance(employee, OfficeEmployee):
+                    company_relations = EmployeeCompany.select().where(EmployeeCompany.office_employee == employee)
+                else:
+                    return ["Легион"]
+            
+                for relation in company_relations:
+                    companies.append(relation.company.name)
+            
+                return companies if companies else ["Легион"]
         except:
             return ["Легион"]
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def show_employee_actions(employee):
         nonlocal current_employee
@@ -117,6 +119,20 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
         if page:
             page.update()
     
+    def open_employee(model, employee_id):
+        """Загружает полную запись уволенного сотрудника и показывает действия"""
+        try:
+            with db_session():
+                from database.projections import load_full
+                employee = load_full(model, employee_id)
+        except Exception as ex:
+            print(f"Ошибка загрузки сотрудника: {ex}")
+            return
+        if employee:
+            show_employee_actions(employee)
+        else:
+            refresh_list()
+    
     def close_actions_dialog():
         actions_dialog.open = False
         if page:
@@ -145,27 +161,24 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
     
     def save_termination_changes():
         try:
-            if db.is_closed():
-                db.connect()
-            
-            from datetime import datetime
-            termination_date = datetime.strptime(edit_termination_date.value, "%d.%m.%Y").date()
-            
-            current_employee.termination_date = termination_date
-            current_employee.termination_reason = edit_termination_reason.value or None
-            current_employee.save()
-            
-            # Логирование
-            if page and hasattr(page, 'auth_manager'):
-                page.auth_manager.log_action("Редактирование данных увольнения", f"Отредактированы данные увольнения сотрудника: {current_employee.full_name}")
-            
-            close_edit_termination_dialog()
-            refresh_list()
+            with db_session():
+                from datetime import datetime
+                termination_date = datetime.strptime(edit_termination_date.value, "%d.%m.%Y").date()
+            
+                current_employee.termination_date = termination_date
+                current_employee.termination_reason = edit_termination_reason.value or None
+                model = type(current_employee)
+                current_employee.save(only=[model.termination_date, model.termination_reason])
+                dossier_cache.invalidate(employee_type_of(current_employee), current_employee.id)
+            
+                # Логирование
+                if page and hasattr(page, 'auth_manager'):
+                    page.auth_manager.log_action("Редактирование данных увольнения", f"Отредактированы данные увольнения сотрудника: {current_employee.full_name}")
+            
+                close_edit_termination_dialog()
+                refresh_list()
         except Exception as ex:
             print(f"Ошибка сохранения: {ex}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def show_delete_confirmation(employee):
         delete_confirmation_dialog.content.value = f"Вы уверены, что хотите окончательно удалить сотрудника {employee.full_name}?\n\nЭто действие нельзя отменить!"
@@ -182,172 +195,179 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
     
     def confirm_delete_employee():
         try:
-            if db.is_closed():
-                db.connect()
-            
-            from database.models import User, EmployeeCompany, GuardEmployee, ChiefEmployee, OfficeEmployee
-            
-            employee_name = current_employee.full_name
-            
-            # Удаляем связанных пользователей
-            if isinstance(current_employee, GuardEmployee):
-                User.delete().where(User.guard_employee == current_employee).execute()
-                EmployeeCompany.delete().where(EmployeeCompany.guard_employee == current_employee).execute()
-            elif isinstance(current_employee, ChiefEmployee):
-                User.delete().where(User.chief_employee == current_employee).execute()
-                EmployeeCompany.delete().where(EmployeeCompany.chief_employee == current_employee).execute()
-            elif isinstance(current_employee, OfficeEmployee):
-                User.delete().where(User.office_employee == current_employee).execute()
-                EmployeeCompany.delete().where(EmployeeCompany.office_employee == current_employee).execute()
-            
-            # Теперь удаляем сотрудника
-            current_employee.delete_instance()
-            
-            # Логирование
-            if page and hasattr(page, 'auth_manager'):
-                page.auth_manager.log_action("Удаление сотрудника", f"Окончательно удален сотрудник: {employee_name}")
-            
-            close_delete_confirmation()
-            close_actions_dialog()
-            refresh_list()
+            with db_session():
+                from database.models import User, EmployeeCompany, GuardEmployee, ChiefEmployee, OfficeEmployee
+            
+                employee_name = current_employee.full_name
+            
+                # Удаляем связанных пользователей
+                if isinstance(current_employee, GuardEmployee):
+                    User.delete().where(User.guard_employee == current_employee).execute()
+                    EmployeeCompany.delete().where(EmployeeCompany.guard_employee == current_employee).execute()
+                elif isinstance(current_employee, ChiefEmployee):
+                    User.delete().where(User.chief_employee == current_employee).execute()
+                    EmployeeCompany.delete().where(EmployeeCompany.chief_employee == current_employee).execute()
+                elif isinstance(current_employee, OfficeEmployee):
+                    User.delete().where(User.office_employee == current_employee).execute()
+                    EmployeeCompany.delete().where(EmployeeCompany.office_employee == current_employee).execute()
+            
+                # Файлы сотрудника, его карточек и документов (удаляются каскадом вместе с ним)
+                from database.blob_store import employee_blob_ids, release_blob
+                blob_ids = employee_blob_ids(current_employee)
+            
+                # Теперь удаляем сотрудника
+                employee_id = current_employee.id
+                current_employee.delete_instance()
+                company_index.remove_employee(employee_type_of(current_employee), employee_id)
+                name_index.remove_employee(employee_type_of(current_employee), employee_id)
+                dossier_cache.invalidate(employee_type_of(current_employee), employee_id)
+                # Смены сотрудника удалены каскадом
+                from database.month_cache import month_cache
+                month_cache.clear()
+            
+                # Удаляем фото и файлы сотрудника, на которые больше никто не ссылается
+                for blob_id in blob_ids:
+                    release_blob(blob_id)
+            
+                # Логирование
+                if page and hasattr(page, 'auth_manager'):
+                    page.auth_manager.log_action("Удаление сотрудника", f"Окончательно удален сотрудник: {employee_name}")
+            
+                close_delete_confirmation()
+                close_actions_dialog()
+                refresh_list()
         except Exception as ex:
             print(f"Ошибка удаления: {ex}")
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def delete_employee_permanently(employee):
         close_actions_dialog()
         show_delete_confirmation(employee)
     
-    def get_terminated_employees():
-        """Получает список уволенных сотрудников"""
-        try:
-            if db.is_closed():
-                db.connect()
-            
-            from database.models import GuardEmployee, ChiefEmployee, OfficeEmployee, Company, EmployeeCompany
-            
-            # Фильтр по компаниям
-            companies = []
-            all_companies = list(Company.select())
-            
-            for company in all_companies:
-                attr_name = f"show_{company.name.lower().replace(' ', '_')}"
-                if getattr(terminated_page, attr_name, True):
-                    companies.append(company.name)
-            
-            # Получаем всех уволенных сотрудников
-            all_terminated = []
-            
-            # Охранники
-            guard_query = GuardEmployee.select().where(GuardEmployee.termination_date.is_null(False))
-            if search_value:
-                guard_query = guard_query.where(GuardEmployee.full_name.contains(search_value))
-            
-            # Применяем фильтр по компаниям для охранников
-            if len(companies) < len(all_companies) and len(companies) > 0:
-                company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-                employee_ids = [ec.guard_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-                guard_query = guard_query.where(GuardEmployee.id.in_(employee_ids))
-            elif len(companies) == 0:
-                guard_query = guard_query.where(False)
-            
-            all_terminated.extend(list(guard_query))
-            
-            # Начальники
-            chief_query = ChiefEmployee.select().where(ChiefEmployee.termination_date.is_null(False))
-            if search_value:
-                chief_query = chief_query.where(ChiefEmployee.full_name.contains(search_value))
-            
-            # Применяем фильтр по компаниям для начальников
-            if len(companies) < len(all_companies) and len(companies) > 0:
-                company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-                employee_ids = [ec.chief_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-                chief_query = chief_query.where(ChiefEmployee.id.in_(employee_ids))
-            elif len(companies) == 0:
-                chief_query = chief_query.where(False)
-            
-            all_terminated.extend(list(chief_query))
-            
-            # Офисные сотрудники
-            office_query = OfficeEmployee.select().where(OfficeEmployee.termination_date.is_null(False))
-            if search_value:
-                office_query = office_query.where(OfficeEmployee.full_name.contains(search_value))
-            
-            # Применяем фильтр по компаниям для офисных сотрудников
-            if len(companies) < len(all_companies) and len(companies) > 0:
-                company_ids = [c.id for c in Company.select().where(Company.name.in_(companies))]
-                employee_ids = [ec.office_employee_id for ec in EmployeeCompany.select().where(EmployeeCompany.company_id.in_(company_ids))]
-                office_query = office_query.where(OfficeEmployee.id.in_(employee_ids))
-            elif len(companies) == 0:
-                office_query = office_query.where(False)
-            
-            all_terminated.extend(list(office_query))
-            
-            # Сортируем по имени
-            all_terminated.sort(key=lambda emp: emp.full_name)
-            
-            return all_terminated
-        except:
-            return []
-        finally:
-            if not db.is_closed():
-                db.close()
+    def employee_type_of(employee):
+        """Тип сотрудника в индексе компаний ('guard', 'chief', 'office')"""
+        from database.models import EmployeeDirectory
+        for employee_type, model in EmployeeDirectory.MODELS.items():
+            if isinstance(employee, model):
+                return employee_type
+        return None
+    
+    def terminated_query():
+        """
+        Запрос уволенных сотрудников с учетом поиска и фильтра компаний
+        
+        Один запрос к представлению employee_directory.
+        """
+        from database.models import EmployeeDirectory
+        
+        # Фильтр по компаниям
+        companies = []
+        all_companies = company_index.companies()
+        
+        for company in all_companies:
+            attr_name = f"show_{company.name.lower().replace(' ', '_')}"
+            if getattr(terminated_page, attr_name, True):
+                companies.append(company.name)
+        
+        query = EmployeeDirectory.select().where(EmployeeDirectory.termination_date.is_null(False))
+        if search_value:
+            # ФИО в любом порядке слов, ё = е
+            query = query.where(name_condition(EmployeeDirectory.full_name, search_value))
+        
+        # Применяем фильтр по компаниям
+        if len(companies) < len(all_companies) and len(companies) > 0:
+            company_ids = [c.id for c in all_companies if c.name in companies]
+            query = query.where(EmployeeDirectory.company_ids.contains_any(*company_ids))
+        elif len(companies) == 0:
+            query = query.where(False)
+        return query
+    
+    def get_terminated_employees(after, limit):
+        """
+        Порция уволенных сотрудников, отсортированных по ФИО
+        
+        Args:
+            after: (ФИО, тип, id) последней загруженной строки или None
+            limit: число строк
+        
+        Returns:
+            list: (модель, строка списка, компании) - строка содержит только отображаемые колонки
+        """
+        from peewee import Tuple
+        from database.models import EmployeeDirectory
+        
+        company_names = {c.id: c.name for c in company_index.companies()}
+        order = (EmployeeDirectory.full_name, EmployeeDirectory.employee_type, EmployeeDirectory.employee_id)
+        query = terminated_query()
+        if after is not None:
+            # Следующая порция - по ключу сортировки последней строки (без OFFSET)
+            query = query.where(Tuple(*order) > Tuple(*after))
+        query = query.order_by(*order).limit(limit)
+        
+        rows = project(
+            query,
+            EmployeeDirectory.employee_type,
+            EmployeeDirectory.employee_id,
+            EmployeeDirectory.full_name,
+            EmployeeDirectory.termination_date,
+            EmployeeDirectory.termination_reason,
+            EmployeeDirectory.company_ids,
+        )
+        return [
+            (
+                EmployeeDirectory.model_for_type(row.employee_type),
+                row,
+                [company_names[company_id] for company_id in row.company_ids if company_id in company_names] or ["Легион"]
+            )
+            for row in rows
+        ]
     
     def restore_employee(employee):
         """Восстанавливает сотрудника (убирает дату увольнения)"""
         try:
-            if db.is_closed():
-                db.connect()
-            employee.termination_date = None
-            employee.termination_reason = None
-            employee.save()
-            
-            # Логирование
-            if page and hasattr(page, 'auth_manager'):
-                page.auth_manager.log_action("Восстановление сотрудника", f"Восстановлен сотрудник: {employee.full_name}")
-            
-            close_actions_dialog()
-            refresh_list()
+            with db_session():
+                employee.termination_date = None
+                employee.termination_reason = None
+                model = type(employee)
+                employee.save(only=[model.termination_date, model.termination_reason])
+                company_index.set_terminated(employee_type_of(employee), employee.id, False)
+                name_index.set_terminated(employee_type_of(employee), employee.id, False)
+                dossier_cache.invalidate(employee_type_of(employee), employee.id)
+            
+                # Логирование
+                if page and hasattr(page, 'auth_manager'):
+                    page.auth_manager.log_action("Восстановление сотрудника", f"Восстановлен сотрудник: {employee.full_name}")
+            
+                close_actions_dialog()
+                refresh_list()
         except:
             pass
-        finally:
-            if not db.is_closed():
-                db.close()
     
     def refresh_list():
-        """Обновляет список уволенных сотрудников"""
-        terminated_employees = get_terminated_employees()
-        terminated_list.controls.clear()
-        
-        for employee in terminated_employees:
-            companies = get_employee_companies(employee)
-            companies_text = ", ".join(companies)
-            
-            terminated_list.controls.append(
-                ft.ListTile(
-                    title=ft.Text(employee.full_name, weight="bold"),
-                    subtitle=ft.Text(f"Дата: {format_date(employee.termination_date)} | Причина: {getattr(employee, 'termination_reason', '') or 'Не указана'}"),
-                    trailing=ft.Text(companies_text),
-                    on_click=lambda e, emp=employee: show_employee_actions(emp)
-                )
-            )
-        
-        if page:
-            page.update()
+        """Загружает список уволенных сотрудников заново (в фоне, с первой порции)"""
+        terminated_rows.reset()
+    
+    def create_terminated_item(item):
+        """Строка списка уволенных"""
+        model, row, companies = item
+        return ft.ListTile(
+            title=ft.Text(row.full_name, weight="bold"),
+            subtitle=ft.Text(f"Дата: {format_date(row.termination_date)} | Причина: {row.termination_reason or 'Не указана'}"),
+            trailing=ft.Text(", ".join(companies)),
+            on_click=lambda e, m=model, emp_id=row.employee_id: open_employee(m, emp_id)
+        )
+    
+    # Поиск после паузы в вводе
+    search = SearchController(lambda text, results: refresh_list())
     
     def on_search_change(e):
         nonlocal search_value
         search_value = e.control.value.strip()
-        refresh_list()
+        search.submit(search_value)
     
     def create_company_filter_dropdown():
         """Создает dropdown с чекбоксами для фильтрации компаний"""
-        from database.models import Company
-        
         # Инициализируем фильтры для всех компаний
-        companies = list(Company.select())
+        companies = company_index.companies()
         for company in companies:
             attr_name = f"show_{company.name.lower().replace(' ', '_')}"
             if not hasattr(terminated_page, attr_name):
@@ -384,8 +404,12 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
                     update_company_filter(comp_name, e.control.value)
                 return handler
             
+            # Число уволенных по всем типам сотрудников (если индекс загружен)
+            counts = [company_index.count(employee_type, company.id, terminated=True) for employee_type in ('guard', 'chief', 'office')]
+            label = company.name if None in counts else f"{company.name} ({sum(counts)})"
+            
             checkbox = ft.Checkbox(
-                label=company.name,
+                label=label,
                 value=getattr(terminated_page, attr_name, True),
                 on_change=make_checkbox_handler(company.name)
             )
@@ -422,6 +446,7 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
     company_button = create_company_filter_dropdown()
     
     # Создаем список
+    status_text = ft.Text("", color=ft.Colors.GREY)
     terminated_list = ft.ListView(
         expand=True,
         spacing=5,
@@ -429,6 +454,18 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
         height=500
     )
     
+    # Строки загружаются порциями при прокрутке
+    terminated_rows = InfiniteList(
+        terminated_list,
+        get_terminated_employees,
+        create_terminated_item,
+        cursor=lambda item: (item[1].full_name, item[1].employee_type, item[1].employee_id),
+        key=lambda item: (item[1].employee_type, item[1].employee_id),
+        count=lambda: terminated_query().count(),
+        empty_text="Нет уволенных сотрудников",
+        status=status_text,
+        page=page
+    )
     refresh_list()
     
     return ft.Column([
@@ -443,6 +480,7 @@ def terminated_page(page: ft.Page = None) -> ft.Column:
                 dense=True,
             ),
             company_button,
+            status_text,
         ], alignment=ft.MainAxisAlignment.START, spacing=20),
         ft.Container(
             content=terminated_list,